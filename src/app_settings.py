@@ -25,8 +25,50 @@ DEFAULT_CONFIG: Dict[str, Any] = {
     "project": {"extension": ".kw"},
     "language": "ja_JP",  # フルロケール（例: ja_JP）
     "display": {"dark_mode": False, "grid_overlay": False},
+    "preview": {
+        "enabled": False,                  # 点のドラッグ中に変換結果を重ねて表示する
+        "max_size": 512,                   # プレビューの長辺の最大画素数
+        "opacity": 0.5,
+        "grid_step": 16,
+        "throttle_ms": 16,
+        "workers": 0
+    },
     "keybindings": {"undo": "Ctrl+Z", "redo": "Ctrl+Y", "toggle_mode": "F5"},
-    "tps": {"reg_lambda": "1e-3", "adaptive": False},
+    "tps": {
+        "reg_lambda": "1e-3",
+        "adaptive": False,
+        "auto_lambda": False,              # プロジェクトの対応点から GCV で reg_lambda を自動選択する
+        "max_memory_mb": 256,
+        "workers": 0,                      # 0 は CPU コア数
+        "eval_mode": "exact",              # "exact"、"grid"（粗い格子から補間）または "fast"（遠方場の近似評価）
+        "grid_step": 16,
+        "grid_tolerance": 0.1,             # grid / fast モードで許容する最大誤差（画素）
+        "lowrank_threshold": 3000,         # 対応点がこの数を超えると低ランク近似で解く（0 で無効）
+        "lowrank_landmarks": 1000,         # 低ランク近似で基底関数の中心とする対応点の数
+        "precision": "float64"             # exact モードでのカーネルの評価精度（"float32" は約 2 倍高速）
+    },
+    "diagnostics": {
+        "residual_warning_px": 5.0         # leave-one-out 残差（画素）がこれを超える対応点を強調表示する
+    },
+    "mosaic": {
+        "feather_px": 32.0                 # 複数シートの重なりをぼかす幅（元画像の画素）
+    },
+    "cache": {
+        "enabled": False,                  # 合成済みワープマップをユーザ設定ディレクトリの warp_cache にキャッシュする
+        "max_size_mb": 1024
+    },
+    "server": {
+        "host": "127.0.0.1",
+        "port": 8765,
+        "jobs": 2,                         # 同時に実行するジョブ数
+        "max_queue": 64,
+        "image_cache_mb": 1024,            # デコード済みの元画像を保持するメモリ上限
+        "solver_cache_size": 32            # 保持する TPS パラメータの件数
+    },
+    "tracing": {
+        "enabled": False,                  # 変換の各ステージの計測結果を transform_spans.jsonl に書き出す
+        "trace_memory": True               # tracemalloc でメモリ確保量のピークも計測する
+    },
     "logging": {"max_run_logs": 10},
     "grid": {"size": 50, "color": "#C8C8C8", "opacity": 0.47},
     "scene": {"margin_ratio": 0.01}
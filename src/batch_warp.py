@@ -0,0 +1,226 @@
+# src/batch_warp.py
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
+
+SUMMARY_FILE_NAME = "summary.json"
+OUTPUT_FORMATS = ("png", "jpg", "tif", "bmp")
+# 帯単位で書き出せる（ストリーミング変換に対応する）出力形式
+STREAM_OUTPUT_FORMATS = ("png", "tif")
+
+def _needs_streaming(project: Any) -> bool:
+    """
+    実地図画像が QImage として読めない（Qt の上限を超える）場合や、一辺が cv2.remap で扱える上限以上の場合に True を返します。
+    """
+    from core import MAX_REMAP_SIDE
+    if project.real_qimage.isNull():
+        return bool(project.real_image_data)
+    return project.real_qimage.width() >= MAX_REMAP_SIDE or project.real_qimage.height() >= MAX_REMAP_SIDE
+
+def _stream_project(project: Any, output_path: str, settings: Dict[str, Any], source: Optional[str]) -> None:
+    """
+    実地図画像を QImage を経由せずに帯単位で変換し、出力先へ直接書き出します。
+    source を指定しない場合は、プロジェクトに埋め込まれた画像を一時ファイルにデコードして使います。
+    """
+    import base64
+    import numpy as np
+    from streaming import decode_to_memmap, open_image_reader, stream_to_file
+    if source is not None:
+        reader = open_image_reader(source)
+    else:
+        encoded = np.frombuffer(base64.b64decode(project.real_image_data), dtype=np.uint8)
+        reader = decode_to_memmap(encoded, f"{project.name} (real map)")
+        del encoded
+    try:
+        output_size = (project.game_qimage.width(), project.game_qimage.height())
+        stream_to_file([tuple(p) for p in project.game_points], [tuple(p) for p in project.real_points],
+                       reader, output_path, output_size, settings)
+    finally:
+        reader.close()
+
+def warp_project_file(project_path: str, output_dir: str, output_format: str = "png",
+                      threads: Optional[int] = None, stream: bool = False,
+                      source: Optional[str] = None) -> Dict[str, Any]:
+    """
+    プロジェクトファイルを GUI なしで読み込み、TPS 変換の結果を画像として書き出します。
+    プロセスプールのワーカーからも呼び出されるため、例外は送出せず結果の辞書に記録します。
+
+    stream が True の場合、source を指定した場合、または実地図画像が QImage や cv2.remap の上限を超える場合は、
+    streaming モジュールで元画像の必要な窓だけを読み、出力を帯単位で書き出します（png と tif のみ、合成は非対応）。
+
+    Args:
+        project_path (str): .kw プロジェクトファイルのパス
+        output_dir (str): 出力ディレクトリ
+        output_format (str, optional): 出力画像の形式（拡張子）
+        threads (Optional[int], optional): 1ジョブあたりのスレッド数。None の場合は設定値
+        stream (bool, optional): 常にストリーミング変換を使う場合は True
+        source (Optional[str], optional): プロジェクトに埋め込まれた画像の代わりに使う実地図画像のパス
+
+    Returns:
+        Dict[str, Any]: project, output, status ("ok" / "error"), error, streamed, timings（秒）を含む結果
+    """
+    # QApplication を作らずに Qt の画像処理だけを使う
+    from PyQt5.QtGui import QImage
+    from project import Project
+    from core import perform_qimage_transformation, perform_mosaic_transformation, load_transform_settings, MOSAIC_FEATHER_PX
+    from app_settings import config
+    from common import _
+    from logger import logger
+
+    result: Dict[str, Any] = {"project": project_path, "output": None, "status": "ok", "error": None, "timings": {}}
+    started = time.perf_counter()
+    try:
+        project = Project.load(project_path, headless=True)
+        loaded = time.perf_counter()
+        result["timings"]["load"] = loaded - started
+        if not project.sheets and not project.has_valid_real_points():
+            raise ValueError(_("error_insufficient_points"))
+        streamed = not project.sheets and (stream or source is not None or _needs_streaming(project))
+        result["streamed"] = streamed
+        if project.game_qimage.isNull() or (not project.sheets and not streamed and project.real_qimage.isNull()):
+            raise ValueError(_("game_image_error_insufficient_points"))
+        if project.sheets and (stream or source is not None):
+            raise ValueError("Streaming output does not support projects with mosaic sheets")
+        if streamed and output_format not in STREAM_OUTPUT_FORMATS:
+            raise ValueError(f"Streaming output supports only --format {' or '.join(STREAM_OUTPUT_FORMATS)}")
+        settings = load_transform_settings(project)
+        if threads is not None:
+            settings["workers"] = max(1, threads)
+        output_size = (project.game_qimage.width(), project.game_qimage.height())
+        output_path = os.path.join(output_dir, f"{project.name}.{output_format}")
+        if streamed:
+            # デコード済みの QImage は使わないため先に解放する
+            project.real_qimage = QImage()
+            logger.info("Streaming warp for %s", project_path)
+            _stream_project(project, output_path, settings, source)
+            warped = None
+        elif project.sheets:
+            # 複数のシートを持つプロジェクトは 1 枚に合成する
+            sheets = project.mosaic_sheets()
+            warped = perform_mosaic_transformation(sheets, output_size,
+                                                   feather_px=config.get("mosaic/feather_px", MOSAIC_FEATHER_PX),
+                                                   **settings)
+            result["sheets"] = len(sheets)
+        else:
+            warped = perform_qimage_transformation(project.game_points, project.real_points,
+                                                   project.real_qimage, output_size, **settings)
+        warped_at = time.perf_counter()
+        result["timings"]["warp"] = warped_at - loaded
+        if warped is not None and not warped.save(output_path):
+            raise IOError(f"Failed to write {output_path}")
+        result["timings"]["save"] = time.perf_counter() - warped_at
+        result["output"] = output_path
+        result["size"] = list(output_size)
+        logger.info("Batch warp finished: %s -> %s", project_path, output_path)
+    except Exception as e:
+        logger.exception("Batch warp failed: %s", project_path)
+        result["status"] = "error"
+        result["error"] = str(e)
+    result["timings"]["total"] = time.perf_counter() - started
+    return result
+
+def run_batch(project_paths: List[str], output_dir: str, jobs: int = 1, threads: Optional[int] = None,
+              output_format: str = "png", stream: bool = False, source: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    複数のプロジェクトを変換します。jobs が2以上の場合はプロセスプールで並列に実行します。
+
+    Args:
+        project_paths (List[str]): .kw プロジェクトファイルのパス
+        output_dir (str): 出力ディレクトリ
+        jobs (int, optional): 同時に実行するプロセス数
+        threads (Optional[int], optional): 1ジョブあたりのスレッド数。None の場合は CPU コア数を jobs で割った値
+        output_format (str, optional): 出力画像の形式（拡張子）
+        stream (bool, optional): 常にストリーミング変換を使う場合は True
+        source (Optional[str], optional): 埋め込まれた画像の代わりに使う実地図画像のパス（プロジェクトが1つの場合のみ）
+
+    Returns:
+        List[Dict[str, Any]]: project_paths と同じ順の結果
+    """
+    if source is not None and len(project_paths) != 1:
+        raise ValueError("A source image can only be given for a single project")
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = max(1, min(jobs, len(project_paths) or 1))
+    if threads is None:
+        # プロセスとスレッドの合計がコア数を超えないようにする
+        threads = max(1, (os.cpu_count() or 1) // jobs)
+    if jobs == 1:
+        return [warp_project_file(path, output_dir, output_format, threads, stream, source) for path in project_paths]
+    results: Dict[str, Dict[str, Any]] = {}
+    # Qt とスレッドを使うため、fork ではなく spawn で子プロセスを起動する
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=context) as executor:
+        futures = {executor.submit(warp_project_file, path, output_dir, output_format, threads, stream, source): path
+                   for path in project_paths}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                results[path] = future.result()
+            except Exception as e:
+                # ワーカープロセス自体が異常終了した場合
+                results[path] = {"project": path, "output": None, "status": "error", "error": str(e), "timings": {}}
+            print(_format_result(results[path]), flush=True)
+    return [results[path] for path in project_paths]
+
+def _format_result(result: Dict[str, Any]) -> str:
+    total = result["timings"].get("total")
+    elapsed = f"{total:8.2f}s" if total is not None else "       -"
+    detail = result["output"] if result["status"] == "ok" else result["error"]
+    return f"[{result['status']:>5}] {elapsed}  {result['project']}  {detail}"
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="kartenwarp", description="KartenWarp headless batch tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    warp = subparsers.add_parser("warp", help="Warp the real map of each project onto its game image")
+    warp.add_argument("projects", nargs="+", help="Project files (.kw)")
+    warp.add_argument("--out", "-o", required=True, help="Output directory")
+    warp.add_argument("--jobs", "-j", type=int, default=1, help="Number of projects processed in parallel")
+    warp.add_argument("--threads", "-t", type=int, default=None,
+                      help="Threads per job (default: CPU cores divided by --jobs)")
+    warp.add_argument("--format", "-f", choices=OUTPUT_FORMATS, default="png", help="Output image format")
+    warp.add_argument("--stream", action="store_true",
+                      help="Read the real map in windows and write the output in strips (png/tif only); "
+                           "used automatically when the real map exceeds the in-memory limits")
+    warp.add_argument("--source", default=None,
+                      help="Real map image used instead of the embedded one (implies --stream; single project only)")
+    warp.add_argument("--summary", default=None,
+                      help=f"Summary JSON path (default: <out>/{SUMMARY_FILE_NAME})")
+    return parser
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    コマンドラインのエントリーポイントです。全プロジェクトが成功した場合は 0 を返します。
+
+    例: python src/main.py warp a.kw b.kw --out results/ --jobs 4
+        python src/main.py warp a.kw --out results/ --format tif --source scan.tif
+    """
+    parser = build_arg_parser()
+    args = parser.parse_args(argv)
+    if args.source is not None and len(args.projects) != 1:
+        parser.error("--source can only be used with a single project")
+    started = time.perf_counter()
+    results = run_batch(args.projects, args.out, jobs=args.jobs, threads=args.threads, output_format=args.format,
+                        stream=args.stream, source=args.source)
+    if args.jobs <= 1:
+        for result in results:
+            print(_format_result(result))
+    failed = sum(1 for r in results if r["status"] != "ok")
+    summary = {
+        "total": len(results),
+        "succeeded": len(results) - failed,
+        "failed": failed,
+        "elapsed": time.perf_counter() - started,
+        "results": results,
+    }
+    summary_path = args.summary or os.path.join(args.out, SUMMARY_FILE_NAME)
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    print(f"{summary['succeeded']}/{summary['total']} succeeded in {summary['elapsed']:.2f}s; summary: {summary_path}")
+    return 0 if failed == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
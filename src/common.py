@@ -4,7 +4,8 @@ import json
 import os
 import logging
 import numpy as np
-from typing import Any, Dict, Tuple, List, Callable
+import cv2
+from typing import Any, Dict, Tuple, List, Callable, Optional
 from PyQt5.QtWidgets import QAction, QFileDialog
 from PyQt5.QtGui import QKeySequence, QPixmap, QImage
 from PyQt5.QtCore import Qt
@@ -91,22 +92,83 @@ def load_image(file_path: str) -> Tuple[QPixmap, QImage]:
     qimage = QImage(file_path)
     return pixmap, qimage
 
+# コピーなしで NumPy 配列として参照できる QImage 形式とチャンネル数
+# （32bit 形式のメモリ上の並びはリトルエンディアンで B, G, R, A）
+QIMAGE_VIEW_CHANNELS: Dict[int, int] = {
+    QImage.Format_RGB32: 4,
+    QImage.Format_ARGB32: 4,
+    QImage.Format_ARGB32_Premultiplied: 4,
+    QImage.Format_RGB888: 3,
+}
+
+class _QImageArray(np.ndarray):
+    """
+    QImage のメモリを参照する配列です。参照元の QImage を保持し、配列より先に解放されないようにします。
+    この配列から作ったスライスやビューも base を通じて QImage を保持します。
+    """
+    _qimage: Optional[QImage] = None
+
+def qimage_array_view(qimage: QImage, writable: bool = False) -> np.ndarray:
+    """
+    QImage のメモリをコピーせずに参照する、形状 (H, W, C) の uint8 配列を返します。
+    行末のパディングはストライドで表現されます。32bit 形式のチャンネル順は B, G, R, A です。
+    
+    Args:
+        qimage (QImage): 参照する QImage（形式は QIMAGE_VIEW_CHANNELS のいずれか）
+        writable (bool, optional): Trueの場合は書き込み可能な配列を返します。
+            共有中の QImage はこの時点で複製（デタッチ）されるため、新しく作成した QImage に対して使用してください。
+    
+    Returns:
+        np.ndarray: QImage と同じメモリを参照する配列
+    
+    Raises:
+        ValueError: 対応していない形式の場合
+    """
+    channels = QIMAGE_VIEW_CHANNELS.get(qimage.format())
+    if channels is None:
+        raise ValueError(f"Unsupported QImage format for array view: {qimage.format()}")
+    height, width, stride = qimage.height(), qimage.width(), qimage.bytesPerLine()
+    ptr = qimage.bits() if writable else qimage.constBits()
+    ptr.setsize(stride * height)
+    view = np.ndarray(shape=(height, width, channels), dtype=np.uint8, buffer=ptr,
+                      strides=(stride, channels, 1)).view(_QImageArray)
+    view._qimage = qimage
+    if not writable:
+        view.flags.writeable = False
+    return view
+
 def qimage_to_numpy(qimage: QImage) -> np.ndarray:
     """
     QImage を NumPy 配列（RGB形式）に変換します。
+    RGB32 の QImage はメモリを直接参照し、RGB への並べ替えの1回だけコピーします。
+    
+    以前の版は RGB32 のメモリ上の並び（B, G, R）をそのまま返しており、RGB と書かれていても
+    実際には赤と青が入れ替わっていました。現在はチャンネル 0 が R の本来の RGB 順で返すため、
+    戻り値の赤と青を自分で入れ替えていた呼び出し側は、その処理を削除してください。
     
     Args:
         qimage (QImage): 変換する QImage
     
     Returns:
-        np.ndarray: RGB形式の NumPy 配列
+        np.ndarray: RGB 順（R, G, B）の連続した NumPy 配列
     """
     qimage = qimage.convertToFormat(QImage.Format_RGB32)
-    width, height = qimage.width(), qimage.height()
-    ptr = qimage.bits()
-    ptr.setsize(height * width * 4)
-    arr = np.array(ptr).reshape(height, width, 4)
-    return arr[..., :3]
+    return cv2.cvtColor(qimage_array_view(qimage), cv2.COLOR_BGRA2RGB)
+
+def numpy_to_qimage(arr: np.ndarray) -> QImage:
+    """
+    NumPy 配列（RGB形式）を QImage に変換します。
+    戻り値の QImage は配列とメモリを共有しないため、配列の解放後も安全に利用できます。
+    
+    Args:
+        arr (np.ndarray): 形状 (H, W, 3) の uint8 配列
+    
+    Returns:
+        QImage: Format_RGB888 の QImage
+    """
+    arr = np.ascontiguousarray(arr)
+    height, width = arr.shape[0], arr.shape[1]
+    return QImage(arr.data, width, height, arr.strides[0], QImage.Format_RGB888).copy()
 
 def open_file_dialog(parent: Any, title: str, directory: str = "", file_filter: str = "All Files (*)") -> str:
     """
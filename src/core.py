@@ -2,14 +2,21 @@
 
 import os
 import json
+import contextvars
 import numpy as np
 import cv2
-from typing import Any, Tuple, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+import threading
+from typing import Any, Callable, Dict, Tuple, List, Optional
 from PyQt5.QtGui import QImage, QPixmap
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QRect
 from logger import logger, transform_logger
 from app_settings import config
-from common import qimage_to_numpy, _  # 翻訳用関数 _ を追加
+from common import qimage_to_numpy, qimage_array_view, QIMAGE_VIEW_CHANNELS, _  # 翻訳用関数 _ を追加
+from tps_solver import get_tps_solver, gcv_sweep, select_landmarks, LowRankTPSSolver, LOWRANK_LANDMARKS
+from tps_fast import FastTPSEvaluator
+from warp_cache import get_warp_map_cache, make_cache_key
+import tracing
 
 # --- データモデル ---
 class SceneState:
@@ -49,15 +56,50 @@ class SceneState:
         self.real_points = points
 
 # --- TPS変換関連 ---
-def compute_tps_parameters(dest_points: np.ndarray, src_points: np.ndarray, reg_lambda: float = 1e-3, adaptive: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+# 行ストリップ分割時の最小タイル数
+MIN_TILES = 16
+ROI_SAMPLE_STEP = 16  # 参照範囲（ROI）を見積もる際のマップの標本化間隔（画素）
+ROI_MARGIN = 2       # 標本点の間でマップが極値を取る場合に備えた ROI の余白（画素）
+# 格子補間の誤差見積もりは標本点上の最大値で真の最大値をわずかに下回り得るため、許容誤差と比べる前に掛ける安全係数
+LATTICE_ERROR_SAFETY = 1.25
+# exact モードでカーネルを評価する浮動小数点の精度
+PRECISIONS = ("float64", "float32")
+# float32 で評価する際に、まとめて float32 で和を取る対応点の数（ブロック間の和は float64 で取る）
+FLOAT32_BLOCK = 64
+# cv2.remap が扱える元画像の一辺の上限（SHRT_MAX 未満）
+MAX_REMAP_SIDE = 32767
+# 複数シートの合成で、出力を分割するブロックの一辺（画素）と、重なりをぼかす既定の幅（元画像の画素）
+MOSAIC_TILE = 512
+MOSAIC_FEATHER_PX = 32.0
+
+# 進捗通知用のコールバック: (ステージ名, 完了数, 総数)
+ProgressCallback = Callable[[str, int, int], None]
+
+class TransformCancelled(Exception):
+    """
+    変換処理がキャンセルされたことを示す例外です。
+    """
+    pass
+
+def _check_cancelled(cancel_event: Optional[threading.Event]) -> None:
+    if cancel_event is not None and cancel_event.is_set():
+        raise TransformCancelled()
+
+def compute_tps_parameters(dest_points: np.ndarray, src_points: np.ndarray, reg_lambda: float = 1e-3, adaptive: bool = False,
+                           lowrank_threshold: Optional[int] = None,
+                           lowrank_landmarks: int = LOWRANK_LANDMARKS) -> Tuple[np.ndarray, np.ndarray]:
     """
     Thin Plate Spline (TPS) の変換パラメータを計算します。
+    係数行列の分解は tps_solver にキャッシュされ、x, y の右辺は一度にまとめて解かれます。
+    点数が lowrank_threshold を超える場合は、密な係数行列を作らない低ランク近似（LowRankTPSSolver）で解きます。
     
     Args:
         dest_points (np.ndarray): 変換先の対応点配列 (N, 2)
         src_points (np.ndarray): 変換元の対応点配列 (N, 2)
         reg_lambda (float, optional): 正則化パラメータ。デフォルトは1e-3。
         adaptive (bool, optional): Trueの場合、点間距離に応じた正則化パラメータに調整します。
+        lowrank_threshold (Optional[int], optional): 低ランク近似に切り替える点数。None または 0 の場合は常に厳密に解く
+        lowrank_landmarks (int, optional): 低ランク近似で基底関数の中心とするランドマークの数
         
     Returns:
         Tuple[np.ndarray, np.ndarray]: TPS変換パラメータ (params_x, params_y)
@@ -66,42 +108,385 @@ def compute_tps_parameters(dest_points: np.ndarray, src_points: np.ndarray, reg_
         ValueError: 点数が不足している場合などのエラー発生時
     """
     transform_logger.debug("Computing TPS parameters")
+    reg_lambda = _resolve_reg_lambda(dest_points, reg_lambda, adaptive)
+
+    # 分解結果はキャッシュされ、1 点だけ異なる点集合に対しては逐次更新される
+    solver = get_tps_solver(dest_points, reg_lambda, lowrank_threshold, lowrank_landmarks)
+    with tracing.span("solve", points=len(dest_points)) as solve_span:
+        params_x, params_y = solver.solve(src_points)
+        if isinstance(solver, LowRankTPSSolver):
+            solve_span.set(landmarks=int(solver.landmarks.size), residual_max=solver.residual[0],
+                           residual_rms=solver.residual[1])
+
+    transform_logger.debug("TPS parameters computed")
+    return params_x, params_y
+
+def compute_loo_residuals(dest_points: np.ndarray, src_points: np.ndarray, reg_lambda: float = 1e-3,
+                          adaptive: bool = False, lowrank_threshold: Optional[int] = None,
+                          lowrank_landmarks: int = LOWRANK_LANDMARKS, **kwargs: Any) -> np.ndarray:
+    """
+    各対応点を除いて変換を計算し直した場合に、その点で生じるずれ（leave-one-out 残差）を画素単位で返します。
+    n 回の再計算は行わず、compute_tps_parameters と共有する分解結果から閉じた式で一度に求めます。
+    ほかの点から予測される位置と大きくずれる点ほど値が大きく、対応点の打ち間違いの候補になります。
+
+    WarpMapBuilder と同様に、変換元の対応点をアフィン変換で変換先の座標系に揃えてから TPS を当てはめるため、
+    残差は変換先（ゲーム画像）の画素単位です。アフィン変換は全点から推定したものを固定して扱います。
+
+    Args:
+        dest_points (np.ndarray): 変換先の対応点配列 (N, 2)
+        src_points (np.ndarray): 変換元の対応点配列 (N, 2)
+        reg_lambda (float, optional): 正則化パラメータ
+        adaptive (bool, optional): Trueの場合、点間距離に応じた正則化パラメータに調整します。
+        lowrank_threshold (Optional[int], optional): 低ランク近似に切り替える点数。None または 0 の場合は常に厳密に解く
+        lowrank_landmarks (int, optional): 低ランク近似で基底関数の中心とするランドマークの数
+        **kwargs: その他の変換設定（使用しません）
+
+    Returns:
+        np.ndarray: 形状 (N,) の残差（画素）。点を除くと変換が定まらない場合は inf
+
+    Raises:
+        ValueError: 対応点が 4 点未満の場合、またはアフィン変換失敗時
+    """
+    src_points_np = np.array(src_points, dtype=np.float64).reshape(-1, 2)
+    dest_points_np = np.array(dest_points, dtype=np.float64).reshape(-1, 2)
+    if src_points_np.shape[0] < 4 or src_points_np.shape[0] != dest_points_np.shape[0]:
+        raise ValueError(_("error_loo_minimum_points"))
+    with tracing.trace("compute_loo_residuals", points=src_points_np.shape[0]):
+        affine_matrix = _estimate_affine(src_points_np, dest_points_np)
+        aligned_src_points = cv2.transform(src_points_np[None], affine_matrix)[0]
+        reg_lambda = _resolve_reg_lambda(dest_points_np, reg_lambda, adaptive)
+        solver = get_tps_solver(dest_points_np, reg_lambda, lowrank_threshold, lowrank_landmarks)
+        with tracing.span("leave_one_out", points=solver.n):
+            errors = solver.leave_one_out(aligned_src_points)
+    residuals = np.hypot(errors[:, 0], errors[:, 1])
+    transform_logger.debug("Leave-one-out residuals computed: max %.3f px at point %d",
+                           float(np.max(residuals)), int(np.argmax(residuals)))
+    return residuals
+
+def compute_gcv_curve(dest_points: np.ndarray, src_points: np.ndarray, lowrank_threshold: Optional[int] = None,
+                      lowrank_landmarks: int = LOWRANK_LANDMARKS) -> Dict[str, Any]:
+    """
+    一般化交差検証（GCV）が最小になる正則化パラメータを、λ の候補を掃引して求めます。
+    カーネル行列の固有値分解は一度だけ行い、候補ごとの評価はその結果から計算します（tps_solver.gcv_sweep）。
+
+    compute_loo_residuals と同様に、変換元の対応点はアフィン変換で変換先の座標系に揃えてから評価します。
+    点数が lowrank_threshold を超える場合は、固有値分解の O(N^3) を避けるため、低ランク近似と同じく
+    均等に選んだ lowrank_landmarks 点だけで評価します。
+
+    Args:
+        dest_points (np.ndarray): 変換先の対応点配列 (N, 2)
+        src_points (np.ndarray): 変換元の対応点配列 (N, 2)
+        lowrank_threshold (Optional[int], optional): 点を間引いて評価する点数の閾値（None は常に全点）
+        lowrank_landmarks (int, optional): 間引く場合に使う点の数
+
+    Returns:
+        Dict[str, Any]: reg_lambda（選ばれた λ）, lambdas（λ の候補）, gcv（各候補の GCV の値）, points（使用した点数）
+
+    Raises:
+        ValueError: 対応点が 4 点未満の場合、またはアフィン変換失敗時
+    """
+    src_points_np = np.array(src_points, dtype=np.float64).reshape(-1, 2)
+    dest_points_np = np.array(dest_points, dtype=np.float64).reshape(-1, 2)
+    if src_points_np.shape[0] < 4 or src_points_np.shape[0] != dest_points_np.shape[0]:
+        raise ValueError(_("error_loo_minimum_points"))
+    with tracing.trace("compute_gcv_curve", points=src_points_np.shape[0]):
+        affine_matrix = _estimate_affine(src_points_np, dest_points_np)
+        aligned_src_points = cv2.transform(src_points_np[None], affine_matrix)[0]
+        if lowrank_threshold and 0 < lowrank_threshold < dest_points_np.shape[0]:
+            subset = select_landmarks(dest_points_np, lowrank_landmarks)
+            dest_points_np, aligned_src_points = dest_points_np[subset], aligned_src_points[subset]
+        lambdas, scores = gcv_sweep(dest_points_np, aligned_src_points)
+    best = int(np.argmin(scores))
+    transform_logger.info("GCV selected reg_lambda = %.6g (GCV %.6g, %d candidates, %d points)",
+                          lambdas[best], scores[best], lambdas.size, dest_points_np.shape[0])
+    return {
+        "reg_lambda": float(lambdas[best]),
+        "lambdas": lambdas.tolist(),
+        "gcv": [float(v) if np.isfinite(v) else None for v in scores],
+        "points": int(dest_points_np.shape[0]),
+    }
+
+def auto_lambda_key(game_points: List[Tuple[float, float]], real_points: List[Tuple[float, float]],
+                    lowrank_threshold: Optional[int] = None, lowrank_landmarks: int = LOWRANK_LANDMARKS) -> str:
+    """
+    GCV で選んだ λ を Project.settings["auto_lambda"] に保存する際の、対応点と設定を表すキーを返します。
+    """
+    return make_cache_key(game_points, real_points, (0, 0), (), method="gcv",
+                          lowrank_threshold=lowrank_threshold, lowrank_landmarks=lowrank_landmarks)
+
+def compute_auto_lambda(game_points: List[Tuple[float, float]], real_points: List[Tuple[float, float]],
+                        lowrank_threshold: Optional[int] = None,
+                        lowrank_landmarks: int = LOWRANK_LANDMARKS) -> Optional[Dict[str, Any]]:
+    """
+    対応点に対して GCV の掃引を行い、Project.settings["auto_lambda"] に保存する形式の結果を返します。
+    プロジェクトには触れないため、ワーカースレッドから呼び出せます（掃引は O(N^3) のため GUI スレッドでは呼ばないこと）。
+
+    Args:
+        game_points (List[Tuple[float, float]]): ゲーム画像（変換先）の対応点
+        real_points (List[Tuple[float, float]]): 実地図（変換元）の対応点
+        lowrank_threshold (Optional[int], optional): 点を間引いて評価する点数の閾値
+        lowrank_landmarks (int, optional): 間引く場合に使う点の数
+
+    Returns:
+        Optional[Dict[str, Any]]: key と compute_gcv_curve の結果。対応点が不足している場合や計算に失敗した場合は None
+    """
+    if len(game_points) != len(real_points) or len(game_points) < 4:
+        return None
+    try:
+        curve = compute_gcv_curve(game_points, real_points, lowrank_threshold, lowrank_landmarks)
+    except Exception:
+        transform_logger.exception("GCV regularization sweep failed; using the configured reg_lambda")
+        return None
+    return {"key": auto_lambda_key(game_points, real_points, lowrank_threshold, lowrank_landmarks), **curve}
+
+def resolve_auto_lambda(project: Any, lowrank_threshold: Optional[int] = None,
+                        lowrank_landmarks: int = LOWRANK_LANDMARKS, compute: bool = True) -> Optional[float]:
+    """
+    プロジェクトの対応点に対して GCV で選んだ正則化パラメータを返します。
+    結果は GCV の曲線とともに Project.settings["auto_lambda"] に保存され、対応点が変わらない限り
+    （プロジェクトを読み直した後も）掃引をやり直しません。
+
+    compute が False の場合は掃引を行わず、保存済みの λ を返します。対応点が変わった後でも、
+    直前の掃引で選ばれた λ をそのまま返します（GUI スレッドやプレビューから呼び出す場合）。
+
+    Args:
+        project (Any): 対象のプロジェクト
+        lowrank_threshold (Optional[int], optional): 点を間引いて評価する点数の閾値
+        lowrank_landmarks (int, optional): 間引く場合に使う点の数
+        compute (bool, optional): 保存済みの結果が現在の対応点のものでない場合に掃引を行うか
+
+    Returns:
+        Optional[float]: 選ばれた λ。対応点が不足している場合、計算に失敗した場合、
+            compute が False で保存済みの結果がない場合は None
+    """
+    game_points, real_points = project.game_points, project.real_points
+    if len(game_points) != len(real_points) or len(game_points) < 4:
+        return None
+    stored = project.settings.get("auto_lambda")
+    if isinstance(stored, dict) and "reg_lambda" in stored:
+        if not compute or stored.get("key") == auto_lambda_key(game_points, real_points, lowrank_threshold,
+                                                                lowrank_landmarks):
+            return float(stored["reg_lambda"])
+    if not compute:
+        return None
+    entry = compute_auto_lambda(game_points, real_points, lowrank_threshold, lowrank_landmarks)
+    if entry is None:
+        return None
+    # 対応点が変わるとプロジェクトは変更済みになるため、保存の要否はここでは変えない
+    project.settings["auto_lambda"] = entry
+    return entry["reg_lambda"]
+
+def auto_lambda_pending(project: Any, settings: Dict[str, Any]) -> bool:
+    """
+    tps/auto_lambda が有効で、現在の対応点に対する GCV の掃引がまだ行われていないかを返します。
+    load_transform_settings(project, resolve_lambda=False) の結果とともに、ワーカーで掃引を行うかの判断に使います。
+    """
+    if project is None or not config.get("tps/auto_lambda", False):
+        return False
+    game_points, real_points = project.game_points, project.real_points
+    if len(game_points) != len(real_points) or len(game_points) < 4:
+        return False
+    stored = project.settings.get("auto_lambda")
+    key = auto_lambda_key(game_points, real_points, settings["lowrank_threshold"], settings["lowrank_landmarks"])
+    return not (isinstance(stored, dict) and stored.get("key") == key)
+
+def _resolve_reg_lambda(dest_points: np.ndarray, reg_lambda: float, adaptive: bool) -> float:
+    # adaptive の場合は点間距離の二乗の平均を掛ける
     if adaptive:
-        diff = dest_points[:, None, :] - dest_points[None, :, :]
-        r2 = np.sum(diff ** 2, axis=2)
-        nonzero = r2[r2 != 0]
-        avg_dist2 = np.mean(nonzero) if nonzero.size > 0 else 1.0
+        avg_dist2 = _mean_pairwise_distance2(np.asarray(dest_points, dtype=np.float64).reshape(-1, 2))
         reg_lambda *= avg_dist2
         transform_logger.debug("Adaptive enabled: adjusted reg_lambda = %s", reg_lambda)
+    return reg_lambda
 
+def _mean_pairwise_distance2(points: np.ndarray) -> float:
+    """
+    異なる位置にある点の組の距離の二乗の平均を、(N, N) の距離行列を作らずに求めます。
+    """
+    n = points.shape[0]
+    centered = points - points.mean(axis=0)
+    # Σ_ij |p_i - p_j|^2 = 2n Σ_i |p_i|^2 - 2 |Σ_i p_i|^2（中心化したので後者は 0）
+    total = 2.0 * n * float(np.sum(centered ** 2))
+    _, counts = np.unique(points, axis=0, return_counts=True)
+    pairs = n * n - int(np.sum(counts.astype(np.int64) ** 2))
+    return total / pairs if pairs > 0 else 1.0
+
+def resolve_worker_count(workers: Optional[int]) -> int:
+    """
+    設定されたワーカー数を実際に使用するスレッド数に変換します。
+    
+    Args:
+        workers (Optional[int]): ワーカー数。None または 0 以下の場合は CPU コア数を使用
+        
+    Returns:
+        int: 使用するワーカー数（最低 1）
+    """
+    if workers is None or workers <= 0:
+        return os.cpu_count() or 1
+    return int(workers)
+
+def _tps_rows_per_tile(n_points: int, width: int, max_memory_mb: Optional[float], itemsize: int = 8) -> int:
+    """
+    メモリ上限からタイル（行ストリップ）あたりの行数を求めます。
+    
+    Args:
+        n_points (int): 対応点の数
+        width (int): グリッドの横幅
+        max_memory_mb (Optional[float]): タイルあたりのメモリ上限（MB）。None の場合は上限なし
+        itemsize (int, optional): 評価に使う浮動小数点数のバイト数（float32 なら 4）
+        
+    Returns:
+        int: タイルあたりの行数（最低 1 行、上限がない場合は 0）
+    """
+    if max_memory_mb is None or max_memory_mb <= 0:
+        return 0
+    # U テンソル (n 行分) と dx, dy, r2 などの一時配列を評価精度のバイト数で見積もる
+    bytes_per_row = itemsize * max(width, 1) * (n_points + 4)
+    return max(1, int(max_memory_mb * 1024 * 1024) // bytes_per_row)
+
+def _plan_row_tiles(height: int, n_points: int, width: int,
+                    max_memory_mb: Optional[float], workers: int, itemsize: int = 8) -> List[Tuple[int, int]]:
+    """
+    出力グリッドを行ストリップ (r0, r1) に分割します。
+    メモリ上限は同時に処理される全ワーカーで共有し、負荷分散と進捗通知・キャンセルの
+    応答性のため、少なくとも MIN_TILES 個（並列時はワーカー数の数倍）のタイルに分割します。
+    """
+    budget = max_memory_mb / workers if max_memory_mb and max_memory_mb > 0 else None
+    rows = _tps_rows_per_tile(n_points, width, budget, itemsize) or height
+    rows = min(rows, max(1, -(-height // max(workers * 4, MIN_TILES))))
+    return [(r0, min(r0 + rows, height)) for r0 in range(0, height, rows)]
+
+def _run_row_tiles(func: Callable[[int, int], None], tiles: List[Tuple[int, int]], workers: int) -> None:
+    """
+    各タイルに対して func(r0, r1) を実行します。workers が 2 以上の場合はスレッドプールで並列に処理します。
+    NumPy と OpenCV は演算中に GIL を解放するため、スレッドで複数コアを利用できます。
+    計測中のスパンをワーカースレッドに引き継ぐため、タイルごとにコンテキストを複製して実行します。
+    """
+    if workers <= 1 or len(tiles) <= 1:
+        for r0, r1 in tiles:
+            func(r0, r1)
+        return
+    with ThreadPoolExecutor(max_workers=min(workers, len(tiles))) as executor:
+        futures = [executor.submit(contextvars.copy_context().run, func, r0, r1) for r0, r1 in tiles]
+        for future in futures:
+            future.result()
+
+def _tps_warp_tile(params_x: np.ndarray, params_y: np.ndarray, dest_points: np.ndarray,
+                   grid_x: np.ndarray, grid_y: np.ndarray, precision: str = "float64") -> Tuple[np.ndarray, np.ndarray]:
+    """
+    グリッドの一部（タイル）について TPS マッピングを評価します。
+    U テンソルはタイル分だけ確保されるため、メモリ使用量は O(タイル画素数 × N) に収まります。
+    precision が "float32" の場合は _tps_warp_tile_float32 で評価します。
+    """
+    if precision == "float32":
+        return _tps_warp_tile_float32(params_x, params_y, dest_points, grid_x, grid_y)
+    n = dest_points.shape[0]
+    # 低ランク近似の解ではランドマーク以外の重みが 0 のため、寄与のない点は評価しない
+    active = np.nonzero((params_x[:n] != 0) | (params_y[:n] != 0))[0]
+    U = np.zeros((active.size, grid_x.shape[0], grid_x.shape[1]), dtype=np.float64)
+    for k, i in enumerate(active):
+        dx = grid_x - dest_points[i, 0]
+        dy = grid_y - dest_points[i, 1]
+        r2 = dx ** 2 + dy ** 2
+        with np.errstate(divide='ignore', invalid='ignore'):
+            U[k] = np.where(r2 == 0, 0, r2 * np.log(r2))
+    a_x = params_x[-3:]
+    w_x = params_x[:n][active]
+    a_y = params_y[-3:]
+    w_y = params_y[:n][active]
+
+    f_x = a_x[0] + a_x[1] * grid_x + a_x[2] * grid_y + np.tensordot(w_x, U, axes=1)
+    f_y = a_y[0] + a_y[1] * grid_x + a_y[2] * grid_y + np.tensordot(w_y, U, axes=1)
+    return f_x, f_y
+
+def _tps_warp_tile_float32(params_x: np.ndarray, params_y: np.ndarray, dest_points: np.ndarray,
+                           grid_x: np.ndarray, grid_y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    カーネルの評価と重み付き和を float32 で行う _tps_warp_tile です。メモリの読み書き量が半分になります。
+
+    画素座標のままでは U = r^2 log r^2 が 1e9 程度になり、打ち消し合う項の和で float32 の精度が失われるため、
+    TPSSolver と同じく中心化・スケーリングした座標で評価します。U(s r) = s^2 U(r) + s^2 r^2 log s^2 の
+    第 2 項は座標の 2 次式になるため、その係数とアフィン項はパラメータから float64 で求めておきます。
+    重みは大きく打ち消し合うため、和は FLOAT32_BLOCK 点ずつ float32 で取り、ブロックごとの部分和を float64 で合計します。
+    U テンソルもブロック分だけ確保されます。
+    """
     n = dest_points.shape[0]
-    diff = dest_points[:, None, :] - dest_points[None, :, :]
-    r2 = np.sum(diff ** 2, axis=2)
-    with np.errstate(divide='ignore', invalid='ignore'):
-        K = r2 * np.log(r2)
-    K[np.isnan(K)] = 0
-    K += reg_lambda * np.eye(n)
-
-    # P行列：各点の同次座標
-    P = np.hstack((np.ones((n, 1)), dest_points))
-    # L行列の構築：K, P, P^T のブロック行列
-    L = np.zeros((n + 3, n + 3), dtype=np.float64)
-    L[:n, :n] = K
-    L[:n, n:] = P
-    L[n:, :n] = P.T
-
-    # 右辺ベクトル
-    Vx = np.concatenate([src_points[:, 0], np.zeros(3)])
-    Vy = np.concatenate([src_points[:, 1], np.zeros(3)])
-    params_x = np.linalg.solve(L, Vx)
-    params_y = np.linalg.solve(L, Vy)
+    active = np.nonzero((params_x[:n] != 0) | (params_y[:n] != 0))[0]
+    points = dest_points[active]
+    center = dest_points.mean(axis=0)
+    extent = float(np.max(np.ptp(dest_points, axis=0))) if n > 1 else 0.0
+    scale = extent / 2.0 if extent > 0 else 1.0
+    normalized = (points - center) / scale
+    weights = np.stack((params_x[:n][active], params_y[:n][active]), axis=1) * scale ** 2
+    affine = np.stack((params_x[-3:], params_y[-3:]), axis=1)
+    log_s2 = np.log(scale ** 2)
+    # f = a0 + a·x + Σ w'_i U(|x̂ - x̂_i|) + log s^2 Σ w'_i |x̂ - x̂_i|^2 を x̂ の多項式として整理する
+    constant = affine[0] + affine[1] * center[0] + affine[2] * center[1] + log_s2 * (np.sum(normalized ** 2, axis=1) @ weights)
+    linear_x = affine[1] * scale - 2.0 * log_s2 * (normalized[:, 0] @ weights)
+    linear_y = affine[2] * scale - 2.0 * log_s2 * (normalized[:, 1] @ weights)
+    quadratic = log_s2 * weights.sum(axis=0)
 
-    transform_logger.debug("TPS parameters computed")
-    return params_x, params_y
+    gx = ((np.asarray(grid_x, dtype=np.float64) - center[0]) / scale).astype(np.float32)
+    gy = ((np.asarray(grid_y, dtype=np.float64) - center[1]) / scale).astype(np.float32)
+    tiny = np.finfo(np.float32).tiny
+    U = np.empty((min(FLOAT32_BLOCK, active.size), gx.shape[0], gx.shape[1]), dtype=np.float32)
+    sums = np.zeros((2,) + gx.shape, dtype=np.float64)
+    weights32 = weights.astype(np.float32)
+    for start in range(0, active.size, FLOAT32_BLOCK):
+        block = U[:min(FLOAT32_BLOCK, active.size - start)]
+        for k in range(block.shape[0]):
+            dx = gx - np.float32(normalized[start + k, 0])
+            dy = gy - np.float32(normalized[start + k, 1])
+            r2 = dx * dx + dy * dy
+            # r2 = 0 では 0 * log(tiny) = 0 となり、np.where による分岐が不要
+            np.multiply(r2, np.log(np.maximum(r2, tiny)), out=block[k])
+        for f in range(2):
+            sums[f] += np.tensordot(weights32[start:start + block.shape[0], f], block, axes=1)
+    r2_grid = gx * gx + gy * gy
+    results = []
+    for f in range(2):
+        values = sums[f].astype(np.float32)
+        values += np.float32(constant[f]) + np.float32(linear_x[f]) * gx + np.float32(linear_y[f]) * gy
+        if quadratic[f] != 0:
+            values += np.float32(quadratic[f]) * r2_grid
+        results.append(values)
+    return results[0], results[1]
 
-def apply_tps_warp(params_x: np.ndarray, params_y: np.ndarray, dest_points: np.ndarray, grid_x: np.ndarray, grid_y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+def estimate_precision_error(params_x: np.ndarray, params_y: np.ndarray, dest_points: np.ndarray,
+                             output_size: Tuple[int, int], precision: str = "float32",
+                             samples_per_axis: int = 32) -> float:
+    """
+    出力画像全体に散らばる標本画素で、precision での評価と float64 での評価の最大のずれ（画素）を返します。
+
+    Args:
+        params_x (np.ndarray): x方向のTPSパラメータ
+        params_y (np.ndarray): y方向のTPSパラメータ
+        dest_points (np.ndarray): 変換先対応点配列 (N, 2)
+        output_size (Tuple[int, int]): 出力画像のサイズ (width, height)
+        precision (str, optional): 比較する評価精度
+        samples_per_axis (int, optional): 1軸あたりの標本数
+
+    Returns:
+        float: 最大のずれ（画素）
+    """
+    width, height = output_size
+    xs = (np.arange(samples_per_axis) + 0.37) * width / samples_per_axis
+    ys = (np.arange(samples_per_axis) + 0.61) * height / samples_per_axis
+    grid_x, grid_y = np.meshgrid(xs, ys)
+    approx_x, approx_y = _tps_warp_tile(params_x, params_y, dest_points, grid_x, grid_y, precision)
+    exact_x, exact_y = _tps_warp_tile(params_x, params_y, dest_points, grid_x, grid_y)
+    error = np.hypot(approx_x - exact_x, approx_y - exact_y)
+    return float(error.max()) if error.size else 0.0
+
+def apply_tps_warp(params_x: np.ndarray, params_y: np.ndarray, dest_points: np.ndarray, grid_x: np.ndarray, grid_y: np.ndarray,
+                   max_memory_mb: Optional[float] = None, workers: int = 1,
+                   precision: str = "float64") -> Tuple[np.ndarray, np.ndarray]:
     """
     TPS変換パラメータを用いて、画像変換用のマッピングを生成します。
+    グリッドは常に行ストリップに分割して評価し、(N, H, W) の U テンソル全体を確保せずにマッピングを構築します。
+    ストリップの数は少なくとも MIN_TILES 個（並列時はワーカー数の 4 倍以上）で、max_memory_mb を指定した場合は
+    ストリップあたりの U テンソルが上限に収まるまで細かく分割します（_plan_row_tiles）。
+    画素ごとの計算はストリップの分け方によらないため、結果は分割しない場合と一致します。
+    workers が 2 以上の場合、ストリップはスレッドプールで並列に評価されます。
     
     Args:
         params_x (np.ndarray): x方向のTPSパラメータ
@@ -109,34 +494,1400 @@ def apply_tps_warp(params_x: np.ndarray, params_y: np.ndarray, dest_points: np.n
         dest_points (np.ndarray): 変換先対応点配列 (N, 2)
         grid_x (np.ndarray): 変換対象画像の横座標グリッド
         grid_y (np.ndarray): 変換対象画像の縦座標グリッド
+        max_memory_mb (Optional[float], optional): 評価時のメモリ上限（MB）。None の場合は上限を設けず、
+            MIN_TILES 個程度のストリップに分割する
+        workers (int, optional): 並列評価に使用するスレッド数。デフォルトは1（逐次処理）。
+        precision (str, optional): カーネルの評価精度。"float32" の場合は正規化座標で評価し、float32 のマップを返す
         
     Returns:
         Tuple[np.ndarray, np.ndarray]: 変換後の x, y 座標マップ
     """
     transform_logger.debug("Applying TPS warp")
     n = dest_points.shape[0]
-    U = np.zeros((n, grid_x.shape[0], grid_x.shape[1]), dtype=np.float64)
-    for i in range(n):
-        dx = grid_x - dest_points[i, 0]
-        dy = grid_y - dest_points[i, 1]
-        r2 = dx ** 2 + dy ** 2
-        with np.errstate(divide='ignore', invalid='ignore'):
-            U[i] = np.where(r2 == 0, 0, r2 * np.log(r2))
-    a_x = params_x[-3:]
-    w_x = params_x[:n]
-    a_y = params_y[-3:]
-    w_y = params_y[:n]
+    height, width = grid_x.shape[0], grid_x.shape[1]
+    dtype = np.dtype(precision)
+    tiles = _plan_row_tiles(height, n, width, max_memory_mb, workers, dtype.itemsize)
+    if len(tiles) == 1:
+        f_x, f_y = _tps_warp_tile(params_x, params_y, dest_points, grid_x, grid_y, precision)
+    else:
+        transform_logger.debug("Tiled TPS evaluation: %d tiles, %d workers (budget %s MB)", len(tiles), workers, max_memory_mb)
+        f_x = np.empty(grid_x.shape, dtype=dtype)
+        f_y = np.empty(grid_x.shape, dtype=dtype)
 
-    f_x = a_x[0] + a_x[1] * grid_x + a_x[2] * grid_y + np.tensordot(w_x, U, axes=1)
-    f_y = a_y[0] + a_y[1] * grid_x + a_y[2] * grid_y + np.tensordot(w_y, U, axes=1)
+        def evaluate_tile(r0: int, r1: int) -> None:
+            f_x[r0:r1], f_y[r0:r1] = _tps_warp_tile(params_x, params_y, dest_points, grid_x[r0:r1], grid_y[r0:r1],
+                                                    precision)
+
+        _run_row_tiles(evaluate_tile, tiles, workers)
     transform_logger.debug("TPS warp applied")
     return f_x, f_y
 
+def evaluate_tps_points(params_x: np.ndarray, params_y: np.ndarray, dest_points: np.ndarray,
+                        xs: np.ndarray, ys: np.ndarray, chunk_size: int = 65536) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    任意の点列に対して TPS 変換を厳密に評価します。
+    
+    Args:
+        params_x (np.ndarray): x方向のTPSパラメータ
+        params_y (np.ndarray): y方向のTPSパラメータ
+        dest_points (np.ndarray): 変換先対応点配列 (N, 2)
+        xs (np.ndarray): 評価する点の x 座標（1次元）
+        ys (np.ndarray): 評価する点の y 座標（1次元）
+        chunk_size (int, optional): 一度に評価する点数
+        
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: 各点の変換後 x, y 座標
+    """
+    xs = np.asarray(xs, dtype=np.float64).ravel()
+    ys = np.asarray(ys, dtype=np.float64).ravel()
+    f_x = np.empty(xs.shape, dtype=np.float64)
+    f_y = np.empty(xs.shape, dtype=np.float64)
+    for start in range(0, xs.size, chunk_size):
+        stop = min(start + chunk_size, xs.size)
+        tile_x, tile_y = _tps_warp_tile(params_x, params_y, dest_points, xs[None, start:stop], ys[None, start:stop])
+        f_x[start:stop] = tile_x[0]
+        f_y[start:stop] = tile_y[0]
+    return f_x, f_y
+
+def _cubic_lattice_weights(coords: np.ndarray, step: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    格子間隔 step の格子上での Catmull-Rom 補間に用いる格子インデックスと重みを返します。
+    格子は -step の位置から始まるため、インデックスは常に格子の内側に収まります。
+    """
+    u = np.asarray(coords, dtype=np.float64) / step
+    base = np.floor(u)
+    t = (u - base)[:, None]
+    index = base.astype(np.int64)[:, None] + np.arange(4)
+    t2 = t * t
+    t3 = t2 * t
+    weights = np.hstack((
+        -0.5 * t3 + t2 - 0.5 * t,
+        1.5 * t3 - 2.5 * t2 + 1.0,
+        -1.5 * t3 + 2.0 * t2 + 0.5 * t,
+        0.5 * t3 - 0.5 * t2
+    ))
+    return index, weights
+
+class TPSLattice:
+    """
+    粗い格子上で厳密に評価した TPS マップを保持し、双三次補間で任意の画素のマップを生成します。
+    TPS の変位場は滑らかなため、格子間隔 16px 程度でもサブピクセル精度の近似が得られます。
+    """
+    def __init__(self, params_x: np.ndarray, params_y: np.ndarray, dest_points: np.ndarray,
+                 output_size: Tuple[int, int], step: int = 16, tolerance: Optional[float] = None,
+                 max_memory_mb: Optional[float] = None, workers: int = 1) -> None:
+        """
+        格子を構築し、tolerance が指定されていれば誤差がそれ以下になるまで格子を細分化します。
+        見積もった誤差には LATTICE_ERROR_SAFETY を掛けてから tolerance と比較します。
+        
+        Args:
+            params_x (np.ndarray): x方向のTPSパラメータ
+            params_y (np.ndarray): y方向のTPSパラメータ
+            dest_points (np.ndarray): 変換先対応点配列 (N, 2)
+            output_size (Tuple[int, int]): 出力画像のサイズ (width, height)
+            step (int, optional): 格子間隔（画素）。デフォルトは16。
+            tolerance (Optional[float], optional): 許容する最大誤差（画素）
+            max_memory_mb (Optional[float], optional): 格子評価時のメモリ上限（MB）
+            workers (int, optional): 格子評価に使用するスレッド数
+        """
+        self.params_x = params_x
+        self.params_y = params_y
+        self.dest_points = dest_points
+        self.width, self.height = output_size
+        self.step = max(1, int(step))
+        self.max_memory_mb = max_memory_mb
+        self.workers = workers
+        self._build()
+        self.max_error = self.estimate_error()
+        while tolerance is not None and self.max_error * LATTICE_ERROR_SAFETY > tolerance and self.step > 1:
+            transform_logger.debug("Lattice error %.4f px exceeds tolerance %.4f px at step %d; refining",
+                                   self.max_error, tolerance, self.step)
+            self.step = max(1, self.step // 2)
+            self._build()
+            self.max_error = self.estimate_error()
+        transform_logger.debug("TPS lattice built: step=%d, shape=%s, max error=%.4f px",
+                               self.step, self.coarse_x.shape, self.max_error)
+
+    def _build(self) -> None:
+        # 画像の外側に1格子ずつ余分に取り、境界でも4点の補間が行えるようにする
+        cols = (self.width - 1) // self.step + 4
+        rows = (self.height - 1) // self.step + 4
+        lattice_x = (np.arange(cols, dtype=np.float64) - 1) * self.step
+        lattice_y = (np.arange(rows, dtype=np.float64) - 1) * self.step
+        grid_x, grid_y = np.meshgrid(lattice_x, lattice_y)
+        self.coarse_x, self.coarse_y = apply_tps_warp(
+            self.params_x, self.params_y, self.dest_points, grid_x, grid_y,
+            max_memory_mb=self.max_memory_mb, workers=self.workers
+        )
+
+    def interpolate(self, xs: np.ndarray, ys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        列座標 xs と行座標 ys の直積グリッド上のマップを双三次補間で求めます。
+        
+        Args:
+            xs (np.ndarray): 列（x）座標の1次元配列
+            ys (np.ndarray): 行（y）座標の1次元配列
+            
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: 形状 (len(ys), len(xs)) の x, y 座標マップ
+        """
+        col_index, col_weights = _cubic_lattice_weights(xs, self.step)
+        row_index, row_weights = _cubic_lattice_weights(ys, self.step)
+        used_rows = np.unique(row_index)
+        local_row_index = np.searchsorted(used_rows, row_index)
+        results = []
+        for coarse in (self.coarse_x, self.coarse_y):
+            horizontal = np.einsum("rck,ck->rc", coarse[used_rows][:, col_index], col_weights)
+            results.append(np.einsum("rkc,rk->rc", horizontal[local_row_index], row_weights))
+        return results[0], results[1]
+
+    def interpolate_points(self, xs: np.ndarray, ys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        任意の点列 (xs[i], ys[i]) のマップを双三次補間で求めます。
+        
+        Args:
+            xs (np.ndarray): 各点の x 座標の1次元配列
+            ys (np.ndarray): 各点の y 座標の1次元配列
+            
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: 各点の x, y 座標
+        """
+        col_index, col_weights = _cubic_lattice_weights(np.asarray(xs).ravel(), self.step)
+        row_index, row_weights = _cubic_lattice_weights(np.asarray(ys).ravel(), self.step)
+        results = []
+        for coarse in (self.coarse_x, self.coarse_y):
+            patches = coarse[row_index[:, :, None], col_index[:, None, :]]
+            results.append(np.einsum("nrc,nr,nc->n", patches, row_weights, col_weights))
+        return results[0], results[1]
+
+    def estimate_error(self, samples_per_axis: int = 64, max_point_cells: int = 256) -> float:
+        """
+        格子セル内の画素で厳密評価と補間結果を比較し、最大誤差（画素）を返します。
+        
+        補間誤差はセル中心だけでなく辺の中点や 1/4 点付近で最大になることがあるため、
+        標本としたセルの 0, 1/4, 1/2, 3/4 の位置を縦横の直積で評価します（0 は格子点・辺上）。
+        また TPS の核 r^2 log r は対応点の近傍で曲率が大きく誤差が集中するため、
+        対応点を含むセル（最大 max_point_cells 個）はさらに 1/8 間隔で密に評価します。
+        
+        Args:
+            samples_per_axis (int, optional): 各軸で標本とするセル数の上限
+            max_point_cells (int, optional): 密に評価する対応点セル数の上限
+            
+        Returns:
+            float: 標本点における最大誤差（画素）
+        """
+        step = self.step
+        offsets = np.unique(np.floor(np.arange(4) * step / 4.0)).astype(np.int64)
+
+        def sample_axis(size: int) -> np.ndarray:
+            origins = np.arange(0, size, step)
+            if origins.size > samples_per_axis:
+                origins = origins[np.linspace(0, origins.size - 1, samples_per_axis).astype(np.int64)]
+            coords = (origins[:, None] + offsets).ravel()
+            return np.unique(coords[coords < size])
+
+        errors = []
+        xs = sample_axis(self.width)
+        ys = sample_axis(self.height)
+        approx_x, approx_y = self.interpolate(xs, ys)
+        grid_x, grid_y = np.meshgrid(xs, ys)
+        exact_x, exact_y = evaluate_tps_points(self.params_x, self.params_y, self.dest_points, grid_x.ravel(), grid_y.ravel())
+        errors.append(np.hypot(approx_x.ravel() - exact_x, approx_y.ravel() - exact_y))
+
+        # 対応点を含む出力範囲内のセル
+        points = np.asarray(self.dest_points, dtype=np.float64).reshape(-1, 2)
+        inside = ((points[:, 0] >= 0) & (points[:, 0] < self.width) &
+                  (points[:, 1] >= 0) & (points[:, 1] < self.height))
+        cells = np.unique(np.floor(points[inside] / step).astype(np.int64), axis=0)
+        if len(cells) > max_point_cells:
+            cells = cells[np.linspace(0, len(cells) - 1, max_point_cells).astype(np.int64)]
+        if len(cells) and step > 1:
+            fine = np.unique(np.floor(np.arange(8) * step / 8.0)).astype(np.int64)
+            local_x, local_y = np.meshgrid(fine, fine)
+            point_x = (cells[:, 0, None] * step + local_x.ravel()).ravel()
+            point_y = (cells[:, 1, None] * step + local_y.ravel()).ravel()
+            valid = (point_x < self.width) & (point_y < self.height)
+            point_x, point_y = point_x[valid], point_y[valid]
+            approx_x, approx_y = self.interpolate_points(point_x, point_y)
+            exact_x, exact_y = evaluate_tps_points(self.params_x, self.params_y, self.dest_points, point_x, point_y)
+            errors.append(np.hypot(approx_x - exact_x, approx_y - exact_y))
+
+        error = np.concatenate(errors)
+        return float(error.max()) if error.size else 0.0
+
+def compose_affine_maps(map_x: np.ndarray, map_y: np.ndarray, matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    座標マップに 2x3 のアフィン行列を合成し、cv2.remap 用の float32 マップを返します。
+    
+    Args:
+        map_x (np.ndarray): x 座標マップ
+        map_y (np.ndarray): y 座標マップ
+        matrix (np.ndarray): 各座標に適用する 2x3 アフィン行列
+        
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: 合成後の x, y 座標マップ（float32）
+    """
+    out_x = matrix[0, 0] * map_x + matrix[0, 1] * map_y + matrix[0, 2]
+    out_y = matrix[1, 0] * map_x + matrix[1, 1] * map_y + matrix[1, 2]
+    return out_x.astype(np.float32), out_y.astype(np.float32)
+
+def _estimate_affine(src_points: np.ndarray, dest_points: np.ndarray) -> np.ndarray:
+    """
+    変換元の対応点を変換先へ写すアフィン変換行列 (2x3) を推定します。3点の場合は厳密に、それ以上は RANSAC で求めます。
+    
+    Raises:
+        ValueError: アフィン変換を推定できない場合
+    """
+    if src_points.shape[0] == 3:
+        return cv2.getAffineTransform(src_points.astype(np.float32), dest_points.astype(np.float32))
+    affine_matrix, inliers = cv2.estimateAffine2D(src_points, dest_points)
+    if affine_matrix is None:
+        transform_logger.error(_("affine_transformation_failed"))
+        raise ValueError(_("affine_transformation_failed_message"))
+    return affine_matrix
+
+class WarpMapBuilder:
+    """
+    対応点から、出力画素ごとの元画像座標（アフィン変換を合成済みのワープマップ）を行単位で生成します。
+    アフィン変換の推定と TPS パラメータの計算は生成時に一度だけ行われます。
+    
+    Args:
+        dest_points (List[Tuple[float, float]]): 変換先の対応点リスト
+        src_points (List[Tuple[float, float]]): 変換元の対応点リスト
+        output_size (Tuple[int, int]): 出力画像のサイズ (width, height)
+        reg_lambda (float, optional): TPS変換の正則化パラメータ
+        adaptive (bool, optional): Trueの場合、正則化パラメータを自動調整
+        max_memory_mb (Optional[float], optional): TPSマップ評価時のメモリ上限（MB）
+        workers (int, optional): 格子の構築に使用するスレッド数
+        eval_mode (str, optional): "exact"、"grid" または "fast"（遠方場の近似評価）
+        grid_step (int, optional): grid モードでの格子間隔（画素）
+        grid_tolerance (Optional[float], optional): grid / fast モードで許容する最大誤差（画素）
+        lowrank_threshold (Optional[int], optional): TPS を低ランク近似で解く点数の閾値（None は常に厳密）
+        lowrank_landmarks (int, optional): 低ランク近似のランドマークの数
+        precision (str, optional): exact モードでのカーネルの評価精度（"float64" または "float32"）。
+            "float32" の場合は float64 での評価との最大のずれを標本画素で求め、precision_error に記録します
+        progress_callback (Optional[ProgressCallback], optional): 進捗通知 (ステージ名, 完了数, 総数)
+        cancel_event (Optional[threading.Event], optional): キャンセル要求を伝えるイベント
+        
+    Raises:
+        ValueError: 対応点が不足している場合、またはアフィン変換失敗時
+        TransformCancelled: 処理がキャンセルされた場合
+    """
+    def __init__(self, dest_points: List[Tuple[float, float]], src_points: List[Tuple[float, float]],
+                 output_size: Tuple[int, int], reg_lambda: float = 1e-3, adaptive: bool = False,
+                 max_memory_mb: Optional[float] = None, workers: int = 1,
+                 eval_mode: str = "exact", grid_step: int = 16, grid_tolerance: Optional[float] = None,
+                 lowrank_threshold: Optional[int] = None, lowrank_landmarks: int = LOWRANK_LANDMARKS,
+                 precision: str = "float64",
+                 progress_callback: Optional[ProgressCallback] = None,
+                 cancel_event: Optional[threading.Event] = None):
+        src_points_np = np.array(src_points, dtype=np.float64)
+        self.dest_points = np.array(dest_points, dtype=np.float64)
+        self.width, self.height = output_size
+        self.max_memory_mb = max_memory_mb
+        self.workers = workers
+
+        if src_points_np.shape[0] < 3:
+            transform_logger.error(_("insufficient_correspondence_points"))
+            raise ValueError(_("error_minimum_points_required"))
+
+        # アフィン変換の計算
+        with tracing.span("affine", points=src_points_np.shape[0]):
+            affine_matrix = _estimate_affine(src_points_np, self.dest_points)
+            # アフィン変換は画像に適用せず、逆行列をワープマップに合成して再サンプリングを1回にまとめる
+            self.inverse_affine = cv2.invertAffineTransform(affine_matrix)
+            aligned_src_points = cv2.transform(np.array([src_points_np], dtype=np.float64), affine_matrix)[0]
+
+        # TPS変換パラメータの計算
+        _check_cancelled(cancel_event)
+        if progress_callback is not None:
+            progress_callback("solve", 0, 1)
+        self.params_x, self.params_y = compute_tps_parameters(
+            self.dest_points, aligned_src_points, reg_lambda=reg_lambda, adaptive=adaptive,
+            lowrank_threshold=lowrank_threshold, lowrank_landmarks=lowrank_landmarks
+        )
+
+        self.lattice: Optional[TPSLattice] = None
+        self.fast: Optional[FastTPSEvaluator] = None
+        self.precision = "float64"
+        self.precision_error: Optional[float] = None
+        if eval_mode == "fast":
+            _check_cancelled(cancel_event)
+            if progress_callback is not None:
+                progress_callback("fast_eval", 0, 1)
+            with tracing.span("fast_eval", points=self.dest_points.shape[0]) as fast_span:
+                self.fast = FastTPSEvaluator(self.params_x, self.params_y, self.dest_points, output_size,
+                                             tolerance=grid_tolerance, max_memory_mb=max_memory_mb)
+                fast_span.set(levels=self.fast.levels, order=self.fast.order, max_error=self.fast.max_error)
+            transform_logger.info("Fast TPS evaluation: %d levels, order %d, max error=%.4f px",
+                                  self.fast.levels, self.fast.order, self.fast.max_error)
+        elif eval_mode == "grid":
+            _check_cancelled(cancel_event)
+            if progress_callback is not None:
+                progress_callback("lattice", 0, 1)
+            with tracing.span("lattice", step=grid_step) as lattice_span:
+                lattice = TPSLattice(self.params_x, self.params_y, self.dest_points, output_size, step=grid_step,
+                                     tolerance=grid_tolerance, max_memory_mb=max_memory_mb, workers=workers)
+                lattice_span.set(final_step=lattice.step, max_error=lattice.max_error)
+            transform_logger.info("Grid TPS evaluation: step=%d px, max error=%.4f px", lattice.step, lattice.max_error)
+            if lattice.step > 1:
+                self.lattice = lattice
+        elif eval_mode != "exact":
+            transform_logger.warning("Unknown TPS eval mode '%s'; falling back to exact", eval_mode)
+        if self.fast is None and self.lattice is None and precision != "float64":
+            if precision not in PRECISIONS:
+                transform_logger.warning("Unknown TPS precision '%s'; falling back to float64", precision)
+            else:
+                with tracing.span("precision_check", precision=precision) as precision_span:
+                    self.precision_error = estimate_precision_error(self.params_x, self.params_y, self.dest_points,
+                                                                    output_size, precision)
+                    precision_span.set(max_error=self.precision_error)
+                self.precision = precision
+                transform_logger.info("TPS evaluation in %s: max deviation from float64 = %.4f px",
+                                      precision, self.precision_error)
+
+    def plan_tiles(self) -> List[Tuple[int, int]]:
+        """
+        メモリ上限とスレッド数に応じた出力の行タイル分割を返します。
+        """
+        # fast モードでは画素あたりのメモリが近傍の点数と補間節点の数で決まる
+        n_points = self.dest_points.shape[0] if self.fast is None else self.fast.max_near + self.fast.order
+        return _plan_row_tiles(self.height, n_points, self.width, self.max_memory_mb, self.workers,
+                               np.dtype(self.precision).itemsize)
+
+    def rows(self, r0: int, r1: int, c0: int = 0, c1: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        出力の行 [r0, r1)（列を指定した場合は列 [c0, c1) のみ）に対応する元画像座標を返します。
+        
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: 形状 (r1 - r0, c1 - c0) の float32 マップ (map_x, map_y)
+        """
+        if c1 is None:
+            c1 = self.width
+        return self.sample(np.arange(c0, c1), np.arange(r0, r1))
+
+    def sample(self, xs: np.ndarray, ys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        列座標 xs と行座標 ys の直積グリッド上の元画像座標を返します。
+        
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: 形状 (len(ys), len(xs)) の float32 マップ (map_x, map_y)
+        """
+        if self.fast is not None:
+            map_x, map_y = self.fast.evaluate_grid(xs, ys)
+        elif self.lattice is not None:
+            map_x, map_y = self.lattice.interpolate(xs, ys)
+        else:
+            grid_x, grid_y = np.meshgrid(xs, ys)
+            map_x, map_y = _tps_warp_tile(self.params_x, self.params_y, self.dest_points, grid_x, grid_y,
+                                          self.precision)
+        return compose_affine_maps(map_x, map_y, self.inverse_affine)
+
+# 三角形の内外判定で頂点座標を丸める固定小数点のビット数
+RASTER_SHIFT = 8
+
+def _triangle_edges(fixed: np.ndarray) -> np.ndarray:
+    """
+    固定小数点の整数座標で表した三角形 (T, 3, 2) の各辺について、三角形の内側（辺上を含む）で
+    非負になる式 a * x + b * y + c の係数 (T, 3, 3) を返します。面積のない三角形はどの点も含まないようにします。
+    """
+    p = fixed.astype(np.int64)
+    q = np.roll(p, -1, axis=1)
+    a = p[..., 1] - q[..., 1]
+    b = q[..., 0] - p[..., 0]
+    c = -(a * p[..., 0] + b * p[..., 1])
+    edges = np.stack((a, b, c), axis=2)
+    area = (p[:, 1, 0] - p[:, 0, 0]) * (p[:, 2, 1] - p[:, 0, 1]) - (p[:, 1, 1] - p[:, 0, 1]) * (p[:, 2, 0] - p[:, 0, 0])
+    edges *= np.sign(area)[:, None, None]
+    edges[area == 0] = (0, 0, -1)
+    return edges
+
+def _delaunay_triangles(points: np.ndarray) -> np.ndarray:
+    """
+    点群の Delaunay 三角形分割を cv2.Subdiv2D で求め、各三角形の頂点インデックス (T, 3) を返します。
+    同じ座標の点は最初の点にまとめられます。
+    """
+    x_min, y_min = np.floor(points.min(axis=0)) - 2
+    x_max, y_max = np.ceil(points.max(axis=0)) + 2
+    subdiv = cv2.Subdiv2D((int(x_min), int(y_min), int(x_max - x_min) + 1, int(y_max - y_min) + 1))
+    coords = points.astype(np.float32)
+    index: Dict[Tuple[float, float], int] = {}
+    for i, (x, y) in enumerate(coords):
+        index.setdefault((float(x), float(y)), i)
+    subdiv.insert([(float(x), float(y)) for x, y in coords])
+    triangles = []
+    for tri in subdiv.getTriangleList().reshape(-1, 3, 2):
+        # 外側の仮想頂点を含む三角形は index に存在しないため除外される
+        ids = [index.get((float(x), float(y))) for x, y in tri]
+        if None not in ids and len(set(ids)) == 3:
+            triangles.append(ids)
+    return np.array(triangles, dtype=np.int64).reshape(-1, 3)
+
+def _frame_vertices(width: int, height: int, divisions: int = 16) -> np.ndarray:
+    """
+    出力画像の外周の1画素外側に並べた頂点と、さらに画像1枚分外側の四隅の頂点を返します。
+    cv2.Subdiv2D は凸包に接する三角形の一部を返さないことがあるため、凸包を画像から十分に離し、
+    外周の頂点で内側と隔てることで、欠ける三角形が出力画像にかからないようにします。
+    """
+    step = max(width, height) / divisions
+    xs = np.linspace(-1.0, width, max(2, int(np.ceil((width + 1) / step)) + 1))
+    ys = np.linspace(-1.0, height, max(2, int(np.ceil((height + 1) / step)) + 1))[1:-1]
+    far = float(max(width, height))
+    return np.vstack((
+        np.column_stack((xs, np.full_like(xs, -1.0))),
+        np.column_stack((xs, np.full_like(xs, float(height)))),
+        np.column_stack((np.full_like(ys, -1.0), ys)),
+        np.column_stack((np.full_like(ys, float(width)), ys)),
+        [[-far, -far], [width + far, -far], [-far, height + far], [width + far, height + far]],
+    ))
+
+class PiecewiseAffineMapBuilder:
+    """
+    変換先の対応点の Delaunay 三角形分割と、三角形ごとのアフィン変換によるワープマップを生成します。
+    WarpMapBuilder と同じインターフェース（plan_tiles, rows, sample）を持ちます。
+    
+    各画素は三角形番号を書き込んだラスタから O(1) で三角形を引き、そのアフィン変換で元画像座標を求めるため、
+    マップ生成の計算量は対応点の数によらず画素数に比例します。対応点の凸包の外側も連続につながるよう、
+    出力画像の外周に沿って、全対応点から推定したアフィン変換で写した頂点を加えてから分割します。
+    
+    Args:
+        dest_points (List[Tuple[float, float]]): 変換先の対応点リスト
+        src_points (List[Tuple[float, float]]): 変換元の対応点リスト
+        output_size (Tuple[int, int]): 出力画像のサイズ (width, height)
+        max_memory_mb (Optional[float], optional): マップ生成時のメモリ上限（MB）
+        workers (int, optional): タイル分割に使用するスレッド数
+        progress_callback (Optional[ProgressCallback], optional): 進捗通知 (ステージ名, 完了数, 総数)
+        cancel_event (Optional[threading.Event], optional): キャンセル要求を伝えるイベント
+        **kwargs: TPS 用の設定（reg_lambda, eval_mode など）。このエンジンでは使用しません
+        
+    Raises:
+        ValueError: 対応点が不足している場合、またはアフィン変換失敗時
+    """
+    def __init__(self, dest_points: List[Tuple[float, float]], src_points: List[Tuple[float, float]],
+                 output_size: Tuple[int, int], max_memory_mb: Optional[float] = None, workers: int = 1,
+                 progress_callback: Optional[ProgressCallback] = None,
+                 cancel_event: Optional[threading.Event] = None, **kwargs: Any):
+        src_points_np = np.array(src_points, dtype=np.float64).reshape(-1, 2)
+        self.dest_points = np.array(dest_points, dtype=np.float64).reshape(-1, 2)
+        self.width, self.height = output_size
+        self.max_memory_mb = max_memory_mb
+        self.workers = workers
+        if src_points_np.shape[0] < 3:
+            transform_logger.error(_("insufficient_correspondence_points"))
+            raise ValueError(_("error_minimum_points_required"))
+
+        with tracing.span("affine", points=src_points_np.shape[0]):
+            inverse_affine = cv2.invertAffineTransform(_estimate_affine(src_points_np, self.dest_points))
+
+        _check_cancelled(cancel_event)
+        if progress_callback is not None:
+            progress_callback("triangulate", 0, 1)
+        with tracing.span("triangulate", points=self.dest_points.shape[0]) as triangulate_span:
+            frame = _frame_vertices(self.width, self.height)
+            frame = np.array([v for v in frame if np.min(np.hypot(*(self.dest_points - v).T)) > 0.5]).reshape(-1, 2)
+            vertices = np.vstack((self.dest_points, frame))
+            targets = np.vstack((src_points_np, frame @ inverse_affine[:, :2].T + inverse_affine[:, 2]))
+            triangles = _delaunay_triangles(vertices)
+            triangulate_span.set(triangles=len(triangles))
+
+            # 三角形ごとに [x, y, 1] @ C = (src_x, src_y) となる係数 C (3x2) を解く
+            tri_dest = vertices[triangles]
+            system = np.concatenate((tri_dest, np.ones(tri_dest.shape[:2] + (1,))), axis=2)
+            degenerate = np.abs(np.linalg.det(system)) < 1e-9
+            system[degenerate] = np.eye(3)
+            coeffs = np.linalg.solve(system, targets[triangles])
+            # 面積のない三角形と、どの三角形にも含まれない画素（番号 T）には全体のアフィン変換を使う
+            global_coeffs = inverse_affine.T
+            coeffs[degenerate] = global_coeffs
+            self._coeffs = np.concatenate((coeffs, global_coeffs[None]), axis=0)
+            self._fallback = len(triangles)
+            fixed = np.round(tri_dest * (1 << RASTER_SHIFT)).astype(np.int64)
+            self._edges = _triangle_edges(fixed)
+            # 各三角形が含みうる画素の行の範囲 [row_min, row_max]
+            self._tri_row_min = -(-fixed[:, :, 1].min(axis=1) >> RASTER_SHIFT)
+            self._tri_row_max = fixed[:, :, 1].max(axis=1) >> RASTER_SHIFT
+        transform_logger.info("Piecewise affine warp: %d triangles", len(triangles))
+
+    def plan_tiles(self) -> List[Tuple[int, int]]:
+        """
+        メモリ上限とスレッド数に応じた出力の行タイル分割を返します。
+        """
+        # 1画素あたりのメモリは対応点の数によらないため、1点分として見積もる
+        return _plan_row_tiles(self.height, 1, self.width, self.max_memory_mb, self.workers)
+
+    def _labels(self, r0: int, r1: int) -> np.ndarray:
+        """
+        出力の行 [r0, r1) の各画素が属する三角形番号を返します。
+
+        画素ごとの判定は固定小数点の整数演算だけで行うため、結果は行の分割の仕方によらず同じになります
+        （cv2.fillPoly は描画先の範囲で辺を切り詰めてから塗るため、帯の境界付近で三角形の境目が変わります）。
+        複数の三角形の辺上にある画素は、番号の大きい三角形に属します。
+        """
+        labels = np.full((r1 - r0, self.width), self._fallback, dtype=np.int32)
+        one = 1 << RASTER_SHIFT
+        selected = np.nonzero((self._tri_row_max >= r0) & (self._tri_row_min < r1))[0]
+        for i in selected:
+            y0 = max(r0, int(self._tri_row_min[i]))
+            y1 = min(r1, int(self._tri_row_max[i]) + 1)
+            ys = np.arange(y0, y1, dtype=np.int64) * one
+            lo = np.zeros(y1 - y0, dtype=np.int64)
+            hi = np.full(y1 - y0, self.width - 1, dtype=np.int64)
+            # 各辺の式 a * x + b * y + c >= 0 を、行ごとに x の範囲として解く
+            for a, b, c in self._edges[i]:
+                rest = b * ys + c
+                if a > 0:
+                    lo = np.maximum(lo, -(rest // (a * one)))
+                elif a < 0:
+                    hi = np.minimum(hi, rest // (-a * one))
+                else:
+                    hi = np.where(rest >= 0, hi, -1)
+            x0, x1 = int(lo.min()), int(hi.max()) + 1
+            if x0 >= x1:
+                continue
+            cols = np.arange(x0, x1, dtype=np.int64)
+            inside = (cols >= lo[:, None]) & (cols <= hi[:, None])
+            labels[y0 - r0:y1 - r0, x0:x1][inside] = i
+        return labels
+
+    def _evaluate(self, labels: np.ndarray, grid_x: np.ndarray, grid_y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        c = self._coeffs[labels]
+        map_x = c[..., 0, 0] * grid_x + c[..., 1, 0] * grid_y + c[..., 2, 0]
+        map_y = c[..., 0, 1] * grid_x + c[..., 1, 1] * grid_y + c[..., 2, 1]
+        return map_x.astype(np.float32), map_y.astype(np.float32)
+
+    def rows(self, r0: int, r1: int, c0: int = 0, c1: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        出力の行 [r0, r1)（列を指定した場合は列 [c0, c1) のみ）に対応する元画像座標を返します。
+        
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: 形状 (r1 - r0, c1 - c0) の float32 マップ (map_x, map_y)
+        """
+        if c1 is None:
+            c1 = self.width
+        labels = self._labels(r0, r1)[:, c0:c1]
+        return self._evaluate(labels, np.arange(c0, c1, dtype=np.float64)[None, :],
+                              np.arange(r0, r1, dtype=np.float64)[:, None])
+
+    def sample(self, xs: np.ndarray, ys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        列座標 xs と行座標 ys の直積グリッド上の元画像座標を返します。三角形番号は最も近い画素のものを使います。
+        
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: 形状 (len(ys), len(xs)) の float32 マップ (map_x, map_y)
+        """
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        cols = np.clip(np.round(xs).astype(np.int64), 0, self.width - 1)
+        rows = np.clip(np.round(ys).astype(np.int64), 0, self.height - 1)
+        labels = np.empty((rows.size, cols.size), dtype=np.int32)
+        # 必要な行を含む範囲を、メモリ上限に収まる行数ずつラスタ化する
+        chunk = max(1, min(self.height, int((self.max_memory_mb or 256) * 1024 * 1024 / (4 * max(1, self.width)))))
+        order = np.argsort(rows, kind="stable")
+        start = 0
+        while start < order.size:
+            r0 = rows[order[start]]
+            r1 = min(r0 + chunk, self.height)
+            stop = start
+            while stop < order.size and rows[order[stop]] < r1:
+                stop += 1
+            band = self._labels(r0, r1)
+            picked = order[start:stop]
+            labels[picked] = band[rows[picked] - r0][:, cols]
+            start = stop
+        return self._evaluate(labels, xs[None, :], ys[:, None])
+
+WARP_ENGINES = ("tps", "piecewise_affine")
+DEFAULT_WARP_ENGINE = "tps"
+
+def create_map_builder(dest_points: List[Tuple[float, float]], src_points: List[Tuple[float, float]],
+                       output_size: Tuple[int, int], engine: str = DEFAULT_WARP_ENGINE,
+                       **options: Any) -> Any:
+    """
+    変換エンジンに応じたワープマップの生成器を作成します。
+    
+    Args:
+        engine (str, optional): "tps"（Thin Plate Spline）または "piecewise_affine"（Delaunay 三角形ごとのアフィン変換）
+        **options: WarpMapBuilder に渡す設定（reg_lambda, max_memory_mb, workers, eval_mode など）
+        
+    Returns:
+        WarpMapBuilder または PiecewiseAffineMapBuilder
+    """
+    if engine == "piecewise_affine":
+        return PiecewiseAffineMapBuilder(dest_points, src_points, output_size, **options)
+    if engine != "tps":
+        transform_logger.warning("Unknown warp engine '%s'; falling back to tps", engine)
+    return WarpMapBuilder(dest_points, src_points, output_size, **options)
+
+def _to_rgb(arr: np.ndarray) -> np.ndarray:
+    """
+    グレースケールや RGBA の配列を RGB の3チャンネルにそろえます。
+    """
+    if arr.ndim == 2:
+        return np.repeat(arr[:, :, None], 3, axis=2)
+    if arr.shape[2] == 1:
+        return np.repeat(arr, 3, axis=2)
+    return arr[:, :, :3]
+
+class ArrayImageReader:
+    """
+    NumPy 配列（メモリマップを含む）を元画像として読み出すリーダーです。
+    配列は RGB（またはグレースケール）の uint8 を想定します。
+    """
+    def __init__(self, array: np.ndarray):
+        if array.dtype != np.uint8:
+            raise ValueError(f"Unsupported image dtype: {array.dtype}")
+        self.array = array
+
+    @property
+    def width(self) -> int:
+        return self.array.shape[1]
+
+    @property
+    def height(self) -> int:
+        return self.array.shape[0]
+
+    @property
+    def channels(self) -> int:
+        return 3
+
+    def read_window(self, x0: int, y0: int, x1: int, y1: int) -> np.ndarray:
+        """
+        元画像の矩形 [x0, x1) × [y0, y1) を RGB の連続配列として返します。
+        """
+        return np.ascontiguousarray(_to_rgb(self.array[y0:y1, x0:x1]))
+
+    def close(self) -> None:
+        self.array = None
+
+class QImageSourceReader:
+    """
+    QImage を元画像として読み出すリーダーです。
+    
+    native が False の場合は要求された矩形だけを RGB 配列に変換します。
+    True の場合は QImage のメモリをコピーせずに参照し、チャンネル順は QImage のメモリ上の並び
+    （32bit 形式では B, G, R, A）のままになります。出力も同じ形式の QImage に書き込む場合に使用します。
+    
+    Args:
+        qimage (QImage): 元画像
+        native (bool, optional): QImage のメモリ上の並びのまま参照する場合は True
+    """
+    def __init__(self, qimage: QImage, native: bool = False):
+        # QImage は暗黙共有されるため、浅いコピーで呼び出し側の変更から切り離す
+        if native and qimage.format() not in QIMAGE_VIEW_CHANNELS:
+            qimage = qimage.convertToFormat(QImage.Format_ARGB32 if qimage.hasAlphaChannel() else QImage.Format_RGB32)
+        elif not native:
+            # Format_RGB32 の場合は変換せず共有される
+            qimage = qimage.convertToFormat(QImage.Format_RGB32)
+        self.qimage = QImage(qimage)
+        self.native = native
+        self._view = qimage_array_view(self.qimage)
+
+    @property
+    def width(self) -> int:
+        return self.qimage.width()
+
+    @property
+    def height(self) -> int:
+        return self.qimage.height()
+
+    @property
+    def channels(self) -> int:
+        return self._view.shape[2] if self.native else 3
+
+    @property
+    def format(self) -> QImage.Format:
+        return self.qimage.format()
+
+    def read_window(self, x0: int, y0: int, x1: int, y1: int) -> np.ndarray:
+        """
+        元画像の矩形 [x0, x1) × [y0, y1) を返します。native の場合はコピーせずに参照します。
+        """
+        window = self._view[y0:y1, x0:x1]
+        if self.native:
+            return window
+        return cv2.cvtColor(window, cv2.COLOR_BGRA2RGB)
+
+    def close(self) -> None:
+        self._view = None
+        self.qimage = None
+
+def _source_window(map_x: np.ndarray, map_y: np.ndarray, width: int, height: int,
+                   margin: int = 0) -> Optional[Tuple[int, int, int, int]]:
+    """
+    マップが参照する元画像の範囲 (x0, y0, x1, y1) を、双三次補間の近傍画素と margin を含めて返します。
+    元画像の外だけを参照する場合は None を返します。
+    """
+    x0 = max(int(np.floor(map_x.min())) - 2 - margin, 0)
+    y0 = max(int(np.floor(map_y.min())) - 2 - margin, 0)
+    x1 = min(int(np.ceil(map_x.max())) + 3 + margin, width)
+    y1 = min(int(np.ceil(map_y.max())) + 3 + margin, height)
+    if x0 >= x1 or y0 >= y1:
+        return None
+    return x0, y0, x1, y1
+
+def _roi_sample_axis(size: int) -> np.ndarray:
+    return np.unique(np.append(np.arange(0, size, ROI_SAMPLE_STEP), size - 1))
+
+class _CroppedSource:
+    """
+    マップが参照する範囲（ROI）だけを変換した元画像です。
+    ROI からはみ出すタイルは、そのタイルが参照する範囲だけを元画像から直接読み出します。
+    """
+    def __init__(self, reader: Any, roi: Optional[Tuple[int, int, int, int]]):
+        self.reader = reader
+        self.roi = roi
+        self.pixels = None
+        if roi is not None:
+            with tracing.span("read_source", window=list(roi)):
+                self.pixels = reader.read_window(*roi)
+            transform_logger.debug("Source ROI: %s of %dx%d", roi, reader.width, reader.height)
+
+    def remap(self, map_x: np.ndarray, map_y: np.ndarray, out: np.ndarray) -> None:
+        """
+        マップに従って再サンプリングし、結果を out（形状 (h, w, channels)）に書き込みます。
+        """
+        window = _source_window(map_x, map_y, self.reader.width, self.reader.height)
+        if window is None:
+            out[...] = 255
+            return
+        roi = self.roi
+        if roi is not None and roi[0] <= window[0] and roi[1] <= window[1] and window[2] <= roi[2] and window[3] <= roi[3]:
+            src, x0, y0 = self.pixels, roi[0], roi[1]
+        else:
+            with tracing.span("read_source", window=list(window)):
+                src, x0, y0 = self.reader.read_window(*window), window[0], window[1]
+        if x0 or y0:
+            map_x = map_x - np.float32(x0)
+            map_y = map_y - np.float32(y0)
+        # 出力先が連続したメモリなら cv2.remap に直接書き込ませる
+        dst = out if out.flags["C_CONTIGUOUS"] and out.flags["WRITEABLE"] else None
+        result = cv2.remap(
+            src,
+            map_x,
+            map_y,
+            dst=dst,
+            interpolation=cv2.INTER_CUBIC,
+            borderMode=cv2.BORDER_CONSTANT,
+            borderValue=(255, 255, 255, 255)
+        )
+        if result is not out:
+            out[...] = result.reshape(out.shape)
+
+def perform_array_transformation(dest_points: List[Tuple[float, float]], src_points: List[Tuple[float, float]],
+                                 src_np: np.ndarray, output_size: Tuple[int, int],
+                                 reg_lambda: float = 1e-3, adaptive: bool = False,
+                                 max_memory_mb: Optional[float] = None, workers: int = 1,
+                                 eval_mode: str = "exact", grid_step: int = 16,
+                                 grid_tolerance: Optional[float] = None, use_map_cache: bool = False,
+                                 engine: str = DEFAULT_WARP_ENGINE, lowrank_threshold: Optional[int] = None,
+                                 lowrank_landmarks: int = LOWRANK_LANDMARKS, precision: str = "float64",
+                                 progress_callback: Optional[ProgressCallback] = None,
+                                 cancel_event: Optional[threading.Event] = None) -> np.ndarray:
+    """
+    NumPy 配列の画像に対して、アフィン変換とTPS変換を組み合わせた変形を実施します。
+    アフィン変換はワープマップに合成されるため、元画像の再サンプリングは1回だけ行われます。
+    cancel_event がセットされると、次のステージまたはタイルの開始時に TransformCancelled を送出します。
+    
+    Args:
+        dest_points (List[Tuple[float, float]]): 変換先の対応点リスト
+        src_points (List[Tuple[float, float]]): 変換元の対応点リスト
+        src_np (np.ndarray): 変換対象の画像（形状 (H, W, C) の NumPy 配列）
+        output_size (Tuple[int, int]): 出力画像のサイズ (width, height)
+        reg_lambda (float, optional): TPS変換の正則化パラメータ。デフォルトは1e-3。
+        adaptive (bool, optional): Trueの場合、正則化パラメータを自動調整
+        max_memory_mb (Optional[float], optional): TPSマップ評価時のメモリ上限（MB）
+        workers (int, optional): タイル単位のマップ生成と再サンプリングに使用するスレッド数
+        eval_mode (str, optional): "exact"（全画素で厳密評価）、"grid"（粗い格子から補間）
+            または "fast"（遠くの対応点の寄与を補間で近似。対応点が数千点以上の場合に高速）
+        grid_step (int, optional): grid モードでの格子間隔（画素）
+        grid_tolerance (Optional[float], optional): grid / fast モードで許容する最大誤差（画素）。
+            超えた場合は格子を細分化（fast モードでは補間の次数を上げる）
+        use_map_cache (bool, optional): Trueの場合、合成済みワープマップをディスクにキャッシュし、同じ入力では再利用
+        engine (str, optional): 変換エンジン。"tps" または "piecewise_affine"（対応点が多い場合に高速）
+        lowrank_threshold (Optional[int], optional): 点数がこれを超える場合、TPS を低ランク近似で解く（None は常に厳密）
+        lowrank_landmarks (int, optional): 低ランク近似で基底関数の中心とするランドマークの数
+        precision (str, optional): exact モードでのカーネルの評価精度。"float32" はメモリの読み書きが半分で高速
+        progress_callback (Optional[ProgressCallback], optional): 進捗通知 (ステージ名, 完了数, 総数)
+        cancel_event (Optional[threading.Event], optional): キャンセル要求を伝えるイベント
+        
+    Returns:
+        np.ndarray: TPS変換後の画像（NumPy配列）
+        
+    Raises:
+        ValueError: 対応点が不足している場合、またはアフィン変換失敗時
+        TransformCancelled: 処理がキャンセルされた場合
+    """
+    return warp_image_source(
+        dest_points, src_points, ArrayImageReader(src_np), output_size,
+        reg_lambda=reg_lambda, adaptive=adaptive, max_memory_mb=max_memory_mb, workers=workers,
+        eval_mode=eval_mode, grid_step=grid_step, grid_tolerance=grid_tolerance, use_map_cache=use_map_cache,
+        engine=engine, lowrank_threshold=lowrank_threshold, lowrank_landmarks=lowrank_landmarks,
+        precision=precision, progress_callback=progress_callback, cancel_event=cancel_event
+    )
+
+def _lowrank_landmarks(n_points: int, lowrank_threshold: Optional[int], lowrank_landmarks: int) -> Optional[int]:
+    """
+    低ランク近似で解かれる場合はランドマークの数を、厳密に解かれる場合は None を返します（キャッシュキー用）。
+    """
+    if lowrank_threshold and lowrank_threshold > 0 and n_points > lowrank_threshold:
+        return int(lowrank_landmarks)
+    return None
+
+def warp_image_source(dest_points: List[Tuple[float, float]], src_points: List[Tuple[float, float]],
+                      reader: Any, output_size: Tuple[int, int],
+                      reg_lambda: float = 1e-3, adaptive: bool = False,
+                      max_memory_mb: Optional[float] = None, workers: int = 1,
+                      eval_mode: str = "exact", grid_step: int = 16,
+                      grid_tolerance: Optional[float] = None, use_map_cache: bool = False,
+                      engine: str = DEFAULT_WARP_ENGINE, lowrank_threshold: Optional[int] = None,
+                      lowrank_landmarks: int = LOWRANK_LANDMARKS, precision: str = "float64",
+                      progress_callback: Optional[ProgressCallback] = None,
+                      cancel_event: Optional[threading.Event] = None,
+                      out: Optional[np.ndarray] = None,
+                      builder: Optional[Any] = None) -> np.ndarray:
+    """
+    リーダーから読み出した元画像を変換します。引数は perform_array_transformation と同じです。
+    
+    ワープマップを粗く標本化して元画像の参照範囲（ROI）を見積もり、その範囲だけを読み出して再サンプリングします。
+    
+    Args:
+        reader (Any): width, height, channels, read_window(x0, y0, x1, y1) を持つ元画像のリーダー
+        out (Optional[np.ndarray], optional): 結果を書き込む形状 (H, W, channels) の配列（QImage のビューなど）。
+            省略時は新しく確保します
+        builder (Optional[Any], optional): 同じ対応点・設定で create_map_builder により作成済みの生成器。
+            指定した場合は TPS パラメータの計算や三角形分割を省略します
+        
+    Returns:
+        np.ndarray: TPS変換後の画像（out を指定した場合は out）
+    """
+    transform_logger.debug("Starting warp_image_source")
+
+    def report(stage: str, done: int, total: int) -> None:
+        if progress_callback is not None:
+            progress_callback(stage, done, total)
+
+    width, height = output_size
+    cache = get_warp_map_cache() if use_map_cache else None
+    cache_writer = None
+    if cache is not None:
+        cache_key = make_cache_key(
+            dest_points, src_points, output_size, (reader.height, reader.width),
+            engine=engine, reg_lambda=float(reg_lambda), adaptive=bool(adaptive), eval_mode=eval_mode,
+            grid_step=grid_step if eval_mode == "grid" else None,
+            grid_tolerance=grid_tolerance if eval_mode in ("grid", "fast") else None,
+            lowrank_landmarks=_lowrank_landmarks(len(dest_points), lowrank_threshold, lowrank_landmarks),
+            precision=precision if engine == "tps" and eval_mode == "exact" else None
+        )
+        cached_maps = cache.load(cache_key)
+        if cached_maps is not None:
+            # キャッシュ済みのマップがあれば TPS の解とマップ生成を省き、再サンプリングだけを行う
+            return _remap_cached_maps(cached_maps, reader, len(dest_points),
+                                      max_memory_mb, workers, progress_callback, cancel_event, out)
+
+    if builder is None:
+        builder = create_map_builder(
+            dest_points, src_points, output_size, engine=engine, reg_lambda=reg_lambda, adaptive=adaptive,
+            max_memory_mb=max_memory_mb, workers=workers, eval_mode=eval_mode, grid_step=grid_step,
+            grid_tolerance=grid_tolerance, lowrank_threshold=lowrank_threshold, lowrank_landmarks=lowrank_landmarks,
+            precision=precision, progress_callback=progress_callback, cancel_event=cancel_event
+        )
+    _check_cancelled(cancel_event)
+    sample_x, sample_y = builder.sample(_roi_sample_axis(width), _roi_sample_axis(height))
+    source = _CroppedSource(reader, _source_window(sample_x, sample_y, reader.width, reader.height, ROI_MARGIN))
+    if cache is not None and cache.fits(height, width):
+        cache_writer = cache.create(cache_key, height, width)
+
+    # タイルごとにワープマップを生成して再サンプリングし、出力画像に書き込む
+    warped = out if out is not None else np.empty((height, width, reader.channels), dtype=np.uint8)
+    tiles = builder.plan_tiles()
+    transform_logger.debug("Warping %d tiles with %d workers", len(tiles), workers)
+    completed = [0]
+    progress_lock = threading.Lock()
+    report("warp", 0, len(tiles))
+
+    def warp_tile(r0: int, r1: int) -> None:
+        _check_cancelled(cancel_event)
+        with tracing.span("maps", rows=[r0, r1]):
+            map_x, map_y = builder.rows(r0, r1)
+            if cache_writer is not None:
+                cache_writer.maps[r0:r1, :, 0] = map_x
+                cache_writer.maps[r0:r1, :, 1] = map_y
+        with tracing.span("remap", rows=[r0, r1]):
+            source.remap(map_x, map_y, warped[r0:r1])
+        with progress_lock:
+            completed[0] += 1
+            done = completed[0]
+        report("warp", done, len(tiles))
+
+    try:
+        with tracing.span("warp", tiles=len(tiles), workers=workers):
+            _run_row_tiles(warp_tile, tiles, workers)
+    except BaseException:
+        if cache_writer is not None:
+            cache_writer.discard()
+        raise
+    if cache_writer is not None:
+        try:
+            cache_writer.commit()
+        except OSError:
+            transform_logger.warning("Failed to store warp maps in cache", exc_info=True)
+            cache_writer.discard()
+    return warped
+
+def _remap_cached_maps(maps: np.ndarray, reader: Any, n_points: int, max_memory_mb: Optional[float], workers: int,
+                       progress_callback: Optional[ProgressCallback],
+                       cancel_event: Optional[threading.Event], out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    キャッシュから読み出した (H, W, 2) の合成済みマップで、行タイルごとに再サンプリングします。
+    """
+    height, width = maps.shape[:2]
+    samples = maps[_roi_sample_axis(height)][:, _roi_sample_axis(width)]
+    source = _CroppedSource(reader, _source_window(samples[..., 0], samples[..., 1], reader.width, reader.height, ROI_MARGIN))
+    warped = out if out is not None else np.empty((height, width, reader.channels), dtype=np.uint8)
+    tiles = _plan_row_tiles(height, n_points, width, max_memory_mb, workers)
+    completed = [0]
+    progress_lock = threading.Lock()
+    if progress_callback is not None:
+        progress_callback("warp", 0, len(tiles))
+
+    def remap_tile(r0: int, r1: int) -> None:
+        _check_cancelled(cancel_event)
+        with tracing.span("maps", rows=[r0, r1], cached=True):
+            tile_maps = np.asarray(maps[r0:r1])
+            map_x = np.ascontiguousarray(tile_maps[..., 0])
+            map_y = np.ascontiguousarray(tile_maps[..., 1])
+        with tracing.span("remap", rows=[r0, r1]):
+            source.remap(map_x, map_y, warped[r0:r1])
+        with progress_lock:
+            completed[0] += 1
+            done = completed[0]
+        if progress_callback is not None:
+            progress_callback("warp", done, len(tiles))
+
+    with tracing.span("warp", tiles=len(tiles), workers=workers, cached=True):
+        _run_row_tiles(remap_tile, tiles, workers)
+    return warped
+
+class CompiledWarp:
+    """
+    ワープマップを cv2.convertMaps で固定小数点（CV_16SC2）に変換して保持し、同じ大きさの複数の元画像
+    （基図・注記・水系・陰影などのレイヤー）に繰り返し適用するための変換です。compile_warp で作成します。
+
+    2 枚目以降のレイヤーはアフィン変換の推定・TPS の解・マップの生成を省き、cv2.remap だけで変換されます。
+    固定小数点のマップは小数部を 1/32 画素に丸めますが、cv2.remap は浮動小数点のマップも内部で同じ形式に
+    変換して補間するため、結果は perform_transformation と一致します。マップは 1 画素あたり 6 バイト
+    （float32 の 2 枚では 8 バイト）です。
+
+    Args:
+        map1 (np.ndarray): 形状 (H, W, 2) の int16 配列。参照範囲 window の左上を原点とした整数部
+        map2 (np.ndarray): 形状 (H, W) の uint16 配列。補間表の番号（小数部）
+        window (Optional[Tuple[int, int, int, int]]): マップが参照する元画像の範囲 (x0, y0, x1, y1)。
+            元画像の外だけを参照する場合は None
+        source_size (Tuple[int, int]): 元画像のサイズ (width, height)
+        max_memory_mb (Optional[float], optional): 再サンプリングのタイル分割に使うメモリ上限（MB）
+        workers (int, optional): 既定のスレッド数
+    """
+    def __init__(self, map1: np.ndarray, map2: np.ndarray, window: Optional[Tuple[int, int, int, int]],
+                 source_size: Tuple[int, int], max_memory_mb: Optional[float] = None, workers: int = 1):
+        self.map1 = map1
+        self.map2 = map2
+        self.window = window
+        self.source_size = source_size
+        self.max_memory_mb = max_memory_mb
+        self.workers = workers
+
+    @property
+    def output_size(self) -> Tuple[int, int]:
+        return self.map1.shape[1], self.map1.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        return self.map1.nbytes + self.map2.nbytes
+
+    def apply(self, source: Any, workers: Optional[int] = None, out: Optional[np.ndarray] = None,
+              cancel_event: Optional[threading.Event] = None) -> np.ndarray:
+        """
+        元画像を変換します。元画像のうち参照範囲だけを読み出し、行タイルごとに再サンプリングします。
+
+        Args:
+            source (Any): 元画像。QImage、uint8 の NumPy 配列（RGB またはグレースケール）、
+                または width, height, channels, read_window(x0, y0, x1, y1) を持つリーダー
+            workers (Optional[int], optional): スレッド数。None の場合は作成時の値
+            out (Optional[np.ndarray], optional): 結果を書き込む形状 (H, W, channels) の配列。省略時は新しく確保します
+            cancel_event (Optional[threading.Event], optional): キャンセル要求を伝えるイベント
+
+        Returns:
+            np.ndarray: 変換後の画像（out を指定した場合は out）
+
+        Raises:
+            ValueError: 元画像のサイズが作成時の source_size と異なる場合
+            TransformCancelled: 処理がキャンセルされた場合
+        """
+        reader = _as_source_reader(source)
+        if (reader.width, reader.height) != tuple(self.source_size):
+            raise ValueError(f"Source size {reader.width}x{reader.height} does not match the compiled warp "
+                             f"({self.source_size[0]}x{self.source_size[1]})")
+        width, height = self.output_size
+        workers = self.workers if workers is None else max(1, workers)
+        warped = out if out is not None else np.empty((height, width, reader.channels), dtype=np.uint8)
+        if self.window is None:
+            warped[...] = 255
+            return warped
+        _check_cancelled(cancel_event)
+        with tracing.span("read_source", window=list(self.window)):
+            pixels = reader.read_window(*self.window)
+        # 固定小数点のマップは float32 のマップの 2 枚分より小さいが、タイルの大きさは同じ基準で決める
+        tiles = _plan_row_tiles(height, 0, width, self.max_memory_mb, workers)
+
+        def remap_tile(r0: int, r1: int) -> None:
+            _check_cancelled(cancel_event)
+            tile_out = warped[r0:r1]
+            dst = tile_out if tile_out.flags["C_CONTIGUOUS"] and tile_out.flags["WRITEABLE"] else None
+            with tracing.span("remap", rows=[r0, r1], fixed_point=True):
+                result = cv2.remap(pixels, self.map1[r0:r1], self.map2[r0:r1], dst=dst,
+                                   interpolation=cv2.INTER_CUBIC, borderMode=cv2.BORDER_CONSTANT,
+                                   borderValue=(255, 255, 255, 255))
+            if result is not tile_out:
+                tile_out[...] = result.reshape(tile_out.shape)
+
+        with tracing.span("apply_compiled_warp", tiles=len(tiles), workers=workers):
+            _run_row_tiles(remap_tile, tiles, workers)
+        return warped
+
+    def apply_qimage(self, source: QImage, workers: Optional[int] = None,
+                     cancel_event: Optional[threading.Event] = None) -> QImage:
+        """
+        QImage を変換し、元画像と同じ形式の QImage を返します（perform_qimage_transformation と同様に、
+        元画像のメモリを直接参照し、結果も QImage のメモリへ直接書き込みます）。
+        """
+        reader = QImageSourceReader(source, native=True)
+        width, height = self.output_size
+        result = QImage(width, height, reader.format)
+        if result.isNull():
+            raise MemoryError(f"Failed to allocate a {width}x{height} image")
+        self.apply(reader, workers=workers, out=qimage_array_view(result, writable=True), cancel_event=cancel_event)
+        reader.close()
+        return result
+
+    def apply_many(self, sources: List[Any], workers: Optional[int] = None, parallel: bool = True,
+                   cancel_event: Optional[threading.Event] = None) -> List[Any]:
+        """
+        複数のレイヤーを変換します。QImage のレイヤーは QImage、それ以外は NumPy 配列で返します。
+
+        Args:
+            sources (List[Any]): 元画像（apply と同じ形式）のリスト
+            workers (Optional[int], optional): 全体で使用するスレッド数。None の場合は作成時の値
+            parallel (bool, optional): True の場合はレイヤー単位で並列に変換し、False の場合は
+                レイヤーを順に、行タイル単位で並列に変換します
+
+        Returns:
+            List[Any]: sources と同じ順の変換結果
+        """
+        workers = self.workers if workers is None else max(1, workers)
+
+        def apply_one(source: Any, layer_workers: int) -> Any:
+            if isinstance(source, QImage):
+                return self.apply_qimage(source, workers=layer_workers, cancel_event=cancel_event)
+            return self.apply(source, workers=layer_workers, cancel_event=cancel_event)
+
+        if not parallel or workers <= 1 or len(sources) <= 1:
+            return [apply_one(source, workers) for source in sources]
+        layer_workers = min(workers, len(sources))
+        # レイヤー数がスレッド数より少ない場合は、余ったスレッドを各レイヤーの行タイルに回す
+        tile_workers = max(1, workers // layer_workers)
+        with ThreadPoolExecutor(max_workers=layer_workers) as executor:
+            futures = [executor.submit(contextvars.copy_context().run, apply_one, source, tile_workers)
+                       for source in sources]
+            return [future.result() for future in futures]
+
+def _as_source_reader(source: Any) -> Any:
+    if isinstance(source, QImage):
+        return QImageSourceReader(source)
+    if isinstance(source, np.ndarray):
+        return ArrayImageReader(source)
+    return source
+
+def compile_warp(dest_points: List[Tuple[float, float]], src_points: List[Tuple[float, float]],
+                 source_size: Tuple[int, int], output_size: Tuple[int, int],
+                 progress_callback: Optional[ProgressCallback] = None,
+                 cancel_event: Optional[threading.Event] = None, **kwargs: Any) -> CompiledWarp:
+    """
+    対応点からワープマップを一度だけ生成し、固定小数点に変換した CompiledWarp を作成します。
+
+    Args:
+        dest_points (List[Tuple[float, float]]): 変換先の対応点リスト
+        src_points (List[Tuple[float, float]]): 変換元の対応点リスト
+        source_size (Tuple[int, int]): 元画像（各レイヤー）のサイズ (width, height)
+        output_size (Tuple[int, int]): 出力画像のサイズ (width, height)
+        progress_callback (Optional[ProgressCallback], optional): 進捗通知 (ステージ名, 完了数, 総数)
+        cancel_event (Optional[threading.Event], optional): キャンセル要求を伝えるイベント
+        **kwargs: create_map_builder に渡す変換設定（engine, reg_lambda, workers, eval_mode など）。
+            load_transform_settings の結果をそのまま渡せます（use_map_cache は使用しません）
+
+    Returns:
+        CompiledWarp: 変換
+
+    Raises:
+        ValueError: 対応点が不足している場合、アフィン変換失敗時、
+            または元画像の一辺が MAX_REMAP_SIDE 以上の場合（python src/main.py warp --stream、
+            または streaming.stream_transformation を使用してください）
+        TransformCancelled: 処理がキャンセルされた場合
+    """
+    source_width, source_height = source_size
+    if source_width >= MAX_REMAP_SIDE or source_height >= MAX_REMAP_SIDE:
+        raise ValueError(f"Fixed-point maps cannot address a {source_width}x{source_height} source; "
+                         f"each side must be below {MAX_REMAP_SIDE} (use 'warp --stream' for larger sources)")
+    # 変換結果そのものを再利用するため、ディスクのマップキャッシュは使わない
+    kwargs.pop("use_map_cache", None)
+    width, height = output_size
+    workers = kwargs.get("workers", 1)
+    with tracing.trace("compile_warp", points=len(dest_points), output_size=list(output_size),
+                       source_size=list(source_size), eval_mode=kwargs.get("eval_mode", "exact"), workers=workers):
+        builder = create_map_builder(dest_points, src_points, output_size, progress_callback=progress_callback,
+                                     cancel_event=cancel_event, **kwargs)
+        map1 = np.empty((height, width, 2), dtype=np.int16)
+        map2 = np.empty((height, width), dtype=np.uint16)
+        windows: List[Tuple[int, int, int, int]] = []
+        tiles = builder.plan_tiles()
+        completed = [0]
+        lock = threading.Lock()
+        if progress_callback is not None:
+            progress_callback("compile", 0, len(tiles))
+
+        def compile_tile(r0: int, r1: int) -> None:
+            _check_cancelled(cancel_event)
+            with tracing.span("maps", rows=[r0, r1]):
+                map_x, map_y = builder.rows(r0, r1)
+            window = _source_window(map_x, map_y, source_width, source_height)
+            with tracing.span("convert_maps", rows=[r0, r1]):
+                # 元画像から十分に離れた座標は範囲内に丸め、整数部が int16 に収まるようにする（境界色のまま）
+                map_x = np.clip(map_x, -8, source_width + 8)
+                map_y = np.clip(map_y, -8, source_height + 8)
+                map1[r0:r1], map2[r0:r1] = cv2.convertMaps(map_x, map_y, cv2.CV_16SC2)
+            with lock:
+                if window is not None:
+                    windows.append(window)
+                completed[0] += 1
+                done = completed[0]
+            if progress_callback is not None:
+                progress_callback("compile", done, len(tiles))
+
+        with tracing.span("compile", tiles=len(tiles), workers=workers):
+            _run_row_tiles(compile_tile, tiles, workers)
+        window = None
+        if windows:
+            bounds = np.array(windows)
+            window = (int(bounds[:, 0].min()), int(bounds[:, 1].min()), int(bounds[:, 2].max()), int(bounds[:, 3].max()))
+            # 整数部を参照範囲の左上からの位置に直す（小数部の map2 は変わらない）。
+            # 元画像の外を指す座標は飽和させ、符号が反転しないようにする
+            for r0, r1 in tiles:
+                cv2.subtract(map1[r0:r1], (window[0], window[1], 0, 0), dst=map1[r0:r1])
+    transform_logger.debug("Compiled warp: %dx%d, source window %s, %.1f MB", width, height, window,
+                           (map1.nbytes + map2.nbytes) / 2 ** 20)
+    return CompiledWarp(map1, map2, window, (source_width, source_height),
+                        kwargs.get("max_memory_mb"), workers)
+
+def _feather_weights(map_x: np.ndarray, map_y: np.ndarray, width: int, height: int,
+                     feather_px: float) -> np.ndarray:
+    """
+    元画像の縁からの距離（元画像の画素）に応じた合成の重みを返します。縁から feather_px 以上内側では 1 です。
+    """
+    distance = np.minimum(np.minimum(map_x + 0.5, width - 0.5 - map_x),
+                          np.minimum(map_y + 0.5, height - 0.5 - map_y))
+    if feather_px <= 0:
+        return (distance > 0).astype(np.float32)
+    return np.clip(distance / np.float32(feather_px), 0, 1).astype(np.float32, copy=False)
+
+def _mosaic_footprint(builder: Any, width: int, height: int, source_width: int, source_height: int,
+                      tile_size: int) -> np.ndarray:
+    """
+    ワープマップを粗く標本化し、シートの元画像を参照する出力ブロック（tile_size 四方）を表す
+    形状 (ブロックの行数, ブロックの列数) の bool 配列を返します。
+    """
+    xs, ys = _roi_sample_axis(width), _roi_sample_axis(height)
+    sample_x, sample_y = builder.sample(xs, ys)
+    inside = (sample_x > -2) & (sample_x < source_width + 1) & (sample_y > -2) & (sample_y < source_height + 1)
+    # 標本点の間で元画像に掛かる場合に備え、隣の標本点まで広げる
+    grown = inside.copy()
+    grown[1:] |= inside[:-1]
+    grown[:-1] |= inside[1:]
+    grown[:, 1:] |= grown[:, :-1].copy()
+    grown[:, :-1] |= grown[:, 1:].copy()
+    block_rows = np.add.reduceat(grown, np.searchsorted(ys, np.arange(0, height, tile_size)), axis=0)
+    return np.add.reduceat(block_rows, np.searchsorted(xs, np.arange(0, width, tile_size)), axis=1) > 0
+
+def mosaic_image_sources(sheets: List[Tuple[List[Tuple[float, float]], List[Tuple[float, float]], Any]],
+                         output_size: Tuple[int, int], feather_px: float = MOSAIC_FEATHER_PX,
+                         tile_size: int = MOSAIC_TILE,
+                         progress_callback: Optional[ProgressCallback] = None,
+                         cancel_event: Optional[threading.Event] = None,
+                         out: Optional[np.ndarray] = None, **kwargs: Any) -> np.ndarray:
+    """
+    複数の元画像（シート）をそれぞれの対応点で変換し、1 枚の出力に合成します。
+    
+    出力を tile_size 四方のブロックに分け、各シートのワープマップを粗く標本化して求めた範囲（フットプリント）に
+    掛かるブロックだけを、そのシートで変換します。1 枚のシートだけが掛かるブロックはそのまま書き込み、
+    複数のシートが重なるブロックは元画像の縁からの距離で重み付けして（フェザリング）合成します。
+    どのシートも掛からない画素は白になります。処理時間とメモリはシートの枚数 × 出力全体ではなく、
+    シートが覆う面積に比例します。
+    
+    Args:
+        sheets (List[Tuple]): (変換先の対応点, 変換元の対応点, リーダー) のリスト。リーダーは warp_image_source と同じで、
+            チャンネル数はすべて同じである必要があります
+        output_size (Tuple[int, int]): 出力画像のサイズ (width, height)
+        feather_px (float, optional): 重みを 0 から 1 へ上げる元画像の縁からの幅（元画像の画素）。0 の場合は境界で切り替えます
+        tile_size (int, optional): ブロックの一辺の上限（画素）
+        progress_callback (Optional[ProgressCallback], optional): 進捗通知 (ステージ名, 完了数, 総数)
+        cancel_event (Optional[threading.Event], optional): キャンセル要求を伝えるイベント
+        out (Optional[np.ndarray], optional): 結果を書き込む形状 (H, W, channels) の配列。省略時は新しく確保します
+        **kwargs: create_map_builder に渡す変換設定（engine, reg_lambda, workers, eval_mode など）
+        
+    Returns:
+        np.ndarray: 合成した画像（out を指定した場合は out）
+        
+    Raises:
+        ValueError: シートがない場合、チャンネル数が異なる場合、対応点が不足している場合、またはアフィン変換失敗時
+        TransformCancelled: 処理がキャンセルされた場合
+    """
+    if not sheets:
+        raise ValueError("No source sheets to mosaic")
+    channels = {reader.channels for _dest, _src, reader in sheets}
+    if len(channels) != 1:
+        raise ValueError(f"Source sheets have different channel counts: {sorted(channels)}")
+    # ディスクのマップキャッシュは出力全体のマップを前提とするため使わない
+    kwargs.pop("use_map_cache", None)
+    width, height = output_size
+    workers = kwargs.get("workers", 1)
+    builders = []
+    footprints = []
+    for index, (dest_points, src_points, reader) in enumerate(sheets):
+        _check_cancelled(cancel_event)
+        with tracing.span("sheet", index=index, points=len(dest_points)):
+            builder = create_map_builder(dest_points, src_points, output_size, progress_callback=progress_callback,
+                                         cancel_event=cancel_event, **kwargs)
+            footprint = _mosaic_footprint(builder, width, height, reader.width, reader.height, tile_size)
+        transform_logger.debug("Mosaic sheet %d covers %d of %d blocks", index, int(footprint.sum()), footprint.size)
+        builders.append(builder)
+        footprints.append(footprint)
+
+    # ブロックの行数は、各シートの行タイル（出力の全幅分）と同じメモリに収まるように決める
+    block_width = min(tile_size, width)
+    block_height = tile_size
+    for builder in builders:
+        r0, r1 = builder.plan_tiles()[0]
+        block_height = min(block_height, max(1, (r1 - r0) * width // block_width))
+    # 行の帯はブロックの境界をまたがないように分ける
+    bands = [(r0, min(r0 + block_height, t0 + tile_size, height))
+             for t0 in range(0, height, tile_size) for r0 in range(t0, min(t0 + tile_size, height), block_height)]
+    sources = [_CroppedSource(reader, None) for _dest, _src, reader in sheets]
+    warped = out if out is not None else np.empty((height, width, channels.pop()), dtype=np.uint8)
+    covered = [0]
+    completed = [0]
+    progress_lock = threading.Lock()
+    if progress_callback is not None:
+        progress_callback("mosaic", 0, len(bands))
+
+    def mosaic_band(r0: int, r1: int) -> None:
+        _check_cancelled(cancel_event)
+        block_row = r0 // tile_size
+        for c0 in range(0, width, block_width):
+            c1 = min(c0 + block_width, width)
+            block_col = c0 // tile_size
+            indices = [i for i, footprint in enumerate(footprints) if footprint[block_row, block_col]]
+            target = warped[r0:r1, c0:c1]
+            if not indices:
+                target[...] = 255
+                continue
+            if len(indices) == 1:
+                with tracing.span("remap", rows=[r0, r1], cols=[c0, c1], sheet=indices[0]):
+                    map_x, map_y = builders[indices[0]].rows(r0, r1, c0, c1)
+                    sources[indices[0]].remap(map_x, map_y, target)
+            else:
+                with tracing.span("blend", rows=[r0, r1], cols=[c0, c1], sheets=indices):
+                    accumulated = np.zeros(target.shape, dtype=np.float32)
+                    weight_sum = np.zeros(target.shape[:2], dtype=np.float32)
+                    pixels = np.empty(target.shape, dtype=np.uint8)
+                    for i in indices:
+                        map_x, map_y = builders[i].rows(r0, r1, c0, c1)
+                        sources[i].remap(map_x, map_y, pixels)
+                        weights = _feather_weights(map_x, map_y, sheets[i][2].width, sheets[i][2].height, feather_px)
+                        accumulated += pixels * weights[..., None]
+                        weight_sum += weights
+                    blended = np.rint(accumulated / np.maximum(weight_sum, 1e-6)[..., None])
+                    target[...] = np.where(weight_sum[..., None] > 0, blended, 255)
+            with progress_lock:
+                covered[0] += len(indices)
+        with progress_lock:
+            completed[0] += 1
+            done = completed[0]
+        if progress_callback is not None:
+            progress_callback("mosaic", done, len(bands))
+
+    with tracing.span("mosaic", sheets=len(sheets), bands=len(bands), workers=workers):
+        _run_row_tiles(mosaic_band, bands, workers)
+    transform_logger.debug("Mosaic remapped %d sheet blocks for %d output blocks",
+                           covered[0], len(bands) * -(-width // block_width))
+    return warped
+
+def perform_mosaic_transformation(sheets: List[Tuple[List[Tuple[float, float]], List[Tuple[float, float]], QImage]],
+                                  output_size: Tuple[int, int], feather_px: float = MOSAIC_FEATHER_PX,
+                                  progress_callback: Optional[ProgressCallback] = None,
+                                  cancel_event: Optional[threading.Event] = None, **kwargs: Any) -> QImage:
+    """
+    複数の QImage（シート）を 1 枚の QImage に合成します（mosaic_image_sources を参照）。
+    
+    各シートの QImage のメモリを直接参照し、結果も QImage のメモリへ直接書き込みます。
+    出力は、アルファチャンネルを持つシートがあれば Format_ARGB32、なければ Format_RGB32 になります。
+    
+    Args:
+        sheets (List[Tuple]): (変換先の対応点, 変換元の対応点, QImage) のリスト
+        output_size (Tuple[int, int]): 出力画像のサイズ (width, height)
+        feather_px (float, optional): 重なりをぼかす幅（元画像の画素）
+        progress_callback (Optional[ProgressCallback], optional): 進捗通知 (ステージ名, 完了数, 総数)
+        cancel_event (Optional[threading.Event], optional): キャンセル要求を伝えるイベント
+        **kwargs: mosaic_image_sources に渡す変換設定（reg_lambda, adaptive, workers など）
+        
+    Returns:
+        QImage: 合成した画像
+        
+    Raises:
+        ValueError: 対応点が不足している場合、またはアフィン変換失敗時
+        TransformCancelled: 処理がキャンセルされた場合
+    """
+    transform_logger.debug("Starting perform_mosaic_transformation")
+    _check_cancelled(cancel_event)
+    if progress_callback is not None:
+        progress_callback("prepare", 0, 1)
+    with tracing.trace("perform_mosaic_transformation", sheets=len(sheets), output_size=list(output_size),
+                       points=[len(dest_points) for dest_points, _src, _image in sheets],
+                       eval_mode=kwargs.get("eval_mode", "exact"), workers=kwargs.get("workers", 1)):
+        # 4 チャンネル（B, G, R, A）にそろえ、形式の異なるシートを同じ出力に合成できるようにする
+        has_alpha = any(qimage.hasAlphaChannel() for _dest, _src, qimage in sheets)
+        readers = [QImageSourceReader(qimage.convertToFormat(QImage.Format_ARGB32 if qimage.hasAlphaChannel()
+                                                             else QImage.Format_RGB32), native=True)
+                   for _dest, _src, qimage in sheets]
+        width, height = output_size
+        result = QImage(width, height, QImage.Format_ARGB32 if has_alpha else QImage.Format_RGB32)
+        if result.isNull():
+            raise MemoryError(f"Failed to allocate a {width}x{height} image")
+        mosaic_image_sources(
+            [(dest_points, src_points, reader) for (dest_points, src_points, _image), reader in zip(sheets, readers)],
+            output_size, feather_px=feather_px, progress_callback=progress_callback, cancel_event=cancel_event,
+            out=qimage_array_view(result, writable=True), **kwargs
+        )
+        for reader in readers:
+            reader.close()
+    transform_logger.debug("Mosaic transformation performed successfully")
+    return result
+
 def perform_transformation(dest_points: List[Tuple[float, float]], src_points: List[Tuple[float, float]],
                            src_qimage: QImage, output_size: Tuple[int, int],
-                           reg_lambda: float = 1e-3, adaptive: bool = False) -> np.ndarray:
+                           reg_lambda: float = 1e-3, adaptive: bool = False, *,
+                           progress_callback: Optional[ProgressCallback] = None,
+                           cancel_event: Optional[threading.Event] = None, **kwargs: Any) -> np.ndarray:
     """
     アフィン変換とTPS変換を組み合わせて、画像全体の変形を実施します。
+    元画像のうちワープマップが参照する範囲だけを NumPy 配列に変換して処理します。
     
     Args:
         dest_points (List[Tuple[float, float]]): 変換先の対応点リスト
@@ -145,64 +1896,170 @@ def perform_transformation(dest_points: List[Tuple[float, float]], src_points: L
         output_size (Tuple[int, int]): 出力画像のサイズ (width, height)
         reg_lambda (float, optional): TPS変換の正則化パラメータ。デフォルトは1e-3。
         adaptive (bool, optional): Trueの場合、正則化パラメータを自動調整
+        progress_callback (Optional[ProgressCallback], optional): 進捗通知 (ステージ名, 完了数, 総数)。キーワード専用
+        cancel_event (Optional[threading.Event], optional): キャンセル要求を伝えるイベント。キーワード専用
+        **kwargs: warp_image_source に渡すその他の変換設定（workers, eval_mode など）
         
     Returns:
-        np.ndarray: TPS変換後の画像（NumPy配列）
+        np.ndarray: TPS変換後の画像（RGB 順の NumPy 配列）。以前の版は qimage_to_numpy と同じく
+            B, G, R の順で返していたため、赤と青を入れ替えていた呼び出し側はその処理が不要になります
         
     Raises:
         ValueError: 対応点が不足している場合、またはアフィン変換失敗時
+        TransformCancelled: 処理がキャンセルされた場合
     """
     transform_logger.debug("Starting perform_transformation")
-    src_points_np = np.array(src_points, dtype=np.float64)
-    dest_points_np = np.array(dest_points, dtype=np.float64)
-
-    if src_points_np.shape[0] < 3:
-        transform_logger.error(_("insufficient_correspondence_points"))
-        raise ValueError(_("error_minimum_points_required"))
+    _check_cancelled(cancel_event)
+    if progress_callback is not None:
+        progress_callback("prepare", 0, 1)
+    with tracing.trace("perform_transformation", points=len(dest_points), output_size=list(output_size),
+                       source_size=[src_qimage.width(), src_qimage.height()],
+                       eval_mode=kwargs.get("eval_mode", "exact"), workers=kwargs.get("workers", 1)):
+        # 元画像は全体を変換せず、ワープマップが参照する範囲だけを QImage から読み出す
+        warped = warp_image_source(
+            dest_points, src_points, QImageSourceReader(src_qimage), output_size,
+            reg_lambda=reg_lambda, adaptive=adaptive,
+            progress_callback=progress_callback, cancel_event=cancel_event, **kwargs
+        )
+    transform_logger.debug("Transformation performed successfully")
+    return warped
 
-    # アフィン変換の計算
-    if src_points_np.shape[0] == 3:
-        affine_matrix = cv2.getAffineTransform(src_points_np.astype(np.float32), dest_points_np.astype(np.float32))
-    else:
-        affine_matrix, _ = cv2.estimateAffine2D(src_points_np, dest_points_np)
-        if affine_matrix is None:
-            transform_logger.error(_("affine_transformation_failed"))
-            raise ValueError(_("affine_transformation_failed_message"))
-
-    # 画像のアフィン変換
-    src_np = qimage_to_numpy(src_qimage)
-    affine_transformed = cv2.warpAffine(
-        src_np,
-        affine_matrix,
-        (src_np.shape[1], src_np.shape[0]),
-        flags=cv2.INTER_CUBIC,
-        borderMode=cv2.BORDER_CONSTANT,
-        borderValue=(255, 255, 255)
-    )
-    aligned_src_points = cv2.transform(np.array([src_points_np], dtype=np.float64), affine_matrix)[0]
+def perform_qimage_transformation(dest_points: List[Tuple[float, float]], src_points: List[Tuple[float, float]],
+                                  src_qimage: QImage, output_size: Tuple[int, int],
+                                  reg_lambda: float = 1e-3, adaptive: bool = False, *,
+                                  progress_callback: Optional[ProgressCallback] = None,
+                                  cancel_event: Optional[threading.Event] = None, **kwargs: Any) -> QImage:
+    """
+    perform_transformation と同じ変換を行い、結果を QImage として返します。
+    
+    元画像の QImage のメモリを直接参照し、結果も新しく確保した QImage のメモリへ cv2.remap が直接書き込むため、
+    画像全体の NumPy 配列や中間コピーを作りません。出力は元画像と同じ形式（RGB32 など）になります。
+    
+    Args:
+        dest_points (List[Tuple[float, float]]): 変換先の対応点リスト
+        src_points (List[Tuple[float, float]]): 変換元の対応点リスト
+        src_qimage (QImage): 変換対象の画像
+        output_size (Tuple[int, int]): 出力画像のサイズ (width, height)
+        reg_lambda (float, optional): TPS変換の正則化パラメータ。デフォルトは1e-3。
+        adaptive (bool, optional): Trueの場合、正則化パラメータを自動調整
+        progress_callback (Optional[ProgressCallback], optional): 進捗通知 (ステージ名, 完了数, 総数)。キーワード専用
+        cancel_event (Optional[threading.Event], optional): キャンセル要求を伝えるイベント。キーワード専用
+        **kwargs: warp_image_source に渡すその他の変換設定（workers, eval_mode など）
+        
+    Returns:
+        QImage: TPS変換後の画像
+        
+    Raises:
+        ValueError: 対応点が不足している場合、またはアフィン変換失敗時
+        TransformCancelled: 処理がキャンセルされた場合
+    """
+    transform_logger.debug("Starting perform_qimage_transformation")
+    _check_cancelled(cancel_event)
+    if progress_callback is not None:
+        progress_callback("prepare", 0, 1)
+    with tracing.trace("perform_qimage_transformation", points=len(dest_points), output_size=list(output_size),
+                       source_size=[src_qimage.width(), src_qimage.height()],
+                       eval_mode=kwargs.get("eval_mode", "exact"), workers=kwargs.get("workers", 1)):
+        with tracing.span("allocate_output"):
+            reader = QImageSourceReader(src_qimage, native=True)
+            width, height = output_size
+            result = QImage(width, height, reader.format)
+            if result.isNull():
+                raise MemoryError(f"Failed to allocate a {width}x{height} image")
+        warp_image_source(
+            dest_points, src_points, reader, output_size, reg_lambda=reg_lambda, adaptive=adaptive,
+            progress_callback=progress_callback, cancel_event=cancel_event,
+            out=qimage_array_view(result, writable=True), **kwargs
+        )
+        reader.close()
+    transform_logger.debug("Transformation performed successfully")
+    return result
 
-    # TPS変換パラメータの計算とワープマップの生成
-    params_x, params_y = compute_tps_parameters(dest_points_np, aligned_src_points, reg_lambda=reg_lambda, adaptive=adaptive)
+def perform_preview_transformation(dest_points: List[Tuple[float, float]], src_points: List[Tuple[float, float]],
+                                   src_np: np.ndarray, src_scale: float, output_size: Tuple[int, int], scale: float,
+                                   reg_lambda: float = 1e-3, adaptive: bool = False, **kwargs: Any) -> np.ndarray:
+    """
+    縮小した元画像と縮小解像度の出力で変換を行います（プレビュー用）。
+    
+    出力座標を scale 倍すると TPS カーネルは scale^2 倍になるため、正則化パラメータも
+    scale^2 倍して解くことで、原寸で解いた場合と同じ変形を縮小表示できます
+    （adaptive の場合は点間距離から自動的に同じ倍率が掛かります）。
+    
+    Args:
+        dest_points (List[Tuple[float, float]]): 原寸での変換先の対応点リスト
+        src_points (List[Tuple[float, float]]): 原寸での変換元の対応点リスト
+        src_np (np.ndarray): src_scale 倍に縮小された元画像
+        src_scale (float): 元画像の縮小率
+        output_size (Tuple[int, int]): 原寸での出力画像サイズ (width, height)
+        scale (float): 出力の縮小率
+        reg_lambda (float, optional): 原寸での正則化パラメータ
+        adaptive (bool, optional): Trueの場合、正則化パラメータを自動調整
+        **kwargs: perform_array_transformation に渡すその他の設定
+        
+    Returns:
+        np.ndarray: 縮小解像度の変換後画像
+    """
+    dest_scaled = np.asarray(dest_points, dtype=np.float64) * scale
+    src_scaled = np.asarray(src_points, dtype=np.float64) * src_scale
+    if not adaptive:
+        reg_lambda = reg_lambda * scale ** 2
     width, height = output_size
-    grid_x, grid_y = np.meshgrid(np.arange(width), np.arange(height))
-    map_x, map_y = apply_tps_warp(params_x, params_y, dest_points_np, grid_x, grid_y)
-
-    warped = cv2.remap(
-        affine_transformed,
-        map_x.astype(np.float32),
-        map_y.astype(np.float32),
-        interpolation=cv2.INTER_CUBIC,
-        borderMode=cv2.BORDER_CONSTANT,
-        borderValue=(255, 255, 255)
+    preview_size = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+    return perform_array_transformation(
+        dest_scaled, src_scaled, src_np, preview_size,
+        reg_lambda=reg_lambda, adaptive=adaptive, **kwargs
     )
-    transform_logger.debug("Transformation performed successfully")
-    return warped
+
+def load_transform_settings(project: Any = None, resolve_lambda: bool = True) -> Dict[str, Any]:
+    """
+    設定ファイルから TPS 変換の設定を読み込み、perform_transformation のキーワード引数として返します。
+    プロジェクトを指定した場合は、プロジェクトごとの設定（Project.settings の warp_engine）を反映します。
+    tps/auto_lambda が有効な場合は、プロジェクトの対応点から GCV で選んだ λ（resolve_auto_lambda）を
+    reg_lambda とし、adaptive は無効にします。
+
+    GCV の掃引は点数の 3 乗に比例して時間がかかるため、GUI スレッドからは resolve_lambda=False で呼び出します。
+    この場合は保存済みの λ だけを使い（なければ設定ファイルの値のまま）、必要な掃引は auto_lambda_pending で
+    判断してワーカースレッドの compute_auto_lambda で行います。
+    
+    Args:
+        project (Any, optional): 変換対象のプロジェクト
+        resolve_lambda (bool, optional): 保存済みの λ が現在の対応点のものでない場合に GCV の掃引を行うか
+        
+    Returns:
+        Dict[str, Any]: perform_transformation に渡す設定値
+    """
+    reg_lambda_str: str = config.get("tps/reg_lambda", "1e-3")
+    try:
+        reg_lambda = float(reg_lambda_str)
+    except Exception:
+        reg_lambda = 1e-3
+    settings = {
+        "reg_lambda": reg_lambda,
+        "adaptive": config.get("tps/adaptive", False),
+        "max_memory_mb": config.get("tps/max_memory_mb", 256),
+        "workers": resolve_worker_count(config.get("tps/workers", 0)),
+        "eval_mode": config.get("tps/eval_mode", "exact"),
+        "grid_step": config.get("tps/grid_step", 16),
+        "grid_tolerance": config.get("tps/grid_tolerance", 0.1),
+        "use_map_cache": config.get("cache/enabled", False),
+        "lowrank_threshold": config.get("tps/lowrank_threshold", 3000),
+        "lowrank_landmarks": config.get("tps/lowrank_landmarks", LOWRANK_LANDMARKS),
+        "precision": config.get("tps/precision", "float64"),
+        "engine": project.settings.get("warp_engine", DEFAULT_WARP_ENGINE) if project is not None else DEFAULT_WARP_ENGINE,
+    }
+    if project is not None and config.get("tps/auto_lambda", False):
+        auto_lambda = resolve_auto_lambda(project, settings["lowrank_threshold"], settings["lowrank_landmarks"],
+                                          compute=resolve_lambda)
+        if auto_lambda is not None:
+            settings["reg_lambda"] = auto_lambda
+            settings["adaptive"] = False
+    return settings
 
 def perform_tps_transform(dest_points: List[Tuple[float, float]], src_points: List[Tuple[float, float]],
                           sceneA: Any, sceneB: Any) -> Tuple[Optional[QPixmap], Optional[str]]:
     """
     TPS変換を実施し、変換後の画像（QPixmap）を生成します。
-    内部でアフィン変換とTPS変換を連続して実行します。
+    内部でアフィン変換とTPS変換を合成したマップにより、1回の再サンプリングで変換します。
     
     Args:
         dest_points (List[Tuple[float, float]]): 変換先対応点リスト
@@ -216,13 +2073,13 @@ def perform_tps_transform(dest_points: List[Tuple[float, float]], src_points: Li
             - エラーメッセージ（失敗時）または None
     """
     transform_logger.debug("Starting perform_tps_transform")
+    with tracing.trace("perform_tps_transform", points=len(dest_points)):
+        return _perform_tps_transform(dest_points, src_points, sceneA, sceneB)
+
+def _perform_tps_transform(dest_points: List[Tuple[float, float]], src_points: List[Tuple[float, float]],
+                           sceneA: Any, sceneB: Any) -> Tuple[Optional[QPixmap], Optional[str]]:
     try:
-        reg_lambda_str: str = config.get("tps/reg_lambda", "1e-3")
-        try:
-            reg_lambda = float(reg_lambda_str)
-        except Exception:
-            reg_lambda = 1e-3
-        adaptive: bool = config.get("tps/adaptive", False)
+        settings = load_transform_settings(sceneA.project)
 
         if not sceneA.project.game_pixmap:
             return None, _("game_image_error_insufficient_points")
@@ -233,24 +2090,18 @@ def perform_tps_transform(dest_points: List[Tuple[float, float]], src_points: Li
 
         src_qimage: QImage = sceneB.project.real_qimage
 
-        warped_np = perform_transformation(
+        warped_qimage = perform_qimage_transformation(
             dest_points, src_points,
             src_qimage, output_size,
-            reg_lambda=reg_lambda, adaptive=adaptive
+            **settings
         )
     except Exception as e:
         transform_logger.exception("Error in TPS transform")
         return None, _("tps_calculation_failed").format(error=str(e))
 
     try:
-        warped_qimage = QImage(
-            warped_np.data,
-            warped_np.shape[1],
-            warped_np.shape[0],
-            warped_np.shape[1] * 3,
-            QImage.Format_RGB888
-        ).copy()
-        warped_pixmap = QPixmap.fromImage(warped_qimage)
+        with tracing.span("to_qpixmap"):
+            warped_pixmap = QPixmap.fromImage(warped_qimage)
         logger.info("TPS transform completed successfully")
         return warped_pixmap, None
     except Exception as e:
@@ -2,11 +2,14 @@
 
 import sys
 import os
-from PyQt5.QtWidgets import QApplication
-from ui import MainWindow
+import importlib
 from logger import setup_logger
 from PyQt5.QtGui import QFont, QFontDatabase
 
+# GUI を起動せずに実行するサブコマンドと、その処理を行うモジュール
+BATCH_COMMANDS = {"warp": "batch_warp", "serve": "warp_server", "morph": "morph_export",
+                  "points": "point_transform"}
+
 def load_bundled_fonts() -> None:
     """
     プロジェクトルートの assets/fonts/ フォルダに配置されたフォントファイルをロードします。
@@ -36,7 +39,15 @@ def main() -> None:
     1. ログ設定を初期化します。
     2. 組み込みフォントをロードし、グローバルフォントを設定します。
     3. メインウィンドウを生成して表示し、Qt のイベントループを開始します。
+    
+    第1引数にサブコマンド（warp, serve, morph, points）が指定された場合は、GUI を起動せずにバッチ処理やジョブサーバーを実行します。
     """
+    if len(sys.argv) > 1 and sys.argv[1] in BATCH_COMMANDS:
+        module = importlib.import_module(BATCH_COMMANDS[sys.argv[1]])
+        sys.exit(module.main(sys.argv[1:]))
+    # GUI 用のモジュールはサブコマンドでは不要なため、GUI を起動する場合だけ読み込む
+    from PyQt5.QtWidgets import QApplication
+    from ui import MainWindow
     setup_logger()
     app: QApplication = QApplication(sys.argv)
     
@@ -0,0 +1,283 @@
+# src/morph_export.py
+import os
+import sys
+import time
+import argparse
+import threading
+import numpy as np
+import cv2
+from typing import Any, List, Optional, Tuple
+from PyQt5.QtGui import QImage
+from logger import transform_logger
+import tracing
+from tps_solver import LOWRANK_LANDMARKS
+from core import (WarpMapBuilder, QImageSourceReader, ProgressCallback, _CroppedSource, _check_cancelled, _run_row_tiles,
+                  _plan_row_tiles, apply_tps_warp, compose_affine_maps)
+
+MORPH_FRAMES = 30
+MORPH_FPS = 15
+# 動画として書き出す拡張子と FourCC。それ以外のパスには連番の PNG を書き出す
+VIDEO_CODECS = {".mp4": "mp4v", ".avi": "MJPG"}
+FRAME_FILE_NAME = "frame_{index:04d}.png"
+# load_transform_settings の結果のうち、モーフィングで使用する設定
+MORPH_SETTING_KEYS = ("reg_lambda", "adaptive", "max_memory_mb", "workers", "lowrank_threshold", "lowrank_landmarks",
+                      "precision")
+
+class MorphMaps:
+    """
+    アフィン変換だけで位置合わせした状態から TPS 変換後の状態へのモーフィングに使うワープマップです。
+
+    TPS の写像 f(x) = a(x) + Σ wᵢ U(|x - pᵢ|) は重み wᵢ について線形なため、重みを t 倍した写像
+    a(x) + t Σ wᵢ U は、アフィン部分だけのマップ base と差分 delta から base + t * delta として得られます。
+    カーネルの評価は作成時の 1 回だけです。
+
+    Args:
+        base_x, base_y (np.ndarray): t = 0（アフィン部分のみ）の元画像座標（float32）
+        delta_x, delta_y (np.ndarray): t = 1 までの差分（float32）
+    """
+    def __init__(self, base_x: np.ndarray, base_y: np.ndarray, delta_x: np.ndarray, delta_y: np.ndarray):
+        self.base_x = base_x
+        self.base_y = base_y
+        self.delta_x = delta_x
+        self.delta_y = delta_y
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return self.base_x.shape[1], self.base_x.shape[0]
+
+    def rows(self, t: float, r0: int, r1: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        重みを t 倍した写像の、出力の行 [r0, r1) に対応する元画像座標を返します。
+        """
+        scale = np.float32(t)
+        map_x = self.delta_x[r0:r1] * scale
+        map_y = self.delta_y[r0:r1] * scale
+        map_x += self.base_x[r0:r1]
+        map_y += self.base_y[r0:r1]
+        return map_x, map_y
+
+    def bounds(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        全フレームのマップが参照しうる元画像座標の範囲を、(x の最小・最大, y の最小・最大) で返します。
+        各画素の座標は t = 0 と t = 1 の座標を結ぶ線分上にあるため、両端の範囲に収まります。
+        """
+        end_x = self.base_x + self.delta_x
+        end_y = self.base_y + self.delta_y
+        xs = np.array([min(self.base_x.min(), end_x.min()), max(self.base_x.max(), end_x.max())])
+        ys = np.array([min(self.base_y.min(), end_y.min()), max(self.base_y.max(), end_y.max())])
+        return xs, ys
+
+def compute_morph_maps(dest_points: List[Tuple[float, float]], src_points: List[Tuple[float, float]],
+                       output_size: Tuple[int, int], scale: float = 1.0, reg_lambda: float = 1e-3,
+                       adaptive: bool = False, max_memory_mb: Optional[float] = None, workers: int = 1,
+                       lowrank_threshold: Optional[int] = None, lowrank_landmarks: int = LOWRANK_LANDMARKS,
+                       precision: str = "float64", progress_callback: Optional[ProgressCallback] = None,
+                       cancel_event: Optional[threading.Event] = None) -> MorphMaps:
+    """
+    対応点から TPS を解き、apply_tps_warp でカーネルを 1 回だけ評価してモーフィング用のマップを作成します。
+
+    Args:
+        dest_points (List[Tuple[float, float]]): 変換先の対応点リスト
+        src_points (List[Tuple[float, float]]): 変換元の対応点リスト
+        output_size (Tuple[int, int]): 変換後の画像のサイズ (width, height)
+        scale (float, optional): フレームの縮小率。フレームのサイズは output_size × scale になります
+        その他の引数は WarpMapBuilder と同じです（評価は常に exact モード）
+
+    Returns:
+        MorphMaps: モーフィング用のマップ
+
+    Raises:
+        ValueError: 対応点が不足している場合、またはアフィン変換失敗時
+        TransformCancelled: 処理がキャンセルされた場合
+    """
+    width, height = output_size
+    frame_width = max(1, int(round(width * scale)))
+    frame_height = max(1, int(round(height * scale)))
+    builder = WarpMapBuilder(dest_points, src_points, output_size, reg_lambda=reg_lambda, adaptive=adaptive,
+                             max_memory_mb=max_memory_mb, workers=workers, lowrank_threshold=lowrank_threshold,
+                             lowrank_landmarks=lowrank_landmarks, precision=precision,
+                             progress_callback=progress_callback, cancel_event=cancel_event)
+    _check_cancelled(cancel_event)
+    if progress_callback is not None:
+        progress_callback("morph_maps", 0, 1)
+    # フレームの画素中心に対応する出力画像の座標（格子はブロードキャストで表す）
+    xs = (np.arange(frame_width, dtype=np.float64) + 0.5) * (width / frame_width) - 0.5
+    ys = (np.arange(frame_height, dtype=np.float64) + 0.5) * (height / frame_height) - 0.5
+    grid_x = np.broadcast_to(xs[None, :], (frame_height, frame_width))
+    grid_y = np.broadcast_to(ys[:, None], (frame_height, frame_width))
+    with tracing.span("morph_maps", size=[frame_width, frame_height]):
+        f_x, f_y = apply_tps_warp(builder.params_x, builder.params_y, builder.dest_points, grid_x, grid_y,
+                                  max_memory_mb=max_memory_mb, workers=workers, precision=precision)
+        a_x, a_y = builder.params_x[-3:], builder.params_y[-3:]
+        affine_x = a_x[0] + a_x[1] * grid_x + a_x[2] * grid_y
+        affine_y = a_y[0] + a_y[1] * grid_x + a_y[2] * grid_y
+        base_x, base_y = compose_affine_maps(affine_x, affine_y, builder.inverse_affine)
+        # 差分にはアフィン行列の線形部分だけが掛かる
+        f_x -= affine_x
+        f_y -= affine_y
+        delta_x, delta_y = compose_affine_maps(f_x, f_y, np.hstack([builder.inverse_affine[:, :2], np.zeros((2, 1))]))
+    if progress_callback is not None:
+        progress_callback("morph_maps", 1, 1)
+    return MorphMaps(base_x, base_y, delta_x, delta_y)
+
+class _FrameSeriesWriter:
+    """
+    フレームをディレクトリに連番の PNG として書き出します。
+    """
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.paths: List[str] = []
+
+    def write(self, frame: np.ndarray) -> None:
+        path = os.path.join(self.directory, FRAME_FILE_NAME.format(index=len(self.paths)))
+        ok, encoded = cv2.imencode(".png", frame)
+        if not ok:
+            raise IOError(f"Failed to encode {path}")
+        # 非 ASCII のパスにも書き出せるよう、エンコード済みのバイト列を書き込む
+        encoded.tofile(path)
+        self.paths.append(path)
+
+    def close(self) -> None:
+        pass
+
+class _VideoFrameWriter:
+    """
+    フレームを cv2.VideoWriter で動画として書き出します。
+    """
+    def __init__(self, path: str, fps: float, frame_size: Tuple[int, int]):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        codec = VIDEO_CODECS[os.path.splitext(path)[1].lower()]
+        self.writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*codec), fps, frame_size)
+        if not self.writer.isOpened():
+            raise IOError(f"Failed to open a video writer for {path}")
+
+    def write(self, frame: np.ndarray) -> None:
+        self.writer.write(frame)
+
+    def close(self) -> None:
+        self.writer.release()
+
+def export_morph_animation(dest_points: List[Tuple[float, float]], src_points: List[Tuple[float, float]],
+                           src_qimage: QImage, output_size: Tuple[int, int], path: str,
+                           frames: int = MORPH_FRAMES, fps: float = MORPH_FPS, scale: float = 1.0,
+                           progress_callback: Optional[ProgressCallback] = None,
+                           cancel_event: Optional[threading.Event] = None, **kwargs: Any) -> str:
+    """
+    実地図がアフィン変換で位置合わせした状態から TPS 変換後の状態へ変形していくフレームを書き出します。
+
+    カーネルの評価は compute_morph_maps の 1 回だけで、各フレームはマップの線形結合と再サンプリングだけで作成されます。
+    フレームは 1 枚ずつ作成してすぐにディスクへ書き出すため、メモリに保持するのはマップと 1 フレーム分だけです。
+
+    Args:
+        dest_points (List[Tuple[float, float]]): 変換先の対応点リスト
+        src_points (List[Tuple[float, float]]): 変換元の対応点リスト
+        src_qimage (QImage): 実地図画像
+        output_size (Tuple[int, int]): 変換後の画像のサイズ (width, height)
+        path (str): 出力先。拡張子が VIDEO_CODECS のいずれかなら動画、それ以外はフレームの PNG を置くディレクトリ
+        frames (int, optional): フレーム数（最初と最後のフレームを含む）
+        fps (float, optional): 動画のフレームレート
+        scale (float, optional): フレームの縮小率
+        progress_callback (Optional[ProgressCallback], optional): 進捗通知 (ステージ名, 完了数, 総数)
+        cancel_event (Optional[threading.Event], optional): キャンセル要求を伝えるイベント
+        **kwargs: 変換設定（load_transform_settings の結果）。MORPH_SETTING_KEYS 以外は使用しません
+
+    Returns:
+        str: 出力先のパス
+
+    Raises:
+        ValueError: 対応点が不足している場合、フレーム数が 1 未満の場合、またはアフィン変換失敗時
+        IOError: 書き出しに失敗した場合
+        TransformCancelled: 処理がキャンセルされた場合
+    """
+    if frames < 1:
+        raise ValueError("At least one frame is required")
+    options = {key: kwargs[key] for key in MORPH_SETTING_KEYS if key in kwargs}
+    workers = options.get("workers", 1)
+    with tracing.trace("export_morph_animation", points=len(dest_points), output_size=list(output_size),
+                       frames=frames, scale=scale, workers=workers):
+        maps = compute_morph_maps(dest_points, src_points, output_size, scale=scale,
+                                  progress_callback=progress_callback, cancel_event=cancel_event, **options)
+        frame_width, frame_height = maps.size
+        reader = QImageSourceReader(src_qimage)
+        bounds_x, bounds_y = maps.bounds()
+        x0 = max(int(np.floor(bounds_x[0])) - 2, 0)
+        y0 = max(int(np.floor(bounds_y[0])) - 2, 0)
+        x1 = min(int(np.ceil(bounds_x[1])) + 3, reader.width)
+        y1 = min(int(np.ceil(bounds_y[1])) + 3, reader.height)
+        # 全フレームが参照する範囲を一度だけ読み出す
+        source = _CroppedSource(reader, (x0, y0, x1, y1) if x0 < x1 and y0 < y1 else None)
+        if os.path.splitext(path)[1].lower() in VIDEO_CODECS:
+            writer: Any = _VideoFrameWriter(path, fps, (frame_width, frame_height))
+        else:
+            writer = _FrameSeriesWriter(path)
+        frame = np.empty((frame_height, frame_width, reader.channels), dtype=np.uint8)
+        tiles = _plan_row_tiles(frame_height, 0, frame_width, None, workers)
+        if progress_callback is not None:
+            progress_callback("frames", 0, frames)
+        try:
+            for index in range(frames):
+                _check_cancelled(cancel_event)
+                t = index / (frames - 1) if frames > 1 else 1.0
+
+                def remap_tile(r0: int, r1: int) -> None:
+                    map_x, map_y = maps.rows(t, r0, r1)
+                    source.remap(map_x, map_y, frame[r0:r1])
+
+                with tracing.span("frame", index=index, t=t):
+                    _run_row_tiles(remap_tile, tiles, workers)
+                    writer.write(cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
+                if progress_callback is not None:
+                    progress_callback("frames", index + 1, frames)
+        finally:
+            writer.close()
+            reader.close()
+    transform_logger.info("Morph animation exported: %s (%d frames, %dx%d)", path, frames, frame_width, frame_height)
+    return path
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="kartenwarp", description="KartenWarp morph animation export")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    morph = subparsers.add_parser("morph", help="Export frames morphing the real map from affine to TPS alignment")
+    morph.add_argument("project", help="Project file (.kw)")
+    morph.add_argument("--out", "-o", required=True,
+                       help=f"Video file ({', '.join(sorted(VIDEO_CODECS))}) or a directory for PNG frames")
+    morph.add_argument("--frames", "-n", type=int, default=MORPH_FRAMES, help="Number of frames, including both ends")
+    morph.add_argument("--fps", type=float, default=MORPH_FPS, help="Frame rate of the video")
+    morph.add_argument("--scale", type=float, default=1.0, help="Scale of the frames relative to the game image")
+    morph.add_argument("--threads", "-t", type=int, default=None, help="Threads (default: tps/workers setting)")
+    return parser
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    コマンドラインのエントリーポイントです。書き出しに成功した場合は 0 を返します。
+
+    例: python src/main.py morph a.kw --out morph.mp4 --frames 60 --scale 0.5
+    """
+    from project import Project
+    from core import load_transform_settings
+    from common import _
+    args = build_arg_parser().parse_args(argv)
+    started = time.perf_counter()
+    try:
+        project = Project.load(args.project, headless=True)
+        if not project.has_valid_real_points():
+            raise ValueError(_("error_insufficient_points"))
+        if project.game_qimage.isNull() or project.real_qimage.isNull():
+            raise ValueError(_("game_image_error_insufficient_points"))
+        settings = load_transform_settings(project)
+        if args.threads is not None:
+            settings["workers"] = max(1, args.threads)
+        output_size = (project.game_qimage.width(), project.game_qimage.height())
+        export_morph_animation(project.game_points, project.real_points, project.real_qimage, output_size, args.out,
+                               frames=args.frames, fps=args.fps, scale=args.scale, **settings)
+    except Exception as e:
+        transform_logger.exception("Morph animation export failed: %s", args.project)
+        print(f"Failed: {e}", file=sys.stderr)
+        return 1
+    print(f"{args.frames} frames written to {args.out} in {time.perf_counter() - started:.2f}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
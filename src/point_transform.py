@@ -0,0 +1,488 @@
+# src/point_transform.py
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import threading
+import numpy as np
+import cv2
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+from logger import transform_logger
+from common import _
+import tracing
+from tps_solver import LOWRANK_LANDMARKS
+from core import (ProgressCallback, _check_cancelled, _estimate_affine, _run_row_tiles, _tps_rows_per_tile,
+                  compute_tps_parameters)
+
+DIRECTIONS = ("forward", "inverse")
+# 逆変換の初期値を補間する粗い表の一辺の節点数と、表が対応点の範囲の外側に広がる割合
+INVERSE_LUT_SIZE = 65
+INVERSE_LUT_MARGIN = 0.25
+NEWTON_TOLERANCE = 1e-6    # 逆変換の収束判定（変換先の画素）
+NEWTON_MAX_ITERATIONS = 20
+# max_memory_mb が指定されない場合に、一時配列 1 つあたりに収める要素数（中心の数 × 点数）
+DEFAULT_CHUNK_ELEMENTS = 2 ** 16
+# ファイルを変換する際に一度に読み込む行数（CSV）または地物の数（改行区切りの GeoJSON）
+STREAM_BATCH = 100000
+CSV_EXTENSIONS = (".csv", ".tsv")
+GEOJSON_EXTENSIONS = (".geojson", ".json")
+GEOJSON_SEQ_EXTENSIONS = (".geojsonl", ".geojsons", ".ndjson", ".jsonl")
+
+class PointTransformer:
+    """
+    対応点から求めた変換で、任意の点列（ベクターデータの頂点など）を一括して変換します。
+
+    WarpMapBuilder と同じく、変換元の対応点をアフィン変換で変換先の座標系に揃えてから compute_tps_parameters で
+    TPS を当てはめます。ワープマップと同じ向き（変換先＝ゲーム画像の座標 → 変換元＝実地図の座標）を順方向とし、
+    TPS をそのまま評価します。逆方向（実地図 → ゲーム画像）は、粗い表から補間した初期値からのニュートン法で解きます。
+    点列はメモリ上限に収まる大きさに分割し、ベクトル化して評価します。
+
+    Args:
+        dest_points (List[Tuple[float, float]]): 変換先（ゲーム画像）の対応点リスト
+        src_points (List[Tuple[float, float]]): 変換元（実地図）の対応点リスト
+        reg_lambda (float, optional): TPS変換の正則化パラメータ
+        adaptive (bool, optional): Trueの場合、正則化パラメータを自動調整
+        lowrank_threshold (Optional[int], optional): TPS を低ランク近似で解く点数の閾値（None は常に厳密）
+        lowrank_landmarks (int, optional): 低ランク近似のランドマークの数
+        max_memory_mb (Optional[float], optional): 評価時のメモリ上限（MB）。全ワーカーで共有します
+        workers (int, optional): 評価に使用するスレッド数
+        tolerance (float, optional): 逆変換の収束判定（変換先の画素）
+        max_iterations (int, optional): 逆変換のニュートン法の最大反復回数
+        **kwargs: その他の変換設定（使用しません）
+
+    Raises:
+        ValueError: 対応点が不足している場合、またはアフィン変換失敗時
+    """
+    def __init__(self, dest_points: List[Tuple[float, float]], src_points: List[Tuple[float, float]],
+                 reg_lambda: float = 1e-3, adaptive: bool = False, lowrank_threshold: Optional[int] = None,
+                 lowrank_landmarks: int = LOWRANK_LANDMARKS, max_memory_mb: Optional[float] = None,
+                 workers: int = 1, tolerance: float = NEWTON_TOLERANCE,
+                 max_iterations: int = NEWTON_MAX_ITERATIONS, **kwargs: Any):
+        src_points_np = np.array(src_points, dtype=np.float64).reshape(-1, 2)
+        dest_points_np = np.array(dest_points, dtype=np.float64).reshape(-1, 2)
+        if src_points_np.shape[0] < 3 or src_points_np.shape[0] != dest_points_np.shape[0]:
+            transform_logger.error(_("insufficient_correspondence_points"))
+            raise ValueError(_("error_minimum_points_required"))
+        self.workers = max(1, workers)
+        self.tolerance = tolerance
+        self.max_iterations = max_iterations
+        self.affine_matrix = _estimate_affine(src_points_np, dest_points_np)
+        self.inverse_affine = cv2.invertAffineTransform(self.affine_matrix)
+        aligned_src_points = cv2.transform(src_points_np[None], self.affine_matrix)[0]
+        params_x, params_y = compute_tps_parameters(
+            dest_points_np, aligned_src_points, reg_lambda=reg_lambda, adaptive=adaptive,
+            lowrank_threshold=lowrank_threshold, lowrank_landmarks=lowrank_landmarks
+        )
+        n = dest_points_np.shape[0]
+        # 低ランク近似の解ではランドマーク以外の重みが 0 のため、寄与のない点は評価しない
+        active = np.nonzero((params_x[:n] != 0) | (params_y[:n] != 0))[0]
+        self.centers = dest_points_np[active]
+        self.weights = np.stack([params_x[:n][active], params_y[:n][active]], axis=1)
+        self.affine_x = params_x[-3:]
+        self.affine_y = params_y[-3:]
+        budget = max_memory_mb / self.workers if max_memory_mb and max_memory_mb > 0 else None
+        # dx, dy, r², log r², U と微分の一時配列（中心の数 × 点数）を float64 で見積もる
+        self.chunk_points = (_tps_rows_per_tile(6 * max(len(active), 1), 1, budget)
+                             or max(1, DEFAULT_CHUNK_ELEMENTS // max(len(active), 1)))
+        self._lut: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]] = None
+        self._lut_bounds = (aligned_src_points.min(axis=0), aligned_src_points.max(axis=0))
+        self._lut_lock = threading.Lock()
+
+    def _kernel(self, xs: np.ndarray, ys: np.ndarray) -> Tuple[np.ndarray, ...]:
+        """
+        揃えた座標系での TPS の値 (f_x, f_y) と、ヤコビ行列の計算に使う中間値 (dx, dy, log r²) を返します。
+        """
+        dx = xs[:, None] - self.centers[None, :, 0]
+        dy = ys[:, None] - self.centers[None, :, 1]
+        r2 = dx * dx + dy * dy
+        # r = 0 では U = r² log r² と微分 2 (log r² + 1) (dx, dy) がいずれも 0 になる
+        log_r2 = np.log(np.maximum(r2, np.finfo(np.float64).tiny))
+        kernel = (r2 * log_r2) @ self.weights
+        f_x = self.affine_x[0] + self.affine_x[1] * xs + self.affine_x[2] * ys + kernel[:, 0]
+        f_y = self.affine_y[0] + self.affine_y[1] * xs + self.affine_y[2] * ys + kernel[:, 1]
+        return f_x, f_y, dx, dy, log_r2
+
+    def _jacobian(self, dx: np.ndarray, dy: np.ndarray, log_r2: np.ndarray) -> Tuple[np.ndarray, ...]:
+        """
+        _kernel の中間値から、ヤコビ行列の成分 (∂f_x/∂x, ∂f_x/∂y, ∂f_y/∂x, ∂f_y/∂y) を返します。
+        """
+        factor = 2.0 * (log_r2 + 1.0)
+        grad_x = (dx * factor) @ self.weights
+        grad_y = (dy * factor) @ self.weights
+        return (self.affine_x[1] + grad_x[:, 0], self.affine_x[2] + grad_y[:, 0],
+                self.affine_y[1] + grad_x[:, 1], self.affine_y[2] + grad_y[:, 1])
+
+    def _run_chunks(self, count: int, func: Callable[[int, int], None], workers: Optional[int] = None) -> None:
+        chunks = [(start, min(start + self.chunk_points, count)) for start in range(0, count, self.chunk_points)]
+        _run_row_tiles(func, chunks, self.workers if workers is None else workers)
+
+    def forward(self, points: Any) -> np.ndarray:
+        """
+        変換先（ゲーム画像）の座標を変換元（実地図）の座標に変換します。
+
+        Args:
+            points (Any): 形状 (M, 2) に変換できる点列
+
+        Returns:
+            np.ndarray: 形状 (M, 2) の変換後の座標
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        result = np.empty_like(points)
+
+        def forward_chunk(start: int, stop: int) -> None:
+            f_x, f_y = self._kernel(points[start:stop, 0], points[start:stop, 1])[:2]
+            result[start:stop] = cv2.transform(np.stack([f_x, f_y], axis=1)[None], self.inverse_affine)[0]
+
+        with tracing.span("forward", points=points.shape[0]):
+            self._run_chunks(points.shape[0], forward_chunk)
+        return result
+
+    def inverse(self, points: Any) -> np.ndarray:
+        """
+        変換元（実地図）の座標を変換先（ゲーム画像）の座標に変換します。
+        収束しなかった点（変換が折り返す領域など）は NaN になります。
+
+        Args:
+            points (Any): 形状 (M, 2) に変換できる点列
+
+        Returns:
+            np.ndarray: 形状 (M, 2) の変換後の座標
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        targets = cv2.transform(points[None], self.affine_matrix)[0] if points.size else points.copy()
+        result = np.empty_like(points)
+        lut = self._inverse_lut()
+
+        def inverse_chunk(start: int, stop: int) -> None:
+            chunk = targets[start:stop]
+            result[start:stop] = self._newton(chunk, _interpolate_lut(lut, chunk))
+
+        with tracing.span("inverse", points=points.shape[0]):
+            self._run_chunks(points.shape[0], inverse_chunk)
+        failed = int(np.isnan(result[:, 0]).sum())
+        if failed:
+            transform_logger.warning("Inverse transform did not converge for %d of %d points", failed, points.shape[0])
+        return result
+
+    def transform(self, points: Any, direction: str = "forward") -> np.ndarray:
+        if direction not in DIRECTIONS:
+            raise ValueError(f"Unknown direction: {direction}")
+        return self.forward(points) if direction == "forward" else self.inverse(points)
+
+    def _inverse_lut(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        揃えた座標系で対応点の範囲を覆う格子の各節点について逆変換を解いた表
+        (節点の x 座標, 節点の y 座標, 逆変換の x, 逆変換の y) を返します。初回の呼び出し時に作成します。
+        """
+        with self._lut_lock:
+            if self._lut is None:
+                low, high = self._lut_bounds
+                margin = np.maximum((high - low) * INVERSE_LUT_MARGIN, 1.0)
+                xs = np.linspace(low[0] - margin[0], high[0] + margin[0], INVERSE_LUT_SIZE)
+                ys = np.linspace(low[1] - margin[1], high[1] + margin[1], INVERSE_LUT_SIZE)
+                grid = np.stack(np.meshgrid(xs, ys), axis=-1).reshape(-1, 2)
+                with tracing.span("inverse_lut", nodes=grid.shape[0]):
+                    # アフィン変換で揃えた後の TPS は恒等写像に近いため、節点そのものを初期値とする
+                    solved = self._newton(grid, grid.copy())
+                # 収束しなかった節点は恒等写像で埋める
+                missing = np.isnan(solved[:, 0])
+                solved[missing] = grid[missing]
+                shape = (INVERSE_LUT_SIZE, INVERSE_LUT_SIZE)
+                self._lut = (xs, ys, solved[:, 0].reshape(shape), solved[:, 1].reshape(shape))
+            return self._lut
+
+    def _newton(self, targets: np.ndarray, seeds: np.ndarray) -> np.ndarray:
+        """
+        揃えた座標系で f(g) = targets となる g をニュートン法で求めます。残差が増えた点は直前の更新を半分に戻します。
+        """
+        count = targets.shape[0]
+        result = np.full((count, 2), np.nan)
+        g = seeds.copy()
+        g_prev = g.copy()
+        step = np.zeros((count, 2))
+        err_prev = np.full(count, np.inf)
+        index = np.arange(count)
+        for _iteration in range(self.max_iterations):
+            if index.size == 0:
+                break
+            f_x, f_y, dx, dy, log_r2 = self._kernel(g[index, 0], g[index, 1])
+            r_x = f_x - targets[index, 0]
+            r_y = f_y - targets[index, 1]
+            err = np.hypot(r_x, r_y)
+            converged = err <= self.tolerance
+            result[index[converged]] = g[index[converged]]
+            worse = ~converged & (err > err_prev[index])
+            backtrack = index[worse]
+            step[backtrack] *= 0.5
+            g[backtrack] = g_prev[backtrack] - step[backtrack]
+            # ヤコビ行列は更新する点についてだけ求める
+            update = ~converged & ~worse
+            j_xx, j_xy, j_yx, j_yy = self._jacobian(dx[update], dy[update], log_r2[update])
+            det = j_xx * j_yy - j_xy * j_yx
+            with np.errstate(divide="ignore", invalid="ignore"):
+                s_x = (j_yy * r_x[update] - j_xy * r_y[update]) / det
+                s_y = (j_xx * r_y[update] - j_yx * r_x[update]) / det
+            forward = index[update]
+            g_prev[forward] = g[forward]
+            err_prev[forward] = err[update]
+            step[forward, 0] = s_x
+            step[forward, 1] = s_y
+            g[forward] -= step[forward]
+            # ヤコビ行列が特異な点は打ち切る
+            index = index[~converged & np.isfinite(g[index]).all(axis=1)]
+        return result
+
+def _interpolate_lut(lut: Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray], points: np.ndarray) -> np.ndarray:
+    """
+    逆変換の表を双線形補間して初期値を返します。表の外側の点は、最も近い縁の値に表の外への差分を加えます。
+    """
+    xs, ys, inverse_x, inverse_y = lut
+    px = np.clip(points[:, 0], xs[0], xs[-1])
+    py = np.clip(points[:, 1], ys[0], ys[-1])
+    fx = (px - xs[0]) / (xs[1] - xs[0])
+    fy = (py - ys[0]) / (ys[1] - ys[0])
+    ix = np.clip(fx.astype(np.int64), 0, xs.size - 2)
+    iy = np.clip(fy.astype(np.int64), 0, ys.size - 2)
+    tx = fx - ix
+    ty = fy - iy
+    seeds = np.empty_like(points)
+    for k, table in enumerate((inverse_x, inverse_y)):
+        top = table[iy, ix] * (1 - tx) + table[iy, ix + 1] * tx
+        bottom = table[iy + 1, ix] * (1 - tx) + table[iy + 1, ix + 1] * tx
+        seeds[:, k] = top * (1 - ty) + bottom * ty
+    seeds[:, 0] += points[:, 0] - px
+    seeds[:, 1] += points[:, 1] - py
+    return seeds
+
+def transform_points(dest_points: List[Tuple[float, float]], src_points: List[Tuple[float, float]], points: Any,
+                     direction: str = "forward", **kwargs: Any) -> np.ndarray:
+    """
+    対応点から求めた変換で点列を変換します。同じ対応点で繰り返し変換する場合は PointTransformer を使用してください。
+
+    Args:
+        dest_points (List[Tuple[float, float]]): 変換先（ゲーム画像）の対応点リスト
+        src_points (List[Tuple[float, float]]): 変換元（実地図）の対応点リスト
+        points (Any): 形状 (M, 2) に変換できる点列
+        direction (str, optional): "forward"（ゲーム画像 → 実地図）または "inverse"（実地図 → ゲーム画像）
+        **kwargs: PointTransformer に渡す設定（reg_lambda, adaptive, workers など）
+
+    Returns:
+        np.ndarray: 形状 (M, 2) の変換後の座標。逆変換が収束しなかった点は NaN
+    """
+    with tracing.trace("transform_points", points=len(dest_points), direction=direction):
+        return PointTransformer(dest_points, src_points, **kwargs).transform(points, direction)
+
+def _format_coordinate(value: float) -> str:
+    return repr(float(value)) if np.isfinite(value) else ""
+
+def _batches(iterator: Iterator[Any], size: int) -> Iterator[List[Any]]:
+    batch: List[Any] = []
+    for item in iterator:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def transform_csv(input_path: str, output_path: str, transformer: PointTransformer, direction: str = "forward",
+                  columns: Tuple[str, str] = ("x", "y"), batch_size: int = STREAM_BATCH,
+                  progress_callback: Optional[ProgressCallback] = None,
+                  cancel_event: Optional[threading.Event] = None) -> int:
+    """
+    CSV（.tsv はタブ区切り）の座標列を変換して書き出します。batch_size 行ずつ読み込み、変換してすぐに書き出します。
+    座標が空の行はそのまま書き出し、逆変換が収束しなかった点の座標は空にします。
+
+    Args:
+        columns (Tuple[str, str], optional): x 座標と y 座標の列名（1 行目の見出し）
+
+    Returns:
+        int: 変換した点の数
+
+    Raises:
+        ValueError: 座標の列が見つからない場合、または数値でない座標がある場合
+    """
+    delimiter = "\t" if input_path.lower().endswith(".tsv") else ","
+    count = 0
+    with open(input_path, newline="", encoding="utf-8-sig") as src, \
+            open(output_path, "w", newline="", encoding="utf-8") as dst:
+        reader = csv.reader(src, delimiter=delimiter)
+        writer = csv.writer(dst, delimiter=delimiter)
+        header = next(reader, None)
+        if header is None:
+            return 0
+        missing = [name for name in columns if name not in header]
+        if missing:
+            raise ValueError(f"Missing coordinate columns in {input_path}: {', '.join(missing)}")
+        x_index, y_index = header.index(columns[0]), header.index(columns[1])
+        writer.writerow(header)
+        for batch in _batches(reader, batch_size):
+            _check_cancelled(cancel_event)
+            rows = [i for i, row in enumerate(batch)
+                    if max(x_index, y_index) < len(row) and row[x_index].strip() and row[y_index].strip()]
+            try:
+                points = np.array([(float(batch[i][x_index]), float(batch[i][y_index])) for i in rows],
+                                  dtype=np.float64).reshape(-1, 2)
+            except ValueError as e:
+                raise ValueError(f"Invalid coordinate in {input_path} near row {count + 2}: {e}")
+            transformed = transformer.transform(points, direction)
+            for i, (x, y) in zip(rows, transformed):
+                batch[i][x_index] = _format_coordinate(x)
+                batch[i][y_index] = _format_coordinate(y)
+            writer.writerows(batch)
+            count += len(rows)
+            if progress_callback is not None:
+                progress_callback("points", count, 0)
+    return count
+
+def _collect_coordinates(geometry: Any, out: List[list]) -> None:
+    """
+    GeoJSON のジオメトリ（Feature や FeatureCollection を含む）から、座標の配列 [x, y, ...] を out に集めます。
+    """
+    if not isinstance(geometry, dict):
+        return
+    kind = geometry.get("type")
+    if kind == "FeatureCollection":
+        for feature in geometry.get("features", []):
+            _collect_coordinates(feature, out)
+    elif kind == "Feature":
+        _collect_coordinates(geometry.get("geometry"), out)
+    elif kind == "GeometryCollection":
+        for member in geometry.get("geometries", []):
+            _collect_coordinates(member, out)
+    elif "coordinates" in geometry:
+        stack = [geometry["coordinates"]]
+        while stack:
+            item = stack.pop()
+            if item and isinstance(item[0], (int, float)):
+                out.append(item)
+            else:
+                stack.extend(item)
+
+def _transform_geojson_objects(objects: List[Any], transformer: PointTransformer, direction: str) -> int:
+    """
+    GeoJSON オブジェクトの座標をまとめて変換し、その場で書き換えます。z 座標などの 3 番目以降の値は変えません。
+    """
+    positions: List[list] = []
+    for obj in objects:
+        _collect_coordinates(obj, positions)
+    if not positions:
+        return 0
+    points = np.array([position[:2] for position in positions], dtype=np.float64)
+    transformed = transformer.transform(points, direction)
+    for position, (x, y) in zip(positions, transformed.tolist()):
+        # JSON は NaN を表せないため、収束しなかった点は null にする
+        position[0] = x if np.isfinite(x) else None
+        position[1] = y if np.isfinite(y) else None
+    return len(positions)
+
+def transform_geojson(input_path: str, output_path: str, transformer: PointTransformer, direction: str = "forward",
+                      batch_size: int = STREAM_BATCH, progress_callback: Optional[ProgressCallback] = None,
+                      cancel_event: Optional[threading.Event] = None) -> int:
+    """
+    GeoJSON の全ジオメトリの座標を変換して書き出します。
+
+    改行区切りの GeoJSON（GEOJSON_SEQ_EXTENSIONS。1 行に 1 つの地物、先頭の RS 文字も可）は batch_size 行ずつ
+    読み込んで変換し、すぐに書き出します。通常の GeoJSON は 1 つの JSON 文書のため全体を読み込み、
+    全頂点をまとめて変換します。
+
+    Returns:
+        int: 変換した点の数
+    """
+    count = 0
+    if input_path.lower().endswith(GEOJSON_SEQ_EXTENSIONS):
+        with open(input_path, encoding="utf-8-sig") as src, open(output_path, "w", encoding="utf-8") as dst:
+            lines = (line.strip().lstrip("\x1e") for line in src)
+            for batch in _batches((line for line in lines if line), batch_size):
+                _check_cancelled(cancel_event)
+                objects = [json.loads(line) for line in batch]
+                count += _transform_geojson_objects(objects, transformer, direction)
+                for obj in objects:
+                    dst.write(json.dumps(obj, ensure_ascii=False, separators=(",", ":")) + "\n")
+                if progress_callback is not None:
+                    progress_callback("points", count, 0)
+        return count
+    with open(input_path, encoding="utf-8-sig") as src:
+        document = json.load(src)
+    _check_cancelled(cancel_event)
+    count = _transform_geojson_objects([document], transformer, direction)
+    with open(output_path, "w", encoding="utf-8") as dst:
+        json.dump(document, dst, ensure_ascii=False, separators=(",", ":"))
+    if progress_callback is not None:
+        progress_callback("points", count, count)
+    return count
+
+def transform_file(input_path: str, output_path: str, transformer: PointTransformer, direction: str = "forward",
+                   **options: Any) -> int:
+    """
+    拡張子に応じて transform_csv または transform_geojson で点列のファイルを変換します。
+
+    Returns:
+        int: 変換した点の数
+
+    Raises:
+        ValueError: 対応していない拡張子の場合
+    """
+    ext = os.path.splitext(input_path)[1].lower()
+    directory = os.path.dirname(os.path.abspath(output_path))
+    os.makedirs(directory, exist_ok=True)
+    with tracing.trace("transform_file", path=input_path, direction=direction):
+        if ext in CSV_EXTENSIONS:
+            return transform_csv(input_path, output_path, transformer, direction, **options)
+        options.pop("columns", None)
+        if ext in GEOJSON_EXTENSIONS or ext in GEOJSON_SEQ_EXTENSIONS:
+            return transform_geojson(input_path, output_path, transformer, direction, **options)
+    raise ValueError(f"Unsupported point file: {input_path}")
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="kartenwarp", description="KartenWarp vector coordinate transform")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    points = subparsers.add_parser("points", help="Transform vertices of CSV or GeoJSON files with a project's points")
+    points.add_argument("project", help="Project file (.kw)")
+    points.add_argument("inputs", nargs="+", help="CSV/TSV, GeoJSON or newline-delimited GeoJSON files")
+    points.add_argument("--out", "-o", required=True,
+                        help="Output file (single input) or directory (several inputs)")
+    points.add_argument("--direction", "-d", choices=DIRECTIONS, default="inverse",
+                        help="inverse: real map pixels to game pixels (default); forward: game pixels to real map pixels")
+    points.add_argument("--columns", nargs=2, default=["x", "y"], metavar=("X", "Y"),
+                        help="Coordinate column names of CSV files")
+    points.add_argument("--threads", "-t", type=int, default=None, help="Threads (default: tps/workers setting)")
+    return parser
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    コマンドラインのエントリーポイントです。全ファイルの変換に成功した場合は 0 を返します。
+
+    例: python src/main.py points a.kw roads.geojson --out roads_game.geojson
+    """
+    from project import Project
+    from core import load_transform_settings
+    args = build_arg_parser().parse_args(argv)
+    project = Project.load(args.project, headless=True)
+    if not project.has_valid_real_points():
+        print(_("error_insufficient_points"), file=sys.stderr)
+        return 1
+    settings = load_transform_settings(project)
+    if args.threads is not None:
+        settings["workers"] = max(1, args.threads)
+    transformer = PointTransformer(project.game_points, project.real_points, **settings)
+    failed = 0
+    for input_path in args.inputs:
+        output_path = args.out
+        if len(args.inputs) > 1 or os.path.isdir(args.out):
+            output_path = os.path.join(args.out, os.path.basename(input_path))
+        started = time.perf_counter()
+        try:
+            count = transform_file(input_path, output_path, transformer, args.direction, columns=tuple(args.columns))
+        except Exception as e:
+            transform_logger.exception("Point transform failed: %s", input_path)
+            print(f"[error] {input_path}: {e}", file=sys.stderr)
+            failed += 1
+            continue
+        print(f"[   ok] {time.perf_counter() - started:8.2f}s  {input_path} -> {output_path} ({count} points)")
+    return 0 if failed == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -46,11 +46,12 @@ def confirm_migration(old_version: int, target_version: int) -> bool:
     )
     return reply == QMessageBox.Yes
 
-def upgrade_project_data(data: dict, from_version: int) -> dict:
+def upgrade_project_data(data: dict, from_version: int, interactive: bool = True) -> dict:
     logger.info("アップグレード処理開始：バージョン %d → %d", from_version, from_version + 1)
     upgraded_data = data.copy()
     if from_version == 1:
-        if not confirm_migration(1, 2):
+        # 非対話モード（ヘッドレス実行）では確認ダイアログを出さずにメモリ上で変換する
+        if interactive and not confirm_migration(1, 2):
             # ユーザーに拒否された場合のエラーメッセージは翻訳キーで管理
             raise IOError(_("project_migration_rejected"))
         game_path = data.get("game_image_path", "")
@@ -78,20 +79,48 @@ def upgrade_project_data(data: dict, from_version: int) -> dict:
         upgraded_data["version"] = from_version + 1
     return upgraded_data
 
-def migrate_project_data(data: dict) -> dict:
+def migrate_project_data(data: dict, interactive: bool = True) -> dict:
     file_version = data.get("version", 1)
     migrated = False
     if file_version < CURRENT_PROJECT_VERSION:
         migrated = True
     while file_version < CURRENT_PROJECT_VERSION:
-        data = upgrade_project_data(data, file_version)
+        data = upgrade_project_data(data, file_version, interactive)
         file_version = data.get("version", file_version + 1)
     if migrated:
         data["_migrated"] = True
     return data
 
+class SourceSheet:
+    """
+    複数の実地図（シート）を 1 枚のゲーム画像に合成する際の、保存済みのシートです。
+    シートごとに、実地図画像とゲーム画像・実地図の対応点を持ちます。
+    """
+    def __init__(self, name="", image_data="", game_points=None, real_points=None):
+        self.name = name
+        self.image_data = image_data
+        self.game_points = game_points if game_points is not None else []
+        self.real_points = real_points if real_points is not None else []
+        self.qimage = QImage()
+
+    def load_image(self):
+        self.qimage = base64_to_qimage(self.image_data)
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "image_data": self.image_data,
+            "game_points": self.game_points,
+            "real_points": self.real_points,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(name=data.get("name", ""), image_data=data.get("image_data", ""),
+                   game_points=data.get("game_points", []), real_points=data.get("real_points", []))
+
 class Project:
-    def __init__(self, game_image_data=None, real_image_data=None):
+    def __init__(self, game_image_data=None, real_image_data=None, headless=False):
         self.name = _("unsaved_project")
         self.file_path = None
         self.game_image_data = game_image_data
@@ -99,21 +128,29 @@ class Project:
         self.game_points = []
         self.real_points = []
         self.settings = {}
+        # 合成用に保存したシート（現在の実地図と対応点は含まない）
+        self.sheets = []
         self.game_qimage = QImage()
         self.real_qimage = QImage()
-        self.game_pixmap = QPixmap()
-        self.real_pixmap = QPixmap()
+        # ヘッドレス実行では QPixmap を作成できないため None のままにする
+        self.game_pixmap = None if headless else QPixmap()
+        self.real_pixmap = None if headless else QPixmap()
         self.modified = True
 
-    def load_embedded_images(self):
+    def load_embedded_images(self, create_pixmaps=True):
+        # QPixmap は QApplication がないと作成できないため、ヘッドレス実行では QImage のみを読み込む
         if self.game_image_data:
             self.game_qimage = base64_to_qimage(self.game_image_data)
-            from common import qimage_to_qpixmap
-            self.game_pixmap = qimage_to_qpixmap(self.game_qimage)
+            if create_pixmaps:
+                from common import qimage_to_qpixmap
+                self.game_pixmap = qimage_to_qpixmap(self.game_qimage)
         if self.real_image_data:
             self.real_qimage = base64_to_qimage(self.real_image_data)
-            from common import qimage_to_qpixmap
-            self.real_pixmap = qimage_to_qpixmap(self.real_qimage)
+            if create_pixmaps:
+                from common import qimage_to_qpixmap
+                self.real_pixmap = qimage_to_qpixmap(self.real_qimage)
+        for sheet in self.sheets:
+            sheet.load_image()
         self.modified = False
 
     def to_dict(self):
@@ -124,6 +161,7 @@ class Project:
             "game_points": self.game_points,
             "real_points": self.real_points,
             "settings": self.settings,
+            "sheets": [sheet.to_dict() for sheet in self.sheets],
         }
         return data
 
@@ -142,20 +180,22 @@ class Project:
             raise IOError(_("project_save_failed").format(error=str(e)))
 
     @classmethod
-    def from_dict(cls, data):
+    def from_dict(cls, data, headless=False):
         try:
-            data = migrate_project_data(data)
+            data = migrate_project_data(data, interactive=not headless)
         except Exception as e:
             logger.exception("プロジェクトデータのマイグレーションに失敗しました")
             raise IOError(_("project_migration_failed").format(error=str(e)))
         project = cls(
             game_image_data=data.get("game_image_data", ""),
-            real_image_data=data.get("real_image_data", "")
+            real_image_data=data.get("real_image_data", ""),
+            headless=headless
         )
         project.game_points = data.get("game_points", [])
         project.real_points = data.get("real_points", [])
         project.settings = data.get("settings", {})
-        project.load_embedded_images()
+        project.sheets = [SourceSheet.from_dict(sheet) for sheet in data.get("sheets", [])]
+        project.load_embedded_images(create_pixmaps=not headless)
         # マイグレーションが行われた場合、未保存状態にし、フラグも保持
         if data.get("_migrated"):
             project.modified = True
@@ -165,10 +205,10 @@ class Project:
         return project
 
     @classmethod
-    def load(cls, file_path):
+    def load(cls, file_path, headless=False):
         try:
             data = load_json(file_path)
-            project = cls.from_dict(data)
+            project = cls.from_dict(data, headless=headless)
             logger.info("プロジェクトを読み込みました: %s", file_path)
             project.file_path = file_path
             project.name = os.path.splitext(os.path.basename(file_path))[0]
@@ -236,3 +276,48 @@ class Project:
                 self.modified = True
         else:
             logger.debug("実地図画像の特徴点に変更はありません")
+
+    def has_valid_real_points(self):
+        return len(self.game_points) == len(self.real_points) >= 3
+
+    def store_real_as_sheet(self, name=None):
+        """
+        現在の実地図画像と対応点をシートとして保存し、次のシートの入力のために実地図画像と対応点を空にします。
+        ゲーム画像はそのまま残ります。
+        
+        Returns:
+            SourceSheet: 保存したシート
+        """
+        if self.real_qimage.isNull() or not self.has_valid_real_points():
+            raise ValueError(_("error_insufficient_points"))
+        sheet = SourceSheet(
+            name=name or _("mosaic_sheet_name").format(index=len(self.sheets) + 1),
+            image_data=self.real_image_data or image_to_base64(self.real_qimage),
+            game_points=[list(p) for p in self.game_points],
+            real_points=[list(p) for p in self.real_points],
+        )
+        sheet.qimage = self.real_qimage
+        self.sheets.append(sheet)
+        self.real_image_data = ""
+        self.real_qimage = QImage()
+        self.real_pixmap = None if self.real_pixmap is None else QPixmap()
+        self.game_points = []
+        self.real_points = []
+        logger.debug("実地図をシートとして保存しました: %s", sheet.name)
+        self.modified = True
+        return sheet
+
+    def clear_sheets(self):
+        self.sheets = []
+        logger.debug("保存済みのシートをすべて削除しました")
+        self.modified = True
+
+    def mosaic_sheets(self):
+        """
+        合成に使うシートを (ゲーム画像の対応点, 実地図の対応点, 実地図画像) のリストで返します。
+        現在の実地図も、画像と 3 組以上の対応点があれば最後のシートとして含めます。
+        """
+        sheets = [(sheet.game_points, sheet.real_points, sheet.qimage) for sheet in self.sheets]
+        if not self.real_qimage.isNull() and self.has_valid_real_points():
+            sheets.append((self.game_points, self.real_points, self.real_qimage))
+        return sheets
@@ -0,0 +1,433 @@
+# src/streaming.py
+import os
+import struct
+import tempfile
+import threading
+import zlib
+import numpy as np
+import cv2
+from typing import Any, Dict, List, Optional, Tuple
+from logger import transform_logger
+import tracing
+from tiff_io import TiffTileWriter, TiffWindowReader
+from tps_solver import LOWRANK_LANDMARKS
+from core import (DEFAULT_WARP_ENGINE, create_map_builder, ArrayImageReader, ProgressCallback, _check_cancelled, _run_row_tiles,
+                  _source_window, load_transform_settings, MAX_REMAP_SIDE)
+
+# max_memory_mb が指定されない場合のメモリ上限（MB）
+DEFAULT_STREAM_MEMORY_MB = 256
+BORDER_VALUE = 255
+# 一時的なメモリマップへ書き込む際に一度に変換する行数
+DECODE_BAND_ROWS = 1024
+
+def _read_pnm_header(path: str) -> Tuple[str, int, int, int, int]:
+    """
+    バイナリ PNM（P5/P6）のヘッダーを読み、(形式, 幅, 高さ, 最大値, データ開始位置) を返します。
+    """
+    tokens: List[bytes] = []
+    with open(path, "rb") as f:
+        while len(tokens) < 4:
+            line = f.readline()
+            if not line:
+                raise ValueError(f"Invalid PNM header: {path}")
+            tokens.extend(line.split(b"#", 1)[0].split())
+        offset = f.tell()
+    magic = tokens[0].decode("ascii")
+    if magic not in ("P5", "P6"):
+        raise ValueError(f"Unsupported PNM format '{magic}': {path}")
+    return magic, int(tokens[1]), int(tokens[2]), int(tokens[3]), offset
+
+class TemporaryArrayReader(ArrayImageReader):
+    """
+    一時ファイルにメモリマップした配列を読み出すリーダーです。閉じると一時ファイルを削除します。
+    """
+    def __init__(self, array: np.ndarray, path: str):
+        super().__init__(array)
+        self.path = path
+
+    def close(self) -> None:
+        array, self.array = self.array, None
+        if array is not None:
+            # Windows ではマップを解放してからでないと削除できない
+            mapping = getattr(array, "_mmap", None)
+            del array
+            if mapping is not None:
+                mapping.close()
+            try:
+                os.remove(self.path)
+            except OSError:
+                transform_logger.warning("Failed to remove temporary image: %s", self.path)
+
+def decode_to_memmap(encoded: np.ndarray, name: str = "image") -> TemporaryArrayReader:
+    """
+    エンコードされた画像（PNG・JPEG など）を一度だけデコードし、一時ディレクトリの .npy にメモリマップして返します。
+
+    デコードの間だけは画像全体がメモリに載りますが、その後の変換では参照する窓だけがディスクから読まれます。
+    使用メモリを常に抑える必要がある場合は、元画像をタイル TIFF・.npy・バイナリ PPM にしておいてください。
+
+    Args:
+        encoded (np.ndarray): エンコードされた画像のバイト列（uint8）
+        name (str, optional): ログに出す画像の名前
+
+    Returns:
+        TemporaryArrayReader: 元画像のリーダー（close で一時ファイルを削除）
+
+    Raises:
+        ValueError: デコードできない場合
+    """
+    data = cv2.imdecode(encoded, cv2.IMREAD_UNCHANGED)
+    if data is None:
+        raise ValueError(f"Failed to read image: {name}")
+    shape = data.shape[:2] if data.ndim == 2 else data.shape[:2] + (3,)
+    fd, path = tempfile.mkstemp(prefix="kartenwarp_", suffix=".npy")
+    os.close(fd)
+    try:
+        array = np.lib.format.open_memmap(path, mode="w+", dtype=np.uint8, shape=shape)
+        for r0 in range(0, shape[0], DECODE_BAND_ROWS):
+            band = data[r0:r0 + DECODE_BAND_ROWS]
+            if band.dtype != np.uint8:
+                band = cv2.convertScaleAbs(band, alpha=255.0 / max(1, np.iinfo(band.dtype).max))
+            if band.ndim == 3:
+                band = cv2.cvtColor(band, cv2.COLOR_BGRA2RGB if band.shape[2] == 4 else cv2.COLOR_BGR2RGB)
+            array[r0:r0 + band.shape[0]] = band
+        array.flush()
+    except BaseException:
+        os.remove(path)
+        raise
+    del data
+    transform_logger.info("Decoded %s into temporary memory map %s (%dx%d)", name, path, shape[1], shape[0])
+    return TemporaryArrayReader(np.load(path, mmap_mode="r"), path)
+
+def open_image_reader(path: str) -> ArrayImageReader:
+    """
+    拡張子に応じて元画像のリーダーを開きます。
+
+    .npy とバイナリ PPM/PGM はメモリマップで、ストリップ・タイル形式の TIFF は TiffWindowReader で開くため、
+    読み出した範囲だけがメモリに載ります。それ以外の形式（PNG・JPEG や窓単位で読めない TIFF）は
+    decode_to_memmap で一度だけデコードして一時ファイルにメモリマップします（QImage の 2GB 制限は受けません）。
+
+    Args:
+        path (str): 元画像のパス
+
+    Returns:
+        ArrayImageReader: 元画像のリーダー（TiffWindowReader も同じインターフェースを持ちます）
+
+    Raises:
+        ValueError: 読み込めない形式の場合
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".npy":
+        return ArrayImageReader(np.load(path, mmap_mode="r"))
+    if ext in (".ppm", ".pgm", ".pnm"):
+        magic, width, height, max_value, offset = _read_pnm_header(path)
+        if max_value > 255:
+            raise ValueError(f"Only 8-bit PNM images are supported: {path}")
+        shape = (height, width, 3) if magic == "P6" else (height, width)
+        return ArrayImageReader(np.memmap(path, dtype=np.uint8, mode="r", offset=offset, shape=shape))
+    if ext in (".tif", ".tiff"):
+        try:
+            return TiffWindowReader(path)
+        except ValueError as e:
+            transform_logger.info("Falling back to a full decode: %s", e)
+    # 非 ASCII のパスでも読めるよう、cv2.imread ではなくバイト列からデコードする
+    return decode_to_memmap(np.fromfile(path, dtype=np.uint8), path)
+
+class PngStripWriter:
+    """
+    行の帯を受け取るたびに圧縮して書き出す PNG ライターです。画像全体をメモリに保持しません。
+    """
+    CHUNK_SIZE = 1 << 20
+
+    def __init__(self, path: str, width: int, height: int, channels: int = 3, compression: int = 6):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.channels = channels
+        self.rows_written = 0
+        self._file = open(path, "wb")
+        self._compressor = zlib.compressobj(compression)
+        self._pending = b""
+        self._previous_row = np.zeros((width * channels,), dtype=np.uint8)
+        color_type = 2 if channels == 3 else 0
+        self._file.write(b"\x89PNG\r\n\x1a\n")
+        self._write_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, color_type, 0, 0, 0))
+
+    def _write_chunk(self, chunk_type: bytes, data: bytes) -> None:
+        self._file.write(struct.pack(">I", len(data)))
+        self._file.write(chunk_type)
+        self._file.write(data)
+        self._file.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(chunk_type)) & 0xFFFFFFFF))
+
+    def _emit(self, data: bytes, final: bool = False) -> None:
+        self._pending += data
+        while len(self._pending) >= self.CHUNK_SIZE or (final and self._pending):
+            self._write_chunk(b"IDAT", self._pending[:self.CHUNK_SIZE])
+            self._pending = self._pending[self.CHUNK_SIZE:]
+
+    def write_rows(self, rows: np.ndarray) -> None:
+        """
+        次の行の帯（形状 (h, width, channels) の uint8）を書き込みます。
+        """
+        flat = rows.reshape(rows.shape[0], -1)
+        # Up フィルタ（直前の行との差分）で圧縮率を上げる
+        previous = np.vstack([self._previous_row[None, :], flat[:-1]])
+        filtered = np.empty((flat.shape[0], flat.shape[1] + 1), dtype=np.uint8)
+        filtered[:, 0] = 2
+        np.subtract(flat, previous, out=filtered[:, 1:], dtype=np.uint8)
+        self._emit(self._compressor.compress(filtered.tobytes()))
+        self._previous_row = flat[-1].copy()
+        self.rows_written += rows.shape[0]
+
+    def close(self) -> None:
+        if self._file is None:
+            return
+        self._emit(self._compressor.flush(), final=True)
+        self._write_chunk(b"IEND", b"")
+        self._file.close()
+        self._file = None
+
+class PpmStripWriter:
+    """
+    行の帯を順に追記するバイナリ PPM/PGM ライターです。
+    """
+    def __init__(self, path: str, width: int, height: int, channels: int = 3):
+        self.path = path
+        self.rows_written = 0
+        self._file = open(path, "wb")
+        magic = b"P6" if channels == 3 else b"P5"
+        self._file.write(magic + b"\n%d %d\n255\n" % (width, height))
+
+    def write_rows(self, rows: np.ndarray) -> None:
+        self._file.write(np.ascontiguousarray(rows).tobytes())
+        self.rows_written += rows.shape[0]
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+class NpyStripWriter:
+    """
+    メモリマップした .npy ファイルに行の帯を順に書き込むライターです。
+    """
+    def __init__(self, path: str, width: int, height: int, channels: int = 3):
+        self.path = path
+        self.rows_written = 0
+        self._array = np.lib.format.open_memmap(path, mode="w+", dtype=np.uint8, shape=(height, width, channels))
+
+    def write_rows(self, rows: np.ndarray) -> None:
+        self._array[self.rows_written:self.rows_written + rows.shape[0]] = rows
+        self.rows_written += rows.shape[0]
+
+    def close(self) -> None:
+        if self._array is not None:
+            self._array.flush()
+            self._array = None
+
+def open_image_writer(path: str, width: int, height: int, channels: int = 3):
+    """
+    拡張子に応じて帯単位で書き出すライターを開きます（.png, .tif/.tiff, .ppm/.pgm/.pnm, .npy）。
+
+    Raises:
+        ValueError: 対応していない拡張子の場合
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".png":
+        return PngStripWriter(path, width, height, channels)
+    if ext in (".tif", ".tiff"):
+        return TiffTileWriter(path, width, height, channels)
+    if ext in (".ppm", ".pgm", ".pnm"):
+        return PpmStripWriter(path, width, height, channels)
+    if ext == ".npy":
+        return NpyStripWriter(path, width, height, channels)
+    raise ValueError(f"Unsupported output format for streaming: {ext}")
+
+def _warp_region(reader: ArrayImageReader, map_x: np.ndarray, map_y: np.ndarray, out: np.ndarray,
+                 window_budget: int) -> None:
+    """
+    マップが参照する元画像の窓だけを読み出して再サンプリングします。
+    窓がメモリ上限や cv2.remap の制限を超える場合は、出力を長辺方向に分割して処理します。
+    """
+    window = _source_window(map_x, map_y, reader.width, reader.height)
+    if window is None:
+        out[...] = BORDER_VALUE
+        return
+    x0, y0, x1, y1 = window
+    too_large = ((x1 - x0) * (y1 - y0) * out.shape[2] > window_budget
+                 or x1 - x0 >= MAX_REMAP_SIDE or y1 - y0 >= MAX_REMAP_SIDE)
+    rows, cols = map_x.shape
+    if too_large and (rows > 1 or cols > 1):
+        if rows >= cols:
+            half = rows // 2
+            _warp_region(reader, map_x[:half], map_y[:half], out[:half], window_budget)
+            _warp_region(reader, map_x[half:], map_y[half:], out[half:], window_budget)
+        else:
+            half = cols // 2
+            _warp_region(reader, map_x[:, :half], map_y[:, :half], out[:, :half], window_budget)
+            _warp_region(reader, map_x[:, half:], map_y[:, half:], out[:, half:], window_budget)
+        return
+    with tracing.span("read_source", window=[x0, y0, x1, y1]):
+        src = reader.read_window(x0, y0, x1, y1)
+    out[...] = cv2.remap(
+        src,
+        np.ascontiguousarray(map_x - x0),
+        np.ascontiguousarray(map_y - y0),
+        interpolation=cv2.INTER_CUBIC,
+        borderMode=cv2.BORDER_CONSTANT,
+        borderValue=(BORDER_VALUE,) * 3
+    ).reshape(out.shape)
+
+def stream_transformation(dest_points: List[Tuple[float, float]], src_points: List[Tuple[float, float]],
+                          reader: ArrayImageReader, writer: Any, output_size: Tuple[int, int],
+                          reg_lambda: float = 1e-3, adaptive: bool = False,
+                          max_memory_mb: Optional[float] = None, workers: int = 1,
+                          eval_mode: str = "exact", grid_step: int = 16,
+                          grid_tolerance: Optional[float] = None, engine: str = DEFAULT_WARP_ENGINE,
+                          lowrank_threshold: Optional[int] = None, lowrank_landmarks: int = LOWRANK_LANDMARKS,
+                          precision: str = "float64", progress_callback: Optional[ProgressCallback] = None,
+                          cancel_event: Optional[threading.Event] = None, builder: Optional[Any] = None,
+                          **kwargs: Any) -> None:
+    """
+    QImage を経由せず、元画像をリーダーから必要な窓だけ読み出し、変換結果を行の帯ごとにライターへ書き出します。
+    変換内容は perform_array_transformation と同じで、使用メモリは max_memory_mb と workers でおおむね決まります。
+
+    Args:
+        dest_points (List[Tuple[float, float]]): 変換先の対応点リスト
+        src_points (List[Tuple[float, float]]): 変換元の対応点リスト
+        reader (ArrayImageReader): 元画像のリーダー
+        writer (Any): write_rows(rows) を持つライター。行は上から順に渡されます
+        output_size (Tuple[int, int]): 出力画像のサイズ (width, height)
+        reg_lambda (float, optional): TPS変換の正則化パラメータ
+        adaptive (bool, optional): Trueの場合、正則化パラメータを自動調整
+        max_memory_mb (Optional[float], optional): 帯1つあたりのメモリ上限（MB）の目安
+        workers (int, optional): 並列に処理するタイル数
+        eval_mode (str, optional): "exact"、"grid" または "fast"
+        grid_step (int, optional): grid モードでの格子間隔（画素）
+        grid_tolerance (Optional[float], optional): grid / fast モードで許容する最大誤差（画素）
+        engine (str, optional): 変換エンジン。"tps" または "piecewise_affine"
+        lowrank_threshold (Optional[int], optional): TPS を低ランク近似で解く点数の閾値（None は常に厳密）
+        lowrank_landmarks (int, optional): 低ランク近似のランドマークの数
+        precision (str, optional): exact モードでのカーネルの評価精度（"float64" または "float32"）
+        progress_callback (Optional[ProgressCallback], optional): 進捗通知 (ステージ名, 完了数, 総数)
+        cancel_event (Optional[threading.Event], optional): キャンセル要求を伝えるイベント
+        builder (Optional[Any], optional): 同じ対応点・設定で create_map_builder により作成済みの生成器。
+            指定した場合は TPS パラメータの計算や三角形分割を省略します
+        **kwargs: その他の設定（ストリーミングでは使用しません）
+
+    Raises:
+        ValueError: 対応点が不足している場合、またはアフィン変換失敗時
+        TransformCancelled: 処理がキャンセルされた場合
+    """
+    transform_logger.debug("Starting stream_transformation")
+    if not max_memory_mb:
+        max_memory_mb = DEFAULT_STREAM_MEMORY_MB
+    workers = max(1, workers)
+    with tracing.trace("stream_transformation", points=len(dest_points), output_size=list(output_size),
+                       source_size=[reader.width, reader.height], eval_mode=eval_mode, workers=workers, engine=engine):
+        if builder is None:
+            builder = create_map_builder(
+                dest_points, src_points, output_size, engine=engine, reg_lambda=reg_lambda, adaptive=adaptive,
+                max_memory_mb=max_memory_mb, workers=workers, eval_mode=eval_mode, grid_step=grid_step,
+                grid_tolerance=grid_tolerance, lowrank_threshold=lowrank_threshold, lowrank_landmarks=lowrank_landmarks,
+                precision=precision, progress_callback=progress_callback, cancel_event=cancel_event
+            )
+        _stream_bands(builder, reader, writer, output_size, max_memory_mb, workers, progress_callback, cancel_event)
+    transform_logger.debug("Streaming transformation finished")
+
+def _stream_bands(builder: Any, reader: ArrayImageReader, writer: Any, output_size: Tuple[int, int],
+                  max_memory_mb: float, workers: int, progress_callback: Optional[ProgressCallback],
+                  cancel_event: Optional[threading.Event]) -> None:
+    width, height = output_size
+    window_budget = int(max_memory_mb * 1024 * 1024 / workers)
+    tiles = builder.plan_tiles()
+    transform_logger.debug("Streaming %d tiles with %d workers", len(tiles), workers)
+    if progress_callback is not None:
+        progress_callback("warp", 0, len(tiles))
+
+    # workers 個のタイルを1つの帯として並列に処理し、帯ごとに順番に書き出す
+    for band_start in range(0, len(tiles), workers):
+        band_tiles = tiles[band_start:band_start + workers]
+        band_r0 = band_tiles[0][0]
+        band = np.empty((band_tiles[-1][1] - band_r0, width, 3), dtype=np.uint8)
+
+        def warp_tile(r0: int, r1: int) -> None:
+            _check_cancelled(cancel_event)
+            with tracing.span("maps", rows=[r0, r1]):
+                map_x, map_y = builder.rows(r0, r1)
+            with tracing.span("remap", rows=[r0, r1]):
+                _warp_region(reader, map_x, map_y, band[r0 - band_r0:r1 - band_r0], window_budget)
+
+        _run_row_tiles(warp_tile, band_tiles, workers)
+        with tracing.span("write", rows=[band_r0, band_tiles[-1][1]]):
+            writer.write_rows(band)
+        if progress_callback is not None:
+            progress_callback("warp", band_start + len(band_tiles), len(tiles))
+
+def stream_to_file(dest_points: List[Tuple[float, float]], src_points: List[Tuple[float, float]],
+                   reader: ArrayImageReader, output_path: str, output_size: Tuple[int, int],
+                   settings: Optional[Dict[str, Any]] = None,
+                   progress_callback: Optional[ProgressCallback] = None,
+                   cancel_event: Optional[threading.Event] = None, builder: Optional[Any] = None) -> str:
+    """
+    リーダーの元画像を変換し、結果をファイルへ直接書き出します。失敗時は書きかけの出力を削除します。
+    リーダーは閉じません。
+
+    Args:
+        dest_points (List[Tuple[float, float]]): 変換先の対応点リスト
+        src_points (List[Tuple[float, float]]): 変換元の対応点リスト
+        reader (ArrayImageReader): 元画像のリーダー
+        output_path (str): 出力先のパス（.png, .tif, .ppm, .npy）
+        output_size (Tuple[int, int]): 出力画像のサイズ (width, height)
+        settings (Optional[Dict[str, Any]], optional): 変換設定。省略時は load_transform_settings() の値
+        progress_callback (Optional[ProgressCallback], optional): 進捗通知 (ステージ名, 完了数, 総数)
+        cancel_event (Optional[threading.Event], optional): キャンセル要求を伝えるイベント
+        builder (Optional[Any], optional): create_map_builder により作成済みの生成器
+
+    Returns:
+        str: 出力先のパス
+    """
+    if settings is None:
+        settings = load_transform_settings()
+    writer = open_image_writer(output_path, output_size[0], output_size[1])
+    try:
+        stream_transformation(dest_points, src_points, reader, writer, output_size,
+                              progress_callback=progress_callback, cancel_event=cancel_event, builder=builder,
+                              **settings)
+    except BaseException:
+        writer.close()
+        try:
+            os.remove(output_path)
+        except OSError:
+            pass
+        raise
+    writer.close()
+    transform_logger.info("Streamed warp written to %s", output_path)
+    return output_path
+
+def stream_transform_file(dest_points: List[Tuple[float, float]], src_points: List[Tuple[float, float]],
+                          source_path: str, output_path: str, output_size: Tuple[int, int],
+                          settings: Optional[Dict[str, Any]] = None,
+                          progress_callback: Optional[ProgressCallback] = None,
+                          cancel_event: Optional[threading.Event] = None) -> str:
+    """
+    ファイルの元画像を変換し、結果をファイルへ直接書き出します。失敗時は書きかけの出力を削除します。
+
+    Args:
+        dest_points (List[Tuple[float, float]]): 変換先の対応点リスト
+        src_points (List[Tuple[float, float]]): 変換元の対応点リスト
+        source_path (str): 元画像のパス
+        output_path (str): 出力先のパス（.png, .tif, .ppm, .npy）
+        output_size (Tuple[int, int]): 出力画像のサイズ (width, height)
+        settings (Optional[Dict[str, Any]], optional): 変換設定。省略時は load_transform_settings() の値
+        progress_callback (Optional[ProgressCallback], optional): 進捗通知 (ステージ名, 完了数, 総数)
+        cancel_event (Optional[threading.Event], optional): キャンセル要求を伝えるイベント
+
+    Returns:
+        str: 出力先のパス
+    """
+    reader = open_image_reader(source_path)
+    try:
+        return stream_to_file(dest_points, src_points, reader, output_path, output_size, settings,
+                              progress_callback, cancel_event)
+    finally:
+        reader.close()
@@ -0,0 +1,371 @@
+# src/tiff_io.py
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import cv2
+
+# 窓読み出しで保持する展開済みブロック（ストリップ／タイル）の上限（MB）
+DEFAULT_BLOCK_CACHE_MB = 64
+# 書き出すタイルの一辺（画素、16 の倍数）
+DEFAULT_TILE_SIZE = 256
+# 細いストリップをまとめて展開する際の、1 ブロックあたりの行数の目安
+STRIP_GROUP_ROWS = 256
+
+# タグの型ごとの (1 要素のバイト数, struct の書式)
+_TYPE_FORMATS = {1: (1, "B"), 2: (1, "B"), 3: (2, "H"), 4: (4, "I"), 5: (8, "II"), 6: (1, "b"), 7: (1, "B"),
+                 8: (2, "h"), 9: (4, "i"), 10: (8, "ii"), 11: (4, "f"), 12: (8, "d"), 16: (8, "Q"),
+                 17: (8, "q"), 18: (8, "Q")}
+# ブロックを単独の TIFF としてデコードする際に、元のファイルから引き継ぐタグ
+_BLOCK_TAGS = (258, 259, 262, 277, 284, 317, 320, 338, 339, 347, 530, 531, 532)
+# 展開をサポートしない圧縮方式（旧形式の JPEG）
+_UNSUPPORTED_COMPRESSIONS = (6,)
+
+TAG_IMAGE_WIDTH = 256
+TAG_IMAGE_LENGTH = 257
+TAG_BITS_PER_SAMPLE = 258
+TAG_COMPRESSION = 259
+TAG_PHOTOMETRIC = 262
+TAG_STRIP_OFFSETS = 273
+TAG_SAMPLES_PER_PIXEL = 277
+TAG_ROWS_PER_STRIP = 278
+TAG_STRIP_BYTE_COUNTS = 279
+TAG_PLANAR_CONFIG = 284
+TAG_PREDICTOR = 317
+TAG_TILE_WIDTH = 322
+TAG_TILE_LENGTH = 323
+TAG_TILE_OFFSETS = 324
+TAG_TILE_BYTE_COUNTS = 325
+
+def _read_ifd(f, offset: int, endian: str, big: bool) -> Dict[int, Tuple[int, list]]:
+    """
+    IFD を読み、タグ番号から (型, 値のリスト) への辞書を返します。
+    """
+    f.seek(offset)
+    count_fmt, entry_size, inline_size = ("Q", 20, 8) if big else ("H", 12, 4)
+    (count,) = struct.unpack(endian + count_fmt, f.read(struct.calcsize(count_fmt)))
+    raw_entries = f.read(count * entry_size)
+    tags: Dict[int, Tuple[int, list]] = {}
+    for i in range(count):
+        entry = raw_entries[i * entry_size:(i + 1) * entry_size]
+        tag, typ = struct.unpack(endian + "HH", entry[:4])
+        if typ not in _TYPE_FORMATS:
+            continue
+        (n,) = struct.unpack(endian + ("Q" if big else "I"), entry[4:4 + inline_size])
+        size, fmt = _TYPE_FORMATS[typ]
+        field = entry[4 + inline_size:]
+        if size * n <= inline_size:
+            data = field[:size * n]
+        else:
+            (data_offset,) = struct.unpack(endian + ("Q" if big else "I"), field)
+            position = f.tell()
+            f.seek(data_offset)
+            data = f.read(size * n)
+            f.seek(position)
+        if typ in (1, 2, 6, 7):
+            values = list(data)
+        else:
+            values = list(struct.unpack(endian + fmt * n, data))
+        tags[tag] = (typ, values)
+    return tags
+
+def _build_ifd(entries: List[Tuple[int, int, list]], offset: int, big: bool) -> bytes:
+    """
+    リトルエンディアンの IFD と、その直後に置く値の領域をまとめたバイト列を作ります。
+
+    Args:
+        entries (List[Tuple[int, int, list]]): (タグ番号, 型, 値のリスト)
+        offset (int): IFD を置くファイル上の位置
+        big (bool): BigTIFF の場合は True
+    """
+    count_fmt, entry_size, inline_size, offset_fmt = ("Q", 20, 8, "Q") if big else ("H", 12, 4, "I")
+    entries = sorted(entries, key=lambda entry: entry[0])
+    header_size = struct.calcsize(count_fmt) + len(entries) * entry_size + inline_size
+    body = struct.pack("<" + count_fmt, len(entries))
+    extra = b""
+    for tag, typ, values in entries:
+        size, fmt = _TYPE_FORMATS[typ]
+        data = bytes(values) if typ in (1, 2, 7) else struct.pack("<" + fmt * (len(values) // len(fmt)), *values)
+        n = len(data) // size
+        if len(data) <= inline_size:
+            field = data.ljust(inline_size, b"\0")
+        else:
+            field = struct.pack("<" + offset_fmt, offset + header_size + len(extra))
+            extra += data + b"\0" * (len(data) % 2)
+        body += struct.pack("<HH" + offset_fmt, tag, typ, n) + field
+    body += struct.pack("<" + offset_fmt, 0)
+    return body + extra
+
+class TiffWindowReader:
+    """
+    ストリップまたはタイル単位で格納された TIFF から、要求された矩形に重なるブロックだけを展開して読み出すリーダーです。
+    画像全体を展開しないため、使用メモリはブロックのキャッシュ（cache_mb）でおおむね決まります。
+
+    各ブロックはそのブロックだけを含む小さな TIFF に組み直して cv2 でデコードするため、
+    圧縮方式（非圧縮・LZW・Deflate・PackBits・JPEG など）と予測子は cv2 が読めるものをそのまま扱えます。
+    チャンネルごとに分かれた格納（PlanarConfiguration = 2）や、ブロックが cache_mb を超えるファイル
+    （画像全体が 1 つのストリップのファイルなど）は扱えず、ValueError を送出します。
+
+    Args:
+        path (str): TIFF ファイルのパス
+        cache_mb (float, optional): 展開済みブロックのキャッシュの上限（MB）
+
+    Raises:
+        ValueError: TIFF でない場合、または窓単位で読み出せない構成の場合
+    """
+    def __init__(self, path: str, cache_mb: float = DEFAULT_BLOCK_CACHE_MB):
+        self.path = path
+        self._cache_limit = int(cache_mb * 1024 * 1024)
+        self._file = open(path, "rb")
+        try:
+            self._parse_header()
+        except Exception:
+            self._file.close()
+            raise
+        self._cache: "OrderedDict[int, np.ndarray]" = OrderedDict()
+        self._cache_bytes = 0
+        self._lock = threading.Lock()
+
+    def _parse_header(self) -> None:
+        f = self._file
+        head = f.read(16)
+        if head[:2] == b"II":
+            endian = "<"
+        elif head[:2] == b"MM":
+            endian = ">"
+        else:
+            raise ValueError(f"Not a TIFF file: {self.path}")
+        (version,) = struct.unpack(endian + "H", head[2:4])
+        if version == 42:
+            big = False
+            (ifd_offset,) = struct.unpack(endian + "I", head[4:8])
+        elif version == 43:
+            big = True
+            (ifd_offset,) = struct.unpack(endian + "Q", head[8:16])
+        else:
+            raise ValueError(f"Not a TIFF file: {self.path}")
+        tags = _read_ifd(f, ifd_offset, endian, big)
+
+        def value(tag: int, default: Optional[int] = None) -> int:
+            if tag not in tags:
+                if default is None:
+                    raise ValueError(f"TIFF tag {tag} is missing: {self.path}")
+                return default
+            return tags[tag][1][0]
+
+        self._width = value(TAG_IMAGE_WIDTH)
+        self._height = value(TAG_IMAGE_LENGTH)
+        if value(TAG_PLANAR_CONFIG, 1) != 1:
+            raise ValueError(f"Planar TIFF images are not supported for windowed reading: {self.path}")
+        if value(TAG_COMPRESSION, 1) in _UNSUPPORTED_COMPRESSIONS:
+            raise ValueError(f"Old-style JPEG TIFF images are not supported: {self.path}")
+        if TAG_TILE_WIDTH in tags:
+            self._block_width = value(TAG_TILE_WIDTH)
+            self._strip_rows = self._block_height = value(TAG_TILE_LENGTH)
+            offsets, counts = tags[TAG_TILE_OFFSETS][1], tags[TAG_TILE_BYTE_COUNTS][1]
+            self._tiled = True
+            self._group = 1
+        else:
+            self._block_width = self._width
+            self._strip_rows = min(value(TAG_ROWS_PER_STRIP, self._height), self._height)
+            offsets, counts = tags[TAG_STRIP_OFFSETS][1], tags[TAG_STRIP_BYTE_COUNTS][1]
+            self._tiled = False
+            # 数行ずつの細いストリップは、デコードの回数を減らすため数百行分をまとめて 1 ブロックとして展開する
+            row_bytes = self._width * 3
+            self._group = max(1, min(-(-STRIP_GROUP_ROWS // self._strip_rows),
+                                     self._cache_limit // 4 // max(1, row_bytes * self._strip_rows)))
+            self._block_height = self._strip_rows * self._group
+        self._blocks_across = -(-self._width // self._block_width)
+        blocks_down = -(-self._height // self._strip_rows)
+        if len(offsets) < self._blocks_across * blocks_down or len(counts) < len(offsets):
+            raise ValueError(f"Truncated TIFF block table: {self.path}")
+        if self._block_width * self._block_height * 3 > self._cache_limit:
+            raise ValueError(f"TIFF blocks of {self._block_width}x{self._block_height} are too large "
+                             f"for windowed reading: {self.path}")
+        self._offsets = offsets
+        self._counts = counts
+        # ブロックを単独の TIFF に組み直す際に引き継ぐタグ（オフセットは小さな TIFF 内の位置に置き換える）
+        self._block_tags = []
+        for tag in _BLOCK_TAGS:
+            if tag in tags:
+                typ, values = tags[tag]
+                if typ in (1, 2, 3, 4, 5, 7):
+                    self._block_tags.append((tag, typ, values))
+
+    @property
+    def width(self) -> int:
+        return self._width
+
+    @property
+    def height(self) -> int:
+        return self._height
+
+    @property
+    def channels(self) -> int:
+        return 3
+
+    def _decode_block(self, index: int) -> np.ndarray:
+        first = index * self._group
+        last = min(first + self._group, len(self._offsets))
+        chunks = []
+        with self._lock:
+            for i in range(first, last):
+                self._file.seek(self._offsets[i])
+                chunks.append(self._file.read(self._counts[i]))
+        width = self._block_width
+        if self._tiled:
+            height = self._block_height
+        else:
+            height = min(self._block_height, self._height - index * self._block_height)
+        entries = self._block_tags + [
+            (TAG_IMAGE_WIDTH, 4, [width]),
+            (TAG_IMAGE_LENGTH, 4, [height]),
+            (TAG_ROWS_PER_STRIP, 4, [self._strip_rows]),
+            (TAG_STRIP_BYTE_COUNTS, 4, [len(chunk) for chunk in chunks]),
+            (TAG_STRIP_OFFSETS, 4, [0] * len(chunks)),
+        ]
+        data_offset = 8 + len(_build_ifd(entries, 8, False))
+        entries[-1] = (TAG_STRIP_OFFSETS, 4, [int(v) for v in data_offset + np.cumsum([0] + [len(c) for c in chunks[:-1]])])
+        encoded = b"II*\0" + struct.pack("<I", 8) + _build_ifd(entries, 8, False) + b"".join(chunks)
+        block = cv2.imdecode(np.frombuffer(encoded, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+        if block is None or block.shape[:2] != (height, width):
+            raise ValueError(f"Failed to decode TIFF block {index}: {self.path}")
+        if block.dtype != np.uint8:
+            block = cv2.convertScaleAbs(block, alpha=255.0 / max(1, np.iinfo(block.dtype).max))
+        if block.ndim == 2:
+            return cv2.cvtColor(block, cv2.COLOR_GRAY2RGB)
+        return cv2.cvtColor(block, cv2.COLOR_BGRA2RGB if block.shape[2] == 4 else cv2.COLOR_BGR2RGB)
+
+    def _block(self, index: int) -> np.ndarray:
+        with self._lock:
+            block = self._cache.get(index)
+            if block is not None:
+                self._cache.move_to_end(index)
+                return block
+        block = self._decode_block(index)
+        with self._lock:
+            if index not in self._cache:
+                self._cache[index] = block
+                self._cache_bytes += block.nbytes
+                while len(self._cache) > 1 and self._cache_bytes > self._cache_limit:
+                    _index, evicted = self._cache.popitem(last=False)
+                    self._cache_bytes -= evicted.nbytes
+        return block
+
+    def read_window(self, x0: int, y0: int, x1: int, y1: int) -> np.ndarray:
+        """
+        元画像の矩形 [x0, x1) × [y0, y1) を RGB の連続配列として返します。
+        """
+        out = np.empty((y1 - y0, x1 - x0, 3), dtype=np.uint8)
+        bw, bh = self._block_width, self._block_height
+        for by in range(y0 // bh, (y1 - 1) // bh + 1):
+            for bx in range(x0 // bw, (x1 - 1) // bw + 1):
+                block = self._block(by * self._blocks_across + bx)
+                top, left = by * bh, bx * bw
+                r0, r1 = max(y0, top), min(y1, top + bh)
+                c0, c1 = max(x0, left), min(x1, left + bw)
+                out[r0 - y0:r1 - y0, c0 - x0:c1 - x0] = block[r0 - top:r1 - top, c0 - left:c1 - left]
+        return out
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._cache.clear()
+
+class TiffTileWriter:
+    """
+    行の帯を受け取り、タイル単位で Deflate 圧縮して書き出すタイル TIFF ライターです。
+    保持するのはタイル 1 段分の行だけで、出力が 4GB を超えうる大きさの場合は BigTIFF で書き出します。
+
+    Args:
+        path (str): 出力先のパス
+        width (int): 画像の幅
+        height (int): 画像の高さ
+        channels (int, optional): チャンネル数（3 は RGB、1 はグレースケール）
+        tile_size (int, optional): タイルの一辺（16 の倍数）
+        compression (int, optional): zlib の圧縮レベル
+    """
+    def __init__(self, path: str, width: int, height: int, channels: int = 3,
+                 tile_size: int = DEFAULT_TILE_SIZE, compression: int = 6):
+        if tile_size % 16:
+            raise ValueError("TIFF tile size must be a multiple of 16")
+        self.path = path
+        self.width = width
+        self.height = height
+        self.channels = channels
+        self.tile_size = tile_size
+        self.compression = compression
+        self.rows_written = 0
+        self._tiles_across = -(-width // tile_size)
+        # 圧縮後のサイズが 4GB に近づく可能性があれば BigTIFF にする（Deflate の膨張分も見込む）
+        self._big = width * height * channels * 1.01 + (1 << 20) >= 1 << 32
+        self._buffer = np.zeros((tile_size, self._tiles_across * tile_size, channels), dtype=np.uint8)
+        self._buffered = 0
+        self._offsets: List[int] = []
+        self._counts: List[int] = []
+        self._file = open(path, "wb")
+        if self._big:
+            self._file.write(b"II+\0" + struct.pack("<HHQ", 8, 0, 0))
+        else:
+            self._file.write(b"II*\0" + struct.pack("<I", 0))
+
+    def _flush_tiles(self) -> None:
+        ts = self.tile_size
+        for c in range(self._tiles_across):
+            tile = self._buffer[:, c * ts:(c + 1) * ts]
+            # 水平差分の予測子（Predictor = 2）で圧縮率を上げる
+            diff = tile.copy()
+            np.subtract(tile[:, 1:], tile[:, :-1], out=diff[:, 1:])
+            data = zlib.compress(diff.tobytes(), self.compression)
+            self._offsets.append(self._file.tell())
+            self._counts.append(len(data))
+            self._file.write(data)
+            if len(data) % 2:
+                self._file.write(b"\0")
+        self._buffer[...] = 0
+        self._buffered = 0
+
+    def write_rows(self, rows: np.ndarray) -> None:
+        """
+        次の行の帯（形状 (h, width, channels) の uint8）を書き込みます。
+        """
+        rows = rows.reshape(rows.shape[0], self.width, self.channels)
+        start = 0
+        while start < rows.shape[0]:
+            count = min(rows.shape[0] - start, self.tile_size - self._buffered)
+            self._buffer[self._buffered:self._buffered + count, :self.width] = rows[start:start + count]
+            self._buffered += count
+            start += count
+            if self._buffered == self.tile_size:
+                self._flush_tiles()
+        self.rows_written += rows.shape[0]
+
+    def close(self) -> None:
+        if self._file is None:
+            return
+        if self._buffered:
+            self._flush_tiles()
+        offset_type = 16 if self._big else 4
+        entries = [
+            (TAG_IMAGE_WIDTH, 4, [self.width]),
+            (TAG_IMAGE_LENGTH, 4, [self.height]),
+            (TAG_BITS_PER_SAMPLE, 3, [8] * self.channels),
+            (TAG_COMPRESSION, 3, [8]),
+            (TAG_PHOTOMETRIC, 3, [2 if self.channels == 3 else 1]),
+            (TAG_SAMPLES_PER_PIXEL, 3, [self.channels]),
+            (TAG_PLANAR_CONFIG, 3, [1]),
+            (TAG_PREDICTOR, 3, [2]),
+            (TAG_TILE_WIDTH, 4, [self.tile_size]),
+            (TAG_TILE_LENGTH, 4, [self.tile_size]),
+            (TAG_TILE_OFFSETS, offset_type, self._offsets),
+            (TAG_TILE_BYTE_COUNTS, offset_type, self._counts),
+        ]
+        ifd_offset = self._file.tell()
+        self._file.write(_build_ifd(entries, ifd_offset, self._big))
+        self._file.seek(8 if self._big else 4)
+        self._file.write(struct.pack("<Q" if self._big else "<I", ifd_offset))
+        self._file.close()
+        self._file = None
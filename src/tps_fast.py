@@ -0,0 +1,300 @@
+# src/tps_fast.py
+
+import math
+from typing import Any, Optional, Tuple
+import numpy as np
+from logger import transform_logger
+from tps_solver import tps_kernel
+
+# 補間節点の数（1軸あたり）の初期値と上限。誤差が許容値を超える場合は FAST_ORDER_STEP ずつ増やす
+FAST_ORDER = 8
+FAST_MAX_ORDER = 16
+FAST_ORDER_STEP = 4
+# 最下層のブロック1つあたりに含まれる対応点の目安と、ブロックの最小サイズ（画素）
+LEAF_POINTS = 2.0
+MIN_LEAF_SIZE = 16.0
+
+def _chebyshev_nodes(order: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    区間 [0, 1] 上の第1種 Chebyshev 節点と、重心型 Lagrange 補間の重みを返します。
+    """
+    angles = (2 * np.arange(order) + 1) * np.pi / (2 * order)
+    nodes = (1.0 - np.cos(angles)) / 2.0
+    weights = (-1.0) ** np.arange(order) * np.sin(angles)
+    return nodes, weights
+
+def _lagrange_basis(t: np.ndarray, nodes: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """
+    ブロック内の正規化座標 t における各節点の Lagrange 基底関数の値を返します。
+
+    Returns:
+        np.ndarray: 形状 (len(t), len(nodes)) の基底関数値
+    """
+    diff = np.asarray(t, dtype=np.float64)[:, None] - nodes[None, :]
+    exact = diff == 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        terms = weights / diff
+        basis = terms / terms.sum(axis=1, keepdims=True)
+    hit = exact.any(axis=1)
+    basis[hit] = exact[hit]
+    return basis
+
+def _is_sorted(values: np.ndarray) -> bool:
+    return bool(np.all(values[1:] >= values[:-1]))
+
+def _as_index(indices: np.ndarray) -> Any:
+    """
+    連続した番号の配列はスライスに変換し、コピーを伴わない基本インデックスで参照できるようにします。
+    """
+    if indices.size and indices[-1] - indices[0] == indices.size - 1 and _is_sorted(indices):
+        return slice(int(indices[0]), int(indices[-1]) + 1)
+    return indices
+
+class FastTPSEvaluator:
+    """
+    TPS の動径基底関数の和 Σ w_i U(|x - x_i|) を、対応点の数によらない画素あたりの計算量で近似評価します。
+
+    出力画像を含む正方形を四分木状のブロックに分け、各ブロックでは近傍（自身と隣接する 3x3 ブロック）の外にある
+    対応点の寄与（遠方場）を、ブロック内の p x p 個の Chebyshev 節点での値として保持します。遠方場は滑らかなため
+    多項式補間で精度よく表せ、子ブロックの遠方場は親の補間多項式に「親の近傍にあり自身の近傍にない」対応点
+    （高々 27 ブロック分）の寄与を加えて求められます。最下層のブロックの画素では、遠方場の補間値に近傍の対応点の
+    寄与を厳密に加えます。構築は O(N log N p^2)、画素あたりの評価は O(p + 近傍の点数) です。
+
+    補間の誤差は節点数 p に対して指数的に減少します。tolerance を指定した場合は、標本画素での厳密評価との
+    最大誤差が tolerance 以下になるまで p を増やして構築し直します。
+    """
+    def __init__(self, params_x: np.ndarray, params_y: np.ndarray, dest_points: np.ndarray,
+                 output_size: Tuple[int, int], order: int = FAST_ORDER, tolerance: Optional[float] = None,
+                 max_memory_mb: Optional[float] = None) -> None:
+        """
+        Args:
+            params_x (np.ndarray): x方向のTPSパラメータ
+            params_y (np.ndarray): y方向のTPSパラメータ
+            dest_points (np.ndarray): 変換先対応点配列 (N, 2)
+            output_size (Tuple[int, int]): 出力画像のサイズ (width, height)
+            order (int, optional): ブロックあたりの補間節点の数（1軸あたり）。大きいほど高精度
+            tolerance (Optional[float], optional): 許容する最大誤差（画素）
+            max_memory_mb (Optional[float], optional): 構築時の一時配列のメモリ上限（MB）
+        """
+        dest_points = np.asarray(dest_points, dtype=np.float64).reshape(-1, 2)
+        weights = np.stack((params_x[:dest_points.shape[0]], params_y[:dest_points.shape[0]]), axis=1)
+        # 重みが 0 の点（低ランク近似でランドマーク以外の点）は寄与しないため除く
+        active = np.any(weights != 0, axis=1)
+        self.dest_points = dest_points[active] if active.any() else dest_points[:1]
+        self.weights = weights[active] if active.any() else np.zeros((1, 2))
+        n = self.dest_points.shape[0]
+        self.affine = np.stack((params_x[-3:], params_y[-3:]), axis=1)
+        self.width, self.height = output_size
+        self.order = max(2, int(order))
+        self.max_memory_mb = max_memory_mb
+
+        # 出力画像（1画素の余白を含む）と全対応点を含む正方形を根のブロックとする
+        self._query = np.array([[-1.0, -1.0], [float(self.width), float(self.height)]])
+        lower = np.minimum(self._query[0], self.dest_points.min(axis=0)) - 1.0
+        upper = np.maximum(self._query[1], self.dest_points.max(axis=0)) + 1.0
+        side = float(np.max(upper - lower))
+        area = float(np.prod(self._query[1] - self._query[0]))
+        target = max(MIN_LEAF_SIZE, math.sqrt(LEAF_POINTS * area / max(n, 1)))
+        self.levels = max(2, int(math.ceil(math.log2(side / target))))
+        self.origin = lower
+        self.side = side
+        self.leaf_size = side / 2 ** self.levels
+
+        self._build()
+        self.max_error = self.estimate_error()
+        while tolerance is not None and self.max_error > tolerance and self.order < FAST_MAX_ORDER:
+            transform_logger.debug("Fast TPS error %.4f px exceeds tolerance %.4f px at order %d; refining",
+                                   self.max_error, tolerance, self.order)
+            self.order = min(FAST_MAX_ORDER, self.order + FAST_ORDER_STEP)
+            self._build()
+            self.max_error = self.estimate_error()
+        transform_logger.debug("Fast TPS evaluator built: n=%d, levels=%d, leaf=%.1f px, order=%d, max error=%.4f px",
+                               n, self.levels, self.leaf_size, self.order, self.max_error)
+
+    def _block_range(self, size: float) -> Tuple[int, int]:
+        # 出力画像にかかるブロックの範囲（x, y それぞれの先頭番号）と個数
+        first = np.floor((self._query[0] - self.origin) / size).astype(np.int64)
+        last = np.floor((self._query[1] - self.origin) / size).astype(np.int64)
+        return first, last - first + 1
+
+    def _cells(self, size: float) -> np.ndarray:
+        return np.floor((self.dest_points - self.origin) / size).astype(np.int64)
+
+    def _pair_chunk(self) -> int:
+        # (対応点, ブロック) の組ごとに p^2 個の節点について数個の float64 配列を確保する
+        budget = (self.max_memory_mb or 256) * 1024 * 1024
+        return max(1, int(budget // (8 * 8 * self.order ** 2)))
+
+    def _build(self) -> None:
+        p = self.order
+        self._nodes, self._bary = _chebyshev_nodes(p)
+        # 子ブロック（親の左右・上下の半分）の節点での、親の節点に対する Lagrange 基底関数の値
+        halves = [_lagrange_basis((q + self._nodes) / 2.0, self._nodes, self._bary) for q in (0, 1)]
+
+        # 第1層（2x2 ブロック）では全対応点が近傍にあるため遠方場は 0
+        first, count = self._block_range(self.side / 2)
+        values = np.zeros((count[1], count[0], 2, p, p), dtype=np.float64)
+        for level in range(2, self.levels + 1):
+            size = self.side / 2 ** level
+            parent_first, parent_values = first, values
+            first, count = self._block_range(size)
+            values = np.empty((count[1], count[0], 2, p, p), dtype=np.float64)
+            rows = np.arange(count[1]) + first[1]
+            cols = np.arange(count[0]) + first[0]
+            for qy in (0, 1):
+                row_sel = np.nonzero(rows % 2 == qy)[0]
+                for qx in (0, 1):
+                    col_sel = np.nonzero(cols % 2 == qx)[0]
+                    if row_sel.size == 0 or col_sel.size == 0:
+                        continue
+                    parent = parent_values[(rows[row_sel] // 2 - parent_first[1])][:, cols[col_sel] // 2 - parent_first[0]]
+                    values[np.ix_(row_sel, col_sel)] = np.einsum("ak,bl,rcfkl->rcfab", halves[qx], halves[qy], parent)
+            self._add_interactions(values, first, count, size)
+        self._values = values
+        self._first = first
+        self._count = count
+        self._build_near_lists()
+
+    def _add_interactions(self, values: np.ndarray, first: np.ndarray, count: np.ndarray, size: float) -> None:
+        """
+        親ブロックの近傍にあり、自身の近傍にない対応点の寄与を各ブロックの節点に加えます。
+        """
+        p = self.order
+        cells = self._cells(size)
+        # 親の近傍に含まれるブロックは各軸 6 個。そのうち自身の近傍（各軸 3 個）の直積を除いた高々 27 個
+        candidates = 2 * (cells // 2)[:, :, None] - 2 + np.arange(6)
+        bx = candidates[:, 0, None, :]
+        by = candidates[:, 1, :, None]
+        far = (np.abs(bx - cells[:, 0, None, None]) > 1) | (np.abs(by - cells[:, 1, None, None]) > 1)
+        inside = ((bx >= first[0]) & (bx < first[0] + count[0]) & (by >= first[1]) & (by < first[1] + count[1]))
+        source, iy, ix = np.nonzero(far & inside)
+        if source.size == 0:
+            return
+        block_x = candidates[source, 0, ix]
+        block_y = candidates[source, 1, iy]
+        block_id = (block_y - first[1]) * count[0] + (block_x - first[0])
+        flat = values.reshape(-1, 2, p * p)
+        node_offset = np.arange(p * p)
+        chunk = self._pair_chunk()
+        for start in range(0, source.size, chunk):
+            stop = min(start + chunk, source.size)
+            src = source[start:stop]
+            node_x = self.origin[0] + (block_x[start:stop, None] + self._nodes) * size
+            node_y = self.origin[1] + (block_y[start:stop, None] + self._nodes) * size
+            dx = node_x[:, :, None] - self.dest_points[src, 0, None, None]
+            dy = node_y[:, None, :] - self.dest_points[src, 1, None, None]
+            # 近傍の外の点なので r2 > 0
+            r2 = dx * dx + dy * dy
+            kernel = (r2 * np.log(r2)).reshape(stop - start, p * p)
+            index = (block_id[start:stop, None] * (p * p) + node_offset).ravel()
+            for f in range(2):
+                contribution = (kernel * self.weights[src, f, None]).ravel()
+                flat[:, f] += np.bincount(index, weights=contribution, minlength=flat.shape[0] * p * p).reshape(-1, p * p)
+
+    def _build_near_lists(self) -> None:
+        # 最下層の各ブロックについて、近傍（3x3 ブロック）にある対応点の番号を CSR 形式で保持する
+        cells = self._cells(self.leaf_size)
+        offsets = np.arange(-1, 2)
+        bx = cells[:, 0, None, None] + offsets[None, None, :]
+        by = cells[:, 1, None, None] + offsets[None, :, None]
+        inside = ((bx >= self._first[0]) & (bx < self._first[0] + self._count[0]) &
+                  (by >= self._first[1]) & (by < self._first[1] + self._count[1]))
+        source, iy, ix = np.nonzero(inside)
+        block_id = (by[source, iy, 0] - self._first[1]) * self._count[0] + (bx[source, 0, ix] - self._first[0])
+        order = np.argsort(block_id, kind="stable")
+        self._near_points = source[order]
+        counts = np.bincount(block_id, minlength=int(self._count[0] * self._count[1]))
+        self._near_offsets = np.concatenate(([0], np.cumsum(counts)))
+        self.max_near = int(counts.max()) if counts.size else 0
+
+    def _kernel_sum(self, points: np.ndarray, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        """
+        points で指定した対応点の寄与を、xs と ys の直積グリッド上で厳密に合計します。
+
+        Returns:
+            np.ndarray: 形状 (2, len(ys), len(xs)) の x, y 成分
+        """
+        total = np.zeros((2, ys.size, xs.size), dtype=np.float64)
+        if points.size == 0 or xs.size == 0 or ys.size == 0:
+            return total
+        # 一時配列 (点数, len(ys), len(xs)) がメモリ上限に収まるように点を分ける
+        budget = (self.max_memory_mb or 256) * 1024 * 1024
+        chunk = max(1, int(budget // (8 * 4 * xs.size * ys.size)))
+        for start in range(0, points.size, chunk):
+            ids = points[start:start + chunk]
+            dx = xs[None, None, :] - self.dest_points[ids, 0, None, None]
+            dy = ys[None, :, None] - self.dest_points[ids, 1, None, None]
+            kernel = tps_kernel(dx * dx + dy * dy)
+            total += np.tensordot(self.weights[ids].T, kernel, axes=1)
+        return total
+
+    def evaluate_grid(self, xs: np.ndarray, ys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        列座標 xs と行座標 ys の直積グリッド上で TPS マッピングを評価します。
+        出力画像の外側の座標は厳密に評価します。
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: 形状 (len(ys), len(xs)) の x, y 座標マップ
+        """
+        xs = np.asarray(xs, dtype=np.float64).ravel()
+        ys = np.asarray(ys, dtype=np.float64).ravel()
+        result = np.empty((2, ys.size, xs.size), dtype=np.float64)
+        for f in range(2):
+            result[f] = self.affine[0, f] + self.affine[1, f] * xs[None, :] + self.affine[2, f] * ys[:, None]
+
+        u = (xs - self.origin[0]) / self.leaf_size
+        v = (ys - self.origin[1]) / self.leaf_size
+        block_x = np.floor(u).astype(np.int64) - self._first[0]
+        block_y = np.floor(v).astype(np.int64) - self._first[1]
+        inside_x = (block_x >= 0) & (block_x < self._count[0])
+        inside_y = (block_y >= 0) & (block_y < self._count[1])
+        all_points = np.arange(self.dest_points.shape[0])
+        if not inside_y.all():
+            rows = np.nonzero(~inside_y)[0]
+            result[:, rows] += self._kernel_sum(all_points, xs, ys[rows])
+        if not inside_x.all():
+            rows = np.nonzero(inside_y)[0]
+            cols = np.nonzero(~inside_x)[0]
+            result[:, rows[:, None], cols] += self._kernel_sum(all_points, xs[cols], ys[rows])
+
+        cols = np.nonzero(inside_x)[0]
+        if cols.size == 0:
+            return result[0], result[1]
+        basis_x = _lagrange_basis(u[cols] - np.floor(u[cols]), self._nodes, self._bary)
+        # 出力画像内の列を、最下層のブロックごとの位置（cols 内の番号）にまとめる
+        positions = np.argsort(block_x[cols], kind="stable")
+        col_blocks, col_starts = np.unique(block_x[cols][positions], return_index=True)
+        col_groups = np.split(positions, col_starts[1:])
+        col_index = _as_index(cols)
+        for local_y in np.unique(block_y[inside_y]):
+            rows = np.nonzero(block_y == local_y)[0]
+            basis_y = _lagrange_basis(v[rows] - np.floor(v[rows]), self._nodes, self._bary)
+            row_index = _as_index(rows)
+            if not isinstance(row_index, slice) and not isinstance(col_index, slice):
+                row_index = rows[:, None]
+            block = result[:, row_index, col_index]
+            # 遠方場: 各列で x 方向の基底を掛けてから、y 方向の基底との行列積を取る
+            partial = (basis_x[:, None, None, :] @ self._values[local_y][block_x[cols]])[:, :, 0, :]
+            for f in range(2):
+                block[f] += basis_y @ partial[:, f, :].T
+            # 近傍: ブロックごとに厳密に加える
+            for local_x, group in zip(col_blocks, col_groups):
+                block_id = local_y * self._count[0] + local_x
+                near = self._near_points[self._near_offsets[block_id]:self._near_offsets[block_id + 1]]
+                if near.size:
+                    block[:, :, group] += self._kernel_sum(near, xs[cols[group]], ys[rows])
+            result[:, row_index, col_index] = block
+        return result[0], result[1]
+
+    def estimate_error(self, samples_per_axis: int = 32) -> float:
+        """
+        出力画像全体に散らばる標本画素で厳密評価と比較し、最大誤差（画素）を返します。
+        """
+        xs = (np.arange(samples_per_axis) + 0.37) * self.width / samples_per_axis
+        ys = (np.arange(samples_per_axis) + 0.61) * self.height / samples_per_axis
+        approx_x, approx_y = self.evaluate_grid(xs, ys)
+        exact = self._kernel_sum(np.arange(self.dest_points.shape[0]), xs, ys)
+        exact_x = self.affine[0, 0] + self.affine[1, 0] * xs[None, :] + self.affine[2, 0] * ys[:, None] + exact[0]
+        exact_y = self.affine[0, 1] + self.affine[1, 1] * xs[None, :] + self.affine[2, 1] * ys[:, None] + exact[1]
+        error = np.hypot(approx_x - exact_x, approx_y - exact_y)
+        return float(error.max()) if error.size else 0.0
@@ -0,0 +1,663 @@
+# src/tps_solver.py
+
+import functools
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Tuple
+import numpy as np
+from logger import transform_logger
+import tracing
+
+# 同一の対応点集合に対する分解結果を保持する数（LRU）
+SOLVER_CACHE_SIZE = 8
+# 低ランク近似で基底関数の中心とするランドマークの数の既定値
+LOWRANK_LANDMARKS = 1000
+# GCV で正則化パラメータを選ぶ際に評価する候補の数と、候補の範囲（K の固有値の最大値に対する比）
+GCV_SAMPLES = 64
+GCV_RANGE = (1e-10, 1e2)
+# 逐次更新後の解の後退誤差が、分解直後の値のこの倍数（かつ DRIFT_TOLERANCE）を超えたら分解し直す
+DRIFT_FACTOR = 100.0
+DRIFT_TOLERANCE = 1e-12
+
+def tps_kernel(r2: np.ndarray) -> np.ndarray:
+    """
+    TPS の動径基底関数 U(r) = r^2 log(r^2) を計算します（r = 0 では 0）。
+
+    Args:
+        r2 (np.ndarray): 距離の二乗
+
+    Returns:
+        np.ndarray: カーネル値
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        K = r2 * np.log(r2)
+    K[np.isnan(K)] = 0
+    return K
+
+def _synchronized(method: Callable) -> Callable:
+    """
+    メソッドをソルバーごとのロック（_lock）の中で実行します。
+    キャッシュのソルバーは複数のスレッドから共有されるため、解く処理と分解・更新が同時に走らないようにします。
+    """
+    @functools.wraps(method)
+    def wrapper(self: Any, *args: Any, **kwargs: Any) -> Any:
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+class TPSSolver:
+    """
+    TPS の連立方程式（ブロック行列 L）を一度だけ分解し、繰り返し解くためのソルバーです。
+
+    内部では L をアフィン項が先頭に来る順序 [[0, P^T], [P, K]] で保持し、その逆行列を
+    分解結果として保存します。条件数を抑えるため、座標は中心化・スケーリングした上で解き、
+    結果のパラメータは元の座標系の形式に戻して返します。対応点を 1 点追加・移動・削除した場合は、境界付き行列の
+    ブロック逆行列公式（Schur 補元）で O(n^2) の更新を行い、O(n^3) の再分解を避けます。
+
+    LU 分解ではなく逆行列を保持するのは、NumPy には LU 分解の再利用（lu_solve）や三角行列の解法がなく、
+    分解を保持しても解くたびに O(n^3) かかるためです。また、1 点の追加・削除を O(n^2) で反映できること、
+    leave_one_out に必要な L^{-1} の対角成分がそのまま得られることも理由です。
+    逆行列による解は λ が小さい場合や点がほぼ一直線上に並ぶ場合に精度が落ち、逐次更新では誤差が蓄積するため、
+    solve では元の行列 L も保持しておき、残差 rhs - L x から 1 回の反復改良で解を補正します。
+    補正前の後退誤差が分解直後の DRIFT_FACTOR 倍を超えた場合は、逐次更新で誤差が蓄積したとみなして再分解します。
+    refactor_interval 回の更新ごとにも再分解します。
+
+    get_tps_solver のキャッシュのソルバーは複数のスレッド（変換・プレビュー・サーバーのジョブ）で共有されるため、
+    解く処理・分解・逐次更新・複製はソルバーごとのロックの中で行い、分解結果と元の行列が常に対応するようにします。
+    """
+    def __init__(self, dest_points: np.ndarray, reg_lambda: float = 1e-3, refactor_interval: int = 32) -> None:
+        """
+        Args:
+            dest_points (np.ndarray): 変換先の対応点配列 (N, 2)
+            reg_lambda (float, optional): 正則化パラメータ（adaptive 調整後の値）
+            refactor_interval (int, optional): 再分解までに許容する逐次更新の回数
+        """
+        self.dest_points = np.array(dest_points, dtype=np.float64).reshape(-1, 2)
+        self.reg_lambda = float(reg_lambda)
+        self.refactor_interval = refactor_interval
+        self._updates = 0
+        self._lock = threading.RLock()
+        self.factorize()
+
+    @property
+    def n(self) -> int:
+        return self.dest_points.shape[0]
+
+    def _normalize(self, points: np.ndarray) -> np.ndarray:
+        return (points - self._center) / self._scale
+
+    def _kernel_column(self, point: np.ndarray) -> np.ndarray:
+        r2 = np.sum((self._normalize(self.dest_points) - self._normalize(point)) ** 2, axis=1)
+        return tps_kernel(r2)
+
+    def _set_normalization(self) -> None:
+        # U(s r) = s^2 U(r) + s^2 r^2 log(s^2) であり、後者はアフィン項に吸収されるため、
+        # 正規化座標では正則化パラメータを 1/s^2 倍した系を解けばよい
+        self._center = self.dest_points.mean(axis=0)
+        extent = float(np.max(np.ptp(self.dest_points, axis=0))) if self.n > 1 else 0.0
+        self._scale = extent / 2.0 if extent > 0 else 1.0
+        self._scaled_lambda = self.reg_lambda / self._scale ** 2
+
+    @_synchronized
+    def factorize(self) -> None:
+        """
+        現在の対応点からブロック行列を構築し、分解（逆行列）を計算し直します。
+
+        Raises:
+            ValueError: 行列が特異で分解できない場合
+        """
+        n = self.n
+        self._set_normalization()
+        with tracing.span("kernel", points=n):
+            normalized = self._normalize(self.dest_points)
+            diff = normalized[:, None, :] - normalized[None, :, :]
+            K = tps_kernel(np.sum(diff ** 2, axis=2))
+            K += self._scaled_lambda * np.eye(n)
+            P = np.hstack((np.ones((n, 1)), normalized))
+            M = np.zeros((n + 3, n + 3), dtype=np.float64)
+            M[:3, 3:] = P.T
+            M[3:, :3] = P
+            M[3:, 3:] = K
+        try:
+            with tracing.span("factorize", points=n):
+                self._inverse = np.linalg.inv(M)
+        except np.linalg.LinAlgError as e:
+            raise ValueError(f"TPS system is singular: {e}")
+        self._matrix = M
+        self._updates = 0
+        # 分解直後の逆行列による解の後退誤差（逐次更新で誤差が蓄積したかを判断する基準）
+        probe = np.zeros((n + 3, 1), dtype=np.float64)
+        probe[3:, 0] = np.cos(np.arange(n))
+        self._baseline_error = self._backward_error(probe, self._inverse @ probe)
+        transform_logger.debug("TPS system factorized (n=%d, backward error %.2e)", n, self._baseline_error)
+
+    def _backward_error(self, rhs: np.ndarray, solution: np.ndarray, residual: Optional[np.ndarray] = None) -> float:
+        # 正規化した後退誤差 |rhs - L x| / (|L| |x| + |rhs|)（無限大ノルム）
+        if residual is None:
+            residual = rhs - self._matrix @ solution
+        scale = np.abs(self._matrix).sum(axis=1).max() * np.abs(solution).max() + np.abs(rhs).max()
+        return float(np.abs(residual).max() / scale) if scale > 0 else 0.0
+
+    def _solve_system(self, rhs: np.ndarray) -> np.ndarray:
+        """
+        逆行列で L x = rhs を解き、元の行列に対する残差から 1 回の反復改良を行います。
+        逐次更新による誤差の蓄積が検出された場合は再分解してから解き直します。
+        """
+        solution = self._inverse @ rhs
+        residual = rhs - self._matrix @ solution
+        if self._updates:
+            error = self._backward_error(rhs, solution, residual)
+            if error > max(DRIFT_TOLERANCE, DRIFT_FACTOR * self._baseline_error):
+                transform_logger.debug("TPS factor drift %.2e after %d updates; refactorizing", error, self._updates)
+                self.factorize()
+                solution = self._inverse @ rhs
+                residual = rhs - self._matrix @ solution
+        return solution + self._inverse @ residual
+
+    @_synchronized
+    def copy(self) -> "TPSSolver":
+        """
+        分解結果を含むソルバーの複製を返します。
+        """
+        clone = TPSSolver.__new__(TPSSolver)
+        clone.dest_points = self.dest_points.copy()
+        clone.reg_lambda = self.reg_lambda
+        clone.refactor_interval = self.refactor_interval
+        clone._lock = threading.RLock()
+        clone._updates = self._updates
+        clone._center = self._center
+        clone._scale = self._scale
+        clone._scaled_lambda = self._scaled_lambda
+        clone._inverse = self._inverse.copy()
+        clone._matrix = self._matrix.copy()
+        clone._baseline_error = self._baseline_error
+        return clone
+
+    @_synchronized
+    def solve(self, src_points: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        x, y 両方の右辺を 1 回の行列積で解き、TPS パラメータを返します。
+
+        Args:
+            src_points (np.ndarray): 変換元の対応点配列 (N, 2)
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (params_x, params_y)。各配列は [w_1..w_N, a_0, a_x, a_y] の順
+        """
+        src_points = np.asarray(src_points, dtype=np.float64).reshape(-1, 2)
+        if src_points.shape[0] != self.n:
+            raise ValueError(f"Expected {self.n} source points, got {src_points.shape[0]}")
+        rhs = np.zeros((self.n + 3, 2), dtype=np.float64)
+        rhs[3:] = src_points
+        solution = self._solve_system(rhs)
+        return self._to_original_params(solution[3:], solution[:3])
+
+    @_synchronized
+    def leave_one_out(self, src_points: np.ndarray) -> np.ndarray:
+        """
+        各対応点を除いて当てはめ直した TPS がその点で生じる予測誤差（leave-one-out 残差）を、
+        点ごとに解き直すことなく分解結果から一度に求めます。
+
+        L の逆行列を B とすると、点 i を除いた系の解の点 i での予測誤差は w_i / B_ii になります
+        （Rippa の公式。正則化項 λI は K の対角にあるため、除いた点でも同じ式が成り立ちます）。
+        計算量は solve と同じ O(n^2) です。
+
+        Args:
+            src_points (np.ndarray): 変換元の対応点配列 (N, 2)
+
+        Returns:
+            np.ndarray: 形状 (N, 2) の予測誤差（src_points と同じ座標系）。点を除くと解けない場合は inf
+
+        Raises:
+            ValueError: 点数が 4 未満の場合
+        """
+        src_points = np.asarray(src_points, dtype=np.float64).reshape(-1, 2)
+        if src_points.shape[0] != self.n:
+            raise ValueError(f"Expected {self.n} source points, got {src_points.shape[0]}")
+        if self.n < 4:
+            raise ValueError("Leave-one-out residuals require at least 4 points")
+        rhs = np.zeros((self.n + 3, 2), dtype=np.float64)
+        rhs[3:] = src_points
+        w = self._solve_system(rhs)[3:]
+        pivots = np.diagonal(self._inverse)[3:]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            errors = w / pivots[:, None]
+        errors[~np.isfinite(errors)] = np.inf
+        return errors
+
+    def _to_original_params(self, w: np.ndarray, a: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # 正規化座標での解 (w', a') を元の座標系の [w, a] に変換する
+        s2 = self._scale ** 2
+        weights = w / s2
+        shift = np.log(s2) * (np.sum(self._normalize(self.dest_points) ** 2, axis=1) @ w)
+        affine = np.empty_like(a)
+        affine[1] = a[1] / self._scale
+        affine[2] = a[2] / self._scale
+        affine[0] = a[0] - affine[1] * self._center[0] - affine[2] * self._center[1] - shift
+        params = np.vstack((weights, affine))
+        return params[:, 0].copy(), params[:, 1].copy()
+
+    def _after_update(self) -> None:
+        self._updates += 1
+        if self._updates >= self.refactor_interval:
+            transform_logger.debug("Refactorizing TPS system after %d updates", self._updates)
+            self.factorize()
+
+    def _append(self, point: np.ndarray) -> None:
+        # 境界付き行列 [[M, b], [b^T, c]] の逆行列を Schur 補元から求める
+        b = np.concatenate(([1.0], self._normalize(point), self._kernel_column(point)))
+        c = self._scaled_lambda
+        Mb = self._inverse @ b
+        schur = c - b @ Mb
+        if abs(schur) < 1e-12 * max(1.0, abs(c)):
+            raise np.linalg.LinAlgError("Degenerate point update")
+        m = self._inverse.shape[0]
+        inverse = np.empty((m + 1, m + 1), dtype=np.float64)
+        inverse[:m, :m] = self._inverse + np.outer(Mb, Mb) / schur
+        inverse[:m, m] = -Mb / schur
+        inverse[m, :m] = -Mb / schur
+        inverse[m, m] = 1.0 / schur
+        matrix = np.empty((m + 1, m + 1), dtype=np.float64)
+        matrix[:m, :m] = self._matrix
+        matrix[:m, m] = b
+        matrix[m, :m] = b
+        matrix[m, m] = c
+        self._inverse = inverse
+        self._matrix = matrix
+        self.dest_points = np.vstack((self.dest_points, point[None, :]))
+
+    def _remove(self, index: int) -> None:
+        # 逆行列から 1 行 1 列を取り除く（Schur 補元によるダウンデート）
+        j = index + 3
+        B = self._inverse
+        keep = np.r_[0:j, j + 1:B.shape[0]]
+        pivot = B[j, j]
+        if abs(pivot) < 1e-300:
+            raise np.linalg.LinAlgError("Degenerate point removal")
+        self._inverse = B[np.ix_(keep, keep)] - np.outer(B[keep, j], B[j, keep]) / pivot
+        self._matrix = self._matrix[np.ix_(keep, keep)]
+        self.dest_points = np.delete(self.dest_points, index, axis=0)
+
+    def _move_last_to(self, index: int) -> None:
+        # 末尾の点を index の位置へ移す（逆行列も同じ置換で並べ替える）
+        last = self.n - 1
+        order = np.r_[0:index, last, index:last]
+        self.dest_points = self.dest_points[order]
+        perm = np.concatenate((np.arange(3), order + 3))
+        self._inverse = self._inverse[np.ix_(perm, perm)]
+        self._matrix = self._matrix[np.ix_(perm, perm)]
+
+    @_synchronized
+    def add_point(self, point: Tuple[float, float], index: Optional[int] = None) -> None:
+        """
+        対応点を 1 点追加し、分解結果を O(n^2) で更新します。
+
+        Args:
+            point (Tuple[float, float]): 追加する変換先の点
+            index (Optional[int], optional): 挿入位置。None の場合は末尾に追加
+        """
+        point = np.asarray(point, dtype=np.float64).reshape(2)
+        original = self.dest_points
+        try:
+            self._append(point)
+            if index is not None and index < self.n - 1:
+                self._move_last_to(index)
+        except np.linalg.LinAlgError:
+            pos = original.shape[0] if index is None else index
+            self.dest_points = np.insert(original, pos, point, axis=0)
+            self.factorize()
+            return
+        self._after_update()
+
+    @_synchronized
+    def remove_point(self, index: int) -> None:
+        """
+        対応点を 1 点削除し、分解結果を O(n^2) で更新します。
+
+        Args:
+            index (int): 削除する点のインデックス
+        """
+        original = self.dest_points
+        try:
+            self._remove(index)
+        except np.linalg.LinAlgError:
+            self.dest_points = np.delete(original, index, axis=0)
+            self.factorize()
+            return
+        self._after_update()
+
+    @_synchronized
+    def move_point(self, index: int, point: Tuple[float, float]) -> None:
+        """
+        対応点を 1 点移動し、削除と追加の 2 回の更新で分解結果を更新します。
+
+        Args:
+            index (int): 移動する点のインデックス
+            point (Tuple[float, float]): 移動先の座標
+        """
+        point = np.asarray(point, dtype=np.float64).reshape(2)
+        original = self.dest_points
+        try:
+            self._remove(index)
+            self._append(point)
+            self._move_last_to(index)
+        except np.linalg.LinAlgError:
+            self.dest_points = original.copy()
+            self.dest_points[index] = point
+            self.factorize()
+            return
+        self._after_update()
+
+def select_landmarks(points: np.ndarray, count: int) -> np.ndarray:
+    """
+    最遠点サンプリングで、点群から空間的に均等に散らばる count 個の点を選びます。
+    重心に最も近い点から始めるため、結果は入力の順序にだけ依存し決定的です。
+
+    Args:
+        points (np.ndarray): 点群 (N, 2)
+        count (int): 選ぶ点の数。重複しない点の数より多い場合は、重複しない点をすべて選びます
+
+    Returns:
+        np.ndarray: 選んだ点のインデックス（昇順）
+    """
+    n = points.shape[0]
+    count = min(int(count), n)
+    first = int(np.argmin(np.sum((points - points.mean(axis=0)) ** 2, axis=1)))
+    selected = [first]
+    distance = np.sum((points - points[first]) ** 2, axis=1)
+    while len(selected) < count:
+        farthest = int(np.argmax(distance))
+        if distance[farthest] == 0:
+            break
+        selected.append(farthest)
+        np.minimum(distance, np.sum((points - points[farthest]) ** 2, axis=1), out=distance)
+    return np.sort(np.array(selected, dtype=np.int64))
+
+class LowRankTPSSolver(TPSSolver):
+    """
+    対応点から選んだ m 個のランドマークだけを動径基底関数の中心とする TPS を、
+    全対応点に対する正則化最小二乗で当てはめるソルバーです（Nyström 型の低ランク近似）。
+
+    厳密な TPS が最小化する ||y - f||^2 + λ w^T K w を、w をランドマーク上に制限して解きます。
+    アフィン項との直交条件 P_m^T c = 0 は零空間の基底 Q2 で c = Q2 γ と表して消去し、
+    罰則項は Q2^T K_mm Q2 の平方根 R を使って最小二乗の行 [sqrt(λ) R, 0] として積み重ねます。
+    この (n + m - 3) x m の行列を QR 分解しておけば、右辺ごとの解は O(n m) で求まります。
+    密な (n+3)x(n+3) 行列は作らず、計算量は O(n m^2)、メモリは O(n m) です。
+
+    結果のパラメータは TPSSolver と同じ [w_1..w_N, a_0, a_x, a_y] の形式で、ランドマーク以外の重みは 0 です。
+    厳密な TPS は（正則化の分を除き）対応点を補間するため、solve のたびに対応点での当てはめ残差
+    （厳密解との差の目安）を residual に記録します。
+    """
+    def __init__(self, dest_points: np.ndarray, reg_lambda: float = 1e-3, landmarks: int = LOWRANK_LANDMARKS) -> None:
+        """
+        Args:
+            dest_points (np.ndarray): 変換先の対応点配列 (N, 2)
+            reg_lambda (float, optional): 正則化パラメータ（adaptive 調整後の値）
+            landmarks (int, optional): ランドマークの数
+        """
+        self.landmark_count = max(4, int(landmarks))
+        self.residual: Optional[Tuple[float, float]] = None
+        super().__init__(dest_points, reg_lambda)
+
+    @_synchronized
+    def factorize(self) -> None:
+        """
+        ランドマークを選び直し、最小二乗の係数行列を QR 分解します。
+
+        Raises:
+            ValueError: 係数行列の階数が不足して解けない場合
+        """
+        n = self.n
+        self._set_normalization()
+        normalized = self._normalize(self.dest_points)
+        self.landmarks = select_landmarks(normalized, self.landmark_count)
+        m = self.landmarks.size
+        if m < 4:
+            raise ValueError("TPS system is singular: fewer than 4 distinct points")
+        centers = normalized[self.landmarks]
+        with tracing.span("kernel", points=n, landmarks=m):
+            P_m = np.hstack((np.ones((m, 1)), centers))
+            basis, _ = np.linalg.qr(P_m, mode="complete")
+            self._null_basis = basis[:, 3:]
+            K_mm = tps_kernel(np.sum((centers[:, None, :] - centers[None, :, :]) ** 2, axis=2))
+            eigenvalues, eigenvectors = np.linalg.eigh(self._null_basis.T @ K_mm @ self._null_basis)
+            penalty = np.sqrt(np.clip(eigenvalues, 0.0, None) * self._scaled_lambda)[:, None] * eigenvectors.T
+            system = np.zeros((n + m - 3, m), dtype=np.float64)
+            for start in range(0, n, 4096):
+                stop = min(start + 4096, n)
+                r2 = np.sum((normalized[start:stop, None, :] - centers[None, :, :]) ** 2, axis=2)
+                system[start:stop, :m - 3] = tps_kernel(r2) @ self._null_basis
+            system[:n, m - 3] = 1.0
+            system[:n, m - 2:] = normalized
+            system[n:, :m - 3] = penalty
+        with tracing.span("factorize", points=n, landmarks=m):
+            q, r = np.linalg.qr(system)
+            if np.min(np.abs(np.diag(r))) < 1e-12 * np.max(np.abs(np.diag(r))):
+                raise ValueError("TPS system is singular: rank-deficient low-rank system")
+            # 右辺の罰則行は 0 のため、Q の上側 n 行だけを保持する
+            self._q_top = np.ascontiguousarray(q[:n])
+            self._r = r
+        self._updates = 0
+        transform_logger.debug("Low-rank TPS system factorized (n=%d, m=%d)", n, m)
+
+    @_synchronized
+    def copy(self) -> "LowRankTPSSolver":
+        clone = LowRankTPSSolver.__new__(LowRankTPSSolver)
+        clone.__dict__.update(self.__dict__)
+        clone._lock = threading.RLock()
+        clone.dest_points = self.dest_points.copy()
+        return clone
+
+    @_synchronized
+    def solve(self, src_points: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        x, y 両方の右辺を一度に解き、TPS パラメータを返します。対応点での残差を residual に記録します。
+
+        Args:
+            src_points (np.ndarray): 変換元の対応点配列 (N, 2)
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (params_x, params_y)。ランドマーク以外の w は 0
+        """
+        src_points = np.asarray(src_points, dtype=np.float64).reshape(-1, 2)
+        if src_points.shape[0] != self.n:
+            raise ValueError(f"Expected {self.n} source points, got {src_points.shape[0]}")
+        projected = self._q_top.T @ src_points
+        solution = np.linalg.solve(self._r, projected)
+        m = self.landmarks.size
+        w = np.zeros((self.n, 2), dtype=np.float64)
+        w[self.landmarks] = self._null_basis @ solution[:m - 3]
+        # 当てはめ値は Q_top Q_top^T y（罰則行の残差は含まない）
+        error = np.hypot(*(self._q_top @ projected - src_points).T)
+        self.residual = (float(error.max()), float(np.sqrt(np.mean(error ** 2))))
+        transform_logger.info("Low-rank TPS fit (n=%d, m=%d): residual at control points max %.4f, rms %.4f",
+                              self.n, m, self.residual[0], self.residual[1])
+        return self._to_original_params(w, solution[m - 3:])
+
+    @_synchronized
+    def leave_one_out(self, src_points: np.ndarray) -> np.ndarray:
+        """
+        各対応点を除いて当てはめ直した場合の予測誤差を、QR 分解から一度に求めます。
+
+        ランドマークの選び方を固定した最小二乗として扱い、点 i の残差 r_i とてこ比 h_ii = |Q_top[i]|^2 から
+        r_i / (1 - h_ii) で求めます。計算量は O(n m) です。
+
+        Args:
+            src_points (np.ndarray): 変換元の対応点配列 (N, 2)
+
+        Returns:
+            np.ndarray: 形状 (N, 2) の予測誤差（src_points と同じ座標系）。点を除くと解けない場合は inf
+        """
+        src_points = np.asarray(src_points, dtype=np.float64).reshape(-1, 2)
+        if src_points.shape[0] != self.n:
+            raise ValueError(f"Expected {self.n} source points, got {src_points.shape[0]}")
+        residual = src_points - self._q_top @ (self._q_top.T @ src_points)
+        leverage = np.einsum("ij,ij->i", self._q_top, self._q_top)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            errors = residual / (1.0 - leverage)[:, None]
+        errors[~np.isfinite(errors)] = np.inf
+        return errors
+
+    # 点の追加・削除・移動ではランドマークの選び方も変わるため、分解をやり直す
+    @_synchronized
+    def add_point(self, point: Tuple[float, float], index: Optional[int] = None) -> None:
+        pos = self.n if index is None else index
+        self.dest_points = np.insert(self.dest_points, pos, np.asarray(point, dtype=np.float64).reshape(2), axis=0)
+        self.factorize()
+
+    @_synchronized
+    def remove_point(self, index: int) -> None:
+        self.dest_points = np.delete(self.dest_points, index, axis=0)
+        self.factorize()
+
+    @_synchronized
+    def move_point(self, index: int, point: Tuple[float, float]) -> None:
+        self.dest_points = self.dest_points.copy()
+        self.dest_points[index] = point
+        self.factorize()
+
+def gcv_sweep(dest_points: np.ndarray, src_points: np.ndarray, lambdas: Optional[np.ndarray] = None,
+              samples: int = GCV_SAMPLES) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    正則化パラメータ λ の候補ごとに一般化交差検証（GCV）の値を計算します。
+
+    P = [Q1 Q2] R と QR 分解し、Q2^T K Q2 = V diag(e) V^T と一度だけ固有値分解しておくと、
+    当てはめ残差は λ Q2 V diag(1 / (e + λ)) V^T Q2^T y、影響行列の跡は n - Σ e / (e + λ) と表せます。
+    このため候補 1 つあたりの計算量は O(n) で、全体は固有値分解の O(n^3) だけで済みます。
+    x, y の 2 成分には共通の λ を使うため、GCV は両成分の残差の二乗和で評価します。
+    座標は TPSSolver と同じく正規化した上で計算し、λ は元の座標系の値で受け渡します。
+
+    Args:
+        dest_points (np.ndarray): 変換先の対応点配列 (N, 2)
+        src_points (np.ndarray): 変換元の対応点配列 (N, 2)
+        lambdas (Optional[np.ndarray], optional): 評価する λ。None の場合は K の固有値から決めた範囲を対数等間隔に評価
+        samples (int, optional): lambdas を省略した場合の候補の数
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (λ の候補（昇順）, 各候補の GCV の値)
+
+    Raises:
+        ValueError: 点数が 4 未満の場合、または対応点が一直線上に並ぶ場合
+    """
+    dest_points = np.asarray(dest_points, dtype=np.float64).reshape(-1, 2)
+    src_points = np.asarray(src_points, dtype=np.float64).reshape(-1, 2)
+    n = dest_points.shape[0]
+    if n < 4 or src_points.shape[0] != n:
+        raise ValueError("GCV requires at least 4 matching points")
+    center = dest_points.mean(axis=0)
+    extent = float(np.max(np.ptp(dest_points, axis=0)))
+    scale = extent / 2.0 if extent > 0 else 1.0
+    normalized = (dest_points - center) / scale
+    with tracing.span("gcv_eigh", points=n):
+        P = np.hstack((np.ones((n, 1)), normalized))
+        basis, r = np.linalg.qr(P, mode="complete")
+        if np.min(np.abs(np.diag(r))) < 1e-12 * np.max(np.abs(np.diag(r))):
+            raise ValueError("GCV requires points that are not collinear")
+        null_basis = basis[:, 3:]
+        K = tps_kernel(np.sum((normalized[:, None, :] - normalized[None, :, :]) ** 2, axis=2))
+        # TPS のカーネルは 2 次の条件付き正定値なので、零空間上では固有値は非負（丸め誤差の分は切り捨てる）
+        eigenvalues, eigenvectors = np.linalg.eigh(null_basis.T @ K @ null_basis)
+        eigenvalues = np.clip(eigenvalues, 0.0, None)
+        projected = eigenvectors.T @ (null_basis.T @ src_points)
+    energy = np.sum(projected ** 2, axis=1)
+    if lambdas is None:
+        top = float(eigenvalues.max()) if eigenvalues.size and eigenvalues.max() > 0 else 1.0
+        scaled = np.logspace(np.log10(top * GCV_RANGE[0]), np.log10(top * GCV_RANGE[1]), samples)
+    else:
+        scaled = np.sort(np.asarray(lambdas, dtype=np.float64).ravel()) / scale ** 2
+    # 残差への寄与の比率 λ / (e + λ)
+    ratio = scaled[:, None] / (eigenvalues[None, :] + scaled[:, None])
+    rss = (ratio ** 2) @ energy
+    trace = ratio.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scores = n * rss / trace ** 2
+    scores[~np.isfinite(scores)] = np.inf
+    return scaled * scale ** 2, scores
+
+def _single_edit(old: np.ndarray, new: np.ndarray) -> Optional[Tuple[str, int]]:
+    """
+    2 つの点集合が 1 点の追加・移動・削除だけ異なる場合、その操作とインデックスを返します。
+    """
+    n_old, n_new = old.shape[0], new.shape[0]
+    common = min(n_old, n_new)
+    mismatch = np.nonzero(np.any(old[:common] != new[:common], axis=1))[0]
+    j = int(mismatch[0]) if mismatch.size else common
+    if n_new == n_old:
+        if mismatch.size == 1:
+            return "move", j
+    elif n_new == n_old + 1:
+        if np.array_equal(new[j + 1:], old[j:]):
+            return "add", j
+    elif n_new == n_old - 1:
+        if np.array_equal(old[j + 1:], new[j:]):
+            return "remove", j
+    return None
+
+_solver_cache: "OrderedDict[Tuple[bytes, float, int], TPSSolver]" = OrderedDict()
+_solver_cache_lock = threading.Lock()
+
+def get_tps_solver(dest_points: np.ndarray, reg_lambda: float, lowrank_threshold: Optional[int] = None,
+                   lowrank_landmarks: int = LOWRANK_LANDMARKS) -> TPSSolver:
+    """
+    対応点と正則化パラメータに対応するソルバーをキャッシュから取得します。
+    キャッシュにない場合でも、1 点だけ異なるソルバーがあればそれを複製して逐次更新し、
+    それもなければ新たに分解します。
+
+    Args:
+        dest_points (np.ndarray): 変換先の対応点配列 (N, 2)
+        reg_lambda (float): 正則化パラメータ（adaptive 調整後の値）
+        lowrank_threshold (Optional[int], optional): 点数がこれを超える場合は LowRankTPSSolver を使う。
+            None または 0 以下の場合は常に厳密に解く
+        lowrank_landmarks (int, optional): 低ランク近似のランドマークの数
+
+    Returns:
+        TPSSolver: 分解済みのソルバー
+    """
+    dest_points = np.ascontiguousarray(dest_points, dtype=np.float64).reshape(-1, 2)
+    lowrank = bool(lowrank_threshold) and lowrank_threshold > 0 and dest_points.shape[0] > lowrank_threshold
+    key = (dest_points.tobytes(), float(reg_lambda), int(lowrank_landmarks) if lowrank else 0)
+    with _solver_cache_lock:
+        solver = _solver_cache.get(key)
+        if solver is not None:
+            _solver_cache.move_to_end(key)
+            transform_logger.debug("TPS solver cache hit (n=%d)", solver.n)
+            return solver
+        base = None
+        # 低ランク近似のソルバーは逐次更新できないため、更新の元にはしない
+        for cached in reversed(_solver_cache.values()):
+            if lowrank or cached.reg_lambda != float(reg_lambda) or isinstance(cached, LowRankTPSSolver):
+                continue
+            edit = _single_edit(cached.dest_points, dest_points)
+            if edit is not None:
+                base = (cached, edit)
+                break
+    if lowrank:
+        transform_logger.info("Using low-rank TPS solver: %d points > threshold %d, %d landmarks",
+                              dest_points.shape[0], lowrank_threshold, lowrank_landmarks)
+        solver = LowRankTPSSolver(dest_points, reg_lambda, lowrank_landmarks)
+    elif base is not None:
+        cached, (action, index) = base
+        transform_logger.debug("Updating cached TPS solver: %s point %d", action, index)
+        with tracing.span("factor_update", action=action, points=dest_points.shape[0]):
+            solver = cached.copy()
+            if action == "add":
+                solver.add_point(dest_points[index], index)
+            elif action == "remove":
+                solver.remove_point(index)
+            else:
+                solver.move_point(index, dest_points[index])
+    else:
+        solver = TPSSolver(dest_points, reg_lambda)
+    with _solver_cache_lock:
+        _solver_cache[key] = solver
+        _solver_cache.move_to_end(key)
+        while len(_solver_cache) > SOLVER_CACHE_SIZE:
+            _solver_cache.popitem(last=False)
+    return solver
+
+def clear_solver_cache() -> None:
+    """
+    ソルバーのキャッシュをすべて破棄します。
+    """
+    with _solver_cache_lock:
+        _solver_cache.clear()
@@ -0,0 +1,218 @@
+# src/tracing.py
+import os
+import json
+import time
+import threading
+import itertools
+import contextvars
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Set
+from app_settings import config
+from logger import RUN_LOG_DIR, transform_logger
+
+# 計測区間（スパン）を受け取るコールバック。引数は書き出される JSON と同じ辞書
+SpanCallback = Callable[[Dict[str, Any]], None]
+
+# transform.log と同じディレクトリに、1スパン1行の JSON として書き出す
+SPAN_LOG_PATH: str = os.path.join(RUN_LOG_DIR, "transform_spans.jsonl")
+
+_callbacks: List[SpanCallback] = []
+_callbacks_lock = threading.Lock()
+_write_lock = threading.Lock()
+_memory_lock = threading.Lock()
+_memory_spans: Set["Span"] = set()
+_memory_users = [0, False]  # (メモリを計測中のトレース数, tracemalloc を自分で開始したか)
+_ids = itertools.count(1)
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("kartenwarp_span", default=None)
+
+def add_span_callback(callback: SpanCallback) -> None:
+    """
+    スパンの終了ごとに呼び出されるコールバックを登録します。
+    コールバックが1つでも登録されている間は、設定 tracing/enabled に関わらず計測を行います。
+    """
+    with _callbacks_lock:
+        if callback not in _callbacks:
+            _callbacks.append(callback)
+
+def remove_span_callback(callback: SpanCallback) -> None:
+    with _callbacks_lock:
+        if callback in _callbacks:
+            _callbacks.remove(callback)
+
+def is_enabled() -> bool:
+    return bool(_callbacks) or config.get("tracing/enabled", False)
+
+def _emit(record: Dict[str, Any]) -> None:
+    if config.get("tracing/enabled", False):
+        line = json.dumps(record, ensure_ascii=False)
+        with _write_lock:
+            try:
+                with open(SPAN_LOG_PATH, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+            except OSError:
+                transform_logger.warning("Failed to write span log", exc_info=True)
+    with _callbacks_lock:
+        callbacks = list(_callbacks)
+    for callback in callbacks:
+        try:
+            callback(record)
+        except Exception:
+            transform_logger.exception("Span callback failed")
+
+def _update_memory_peaks() -> int:
+    # tracemalloc のピークはプロセス全体で1つのため、開いているスパンへ配ってからリセットする
+    current, peak = tracemalloc.get_traced_memory()
+    for span in _memory_spans:
+        span._peak = max(span._peak, peak)
+    tracemalloc.reset_peak()
+    return current
+
+class _Trace:
+    """
+    ルートのスパンから始まる1回分の計測です。ステージごとの合計時間を集計します。
+    """
+    def __init__(self, trace_memory: bool):
+        self.id = next(_ids)
+        self.trace_memory = trace_memory
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, wall: float, cpu: float) -> None:
+        with self._lock:
+            stage = self.stages.setdefault(name, {"count": 0, "wall_s": 0.0, "cpu_s": 0.0})
+            stage["count"] += 1
+            stage["wall_s"] += wall
+            stage["cpu_s"] += cpu
+
+class Span:
+    """
+    with 文で囲んだ区間の実時間、スレッドの CPU 時間、メモリ確保量のピーク（tracemalloc）を計測します。
+    スパンは contextvars で入れ子になり、ワーカースレッドにも _run_row_tiles を通じて引き継がれます。
+    並列に実行されるスパンのメモリのピークには、同時に実行中の他のスレッドの確保分も含まれます。
+    """
+    def __init__(self, name: str, parent: Optional["Span"], trace: _Trace, attrs: Dict[str, Any]):
+        self.name = name
+        self.id = next(_ids)
+        self.parent = parent
+        self.trace = trace
+        self.attrs = attrs
+        self._peak = 0
+        self._base = 0
+
+    def set(self, **attrs: Any) -> None:
+        """
+        スパンに属性（点数や画像サイズなど）を追加します。
+        """
+        self.attrs.update(attrs)
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        if self.trace.trace_memory:
+            with _memory_lock:
+                self._base = self._peak = _update_memory_peaks()
+                _memory_spans.add(self)
+        self._started_at = time.time()
+        self._cpu_started = time.thread_time()
+        self._wall_started = time.perf_counter()
+        return self
+
+    def _finish(self, exc_type: Any) -> Dict[str, Any]:
+        wall = time.perf_counter() - self._wall_started
+        cpu = time.thread_time() - self._cpu_started
+        peak_alloc = None
+        if self.trace.trace_memory:
+            with _memory_lock:
+                _update_memory_peaks()
+                _memory_spans.discard(self)
+            peak_alloc = (self._peak - self._base) / 2 ** 20
+        _current_span.reset(self._token)
+        self.trace.add(self.name, wall, cpu)
+        record = {
+            "trace": self.trace.id,
+            "span": self.id,
+            "parent": self.parent.id if self.parent is not None else None,
+            "name": self.name,
+            "start": self._started_at,
+            "wall_s": wall,
+            "cpu_s": cpu,
+            "peak_alloc_mb": peak_alloc,
+            "thread": threading.current_thread().name,
+        }
+        if self.attrs:
+            record["attrs"] = self.attrs
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        return record
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        _emit(self._finish(exc_type))
+
+class _RootSpan(Span):
+    """
+    トレースの起点となるスパンです。終了時にステージごとの合計とプロセス全体の CPU 時間を記録します。
+    """
+    def __enter__(self) -> "Span":
+        if self.trace.trace_memory:
+            with _memory_lock:
+                if _memory_users[0] == 0 and not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                    _memory_users[1] = True
+                _memory_users[0] += 1
+        self._process_cpu_started = time.process_time()
+        return super().__enter__()
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        record = self._finish(exc_type)
+        record["process_cpu_s"] = time.process_time() - self._process_cpu_started
+        record["stages"] = {name: stage for name, stage in self.trace.stages.items() if name != self.name}
+        if self.trace.trace_memory:
+            with _memory_lock:
+                _memory_users[0] -= 1
+                if _memory_users[0] == 0 and _memory_users[1]:
+                    tracemalloc.stop()
+                    _memory_users[1] = False
+        _emit(record)
+
+class _NullSpan:
+    """
+    計測が無効な場合に返される、何もしないスパンです。
+    """
+    def set(self, **attrs: Any) -> None:
+        pass
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+def trace(name: str, **attrs: Any) -> Any:
+    """
+    変換処理の入口を計測します。計測中のトレースがあればその子スパンになり、
+    なければ計測が有効な場合に限り新しいトレースを開始します。
+
+    Args:
+        name (str): スパン名
+        **attrs: スパンに記録する属性
+    """
+    parent = _current_span.get()
+    if parent is not None:
+        return Span(name, parent, parent.trace, attrs)
+    if not is_enabled():
+        return _NULL_SPAN
+    return _RootSpan(name, None, _Trace(config.get("tracing/trace_memory", True)), attrs)
+
+def span(name: str, **attrs: Any) -> Any:
+    """
+    処理の1ステージを計測します。トレースの外（プレビューなど）では何もしません。
+
+    Args:
+        name (str): ステージ名（affine, kernel, factorize, solve, lattice, read_source, maps, remap など）
+        **attrs: スパンに記録する属性
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return _NULL_SPAN
+    return Span(name, parent, parent.trace, attrs)
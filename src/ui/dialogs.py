@@ -5,12 +5,12 @@ from PyQt5.QtWidgets import (
     QMessageBox, QToolBar, QAction, QFileDialog, QDialogButtonBox, QLineEdit, QCheckBox,
     QFormLayout, QComboBox, QSpinBox, QDoubleSpinBox, QWidget, QGraphicsView, QGraphicsScene, QLabel
 )
-from PyQt5.QtGui import QKeySequence, QPixmap, QImage
+from PyQt5.QtGui import QKeySequence, QPixmap, QImage, QColor
 from PyQt5.QtCore import Qt, QEvent
 from app_settings import config, set_language
 from themes import get_dark_mode_stylesheet
 from logger import logger
-from core import export_scene
+from core import export_scene, compute_loo_residuals, load_transform_settings
 from project import Project
 from PyQt5.QtWidgets import QShortcut
 from common import open_file_dialog  # 共通ファイルダイアログ関数
@@ -134,6 +134,82 @@ class HistoryDialog(QDialog):
         self.refresh_history()
         logger.debug("Jumped to history index %s", selected_row)
 
+class PointResidualDialog(QDialog):
+    """
+    対応点を leave-one-out 残差の大きい順に一覧表示するダイアログです。
+    選択した点は両方のシーンで選択状態にし、ビューの中央に表示します。
+    """
+    def __init__(self, project, scenes, views, parent=None):
+        super().__init__(parent)
+        logger.debug("PointResidualDialog initialized")
+        self.setWindowTitle(_("point_residuals_title"))
+        self.project = project
+        self.scenes = scenes
+        self.views = views
+        self.layout = QVBoxLayout(self)
+        self.summary_label = QLabel(self)
+        self.layout.addWidget(self.summary_label)
+        self.list_widget = QListWidget(self)
+        self.list_widget.itemDoubleClicked.connect(self.jump_to_selected)
+        self.layout.addWidget(self.list_widget)
+        btn_layout = QHBoxLayout()
+        self.refresh_button = QPushButton(_("refresh"))
+        self.refresh_button.clicked.connect(self.refresh_residuals)
+        btn_layout.addWidget(self.refresh_button)
+        self.jump_button = QPushButton(_("jump"))
+        self.jump_button.clicked.connect(self.jump_to_selected)
+        btn_layout.addWidget(self.jump_button)
+        self.close_button = QPushButton(_("close"))
+        self.close_button.clicked.connect(self.close)
+        btn_layout.addWidget(self.close_button)
+        self.layout.addLayout(btn_layout)
+        self.resize(420, 480)
+        self.refresh_residuals()
+
+    def refresh_residuals(self):
+        logger.debug("Refreshing point residuals")
+        self.list_widget.clear()
+        game_points = self.project.game_points
+        real_points = self.project.real_points
+        if len(game_points) != len(real_points) or len(game_points) < 4:
+            self.summary_label.setText(_("error_loo_minimum_points"))
+            return
+        try:
+            residuals = compute_loo_residuals(game_points, real_points,
+                                              **load_transform_settings(self.project, resolve_lambda=False))
+        except Exception as e:
+            logger.exception("Failed to compute leave-one-out residuals")
+            self.summary_label.setText(_("point_residuals_failed").format(error=str(e)))
+            return
+        warning_px = float(config.get("diagnostics/residual_warning_px", 5.0))
+        flagged = 0
+        for index in sorted(range(len(residuals)), key=lambda i: -residuals[i]):
+            residual = residuals[index]
+            item_text = _("point_residual_item").format(index=index + 1, residual=residual)
+            self.list_widget.addItem(item_text)
+            item = self.list_widget.item(self.list_widget.count() - 1)
+            item.setData(Qt.UserRole, index)
+            if residual > warning_px:
+                item.setForeground(QColor(200, 0, 0))
+                flagged += 1
+        self.summary_label.setText(_("point_residuals_summary").format(flagged=flagged, threshold=warning_px))
+        if self.list_widget.count():
+            self.list_widget.setCurrentRow(0)
+
+    def jump_to_selected(self):
+        selected_items = self.list_widget.selectedItems()
+        if not selected_items:
+            return
+        index = selected_items[0].data(Qt.UserRole)
+        for scene, view in zip(self.scenes, self.views):
+            points = scene.get_history()
+            if index >= len(points) or points[index].get("ellipse") is None:
+                continue
+            scene.clearSelection()
+            points[index]["ellipse"].setSelected(True)
+            view.centerOn(points[index]["ellipse"])
+        logger.debug("Jumped to point %s", index + 1)
+
 class OptionsDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -156,6 +232,13 @@ class OptionsDialog(QDialog):
         self.adaptive_reg_checkbox = QCheckBox(self)
         self.adaptive_reg_checkbox.setChecked(config.get("tps/adaptive", False))
         form_layout.addRow(_("tps_adaptive") + ":", self.adaptive_reg_checkbox)
+        # 自動選択（GCV）中は手入力の λ と adaptive は使われない
+        self.auto_lambda_checkbox = QCheckBox(self)
+        self.auto_lambda_checkbox.setToolTip(_("tps_auto_lambda_tooltip"))
+        self.auto_lambda_checkbox.toggled.connect(self._update_reg_inputs)
+        self.auto_lambda_checkbox.setChecked(config.get("tps/auto_lambda", False))
+        form_layout.addRow(_("tps_auto_lambda") + ":", self.auto_lambda_checkbox)
+        self._update_reg_inputs(self.auto_lambda_checkbox.isChecked())
         self.grid_checkbox = QCheckBox(self)
         self.grid_checkbox.setChecked(config.get("display/grid_overlay", False))
         form_layout.addRow(_("grid_overlay") + ":", self.grid_checkbox)
@@ -205,6 +288,10 @@ class OptionsDialog(QDialog):
         button_box.rejected.connect(self.reject)
         layout.addWidget(button_box)
     
+    def _update_reg_inputs(self, auto_lambda):
+        self.tps_reg_edit.setEnabled(not auto_lambda)
+        self.adaptive_reg_checkbox.setEnabled(not auto_lambda)
+
     def accept(self):
         logger.debug("OptionsDialog accept triggered")
         tps_reg_text = self.tps_reg_edit.text().strip()
@@ -226,6 +313,7 @@ class OptionsDialog(QDialog):
         config.set("display/dark_mode", self.dark_mode_checkbox.isChecked())
         config.set("tps/reg_lambda", self.tps_reg_edit.text())
         config.set("tps/adaptive", self.adaptive_reg_checkbox.isChecked())
+        config.set("tps/auto_lambda", self.auto_lambda_checkbox.isChecked())
         config.set("logging/max_run_logs", self.log_max_folders_spin.value())
         lang_code = self.language_combo.currentData()
         set_language(lang_code)
@@ -2,7 +2,7 @@
 import os
 import ast
 from PyQt5.QtWidgets import QGraphicsEllipseItem, QGraphicsScene, QGraphicsTextItem, QMenu
-from PyQt5.QtGui import QPainterPath, QPen, QBrush, QColor
+from PyQt5.QtGui import QPainterPath, QPen, QBrush, QColor, QPixmap
 from PyQt5.QtCore import QPointF, Qt, pyqtSignal, QTimer
 from app_settings import config
 from logger import logger
@@ -43,6 +43,10 @@ class DraggablePointItem(QGraphicsEllipseItem):
             offset = QPointF(10, -10)
             if self.command.get("text") is not None:
                 self.command["text"].setPos(newPos + offset)
+        elif change == QGraphicsEllipseItem.ItemPositionHasChanged and self._dragging:
+            scene = self.scene()
+            if scene and hasattr(scene, "pointDragged"):
+                scene.pointDragged.emit()
         return super().itemChange(change, value)
 
     def mousePressEvent(self, event):
@@ -58,11 +62,14 @@ class DraggablePointItem(QGraphicsEllipseItem):
         if hasattr(self, "_drag_start_pos"):
             old_pos = self._drag_start_pos
             new_pos = self.pos()
+            # 移動の記録でシーンが再構築され、この項目はシーンから外れる
+            scene = self.scene()
             if (old_pos - new_pos).manhattanLength() > 1:
-                scene = self.scene()
                 if scene and hasattr(scene, "record_move_command"):
                     scene.record_move_command(self.command, new_pos)
             del self._drag_start_pos
+            if scene and hasattr(scene, "pointDragFinished"):
+                scene.pointDragFinished.emit()
 
     def contextMenuEvent(self, event):
         menu = QMenu()
@@ -77,6 +84,8 @@ class DraggablePointItem(QGraphicsEllipseItem):
 class InteractiveScene(QGraphicsScene):
     activated = pyqtSignal(object)
     projectModified = pyqtSignal()
+    pointDragged = pyqtSignal()       # ドラッグ中に点が移動するたびに通知
+    pointDragFinished = pyqtSignal()
 
     def __init__(self, project=None, image_type="game", parent=None):
         super().__init__(parent)
@@ -92,6 +101,43 @@ class InteractiveScene(QGraphicsScene):
         self.image_qimage = None
         self.occupied_pixels = {}
         self._loading = False
+        self.preview_item = None
+
+    def current_points(self):
+        """
+        ドラッグ中の位置を含めた、現在表示されている点の座標を追加順に返します。
+        """
+        points = []
+        for cmd in self.history_log:
+            if cmd["action"] == "add" and cmd["id"] in self.points_dict:
+                ellipse = self.points_dict[cmd["id"]].get("ellipse")
+                pt = ellipse.pos() if ellipse is not None else self.points_dict[cmd["id"]]["pos"]
+                points.append((pt.x(), pt.y()))
+        return points
+
+    def set_preview_image(self, qimage, scale=1.0):
+        """
+        変換結果のプレビューを画像の上に重ねて表示します。qimage が None の場合は消去します。
+        
+        Args:
+            qimage (QImage): 縮小解像度の変換結果
+            scale (float): 画像に対するプレビューの縮小率
+        """
+        if qimage is None or qimage.isNull():
+            if self.preview_item is not None:
+                self.preview_item.setVisible(False)
+            return
+        pixmap = QPixmap.fromImage(qimage)
+        if self.preview_item is None:
+            self.preview_item = self.addPixmap(pixmap)
+            self.preview_item.setAcceptedMouseButtons(Qt.NoButton)
+            self.preview_item.setTransformationMode(Qt.SmoothTransformation)
+            self.preview_item.setZValue(0.5)
+        else:
+            self.preview_item.setPixmap(pixmap)
+        self.preview_item.setOpacity(config.get("preview/opacity", 0.5))
+        self.preview_item.setScale(1.0 / scale)
+        self.preview_item.setVisible(True)
 
     def _update_project_state(self):
         if self.project is None:
@@ -145,12 +191,14 @@ class InteractiveScene(QGraphicsScene):
         ellipse_item.setPen(pen)
         ellipse_item.setBrush(brush)
         ellipse_item.setPos(command["pos"])
+        ellipse_item.setZValue(1)
         self.addItem(ellipse_item)
         text_item = QGraphicsTextItem("")
         text_item.setDefaultTextColor(Qt.blue)
         text_item.setFlag(QGraphicsTextItem.ItemIgnoresTransformations, True)
         text_offset = QPointF(10, -10)
         text_item.setPos(command["pos"] + text_offset)
+        text_item.setZValue(1)
         self.addItem(text_item)
         command["ellipse"] = ellipse_item
         command["text"] = text_item
@@ -349,6 +397,7 @@ class InteractiveScene(QGraphicsScene):
             view.viewport().setUpdatesEnabled(False)
             QCoreApplication.processEvents()
         self.clear()
+        self.preview_item = None
         self.history_log = []
         self.history_index = -1
         self.points_dict.clear()
@@ -8,10 +8,13 @@ from PyQt5.QtGui import QPixmap, QImage
 from PyQt5.QtCore import Qt, QPointF, QTimer, QByteArray
 from logger import logger
 from app_settings import config
-from core import perform_tps_transform, export_scene
+from core import export_scene, load_transform_settings, auto_lambda_pending, MOSAIC_FEATHER_PX
+import tracing
 from ui.interactive_scene import InteractiveScene
 from ui.interactive_view import ZoomableViewWidget
 from ui.ui_manager import UIManager  # 統合 UI マネージャーを利用
+from ui.transform_worker import TransformWorker
+from ui.warp_preview import WarpPreviewController
 from project import Project
 
 MODE_INTEGRATED = "integrated"
@@ -46,6 +49,9 @@ class MainWindow(QMainWindow):
         self.mode = MODE_INTEGRATED
         self.project = None
         self._integrated_splitter_sizes = None  # 統合モード時のスプリッターサイズを保持
+        self._transform_worker = None  # 実行中の TPS 変換ワーカー
+        self._transform_progress = None
+        self.preview_controller = None
 
         # UIManager を通してプロジェクト選択ダイアログを表示
         self.ui_manager = UIManager(self)
@@ -85,6 +91,7 @@ class MainWindow(QMainWindow):
         # シーンがフォーカスされたときに active_scene を更新する
         self.sceneA.activated.connect(self.set_active_scene)
         self.sceneB.activated.connect(self.set_active_scene)
+        self.preview_controller = WarpPreviewController(self.project, self.sceneA, self.sceneB, self)
         # 起動時のデフォルトとして sceneA をアクティブシーンに設定する
         self.set_active_scene(self.sceneA)
         
@@ -116,14 +123,21 @@ class MainWindow(QMainWindow):
             self.sceneB._update_project_state()
 
         self._update_window_title()
+        self.preview_controller.refresh()
 
     def switch_project(self, new_project):
         logger.info("Switching project from [%s] to [%s]", self.project.name, new_project.name)
+        self.cancel_transform()
+        if self.preview_controller is not None:
+            self.preview_controller.shutdown()
+            self.preview_controller.deleteLater()
         self.project = new_project
         if hasattr(self, "integrated_widget"):
             self.integrated_widget.setParent(None)
             self.integrated_widget.deleteLater()
         self._init_scenes_and_views()
+        if hasattr(self, "piecewise_affine_action"):
+            self.piecewise_affine_action.setChecked(self.project.settings.get("warp_engine") == "piecewise_affine")
         self.statusBar().showMessage(_("project_loaded"), 3000)
         logger.info("Project switched successfully to [%s]", self.project.name)
 
@@ -331,6 +345,14 @@ class MainWindow(QMainWindow):
         self.ui_manager.show_history_dialog(self.active_scene)
         logger.debug("History dialog opened")
 
+    def open_point_residual_dialog(self):
+        if self.project is None:
+            QMessageBox.warning(self, _("error_no_project_title"), _("error_no_project_message"))
+            return
+        self.ui_manager.show_point_residual_dialog(self.project, [self.sceneA, self.sceneB],
+                                                   [self.viewA.view, self.viewB.view])
+        logger.debug("Point residual dialog opened")
+
     def open_options_dialog(self):
         if self.ui_manager.show_options_dialog():
             self.statusBar().showMessage(_("options_saved"), 3000)
@@ -344,20 +366,130 @@ class MainWindow(QMainWindow):
             return
         ptsA = self.project.game_points
         ptsB = self.project.real_points
-        if len(ptsA) != len(ptsB) or len(ptsA) < 3:
+        # 保存済みのシートがある場合は、現在の実地図と合わせて 1 枚に合成する
+        sheets = self.project.mosaic_sheets() if self.project.sheets else None
+        if not sheets and (len(ptsA) != len(ptsB) or len(ptsA) < 3):
             self.statusBar().showMessage(_("error_insufficient_points"), 3000)
             logger.warning("Insufficient points for transformation")
             return
-        warped_pixmap, error = perform_tps_transform(ptsA, ptsB, self.sceneA, self.sceneB)
-        if error:
-            self.statusBar().showMessage(error, 3000)
-            logger.error("TPS transformation error: %s", error)
+        if self.project.game_pixmap.isNull():
+            self.statusBar().showMessage(_("game_image_error_insufficient_points"), 3000)
+            logger.warning("Game image missing for transformation")
+            return
+        # 実行中の古い変換はキャンセルし、その結果は破棄する
+        self.cancel_transform()
+        output_size = (self.project.game_pixmap.width(), self.project.game_pixmap.height())
+        # GCV の掃引は O(N^3) のため GUI スレッドでは行わず、必要ならワーカーで変換の前に行う
+        settings = load_transform_settings(self.project, resolve_lambda=False)
+        worker = TransformWorker(ptsA, ptsB, self.project.real_qimage, output_size, settings, self,
+                                 sheets=sheets, feather_px=config.get("mosaic/feather_px", MOSAIC_FEATHER_PX),
+                                 auto_lambda=auto_lambda_pending(self.project, settings))
+        worker.autoLambdaResolved.connect(lambda entry, w=worker: self._on_auto_lambda_resolved(w, entry))
+        worker.progressChanged.connect(lambda stage, done, total, w=worker: self._on_transform_progress(w, stage, done, total))
+        worker.transformFinished.connect(lambda qimage, w=worker: self._on_transform_finished(w, qimage))
+        worker.transformFailed.connect(lambda error, w=worker: self._on_transform_failed(w, error))
+        worker.transformCancelled.connect(lambda w=worker: self._on_transform_cancelled(w))
+        worker.finished.connect(worker.deleteLater)
+        self._transform_worker = worker
+        self._transform_progress = self.ui_manager.show_progress_dialog(_("transform_progress_title"), self.cancel_transform)
+        worker.start()
+        self.statusBar().showMessage(_("transform_started"))
+        logger.info("TPS transformation started in background")
+
+    def store_real_as_sheet(self):
+        if self.project is None:
+            QMessageBox.warning(self, _("error_no_project_title"), _("error_no_project_message"))
             return
+        if self.project.real_qimage.isNull() or not self.project.has_valid_real_points():
+            self.statusBar().showMessage(_("error_insufficient_points"), 3000)
+            return
+        self.cancel_transform()
+        sheet = self.project.store_real_as_sheet()
+        # 実地図と対応点を空にしたプロジェクトでシーンを作り直し、次のシートを入力できるようにする
+        self.switch_project(self.project)
+        self._update_window_title()
+        self.statusBar().showMessage(
+            _("mosaic_sheet_stored").format(name=sheet.name, count=len(self.project.sheets)), 3000)
+        logger.info("Real map stored as mosaic sheet: %s", sheet.name)
+
+    def clear_mosaic_sheets(self):
+        if self.project is None or not self.project.sheets:
+            self.statusBar().showMessage(_("mosaic_no_sheets"), 3000)
+            return
+        ret = QMessageBox.question(
+            self,
+            _("mosaic_clear_sheets_title"),
+            _("mosaic_clear_sheets_confirm").format(count=len(self.project.sheets)),
+            QMessageBox.Ok | QMessageBox.Cancel
+        )
+        if ret != QMessageBox.Ok:
+            return
+        self.project.clear_sheets()
+        self._update_window_title()
+        self.statusBar().showMessage(_("mosaic_sheets_cleared"), 3000)
+        logger.info("Mosaic sheets cleared")
+
+    def cancel_transform(self, wait=False):
+        worker = self._transform_worker
+        if worker is not None:
+            worker.cancel()
+            logger.info("TPS transformation cancel requested")
+            if wait:
+                worker.wait()
+        self._transform_worker = None
+        self._close_transform_progress()
+
+    def _close_transform_progress(self):
+        if self._transform_progress is not None:
+            progress = self._transform_progress
+            self._transform_progress = None
+            progress.canceled.disconnect()
+            progress.close()
+            progress.deleteLater()
+
+    def _on_transform_progress(self, worker, stage, done, total):
+        if worker is not self._transform_worker or self._transform_progress is None:
+            return
+        self._transform_progress.setLabelText(_("transform_stage_" + stage))
+        self._transform_progress.setValue(int(100 * done / total) if total else 0)
+
+    def _on_auto_lambda_resolved(self, worker, entry):
+        # 掃引中に対応点が変わった場合は、古い点に対する結果を保存しない
+        if self.project is None or worker.dest_points != [tuple(p) for p in self.project.game_points] \
+                or worker.src_points != [tuple(p) for p in self.project.real_points]:
+            return
+        self.project.settings["auto_lambda"] = entry
+        logger.debug("GCV reg_lambda stored for the project: %.6g", entry["reg_lambda"])
+
+    def _on_transform_finished(self, worker, qimage):
+        if worker is not self._transform_worker:
+            logger.debug("Discarding result of stale TPS transformation")
+            return
+        self._transform_worker = None
+        self._close_transform_progress()
+        with tracing.trace("to_qpixmap", output_size=[qimage.width(), qimage.height()]):
+            warped_pixmap = QPixmap.fromImage(qimage)
         result_win = self.ui_manager.show_result_window(warped_pixmap)
         self.result_win = result_win
         self.statusBar().showMessage(_("transform_complete"), 3000)
         logger.info("TPS transformation executed successfully")
 
+    def _on_transform_failed(self, worker, error):
+        if worker is not self._transform_worker:
+            return
+        self._transform_worker = None
+        self._close_transform_progress()
+        self.statusBar().showMessage(error, 3000)
+        logger.error("TPS transformation error: %s", error)
+
+    def _on_transform_cancelled(self, worker):
+        if worker is self._transform_worker:
+            self._transform_worker = None
+            self._close_transform_progress()
+        # 新しい変換に置き換えられた場合は、実行中の表示を上書きしない
+        if self._transform_worker is None:
+            self.statusBar().showMessage(_("transform_cancelled"), 3000)
+
     def toggle_mode(self):
         # 内部状態の比較は定数で行う
         if self.mode == MODE_INTEGRATED:
@@ -477,6 +609,25 @@ class MainWindow(QMainWindow):
         self.sceneB.update()
         logger.debug("Grid overlay toggled to %s", new_state)
 
+    def toggle_live_preview(self):
+        current = config.get("preview/enabled", False)
+        new_state = not current
+        config.set("preview/enabled", new_state)
+        self.statusBar().showMessage(f"{_('live_preview')} {'ON' if new_state else 'OFF'}", 2000)
+        self.live_preview_action.setChecked(new_state)
+        self.preview_controller.refresh()
+        logger.debug("Live preview toggled to %s", new_state)
+
+    def toggle_piecewise_affine(self):
+        new_state = self.project.settings.get("warp_engine") != "piecewise_affine"
+        self.project.settings["warp_engine"] = "piecewise_affine" if new_state else "tps"
+        self.project.modified = True
+        self._update_window_title()
+        self.statusBar().showMessage(f"{_('piecewise_affine_warp')} {'ON' if new_state else 'OFF'}", 2000)
+        self.piecewise_affine_action.setChecked(new_state)
+        self.preview_controller.refresh()
+        logger.debug("Warp engine for project [%s] set to %s", self.project.name, self.project.settings["warp_engine"])
+
     def show_usage(self):
         message = _("usage_text").format(
             load_game_image=_("load_game_image"),
@@ -527,6 +678,9 @@ class MainWindow(QMainWindow):
             elif clicked == cancel_button:
                 event.ignore()
                 return
+        self.cancel_transform(wait=True)
+        if self.preview_controller is not None:
+            self.preview_controller.shutdown()
         event.accept()
 
 if __name__ == '__main__':
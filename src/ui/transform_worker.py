@@ -0,0 +1,93 @@
+# src/ui/transform_worker.py
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from PyQt5.QtCore import QThread, pyqtSignal
+from PyQt5.QtGui import QImage
+from logger import transform_logger
+from core import (perform_qimage_transformation, perform_mosaic_transformation, compute_auto_lambda,
+                  TransformCancelled, MOSAIC_FEATHER_PX)
+
+class TransformWorker(QThread):
+    """
+    TPS 変換をバックグラウンドスレッドで実行するワーカーです。
+    QPixmap は GUI スレッドでしか扱えないため、結果は QImage として通知します。
+    sheets を指定した場合は、各シートを変換して 1 枚に合成します（perform_mosaic_transformation）。
+    auto_lambda が True の場合は、変換の前に GCV の掃引（compute_auto_lambda）もこのスレッドで行い、
+    選ばれた λ で変換した上で、結果を autoLambdaResolved で通知します（プロジェクトへの保存は GUI スレッドで行う）。
+    """
+    progressChanged = pyqtSignal(str, int, int)  # (ステージ名, 完了数, 総数)
+    transformFinished = pyqtSignal(QImage)
+    transformFailed = pyqtSignal(str)
+    transformCancelled = pyqtSignal()
+    autoLambdaResolved = pyqtSignal(object)  # compute_auto_lambda の結果
+
+    def __init__(self, dest_points: List[Tuple[float, float]], src_points: List[Tuple[float, float]],
+                 src_qimage: QImage, output_size: Tuple[int, int], settings: Dict[str, Any], parent=None,
+                 sheets: Optional[List[Tuple[Any, Any, QImage]]] = None, feather_px: float = MOSAIC_FEATHER_PX,
+                 auto_lambda: bool = False):
+        super().__init__(parent)
+        self.dest_points = [tuple(p) for p in dest_points]
+        self.src_points = [tuple(p) for p in src_points]
+        # QImage は暗黙共有されるため、浅いコピーで GUI 側の変更から切り離す
+        self.src_qimage = QImage(src_qimage)
+        self.output_size = output_size
+        self.settings = dict(settings)
+        self.sheets = [([tuple(p) for p in dest], [tuple(p) for p in src], QImage(qimage))
+                       for dest, src, qimage in sheets] if sheets else None
+        self.feather_px = feather_px
+        self.auto_lambda = auto_lambda
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        """
+        実行中の変換にキャンセルを要求します。処理は次のタイルの開始時に中断されます。
+        """
+        self._cancel_event.set()
+
+    def is_cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def run(self):
+        transform_logger.debug("TransformWorker started")
+        try:
+            if self.auto_lambda:
+                self._resolve_auto_lambda()
+            # 結果は QImage のメモリへ直接書き込まれるため、配列からの変換は不要
+            if self.sheets:
+                warped_qimage = perform_mosaic_transformation(
+                    self.sheets, self.output_size, feather_px=self.feather_px,
+                    progress_callback=self.progressChanged.emit,
+                    cancel_event=self._cancel_event,
+                    **self.settings
+                )
+            else:
+                warped_qimage = perform_qimage_transformation(
+                    self.dest_points, self.src_points,
+                    self.src_qimage, self.output_size,
+                    progress_callback=self.progressChanged.emit,
+                    cancel_event=self._cancel_event,
+                    **self.settings
+                )
+        except TransformCancelled:
+            transform_logger.info("TPS transform cancelled")
+            self.transformCancelled.emit()
+            return
+        except Exception as e:
+            transform_logger.exception("Error in TPS transform")
+            self.transformFailed.emit(_("tps_calculation_failed").format(error=str(e)))
+            return
+        if self.is_cancelled():
+            self.transformCancelled.emit()
+            return
+        self.transformFinished.emit(warped_qimage)
+
+    def _resolve_auto_lambda(self):
+        self.progressChanged.emit("gcv", 0, 1)
+        entry = compute_auto_lambda(self.dest_points, self.src_points,
+                                    self.settings.get("lowrank_threshold"), self.settings.get("lowrank_landmarks"))
+        if self.is_cancelled():
+            raise TransformCancelled()
+        if entry is not None:
+            self.settings["reg_lambda"] = entry["reg_lambda"]
+            self.settings["adaptive"] = False
+            self.autoLambdaResolved.emit(entry)
@@ -1,9 +1,10 @@
 # src/ui/ui_manager.py
 from PyQt5.QtWidgets import (
     QWidget, QHBoxLayout, QLineEdit, QPushButton, QFileDialog,
-    QMenu, QAction, QDialog, QMessageBox, QToolBar, QMainWindow
+    QMenu, QAction, QDialog, QMessageBox, QToolBar, QMainWindow, QProgressDialog
 )
 from PyQt5.QtGui import QKeySequence
+from PyQt5.QtCore import Qt
 from app_settings import config
 from logger import logger
 from common import create_action, open_file_dialog, save_file_dialog
@@ -105,12 +106,26 @@ class UnifiedMenuManager:
         tools_menu = mb.addMenu(_("tools_menu"))
         tools_menu_items = [
             {"text": _("execute_tps"), "slot": self.main_window.transform_images},
+            {"text": _("point_residuals_menu"), "slot": self.main_window.open_point_residual_dialog,
+             "tooltip": _("point_residuals_menu_tooltip")},
+            "separator",
+            {"text": _("mosaic_store_sheet_menu"), "slot": self.main_window.store_real_as_sheet,
+             "tooltip": _("mosaic_store_sheet_menu_tooltip")},
+            {"text": _("mosaic_clear_sheets_menu"), "slot": self.main_window.clear_mosaic_sheets},
             "separator",
             {"text": _("toggle_mode"), "slot": self.main_window.toggle_mode, "shortcut": config.get("keybindings/toggle_mode", "F5")},
             "separator",
             {"text": _("options"), "slot": self.main_window.open_options_dialog}
         ]
         self.create_menu_from_config(tools_menu, tools_menu_items)
+        # 変換エンジンはプロジェクトごとの設定
+        self.main_window.piecewise_affine_action = create_action(
+            self.main_window, _("piecewise_affine_warp"), self.main_window.toggle_piecewise_affine,
+            tooltip=_("piecewise_affine_warp_tooltip"))
+        self.main_window.piecewise_affine_action.setCheckable(True)
+        self.main_window.piecewise_affine_action.setChecked(
+            self.main_window.project.settings.get("warp_engine") == "piecewise_affine")
+        tools_menu.insertAction(tools_menu.actions()[1], self.main_window.piecewise_affine_action)
 
         # View メニュー（チェック項目は個別に作成）
         view_menu = mb.addMenu(_("view_menu"))
@@ -122,6 +137,10 @@ class UnifiedMenuManager:
         self.main_window.grid_overlay_action.setCheckable(True)
         self.main_window.grid_overlay_action.setChecked(config.get("display/grid_overlay", False))
         view_menu.addAction(self.main_window.grid_overlay_action)
+        self.main_window.live_preview_action = create_action(self.main_window, _("live_preview"), self.main_window.toggle_live_preview)
+        self.main_window.live_preview_action.setCheckable(True)
+        self.main_window.live_preview_action.setChecked(config.get("preview/enabled", False))
+        view_menu.addAction(self.main_window.live_preview_action)
         
         # Help メニュー
         help_menu = mb.addMenu(_("help_menu"))
@@ -167,12 +186,30 @@ class DialogManager:
         dlg = HistoryDialog(scene, self.parent)
         dlg.exec_()
 
+    def show_point_residual_dialog(self, project, scenes, views):
+        from ui.dialogs import PointResidualDialog
+        dlg = PointResidualDialog(project, scenes, views, self.parent)
+        dlg.exec_()
+
     def show_result_window(self, pixmap):
         from ui.dialogs import ResultWindow
         result_win = ResultWindow(pixmap, self.parent)
         result_win.show()
         return result_win
 
+    def show_progress_dialog(self, title, cancel_slot):
+        # GUI を塞がないよう非モーダルで表示し、キャンセルボタンで cancel_slot を呼び出す
+        progress = QProgressDialog(title, _("cancel"), 0, 100, self.parent)
+        progress.setWindowTitle(title)
+        progress.setWindowModality(Qt.NonModal)
+        progress.setAutoClose(False)
+        progress.setAutoReset(False)
+        progress.setMinimumDuration(0)
+        progress.setValue(0)
+        progress.canceled.connect(cancel_slot)
+        progress.show()
+        return progress
+
     def show_message(self, title_key, message_key, **kwargs):
         title = _(title_key)
         message = _(message_key).format(**kwargs)
@@ -210,8 +247,14 @@ class UIManager:
     def show_history_dialog(self, scene):
         self.dialog_manager.show_history_dialog(scene)
 
+    def show_point_residual_dialog(self, project, scenes, views):
+        self.dialog_manager.show_point_residual_dialog(project, scenes, views)
+
     def show_result_window(self, pixmap):
         return self.dialog_manager.show_result_window(pixmap)
 
+    def show_progress_dialog(self, title, cancel_slot):
+        return self.dialog_manager.show_progress_dialog(title, cancel_slot)
+
     def create_file_selector(self, parent, dialog_title_key, file_filter, mode="open", default_extension=""):
         return FileSelectorWidget(parent, dialog_title_key, file_filter, mode, default_extension)
@@ -0,0 +1,225 @@
+# src/ui/warp_preview.py
+import threading
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
+from PyQt5.QtCore import QObject, QThread, QTimer, Qt, pyqtSignal
+from PyQt5.QtGui import QImage
+from logger import logger
+from app_settings import config
+from core import (perform_preview_transformation, perform_qimage_transformation, load_transform_settings,
+                  resolve_worker_count, TransformCancelled)
+from common import qimage_to_numpy, numpy_to_qimage
+
+# (縮小率, 元画像の縮小率, 元画像, 変換設定) の組で1段分のプレビューを表す
+PreviewLevel = Tuple[float, float, Any, Dict[str, Any]]
+
+class PreviewWorker(QThread):
+    """
+    縮小解像度の TPS 変換を段階的に実行するワーカーです。
+    levels を先頭から順に処理し、各段の結果を levelReady で通知します。
+    """
+    levelReady = pyqtSignal(QImage, float)  # (変換結果, 出力の縮小率)
+
+    def __init__(self, dest_points: List[Tuple[float, float]], src_points: List[Tuple[float, float]],
+                 output_size: Tuple[int, int], levels: List[PreviewLevel], parent=None):
+        super().__init__(parent)
+        self.dest_points = [tuple(p) for p in dest_points]
+        self.src_points = [tuple(p) for p in src_points]
+        self.output_size = output_size
+        self.levels = list(levels)
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def is_cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def run(self):
+        for scale, src_scale, src, settings in self.levels:
+            if self.is_cancelled():
+                return
+            try:
+                if isinstance(src, QImage):
+                    # 原寸の元画像は QImage のまま渡され、参照する範囲だけを直接読み出して変換する
+                    warped = perform_qimage_transformation(
+                        self.dest_points, self.src_points, src, self.output_size,
+                        cancel_event=self._cancel_event, **settings
+                    )
+                else:
+                    warped = numpy_to_qimage(perform_preview_transformation(
+                        self.dest_points, self.src_points, src, src_scale,
+                        self.output_size, scale, cancel_event=self._cancel_event, **settings
+                    ))
+            except TransformCancelled:
+                return
+            except Exception:
+                logger.debug("Warp preview failed", exc_info=True)
+                return
+            if self.is_cancelled():
+                return
+            self.levelReady.emit(warped, scale)
+
+class WarpPreviewController(QObject):
+    """
+    ゲーム画像シーンに変換結果のプレビューを重ねて表示するコントローラーです。
+
+    ドラッグ中は縮小した元画像と粗い格子による低解像度の変換を表示更新の間隔で間引いて再計算し、
+    ドラッグ終了後は原寸までバックグラウンドで段階的に精細化します。
+    """
+    def __init__(self, project, game_scene, real_scene, parent=None):
+        super().__init__(parent)
+        self.project = project
+        self.game_scene = game_scene
+        self.real_scene = real_scene
+        self._worker: Optional[PreviewWorker] = None
+        self._pending: Optional[bool] = None  # 実行待ちの要求（True は精細化を含む）
+        self._refine_requested = False
+        self._small_source_key = None
+        self._small_source: Optional[Tuple[Any, float]] = None
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(config.get("preview/throttle_ms", 16))
+        self._timer.timeout.connect(self._on_timer)
+        for scene in (game_scene, real_scene):
+            scene.pointDragged.connect(self._on_point_dragged)
+            scene.pointDragFinished.connect(self.request_refine)
+            scene.projectModified.connect(self.request_refine)
+
+    def is_enabled(self) -> bool:
+        return config.get("preview/enabled", False)
+
+    def _on_point_dragged(self):
+        if not self.is_enabled():
+            return
+        # 表示更新間隔より短い間隔の要求はまとめ、最新の点配置だけを計算する
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def request_refine(self):
+        """
+        現在の点配置で、低解像度から原寸までの段階的なプレビューを要求します。
+        """
+        if not self.is_enabled():
+            return
+        self._refine_requested = True
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def refresh(self):
+        """
+        設定の変更を反映します。無効化された場合はプレビューを消去します。
+        """
+        if self.is_enabled():
+            self.request_refine()
+        else:
+            self.stop()
+            self.game_scene.set_preview_image(None)
+
+    def stop(self):
+        self._timer.stop()
+        self._pending = None
+        self._refine_requested = False
+        if self._worker is not None:
+            self._worker.cancel()
+
+    def shutdown(self):
+        """
+        実行中のプレビュー計算を中断し、スレッドの終了を待ちます。
+        """
+        self.stop()
+        if self._worker is not None:
+            self._worker.wait()
+            self._worker = None
+
+    def _on_timer(self):
+        refine = self._refine_requested
+        self._refine_requested = False
+        if self._worker is not None:
+            # 終了後に最新の点配置で計算し直す。低解像度の計算は短いため待ち、精細化中なら打ち切る
+            self._pending = bool(self._pending) or refine
+            if len(self._worker.levels) > 1:
+                self._worker.cancel()
+            return
+        self._start(refine)
+
+    def _small_source_image(self, real_qimage: QImage, max_size: int) -> Tuple[Any, float]:
+        key = (real_qimage.cacheKey(), max_size)
+        if key != self._small_source_key:
+            # 出力より少し大きめに縮小しておき、拡大方向の変形でもぼけにくくする
+            longest = max(real_qimage.width(), real_qimage.height())
+            src_scale = min(1.0, 2.0 * max_size / longest)
+            if src_scale < 1.0:
+                small = real_qimage.scaled(
+                    max(1, int(round(real_qimage.width() * src_scale))),
+                    max(1, int(round(real_qimage.height() * src_scale))),
+                    Qt.IgnoreAspectRatio, Qt.SmoothTransformation
+                )
+                src_scale = small.width() / real_qimage.width()
+            else:
+                small = real_qimage
+            self._small_source = (np.ascontiguousarray(qimage_to_numpy(small)), src_scale)
+            self._small_source_key = key
+        return self._small_source
+
+    def _start(self, refine: bool):
+        game_points = self.game_scene.current_points()
+        real_points = self.real_scene.current_points()
+        if (self.project is None or self.project.game_qimage.isNull() or self.project.real_qimage.isNull()
+                or len(game_points) != len(real_points) or len(game_points) < 3):
+            self.game_scene.set_preview_image(None)
+            return
+        output_size = (self.project.game_qimage.width(), self.project.game_qimage.height())
+        # GCV の掃引は行わず、直前の変換で選ばれた λ（なければ設定ファイルの値）をそのまま使う
+        settings = load_transform_settings(self.project, resolve_lambda=False)
+        max_size = config.get("preview/max_size", 512)
+        scale = min(1.0, max_size / max(output_size))
+        small_src, src_scale = self._small_source_image(self.project.real_qimage, max_size)
+        preview_settings = {
+            "reg_lambda": settings["reg_lambda"],
+            "adaptive": settings["adaptive"],
+            "workers": resolve_worker_count(config.get("preview/workers", 0)),
+            "eval_mode": "grid",
+            "grid_step": config.get("preview/grid_step", 16),
+            "engine": settings["engine"],
+            "lowrank_threshold": settings["lowrank_threshold"],
+            "lowrank_landmarks": settings["lowrank_landmarks"],
+        }
+        levels: List[PreviewLevel] = [(scale, src_scale, small_src, preview_settings)]
+        if refine and scale < 1.0:
+            # 原寸の精細化はドラッグを離すたびに変わる点配置で行うため、ディスクのマップキャッシュには書き込まない
+            refine_settings = {
+                "reg_lambda": settings["reg_lambda"],
+                "adaptive": settings["adaptive"],
+                "max_memory_mb": settings["max_memory_mb"],
+                "workers": settings["workers"],
+                "eval_mode": settings["eval_mode"],
+                "grid_step": settings["grid_step"],
+                "grid_tolerance": settings["grid_tolerance"],
+                "engine": settings["engine"],
+                "lowrank_threshold": settings["lowrank_threshold"],
+                "lowrank_landmarks": settings["lowrank_landmarks"],
+                "precision": settings["precision"],
+                "use_map_cache": False,
+            }
+            levels.append((1.0, 1.0, QImage(self.project.real_qimage), refine_settings))
+        worker = PreviewWorker(game_points, real_points, output_size, levels, self)
+        worker.levelReady.connect(lambda qimage, level_scale, w=worker: self._on_level_ready(w, qimage, level_scale))
+        worker.finished.connect(lambda w=worker: self._on_worker_finished(w))
+        self._worker = worker
+        worker.start()
+
+    def _on_level_ready(self, worker, qimage, scale):
+        if worker is not self._worker or worker.is_cancelled():
+            return
+        self.game_scene.set_preview_image(qimage, scale)
+
+    def _on_worker_finished(self, worker):
+        worker.deleteLater()
+        if worker is not self._worker:
+            return
+        self._worker = None
+        if self._pending is not None:
+            refine = self._pending
+            self._pending = None
+            self._start(refine)
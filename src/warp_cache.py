@@ -0,0 +1,171 @@
+# src/warp_cache.py
+import os
+import hashlib
+import threading
+import uuid
+import numpy as np
+from typing import Any, Optional, Sequence, Tuple
+from logger import transform_logger
+from app_settings import config, get_user_config_dir
+
+# マップの生成方法を変更した場合は値を上げ、古いキャッシュを無効化する
+CACHE_VERSION = 1
+CACHE_EXTENSION = ".npy"
+
+def make_cache_key(dest_points: Sequence[Sequence[float]], src_points: Sequence[Sequence[float]],
+                   output_size: Tuple[int, int], source_shape: Tuple[int, ...], **options: Any) -> str:
+    """
+    ワープマップを一意に決める入力からキャッシュキーを生成します。
+
+    マップは対応点と変換設定、出力サイズだけで決まり元画像の画素値には依存しないため、
+    元画像は形状のみをキーに含めます（画素が変わってもマップは再利用できます）。
+
+    Args:
+        dest_points (Sequence[Sequence[float]]): 変換先の対応点
+        src_points (Sequence[Sequence[float]]): 変換元の対応点
+        output_size (Tuple[int, int]): 出力画像のサイズ (width, height)
+        source_shape (Tuple[int, ...]): 元画像の配列形状
+        **options: マップに影響する変換設定（reg_lambda, adaptive, eval_mode など）
+
+    Returns:
+        str: 16進数のキー文字列
+    """
+    digest = hashlib.sha256()
+    digest.update(f"v{CACHE_VERSION}".encode())
+    digest.update(np.ascontiguousarray(dest_points, dtype=np.float64).tobytes())
+    digest.update(b"|")
+    digest.update(np.ascontiguousarray(src_points, dtype=np.float64).tobytes())
+    digest.update(repr((tuple(output_size), tuple(source_shape[:2]), sorted(options.items()))).encode())
+    return digest.hexdigest()
+
+class WarpMapCache:
+    """
+    合成済みのワープマップ（float32, 形状 (H, W, 2)）を .npy ファイルとして保存するキャッシュです。
+    読み出しはメモリマップで行うため、巨大なマップでも必要な行だけが読み込まれます。
+    合計サイズが上限を超えると、最後に使用された時刻が古いものから削除します。
+    """
+    def __init__(self, cache_dir: str, max_size_mb: float):
+        self.cache_dir = cache_dir
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + CACHE_EXTENSION)
+
+    def load(self, key: str) -> Optional[np.ndarray]:
+        """
+        キャッシュ済みのマップを読み取り専用のメモリマップとして返します。存在しなければ None を返します。
+        """
+        path = self._path(key)
+        try:
+            maps = np.load(path, mmap_mode="r")
+            os.utime(path)  # 最終使用時刻を更新する（LRU 用）
+        except (OSError, ValueError):
+            return None
+        transform_logger.debug("Warp map cache hit: %s", key)
+        return maps
+
+    def fits(self, height: int, width: int) -> bool:
+        """
+        指定サイズのマップが容量上限に収まるかを返します。
+        """
+        return height * width * 2 * np.dtype(np.float32).itemsize <= self.max_size_bytes
+
+    def create(self, key: str, height: int, width: int) -> "WarpMapWriter":
+        """
+        マップを書き込むための一時ファイルを作成します。commit() を呼ぶまではキャッシュに現れません。
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        return WarpMapWriter(self, key, height, width)
+
+    def _commit(self, key: str, temp_path: str) -> None:
+        final_path = self._path(key)
+        os.replace(temp_path, final_path)
+        transform_logger.debug("Warp map cached: %s", key)
+        self.evict(keep=final_path)
+
+    def evict(self, keep: Optional[str] = None) -> None:
+        """
+        合計サイズが上限以下になるまで、最終使用時刻の古いファイルから削除します。
+        """
+        with self._lock:
+            entries = []
+            try:
+                names = os.listdir(self.cache_dir)
+            except OSError:
+                return
+            for name in names:
+                if not name.endswith(CACHE_EXTENSION):
+                    continue
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+            total = sum(entry[1] for entry in entries)
+            for mtime, size, path in sorted(entries):
+                if total <= self.max_size_bytes:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    os.remove(path)
+                    total -= size
+                    transform_logger.debug("Evicted warp map cache file: %s", path)
+                except OSError:
+                    # 他の処理がメモリマップで開いている場合などは次回に持ち越す
+                    continue
+
+    def clear(self) -> None:
+        """
+        キャッシュをすべて削除します。
+        """
+        with self._lock:
+            if not os.path.isdir(self.cache_dir):
+                return
+            for name in os.listdir(self.cache_dir):
+                if name.endswith(CACHE_EXTENSION) or name.endswith(".tmp"):
+                    try:
+                        os.remove(os.path.join(self.cache_dir, name))
+                    except OSError:
+                        pass
+
+class WarpMapWriter:
+    """
+    WarpMapCache.create が返す書き込み用オブジェクトです。maps に行単位で書き込み、最後に commit() します。
+    """
+    def __init__(self, cache: WarpMapCache, key: str, height: int, width: int):
+        self.cache = cache
+        self.key = key
+        self.temp_path = os.path.join(cache.cache_dir, f"{key}.{uuid.uuid4().hex}.tmp")
+        self.maps = np.lib.format.open_memmap(self.temp_path, mode="w+", dtype=np.float32, shape=(height, width, 2))
+
+    def commit(self) -> None:
+        self.maps.flush()
+        self.maps = None  # Windows では開いたままのファイルを置き換えられないため先に閉じる
+        self.cache._commit(self.key, self.temp_path)
+
+    def discard(self) -> None:
+        self.maps = None
+        try:
+            os.remove(self.temp_path)
+        except OSError:
+            pass
+
+_default_cache: Optional[WarpMapCache] = None
+
+def get_warp_map_cache() -> WarpMapCache:
+    """
+    設定に基づく既定のワープマップキャッシュを返します。保存先はユーザ設定ディレクトリの warp_cache
+    （Windows は %APPDATA%\\KartenWarp\\warp_cache、macOS は ~/Library/Application Support/KartenWarp/warp_cache、
+    それ以外は ~/.config/KartenWarp/warp_cache。環境変数 KARTENWARP_CONFIG_DIR で変更可能）です。
+    キャッシュは設定 cache/enabled を有効にした場合だけ使われます。
+    """
+    global _default_cache
+    cache_dir = os.path.join(get_user_config_dir(), "warp_cache")
+    max_size_mb = config.get("cache/max_size_mb", 1024)
+    if (_default_cache is None or _default_cache.cache_dir != cache_dir
+            or _default_cache.max_size_bytes != int(max_size_mb * 1024 * 1024)):
+        _default_cache = WarpMapCache(cache_dir, max_size_mb)
+    return _default_cache
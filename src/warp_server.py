@@ -0,0 +1,520 @@
+# src/warp_server.py
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import itertools
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+import numpy as np
+import cv2
+from PyQt5.QtGui import QImage, QImageReader
+from logger import logger
+from app_settings import config
+from common import _
+from core import (TransformCancelled, create_map_builder, perform_transformation, load_transform_settings,
+                  resolve_worker_count, MAX_REMAP_SIDE)
+from warp_cache import make_cache_key
+
+# リクエスト本文の上限（対応点を多数含むジョブでも十分な大きさ）
+MAX_REQUEST_BYTES = 16 * 1024 * 1024
+# ジョブごとに上書きできる変換設定
+JOB_SETTING_KEYS = ("reg_lambda", "adaptive", "max_memory_mb", "workers", "eval_mode", "grid_step",
+                    "grid_tolerance", "use_map_cache", "engine", "lowrank_threshold", "lowrank_landmarks", "precision")
+# プロジェクトのジョブでプロジェクトから引き継ぐ変換設定
+PROJECT_SETTING_KEYS = ("engine", "reg_lambda", "adaptive")
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                413: "Payload Too Large", 503: "Service Unavailable"}
+
+class MemoryLRUCache:
+    """
+    スレッドセーフなメモリ上の LRU キャッシュです。
+    要素数とバイト数の上限を超えると、最後に使用された時刻が古いものから破棄します。
+    同じキーの値を複数のスレッドが同時に要求した場合は、生成を1回だけ行います。
+
+    Args:
+        max_items (Optional[int], optional): 要素数の上限
+        max_bytes (Optional[int], optional): 合計バイト数の上限
+        size_of (Optional[Callable[[Any], int]], optional): 値のバイト数を返す関数
+    """
+    def __init__(self, max_items: Optional[int] = None, max_bytes: Optional[int] = None,
+                 size_of: Optional[Callable[[Any], int]] = None):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self._size_of = size_of or (lambda value: 0)
+        self._items: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+        self._loading: Dict[Hashable, threading.Lock] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, key: Hashable) -> Tuple[bool, Any]:
+        entry = self._items.get(key)
+        if entry is None:
+            return False, None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return True, entry[0]
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        キーに対応する値を返します。キャッシュにない場合は factory() で生成して登録します。
+
+        Returns:
+            Tuple[Any, bool]: (値, キャッシュから取得した場合は True)
+        """
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                return value, True
+            key_lock = self._loading.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                # 待っている間に他のスレッドが生成した場合
+                found, value = self._lookup(key)
+                if found:
+                    return value, True
+                self.misses += 1
+            try:
+                value = factory()
+                size = self._size_of(value)
+                with self._lock:
+                    self._items[key] = (value, size)
+                    self._bytes += size
+                    self._evict()
+            finally:
+                with self._lock:
+                    self._loading.pop(key, None)
+        return value, False
+
+    def _evict(self) -> None:
+        # 直前に追加した要素は上限を超えていても残す
+        while len(self._items) > 1 and (
+                (self.max_items is not None and len(self._items) > self.max_items)
+                or (self.max_bytes is not None and self._bytes > self.max_bytes)):
+            _key, (_value, size) = self._items.popitem(last=False)
+            self._bytes -= size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"items": len(self._items), "bytes": self._bytes, "hits": self.hits, "misses": self.misses}
+
+def _file_key(kind: str, path: str) -> Tuple[str, str, int, int]:
+    """
+    ファイルの内容が変わればキーも変わるよう、パスと更新時刻・サイズからキャッシュキーを作ります。
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    return kind, path, stat.st_mtime_ns, stat.st_size
+
+def _load_source_qimage(path: str) -> QImage:
+    qimage = QImage(path)
+    if qimage.isNull():
+        raise ValueError(f"Failed to read image: {path}")
+    # QImageSourceReader が変換せずに参照できる形式にしておく
+    return qimage.convertToFormat(QImage.Format_RGB32)
+
+def _load_project_inputs(path: str) -> Dict[str, Any]:
+    from project import Project
+    project = Project.load(path, headless=True)
+    if len(project.game_points) != len(project.real_points) or len(project.game_points) < 3:
+        raise ValueError(_("error_insufficient_points"))
+    if project.game_qimage.isNull() or project.real_qimage.isNull():
+        raise ValueError(_("game_image_error_insufficient_points"))
+    return {
+        "game_points": [tuple(p) for p in project.game_points],
+        "real_points": [tuple(p) for p in project.real_points],
+        "source": project.real_qimage.convertToFormat(QImage.Format_RGB32),
+        "output_size": (project.game_qimage.width(), project.game_qimage.height()),
+        # プロジェクトに保存された変換エンジンと、自動選択（GCV）した正則化パラメータ
+        "settings": {key: value for key, value in load_transform_settings(project).items()
+                     if key in PROJECT_SETTING_KEYS},
+    }
+
+def _source_needs_streaming(path: str) -> bool:
+    """
+    元画像が QImage として読めない形式・大きさの場合や、一辺が cv2.remap で扱える上限以上の場合に True を返します。
+    """
+    size = QImageReader(path).size()
+    if not size.isValid():
+        return True
+    width, height = size.width(), size.height()
+    return width >= MAX_REMAP_SIDE or height >= MAX_REMAP_SIDE or width * height * 4 >= 1 << 31
+
+def _qimage_bytes(value: Any) -> int:
+    qimage = value["source"] if isinstance(value, dict) else value
+    return qimage.bytesPerLine() * qimage.height()
+
+def write_image(path: str, rgb: np.ndarray) -> None:
+    """
+    RGB 配列を拡張子に応じた形式で書き出します。非 ASCII のパスにも対応します。
+    """
+    ext = os.path.splitext(path)[1].lower() or ".png"
+    ok, encoded = cv2.imencode(ext, cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR))
+    if not ok:
+        raise ValueError(f"Unsupported output format: {path}")
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    encoded.tofile(path)
+
+class WarpJob:
+    """
+    キューに積まれた1件の変換ジョブです。進捗や結果はイベントとして events に送られます。
+    """
+    def __init__(self, job_id: int, spec: Dict[str, Any], loop: asyncio.AbstractEventLoop):
+        self.id = job_id
+        self.spec = spec
+        self.events: asyncio.Queue = asyncio.Queue()
+        self.cancel_event = threading.Event()
+        self._loop = loop
+
+    def emit(self, event: str, **fields: Any) -> None:
+        """
+        イベントを送ります。ワーカースレッドからも呼び出せます。
+        """
+        payload = {"event": event, "job": self.id, **fields}
+        self._loop.call_soon_threadsafe(self.events.put_nowait, payload)
+
+class WarpServer:
+    """
+    ワープジョブを受け付けるローカルの HTTP サーバーです（TCP または Unix ソケット）。
+
+    POST /warp で受け付けたジョブはキューに積まれ、jobs 件ずつスレッドプールで実行されます。
+    応答は改行区切りの JSON（application/x-ndjson）で、queued / started / progress を経て
+    done・error・cancelled のいずれかで終わります。接続が切れた場合はジョブをキャンセルします。
+    GET /status はキューと各キャッシュの状態を返します。
+    元画像のパス（source）を指定したジョブは、"stream": true の場合や元画像が QImage・cv2.remap の上限を超える場合に
+    streaming モジュールで帯単位に変換し、出力へ直接書き出します。
+
+    デコード済みの元画像と TPS パラメータ（create_map_builder の生成器）はメモリ上の LRU キャッシュに保持し、
+    同じ地図に対する繰り返しのジョブではデコードと連立方程式の求解を省略します。
+
+    Args:
+        jobs (int, optional): 同時に実行するジョブ数
+        threads (Optional[int], optional): 1ジョブあたりのスレッド数。None の場合は CPU コア数を jobs で割った値
+        max_queue (int, optional): 実行待ちジョブ数の上限。超えた場合は 503 を返します
+        image_cache_mb (float, optional): 元画像キャッシュの上限（MB）
+        solver_cache_size (int, optional): TPS パラメータのキャッシュに保持する件数
+    """
+    def __init__(self, jobs: int = 2, threads: Optional[int] = None, max_queue: int = 64,
+                 image_cache_mb: float = 1024, solver_cache_size: int = 32):
+        self.jobs = max(1, jobs)
+        self.threads = threads if threads is not None else max(1, (os.cpu_count() or 1) // self.jobs)
+        self.max_queue = max_queue
+        self.images = MemoryLRUCache(max_bytes=int(image_cache_mb * 1024 * 1024), size_of=_qimage_bytes)
+        self.solvers = MemoryLRUCache(max_items=solver_cache_size)
+        self._job_ids = itertools.count(1)
+        self._active: Dict[int, WarpJob] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._servers: List[asyncio.AbstractServer] = []
+        self._workers: List[asyncio.Task] = []
+
+    # --- ジョブの実行（ワーカースレッド） ---
+
+    def _job_settings(self, overrides: Dict[str, Any]) -> Dict[str, Any]:
+        settings = load_transform_settings()
+        settings["workers"] = self.threads
+        unknown = set(overrides) - set(JOB_SETTING_KEYS)
+        if unknown:
+            raise ValueError(f"Unknown settings: {', '.join(sorted(unknown))}")
+        settings.update(overrides)
+        settings["workers"] = resolve_worker_count(settings["workers"])
+        return settings
+
+    def _resolve_inputs(self, spec: Dict[str, Any], streamed: bool = False) -> Tuple[Dict[str, Any], bool]:
+        if "project" in spec:
+            path = spec["project"]
+            return self.images.get_or_create(_file_key("project", path), lambda: _load_project_inputs(path))
+        for key in ("game_points", "real_points", "source"):
+            if key not in spec:
+                raise ValueError(f"Missing field: {key}")
+        source_path = spec["source"]
+        if streamed:
+            # ストリーミング変換では元画像を窓単位で読むため、デコードもキャッシュもしない
+            source, cached = None, False
+        else:
+            source, cached = self.images.get_or_create(_file_key("image", source_path),
+                                                       lambda: _load_source_qimage(source_path))
+        if "output_size" in spec:
+            output_size = tuple(int(v) for v in spec["output_size"])
+        elif "game_image" in spec:
+            # ゲーム画像は大きさだけが必要なため、デコードせずにヘッダーから読む
+            size = QImageReader(spec["game_image"]).size()
+            if not size.isValid():
+                raise ValueError(f"Failed to read image: {spec['game_image']}")
+            output_size = (size.width(), size.height())
+        else:
+            raise ValueError("Missing field: output_size or game_image")
+        inputs = {
+            "game_points": [tuple(p) for p in spec["game_points"]],
+            "real_points": [tuple(p) for p in spec["real_points"]],
+            "source": source,
+            "output_size": output_size,
+        }
+        return inputs, cached
+
+    def _builder(self, inputs: Dict[str, Any], settings: Dict[str, Any],
+                 progress: Callable[[str, int, int], None],
+                 cancel_event: threading.Event) -> Tuple[Any, bool]:
+        options = {key: settings[key] for key in JOB_SETTING_KEYS if key != "use_map_cache"}
+        key = make_cache_key(inputs["game_points"], inputs["real_points"], inputs["output_size"], (), **options)
+        return self.solvers.get_or_create(key, lambda: create_map_builder(
+            inputs["game_points"], inputs["real_points"], inputs["output_size"],
+            progress_callback=progress, cancel_event=cancel_event, **options
+        ))
+
+    def _run_job(self, job: WarpJob) -> Dict[str, Any]:
+        spec = job.spec
+        timings: Dict[str, float] = {}
+        started = time.perf_counter()
+        settings = self._job_settings(spec.get("settings", {}))
+        # 元画像のパスを指定したジョブは、要求された場合や QImage で扱えない大きさの場合にストリーミング変換する
+        streamed = "project" not in spec and "source" in spec and (
+            bool(spec.get("stream")) or _source_needs_streaming(spec["source"]))
+        inputs, source_cached = self._resolve_inputs(spec, streamed)
+        for key, value in inputs.get("settings", {}).items():
+            # プロジェクトのジョブでは、ジョブで上書きされない限りプロジェクトごとの設定を使う
+            if key not in spec.get("settings", {}):
+                settings[key] = value
+        loaded = time.perf_counter()
+        timings["load"] = loaded - started
+
+        def progress(stage: str, done: int, total: int) -> None:
+            job.emit("progress", stage=stage, done=done, total=total)
+
+        builder, solver_cached = self._builder(inputs, settings, progress, job.cancel_event)
+        solved = time.perf_counter()
+        timings["solve"] = solved - loaded
+        if streamed:
+            from streaming import open_image_reader, stream_to_file
+            os.makedirs(os.path.dirname(os.path.abspath(spec["output"])), exist_ok=True)
+            reader = open_image_reader(spec["source"])
+            try:
+                stream_to_file(inputs["game_points"], inputs["real_points"], reader, spec["output"],
+                               inputs["output_size"], settings, progress, job.cancel_event, builder)
+            finally:
+                reader.close()
+            warped_at = time.perf_counter()
+            timings["warp"] = warped_at - solved
+        else:
+            warped = perform_transformation(
+                inputs["game_points"], inputs["real_points"], inputs["source"], inputs["output_size"],
+                progress_callback=progress, cancel_event=job.cancel_event, builder=builder, **settings
+            )
+            warped_at = time.perf_counter()
+            timings["warp"] = warped_at - solved
+            write_image(spec["output"], warped)
+        timings["save"] = time.perf_counter() - warped_at
+        timings["total"] = time.perf_counter() - started
+        logger.info("Server job %d finished: %s", job.id, spec["output"])
+        return {
+            "output": spec["output"],
+            "size": list(inputs["output_size"]),
+            "cached": {"source": source_cached, "solver": solver_cached},
+            "streamed": streamed,
+            "timings": timings,
+        }
+
+    async def _worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self._queue.get()
+            try:
+                if job.cancel_event.is_set():
+                    job.emit("cancelled")
+                    continue
+                job.emit("started")
+                try:
+                    result = await loop.run_in_executor(self._executor, self._run_job, job)
+                except TransformCancelled:
+                    job.emit("cancelled")
+                except Exception as e:
+                    logger.exception("Server job %d failed", job.id)
+                    job.emit("error", error=str(e))
+                else:
+                    job.emit("done", **result)
+            finally:
+                self._active.pop(job.id, None)
+                self._queue.task_done()
+
+    # --- HTTP ---
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "jobs": self.jobs,
+            "threads": self.threads,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "active": len(self._active),
+            "caches": {"images": self.images.stats(), "solvers": self.solvers.stats()},
+        }
+
+    @staticmethod
+    async def _send_json(writer: asyncio.StreamWriter, status: int, payload: Dict[str, Any]) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body
+        )
+        await writer.drain()
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Tuple[str, str, bytes]:
+        request_line = (await reader.readline()).decode("latin-1").split()
+        if len(request_line) != 3:
+            raise ValueError("Malformed request line")
+        method, target = request_line[0].upper(), request_line[1]
+        length = 0
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _sep, value = line.decode("latin-1").partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value.strip())
+        if length > MAX_REQUEST_BYTES:
+            raise OverflowError(length)
+        body = await reader.readexactly(length) if length else b""
+        return method, target.split("?", 1)[0], body
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            try:
+                method, path, body = await self._read_request(reader)
+            except OverflowError:
+                await self._send_json(writer, 413, {"error": "Request body too large"})
+                return
+            except (ValueError, asyncio.IncompleteReadError):
+                await self._send_json(writer, 400, {"error": "Malformed request"})
+                return
+            if path == "/status":
+                await self._send_json(writer, 200, self.status())
+            elif path == "/warp":
+                if method != "POST":
+                    await self._send_json(writer, 405, {"error": "Use POST"})
+                    return
+                await self._handle_warp(body, writer)
+            else:
+                await self._send_json(writer, 404, {"error": f"Unknown path: {path}"})
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _handle_warp(self, body: bytes, writer: asyncio.StreamWriter) -> None:
+        try:
+            spec = json.loads(body.decode("utf-8"))
+            if not isinstance(spec, dict) or "output" not in spec:
+                raise ValueError("Missing field: output")
+        except ValueError as e:
+            await self._send_json(writer, 400, {"error": str(e)})
+            return
+        if self._queue.full():
+            await self._send_json(writer, 503, {"error": "Job queue is full"})
+            return
+        job = WarpJob(next(self._job_ids), spec, asyncio.get_running_loop())
+        self._active[job.id] = job
+        self._queue.put_nowait(job)
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+                     b"Transfer-Encoding: chunked\r\nConnection: close\r\n\r\n")
+        job.emit("queued", position=self._queue.qsize())
+        try:
+            while True:
+                event = await job.events.get()
+                line = json.dumps(event, ensure_ascii=False).encode("utf-8") + b"\n"
+                writer.write(f"{len(line):X}\r\n".encode("ascii") + line + b"\r\n")
+                await writer.drain()
+                if event["event"] in ("done", "error", "cancelled"):
+                    break
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        except ConnectionError:
+            # クライアントが切断した場合は、待機中・実行中のジョブを打ち切る
+            job.cancel_event.set()
+            logger.info("Client disconnected; cancelling server job %d", job.id)
+
+    async def start(self, host: Optional[str] = None, port: Optional[int] = None,
+                    unix_path: Optional[str] = None) -> None:
+        """
+        待ち受けとワーカーを開始します。unix_path を指定した場合は Unix ソケットで待ち受けます。
+        """
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._executor = ThreadPoolExecutor(max_workers=self.jobs, thread_name_prefix="warp-job")
+        self._workers = [asyncio.create_task(self._worker()) for _i in range(self.jobs)]
+        if unix_path is not None:
+            self._servers.append(await asyncio.start_unix_server(self._handle_connection, path=unix_path))
+        else:
+            self._servers.append(await asyncio.start_server(self._handle_connection, host, port))
+
+    @property
+    def addresses(self) -> List[Any]:
+        return [sock.getsockname() for server in self._servers for sock in server.sockets]
+
+    async def close(self) -> None:
+        """
+        待ち受けを停止し、実行中のジョブをキャンセルします。
+        """
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+        for job in list(self._active.values()):
+            job.cancel_event.set()
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+async def serve(server: WarpServer, host: Optional[str], port: Optional[int], unix_path: Optional[str]) -> None:
+    await server.start(host, port, unix_path)
+    print(f"KartenWarp warp server listening on {server.addresses} "
+          f"(jobs={server.jobs}, threads={server.threads})", flush=True)
+    try:
+        await asyncio.gather(*(s.serve_forever() for s in server._servers))
+    finally:
+        await server.close()
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="kartenwarp", description="KartenWarp local warp job server")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    serve_parser = subparsers.add_parser("serve", help="Accept warp jobs over HTTP on a local socket")
+    serve_parser.add_argument("--host", default=config.get("server/host", "127.0.0.1"), help="Address to bind")
+    serve_parser.add_argument("--port", "-p", type=int, default=config.get("server/port", 8765), help="TCP port")
+    serve_parser.add_argument("--unix", default=None, help="Listen on this Unix socket path instead of TCP")
+    serve_parser.add_argument("--jobs", "-j", type=int, default=config.get("server/jobs", 2),
+                              help="Number of jobs run concurrently")
+    serve_parser.add_argument("--threads", "-t", type=int, default=None,
+                              help="Threads per job (default: CPU cores divided by --jobs)")
+    return parser
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    コマンドラインのエントリーポイントです。
+
+    例: python src/main.py serve --port 8765
+        curl -N -d '{"project": "a.kw", "output": "a.png"}' http://127.0.0.1:8765/warp
+    """
+    args = build_arg_parser().parse_args(argv)
+    server = WarpServer(
+        jobs=args.jobs, threads=args.threads, max_queue=config.get("server/max_queue", 64),
+        image_cache_mb=config.get("server/image_cache_mb", 1024),
+        solver_cache_size=config.get("server/solver_cache_size", 32),
+    )
+    try:
+        asyncio.run(serve(server, args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+# tests/conftest.py
+
+import os
+import sys
+import json
+import base64
+import cv2
+import numpy as np
+import pytest
+
+# src 以下のモジュールはアプリ本体と同じく名前だけで import する
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from types import SimpleNamespace  # noqa: E402
+from core import apply_tps_warp, compute_tps_parameters  # noqa: E402
+from tps_solver import clear_solver_cache, tps_kernel  # noqa: E402
+
+# 近似評価の誤差を全画素で確かめる出力画像のサイズ (width, height)
+WARP_SIZE = (320, 240)
+
+@pytest.fixture(autouse=True)
+def _fresh_solver_cache():
+    # ソルバーのキャッシュを介した逐次更新がテスト間で干渉しないようにする
+    clear_solver_cache()
+    yield
+    clear_solver_cache()
+
+def _make_points(n: int, size=(400, 300), amplitude: float = 12.0, seed: int = 0):
+    """
+    出力画像内に散らばる変換先の点と、拡大・平行移動に乱れを加えた変換元の点を返します。
+    """
+    rng = np.random.default_rng(seed)
+    dest = rng.uniform((10.0, 10.0), (size[0] - 10.0, size[1] - 10.0), (n, 2))
+    src = dest * 1.05 + (7.0, -4.0) + rng.normal(0.0, amplitude, (n, 2))
+    return dest, src
+
+@pytest.fixture
+def make_points():
+    return _make_points
+
+@pytest.fixture
+def points():
+    return _make_points(12)
+
+def _max_deviation(a, b) -> float:
+    """
+    2 組の (x, y) 座標マップの、画素ごとの距離の最大値を返します。
+    """
+    return float(np.hypot(a[0] - b[0], a[1] - b[1]).max())
+
+@pytest.fixture
+def max_deviation():
+    return _max_deviation
+
+@pytest.fixture
+def exact_map():
+    def evaluate(params_x, params_y, dest, size=WARP_SIZE):
+        grid_x, grid_y = np.meshgrid(np.arange(size[0], dtype=np.float64), np.arange(size[1], dtype=np.float64))
+        return apply_tps_warp(params_x, params_y, dest, grid_x, grid_y)
+    return evaluate
+
+@pytest.fixture
+def warp(exact_map):
+    """
+    WARP_SIZE の出力に対する 20 点の TPS と、全画素の厳密なマップ（exact）を返します。
+    """
+    dest, src = _make_points(20, size=WARP_SIZE, amplitude=25.0, seed=4)
+    params_x, params_y = compute_tps_parameters(dest, src, reg_lambda=1e-3)
+    return SimpleNamespace(params_x=params_x, params_y=params_y, dest=dest, size=WARP_SIZE,
+                           exact=exact_map(params_x, params_y, dest))
+
+def _direct_system(dest: np.ndarray, reg_lambda: float) -> np.ndarray:
+    """
+    正規化せず元の座標系のまま組み立てた TPS の係数行列 [[0, P^T], [P, K + λI]] を返します。
+    """
+    n = dest.shape[0]
+    K = tps_kernel(np.sum((dest[:, None, :] - dest[None, :, :]) ** 2, axis=2)) + reg_lambda * np.eye(n)
+    P = np.hstack((np.ones((n, 1)), dest))
+    M = np.zeros((n + 3, n + 3))
+    M[:3, 3:] = P.T
+    M[3:, :3] = P
+    M[3:, 3:] = K
+    return M
+
+@pytest.fixture
+def direct_system():
+    return _direct_system
+
+def _test_image(width: int, height: int, seed: int = 8) -> np.ndarray:
+    """
+    圧縮が効きつつ画素ごとの差も残る RGB 画像を返します。
+    """
+    rng = np.random.default_rng(seed)
+    base = rng.integers(0, 256, (height // 10 + 1, width // 10 + 1, 3), dtype=np.uint8)
+    image = cv2.resize(base, (width, height), interpolation=cv2.INTER_LINEAR)
+    return np.ascontiguousarray(image + rng.integers(0, 4, image.shape, dtype=np.uint8))
+
+def _encode_png(rgb: np.ndarray) -> str:
+    return base64.b64encode(cv2.imencode(".png", cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR))[1].tobytes()).decode("ascii")
+
+@pytest.fixture
+def write_project(tmp_path):
+    """
+    画像を埋め込んだ .kw プロジェクトファイルを書き出す関数を返します。
+    sheets には (実地図画像, ゲーム画像の対応点, 実地図の対応点) のリストを指定します。
+    """
+    def write(name, game_size, real_image, game_points, real_points, sheets=()):
+        data = {
+            "version": 2,
+            "game_image_data": _encode_png(_test_image(*game_size, seed=1)),
+            "real_image_data": _encode_png(real_image) if real_image is not None else "",
+            "game_points": [list(map(float, p)) for p in game_points],
+            "real_points": [list(map(float, p)) for p in real_points],
+            "settings": {},
+            "sheets": [{"name": f"sheet{i}", "image_data": _encode_png(image),
+                        "game_points": [list(map(float, p)) for p in dest],
+                        "real_points": [list(map(float, p)) for p in src]}
+                       for i, (image, dest, src) in enumerate(sheets)],
+        }
+        path = tmp_path / (name + ".kw")
+        path.write_text(json.dumps(data), encoding="utf-8")
+        return str(path)
+    return write
+
+@pytest.fixture
+def test_image():
+    return _test_image
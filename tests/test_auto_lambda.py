@@ -0,0 +1,74 @@
+# tests/test_auto_lambda.py
+
+from types import SimpleNamespace
+import numpy as np
+import pytest
+import core
+from core import auto_lambda_pending, compute_auto_lambda, load_transform_settings, resolve_auto_lambda
+from tps_solver import gcv_sweep
+
+def _project(make_points):
+    dest, src = make_points(20, seed=9)
+    return SimpleNamespace(game_points=[tuple(p) for p in dest], real_points=[tuple(p) for p in src], settings={})
+
+def _enable_auto_lambda(monkeypatch):
+    get = core.config.get
+    monkeypatch.setattr(core.config, "get", lambda key, default=None: True if key == "tps/auto_lambda" else get(key, default))
+
+def _count_sweeps(monkeypatch):
+    calls = []
+    sweep = core.compute_gcv_curve
+    monkeypatch.setattr(core, "compute_gcv_curve", lambda *args, **kwargs: calls.append(1) or sweep(*args, **kwargs))
+    return calls
+
+def test_gui_settings_never_start_a_sweep(make_points, monkeypatch):
+    _enable_auto_lambda(monkeypatch)
+    calls = _count_sweeps(monkeypatch)
+    project = _project(make_points)
+    settings = load_transform_settings(project, resolve_lambda=False)
+    assert calls == [] and "auto_lambda" not in project.settings
+    assert auto_lambda_pending(project, settings)
+
+    # ワーカーでの掃引結果を保存すると、同じ対応点では掃引は不要になる
+    entry = compute_auto_lambda(project.game_points, project.real_points,
+                                settings["lowrank_threshold"], settings["lowrank_landmarks"])
+    project.settings["auto_lambda"] = entry
+    assert not auto_lambda_pending(project, settings)
+    assert load_transform_settings(project, resolve_lambda=False)["reg_lambda"] == entry["reg_lambda"]
+
+    # 点を動かした後も、プレビュー用の設定は掃引せずに直前の λ を使う
+    project.game_points[0] = (1.0, 2.0)
+    assert auto_lambda_pending(project, settings)
+    assert load_transform_settings(project, resolve_lambda=False)["reg_lambda"] == entry["reg_lambda"]
+    assert len(calls) == 1
+
+def test_resolve_auto_lambda_reuses_stored_result(make_points, monkeypatch):
+    calls = _count_sweeps(monkeypatch)
+    project = _project(make_points)
+    assert resolve_auto_lambda(project, compute=False) is None
+    first = resolve_auto_lambda(project)
+    assert first == project.settings["auto_lambda"]["reg_lambda"]
+    assert resolve_auto_lambda(project) == first
+    assert len(calls) == 1
+
+def test_gcv_matches_direct_computation(points, direct_system):
+    dest, src = points
+    n = dest.shape[0]
+    lambdas, scores = gcv_sweep(dest, src, lambdas=np.array([1e-2, 1.0, 1e2, 1e4]))
+    for reg_lambda, score in zip(lambdas, scores):
+        # 当てはめ残差は y - f = λ w、I - H はブロック逆行列の K 側の対角ブロックの λ 倍
+        inverse = np.linalg.inv(direct_system(dest, reg_lambda))
+        weights = inverse[3:, 3:] @ src
+        rss = np.sum((reg_lambda * weights) ** 2)
+        trace = reg_lambda * np.trace(inverse[3:, 3:])
+        assert score == pytest.approx(n * rss / trace ** 2, rel=1e-6)
+
+def test_gcv_default_candidates_are_sorted(points):
+    lambdas, scores = gcv_sweep(*points)
+    assert np.all(np.diff(lambdas) > 0)
+    assert np.all(np.isfinite(scores)) and np.all(scores >= 0)
+
+def test_gcv_rejects_collinear_points():
+    dest = np.stack((np.arange(6.0), 2.0 * np.arange(6.0)), axis=1)
+    with pytest.raises(ValueError):
+        gcv_sweep(dest, dest)
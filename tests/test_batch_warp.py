@@ -0,0 +1,45 @@
+# tests/test_batch_warp.py
+
+import os
+import sys
+import json
+import subprocess
+import cv2
+import numpy as np
+import batch_warp
+
+def test_batch_writes_outputs_and_summary(tmp_path, write_project, make_points, test_image):
+    dest, src = make_points(12, size=(200, 150), amplitude=6.0)
+    good = write_project("good", (200, 150), test_image(210, 160), dest, src)
+    # 対応点が 3 点に満たないプロジェクトは失敗として記録され、ほかのプロジェクトの処理は続く
+    bad = write_project("bad", (200, 150), test_image(210, 160), dest[:2], src[:2])
+    out = tmp_path / "out"
+    assert batch_warp.main(["warp", good, bad, "--out", str(out), "--threads", "1"]) == 1
+    with open(str(out / batch_warp.SUMMARY_FILE_NAME), encoding="utf-8") as f:
+        summary = json.load(f)
+    assert (summary["total"], summary["succeeded"], summary["failed"]) == (2, 1, 1)
+    assert [r["status"] for r in summary["results"]] == ["ok", "error"]
+    output = cv2.imread(summary["results"][0]["output"])
+    assert output.shape == (150, 200, 3) and output.any()
+
+def test_streamed_batch_matches_in_memory(tmp_path, write_project, make_points, test_image):
+    dest, src = make_points(12, size=(200, 150), amplitude=6.0)
+    project = write_project("map", (200, 150), test_image(210, 160), dest, src)
+    results = {}
+    for stream in (False, True):
+        out = str(tmp_path / ("stream" if stream else "memory"))
+        result, = batch_warp.run_batch([project], out, threads=1, stream=stream)
+        assert result["status"] == "ok" and result["streamed"] == stream
+        results[stream] = cv2.imread(result["output"], cv2.IMREAD_UNCHANGED)
+    np.testing.assert_array_equal(results[True][..., :3], results[False][..., :3])
+
+def test_subcommand_does_not_load_the_gui(tmp_path, write_project, make_points, test_image):
+    dest, src = make_points(12, size=(200, 150), amplitude=6.0)
+    project = write_project("map", (200, 150), test_image(210, 160), dest, src)
+    script = ("import sys, main\n"
+              f"sys.argv = ['main.py', 'warp', {project!r}, '--out', {str(tmp_path / 'out')!r}]\n"
+              "try:\n    main.main()\nexcept SystemExit as e:\n    code = e.code\n"
+              "print(code, 'ui' in sys.modules)\n")
+    completed = subprocess.run([sys.executable, "-c", script], cwd=os.path.dirname(batch_warp.__file__), capture_output=True, text=True,
+                               env=dict(os.environ, KARTENWARP_CONFIG_DIR=str(tmp_path / "config")))
+    assert completed.stdout.splitlines()[-1] == "0 False", completed.stderr
@@ -0,0 +1,43 @@
+# tests/test_compiled_warp.py
+
+import numpy as np
+import pytest
+from PyQt5.QtGui import QImage
+from common import qimage_to_numpy
+from core import compile_warp, perform_array_transformation, perform_qimage_transformation
+
+SETTINGS = {"reg_lambda": 1e-3, "max_memory_mb": 1, "workers": 2}
+
+def test_layers_match_full_transformation(points, test_image):
+    dest, src = points
+    layers = [test_image(420, 320, seed=seed) for seed in (1, 2, 3)]
+    compiled = compile_warp(dest, src, (420, 320), (400, 300), **SETTINGS)
+    assert compiled.output_size == (400, 300)
+    expected = [perform_array_transformation(dest, src, layer, (400, 300), **SETTINGS) for layer in layers]
+    # 固定小数点のマップでも、cv2.remap が内部で行う丸めと同じなので結果は一致する
+    for parallel in (True, False):
+        for result, layer_expected in zip(compiled.apply_many(layers, parallel=parallel), expected):
+            np.testing.assert_array_equal(result, layer_expected)
+
+def test_qimage_layer_matches_qimage_transformation(points, test_image):
+    dest, src = points
+    rgb = test_image(420, 320)
+    qimage = QImage(rgb.data, 420, 320, 3 * 420, QImage.Format_RGB888).convertToFormat(QImage.Format_RGB32)
+    compiled = compile_warp(dest, src, (420, 320), (400, 300), **SETTINGS)
+    result = compiled.apply_qimage(qimage)
+    expected = perform_qimage_transformation(dest, src, qimage, (400, 300), **SETTINGS)
+    assert result.format() == expected.format()
+    np.testing.assert_array_equal(qimage_to_numpy(result), qimage_to_numpy(expected))
+
+def test_source_outside_the_warp_gives_background(test_image):
+    dest = [(0.0, 0.0), (100.0, 0.0), (0.0, 100.0), (100.0, 100.0)]
+    src = [(x + 5000.0, y) for x, y in dest]
+    compiled = compile_warp(dest, src, (200, 150), (100, 80))
+    assert compiled.window is None
+    assert (compiled.apply(test_image(200, 150)) == 255).all()
+
+def test_source_size_must_match(points, test_image):
+    dest, src = points
+    compiled = compile_warp(dest, src, (420, 320), (400, 300))
+    with pytest.raises(ValueError):
+        compiled.apply(test_image(421, 320))
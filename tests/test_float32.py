@@ -0,0 +1,20 @@
+# tests/test_float32.py
+
+import numpy as np
+from core import WarpMapBuilder, estimate_precision_error, _tps_warp_tile
+
+def test_float32_kernel_close_to_float64(warp, max_deviation):
+    grid_x, grid_y = np.meshgrid(np.arange(warp.size[0], dtype=np.float64), np.arange(warp.size[1], dtype=np.float64))
+    single = _tps_warp_tile(warp.params_x, warp.params_y, warp.dest, grid_x, grid_y, "float32")
+    double = _tps_warp_tile(warp.params_x, warp.params_y, warp.dest, grid_x, grid_y)
+    deviation = max_deviation(single, double)
+    assert deviation < 1e-2
+    # 見積もりは標本点での差なので、全画素での差を超えない
+    estimate = estimate_precision_error(warp.params_x, warp.params_y, warp.dest, warp.size, "float32")
+    assert estimate <= deviation + 1e-12
+
+def test_map_builder_float32_close_to_exact(make_points, max_deviation):
+    dest, src = make_points(15, size=(320, 240), amplitude=10.0, seed=7)
+    exact = WarpMapBuilder(dest, src, (320, 240)).rows(0, 240)
+    approx = WarpMapBuilder(dest, src, (320, 240), precision="float32").rows(0, 240)
+    assert max_deviation(approx, exact) < 0.1
@@ -0,0 +1,36 @@
+# tests/test_leave_one_out.py
+
+import numpy as np
+import pytest
+from core import evaluate_tps_points
+from tps_solver import LowRankTPSSolver, TPSSolver
+
+@pytest.mark.parametrize("reg_lambda", [1e-3, 10.0])
+def test_leave_one_out_matches_refits(points, reg_lambda):
+    dest, src = points
+    errors = TPSSolver(dest, reg_lambda).leave_one_out(src)
+    for i in range(dest.shape[0]):
+        rest = np.delete(np.arange(dest.shape[0]), i)
+        params_x, params_y = TPSSolver(dest[rest], reg_lambda).solve(src[rest])
+        px, py = evaluate_tps_points(params_x, params_y, dest[rest], dest[i:i + 1, 0], dest[i:i + 1, 1])
+        np.testing.assert_allclose(errors[i], src[i] - (px[0], py[0]), atol=1e-7)
+
+def test_leave_one_out_requires_four_points():
+    dest = np.array([[0.0, 0.0], [10.0, 0.0], [0.0, 10.0]])
+    with pytest.raises(ValueError):
+        TPSSolver(dest, 1e-3).leave_one_out(dest)
+
+def test_lowrank_leave_one_out_matches_refits_for_fixed_landmarks(make_points):
+    dest, src = make_points(30, seed=3)
+    solver = LowRankTPSSolver(dest, 1.0, landmarks=12)
+    errors = solver.leave_one_out(src)
+    landmarks = set(solver.landmarks.tolist())
+    # ランドマークでない点は除いてもランドマークが変わらないため、最小二乗の公式がそのまま成り立つ
+    for i in [i for i in range(dest.shape[0]) if i not in landmarks][:5]:
+        rest = np.delete(np.arange(dest.shape[0]), i)
+        refit = LowRankTPSSolver(dest[rest], 1.0, landmarks=12)
+        if not np.array_equal(dest[rest][refit.landmarks], dest[solver.landmarks]):
+            continue
+        params_x, params_y = refit.solve(src[rest])
+        px, py = evaluate_tps_points(params_x, params_y, dest[rest], dest[i:i + 1, 0], dest[i:i + 1, 1])
+        np.testing.assert_allclose(errors[i], src[i] - (px[0], py[0]), atol=1e-6)
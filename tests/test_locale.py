@@ -0,0 +1,29 @@
+# tests/test_locale.py
+
+import gettext
+import os
+import re
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# TransformWorker の進捗として変換ダイアログに表示されるステージを通知するモジュール
+STAGE_SOURCES = ("src/core.py", "src/ui/transform_worker.py")
+
+def _transform_stages():
+    stages = set()
+    for path in STAGE_SOURCES:
+        with open(os.path.join(ROOT, path), encoding="utf-8") as f:
+            stages.update(re.findall(r'(?:progress_callback|progressChanged\.emit)\("(\w+)"', f.read()))
+    return sorted(stages)
+
+def test_stage_list_is_not_empty():
+    assert {"prepare", "solve", "warp"} <= set(_transform_stages())
+
+@pytest.mark.parametrize("stage", _transform_stages())
+def test_transform_stages_have_msgids(stage):
+    msgid = "transform_stage_" + stage
+    with open(os.path.join(ROOT, "locale", "messages.pot"), encoding="utf-8") as f:
+        assert f'msgid "{msgid}"' in f.read()
+    with open(os.path.join(ROOT, "locale", "ja_JP", "LC_MESSAGES", "messages.mo"), "rb") as f:
+        translation = gettext.GNUTranslations(f)
+    assert translation.gettext(msgid) != msgid
@@ -0,0 +1,22 @@
+# tests/test_lowrank_solver.py
+
+import numpy as np
+from core import compute_tps_parameters
+from tps_solver import LowRankTPSSolver, TPSSolver
+
+def test_lowrank_with_all_landmarks_matches_exact(points):
+    dest, src = points
+    solver = LowRankTPSSolver(dest, 1e-3, landmarks=dest.shape[0])
+    for actual, expected in zip(solver.solve(src), TPSSolver(dest, 1e-3).solve(src)):
+        np.testing.assert_allclose(actual, expected, rtol=1e-6, atol=1e-6 * np.abs(expected).max())
+
+def test_lowrank_map_close_to_exact(make_points, exact_map, max_deviation):
+    dest, _ = make_points(200, size=(320, 240), seed=6)
+    # 滑らかな変形（2次の多項式）は少数のランドマークでも厳密な TPS とほぼ同じ写像になる
+    src = np.stack((dest[:, 0] + 1e-4 * dest[:, 0] * dest[:, 1], dest[:, 1] + 2e-4 * dest[:, 0] ** 2), axis=1)
+    exact = exact_map(*compute_tps_parameters(dest, src, reg_lambda=1e-3), dest)
+    params_x, params_y = compute_tps_parameters(dest, src, reg_lambda=1e-3, lowrank_threshold=100,
+                                                lowrank_landmarks=60)
+    assert np.count_nonzero(params_x[:-3]) <= 60
+    # 対応点の外側（画像の隅）は外挿になるため、変位（最大約 20 画素）に対して 1% 強の差まで許す
+    assert max_deviation(exact_map(params_x, params_y, dest), exact) < 0.25
@@ -0,0 +1,59 @@
+# tests/test_morph_export.py
+
+import os
+import cv2
+import numpy as np
+import pytest
+from PyQt5.QtGui import QImage
+from core import WarpMapBuilder, perform_array_transformation
+import morph_export
+from morph_export import FRAME_FILE_NAME, compute_morph_maps, export_morph_animation
+
+def test_morph_maps_run_from_affine_to_tps(points):
+    dest, src = points
+    maps = compute_morph_maps(dest, src, (400, 300))
+    exact = WarpMapBuilder(dest, src, (400, 300)).rows(0, 300)
+    end = maps.rows(1.0, 0, 300)
+    for axis in range(2):
+        np.testing.assert_allclose(end[axis], exact[axis], atol=1e-3)
+    # t = 0 はアフィン変換だけなので、どの方向にも 2 階差分が 0 になる
+    start = maps.rows(0.0, 0, 300)
+    for axis in range(2):
+        assert np.abs(np.diff(start[axis].astype(np.float64), 2, axis=0)).max() < 1e-3
+        assert np.abs(np.diff(start[axis].astype(np.float64), 2, axis=1)).max() < 1e-3
+    # 途中のフレームは両端の線形補間
+    middle = maps.rows(0.25, 100, 140)
+    for axis in range(2):
+        np.testing.assert_allclose(middle[axis], 0.75 * start[axis][100:140] + 0.25 * end[axis][100:140], atol=1e-3)
+
+def test_scaled_maps_have_the_frame_size(points):
+    dest, src = points
+    assert compute_morph_maps(dest, src, (400, 300), scale=0.5).size == (200, 150)
+
+def test_exported_frames_end_at_the_warped_map(tmp_path, points, test_image):
+    dest, src = points
+    rgb = test_image(420, 320)
+    qimage = QImage(rgb.data, 420, 320, 3 * 420, QImage.Format_RGB888).copy()
+    directory = str(tmp_path / "frames")
+    assert export_morph_animation(dest, src, qimage, (400, 300), directory, frames=3, workers=2) == directory
+    assert sorted(os.listdir(directory)) == [FRAME_FILE_NAME.format(index=i) for i in range(3)]
+    frames = [cv2.cvtColor(cv2.imread(os.path.join(directory, FRAME_FILE_NAME.format(index=i))), cv2.COLOR_BGR2RGB)
+              for i in range(3)]
+    expected = perform_array_transformation(dest, src, rgb, (400, 300))
+    # マップの計算順序の違いによる丸めで、ごく一部の画素が 1 だけ異なることがある
+    assert np.abs(frames[-1].astype(np.int16) - expected).max() <= 1
+    assert not np.array_equal(frames[0], frames[-1])
+
+def test_at_least_one_frame_is_required(tmp_path, points):
+    dest, src = points
+    with pytest.raises(ValueError):
+        export_morph_animation(dest, src, QImage(40, 30, QImage.Format_RGB32), (400, 300), str(tmp_path), frames=0)
+
+def test_command_exports_project_frames(tmp_path, write_project, make_points, test_image):
+    dest, src = make_points(12, size=(200, 150), amplitude=6.0)
+    project = write_project("map", (200, 150), test_image(210, 160), dest, src)
+    out = tmp_path / "frames"
+    assert morph_export.main(["morph", project, "--out", str(out), "--frames", "2", "--scale", "0.5"]) == 0
+    assert cv2.imread(str(out / FRAME_FILE_NAME.format(index=1))).shape == (75, 100, 3)
+    bad = write_project("bad", (200, 150), test_image(210, 160), dest[:2], src[:2])
+    assert morph_export.main(["morph", bad, "--out", str(tmp_path / "bad")]) == 1
@@ -0,0 +1,50 @@
+# tests/test_mosaic.py
+
+import numpy as np
+import pytest
+from PyQt5.QtGui import QImage
+from core import (ArrayImageReader, QImageSourceReader, create_map_builder, mosaic_image_sources,
+                  perform_array_transformation, perform_mosaic_transformation)
+
+def test_single_sheet_matches_plain_warp(points, test_image):
+    dest, src = points
+    rgb = test_image(420, 320)
+    result = mosaic_image_sources([(dest, src, ArrayImageReader(rgb))], (400, 300), workers=2)
+    np.testing.assert_array_equal(result, perform_array_transformation(dest, src, rgb, (400, 300)))
+
+def test_overlapping_sheets_reassemble_the_map(points, test_image):
+    dest, src = points
+    rgb = test_image(420, 320)
+    # 1 枚の地図を、横に 100 画素重なる 2 枚のシートに分ける（右のシートの座標は 150 画素ずれる）
+    sheets = [(dest, src, ArrayImageReader(rgb[:, :250].copy())),
+              (dest, src - (150, 0), ArrayImageReader(rgb[:, 150:].copy()))]
+    result = mosaic_image_sources(sheets, (400, 300), workers=2)
+    expected = perform_array_transformation(dest, src, rgb, (400, 300))
+    map_x, map_y = create_map_builder(dest, src, (400, 300)).rows(0, 300)
+    # 地図やシートの縁の近くは、補間に縁の外（白）が混ざる割合が単独の変換と異なるため除く
+    inner = ((map_x > 3) & (map_x < 417) & (map_y > 3) & (map_y < 317)
+             & (np.abs(map_x - 150) > 3) & (np.abs(map_x - 250) > 3))
+    assert np.abs(result.astype(np.int16) - expected)[inner].max() <= 1
+    outside = (map_x < -3) | (map_x > 423) | (map_y < -3) | (map_y > 323)
+    assert outside.any() and (result[outside] == 255).all()
+
+def test_qimage_mosaic_keeps_alpha(points, test_image):
+    dest, src = points
+    rgb = test_image(420, 320)
+    opaque = QImage(rgb.data, 420, 320, 3 * 420, QImage.Format_RGB888).convertToFormat(QImage.Format_RGB32)
+    result = perform_mosaic_transformation([(dest, src, opaque)], (400, 300))
+    assert (result.width(), result.height(), result.format()) == (400, 300, QImage.Format_RGB32)
+    transparent = opaque.convertToFormat(QImage.Format_ARGB32)
+    result = perform_mosaic_transformation([(dest, src, opaque), (dest, src, transparent)], (400, 300))
+    assert result.format() == QImage.Format_ARGB32
+
+def test_sheets_must_share_channel_count(points, test_image):
+    dest, src = points
+    rgb = test_image(420, 320)
+    qimage = QImage(rgb.data, 420, 320, 3 * 420, QImage.Format_RGB888).convertToFormat(QImage.Format_RGB32)
+    # QImage のメモリをそのまま参照するリーダーは 4 チャンネル、配列のリーダーは RGB の 3 チャンネル
+    with pytest.raises(ValueError):
+        mosaic_image_sources([(dest, src, ArrayImageReader(rgb)), (dest, src, QImageSourceReader(qimage, native=True))],
+                             (400, 300))
+    with pytest.raises(ValueError):
+        mosaic_image_sources([], (400, 300))
@@ -0,0 +1,41 @@
+# tests/test_piecewise_affine.py
+
+import numpy as np
+import pytest
+from core import PiecewiseAffineMapBuilder, create_map_builder
+
+SIZE = (200, 150)
+
+def test_affine_correspondences_give_that_affine_everywhere(make_points):
+    dest, _ = make_points(15, size=SIZE)
+    matrix = np.array([[1.1, 0.2, 5.0], [-0.15, 0.95, -3.0]])
+    src = dest @ matrix[:, :2].T + matrix[:, 2]
+    map_x, map_y = PiecewiseAffineMapBuilder(dest, src, SIZE).rows(0, SIZE[1])
+    grid_x, grid_y = np.meshgrid(np.arange(SIZE[0], dtype=np.float64), np.arange(SIZE[1], dtype=np.float64))
+    # 凸包の外側も、全対応点から推定した同じアフィン変換でつながる
+    np.testing.assert_allclose(map_x, matrix[0, 0] * grid_x + matrix[0, 1] * grid_y + matrix[0, 2], atol=1e-3)
+    np.testing.assert_allclose(map_y, matrix[1, 0] * grid_x + matrix[1, 1] * grid_y + matrix[1, 2], atol=1e-3)
+
+def test_control_points_are_interpolated(make_points):
+    dest, src = make_points(15, size=SIZE, amplitude=8.0, seed=2)
+    dest = np.round(dest)
+    builder = create_map_builder(dest, src, SIZE, engine="piecewise_affine")
+    for (x, y), expected in zip(dest, src):
+        map_x, map_y = builder.sample(np.array([x]), np.array([y]))
+        np.testing.assert_allclose((map_x[0, 0], map_y[0, 0]), expected, atol=1e-3)
+
+def test_row_tiles_and_samples_match_full_map(make_points):
+    dest, src = make_points(30, size=SIZE, amplitude=8.0, seed=3)
+    builder = PiecewiseAffineMapBuilder(dest, src, SIZE)
+    full = builder.rows(0, SIZE[1])
+    tiles = [builder.rows(r0, r1, 20, 170) for r0, r1 in [(0, 7), (7, 80), (80, SIZE[1])]]
+    for axis in range(2):
+        np.testing.assert_array_equal(np.vstack([tile[axis] for tile in tiles]), full[axis][:, 20:170])
+    xs, ys = np.array([0.0, 33.0, 199.0]), np.array([149.0, 5.0, 70.0])
+    sampled = builder.sample(xs, ys)
+    for axis in range(2):
+        np.testing.assert_array_equal(sampled[axis], full[axis][np.ix_(ys.astype(int), xs.astype(int))])
+
+def test_requires_three_points():
+    with pytest.raises(ValueError):
+        PiecewiseAffineMapBuilder([(0.0, 0.0), (10.0, 0.0)], [(0.0, 0.0), (10.0, 0.0)], SIZE)
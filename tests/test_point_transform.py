@@ -0,0 +1,61 @@
+# tests/test_point_transform.py
+
+import csv
+import json
+import numpy as np
+import pytest
+from core import WarpMapBuilder
+from point_transform import PointTransformer, transform_file, transform_points
+
+@pytest.fixture
+def transformer(points):
+    dest, src = points
+    return PointTransformer(dest, src, reg_lambda=1e-3, workers=2)
+
+def test_forward_matches_the_warp_map(points, transformer):
+    dest, src = points
+    xs, ys = np.arange(0.0, 400.0, 37.5), np.arange(0.0, 300.0, 21.0)
+    map_x, map_y = WarpMapBuilder(dest, src, (400, 300)).sample(xs, ys)
+    grid_x, grid_y = np.meshgrid(xs, ys)
+    result = transformer.forward(np.stack((grid_x.ravel(), grid_y.ravel()), axis=1))
+    # ワープマップは float32 のため、その丸めの範囲で一致する
+    np.testing.assert_allclose(result[:, 0], map_x.ravel(), atol=1e-3)
+    np.testing.assert_allclose(result[:, 1], map_y.ravel(), atol=1e-3)
+    np.testing.assert_allclose(transformer.forward(dest), src, atol=0.05)
+
+def test_inverse_undoes_forward(transformer):
+    game = np.random.default_rng(11).uniform((0.0, 0.0), (400.0, 300.0), (500, 2))
+    real = transformer.forward(game)
+    np.testing.assert_allclose(transformer.inverse(real), game, atol=1e-5)
+    np.testing.assert_allclose(transformer.transform(real, "inverse"), game, atol=1e-5)
+
+def test_transform_points_and_direction(points):
+    dest, src = points
+    np.testing.assert_allclose(transform_points(dest, src, [(10.0, 20.0)]),
+                               PointTransformer(dest, src).forward([(10.0, 20.0)]))
+    with pytest.raises(ValueError):
+        transform_points(dest, src, [(10.0, 20.0)], direction="sideways")
+    with pytest.raises(ValueError):
+        PointTransformer(dest[:2], src[:2])
+
+def test_csv_and_geojson_files(tmp_path, transformer):
+    csv_path = tmp_path / "places.csv"
+    csv_path.write_text("name,x,y\nA,10,20\nB,,\nC,150.5,99\n", encoding="utf-8")
+    assert transform_file(str(csv_path), str(tmp_path / "out" / "places.csv"), transformer, "forward") == 2
+    with open(str(tmp_path / "out" / "places.csv"), newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    expected = transformer.forward([(10.0, 20.0), (150.5, 99.0)])
+    assert rows[0] == ["name", "x", "y"] and rows[2] == ["B", "", ""]
+    np.testing.assert_allclose([[float(v) for v in rows[i][1:]] for i in (1, 3)], expected, atol=1e-6)
+
+    line = [[10.0, 20.0, 7.0], [150.5, 99.0, 8.0]]
+    document = {"type": "FeatureCollection", "features": [
+        {"type": "Feature", "properties": {"name": "road"}, "geometry": {"type": "LineString", "coordinates": line}}]}
+    geojson_path = tmp_path / "roads.geojson"
+    geojson_path.write_text(json.dumps(document), encoding="utf-8")
+    assert transform_file(str(geojson_path), str(tmp_path / "roads_out.geojson"), transformer, "forward") == 2
+    with open(str(tmp_path / "roads_out.geojson"), encoding="utf-8") as f:
+        coordinates = json.load(f)["features"][0]["geometry"]["coordinates"]
+    # 3 番目以降の値（標高など）は変えない
+    assert [c[2] for c in coordinates] == [7.0, 8.0]
+    np.testing.assert_allclose([c[:2] for c in coordinates], expected)
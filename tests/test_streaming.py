@@ -0,0 +1,38 @@
+# tests/test_streaming.py
+
+import cv2
+import numpy as np
+import pytest
+from core import perform_array_transformation
+from streaming import open_image_reader, stream_to_file
+
+def _test_image(width: int = 300, height: int = 200) -> np.ndarray:
+    rng = np.random.default_rng(8)
+    base = rng.integers(0, 256, (height // 10 + 1, width // 10 + 1, 3), dtype=np.uint8)
+    # 圧縮が効きつつ、画素ごとの差も残る画像
+    image = cv2.resize(base, (width, height), interpolation=cv2.INTER_LINEAR)
+    return np.ascontiguousarray(image + rng.integers(0, 4, image.shape, dtype=np.uint8))
+
+@pytest.mark.parametrize("source_ext, output_ext", [(".png", ".npy"), (".tif", ".tif"), (".npy", ".png")])
+def test_streamed_warp_matches_in_memory(tmp_path, points, source_ext, output_ext):
+    dest, src = points
+    rgb = _test_image(420, 320)
+    source = str(tmp_path / ("source" + source_ext))
+    if source_ext == ".npy":
+        np.save(source, rgb)
+    else:
+        cv2.imwrite(source, cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR))
+    settings = {"reg_lambda": 1e-3, "max_memory_mb": 1, "workers": 1}
+    expected = perform_array_transformation(dest, src, rgb, (400, 300), **settings)
+
+    output = str(tmp_path / ("output" + output_ext))
+    reader = open_image_reader(source)
+    try:
+        stream_to_file(dest, src, reader, output, (400, 300), settings=settings)
+    finally:
+        reader.close()
+    if output_ext == ".npy":
+        result = np.load(output)
+    else:
+        result = cv2.cvtColor(cv2.imread(output, cv2.IMREAD_UNCHANGED), cv2.COLOR_BGR2RGB)
+    np.testing.assert_array_equal(result, expected)
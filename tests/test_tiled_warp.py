@@ -0,0 +1,37 @@
+# tests/test_tiled_warp.py
+
+import numpy as np
+import pytest
+from core import MIN_TILES, _plan_row_tiles, _tps_warp_tile, apply_tps_warp, compute_tps_parameters
+
+SIZE = (320, 240)
+
+@pytest.fixture
+def warp(make_points):
+    dest, src = make_points(20, size=SIZE, amplitude=25.0, seed=4)
+    params_x, params_y = compute_tps_parameters(dest, src, reg_lambda=1e-3)
+    grid_x, grid_y = np.meshgrid(np.arange(SIZE[0], dtype=np.float64), np.arange(SIZE[1], dtype=np.float64))
+    return params_x, params_y, dest, grid_x, grid_y
+
+@pytest.mark.parametrize("max_memory_mb, workers", [(None, 1), (0.5, 1), (0.5, 2), (None, 3)])
+def test_tiled_evaluation_matches_single_tile(warp, max_memory_mb, workers):
+    params_x, params_y, dest, grid_x, grid_y = warp
+    whole = _tps_warp_tile(params_x, params_y, dest, grid_x, grid_y)
+    # 行ストリップに分割しても、同じ画素は同じ式で評価される
+    tiled = apply_tps_warp(params_x, params_y, dest, grid_x, grid_y, max_memory_mb=max_memory_mb, workers=workers)
+    np.testing.assert_array_equal(whole[0], tiled[0])
+    np.testing.assert_array_equal(whole[1], tiled[1])
+
+def test_row_tiles_cover_the_grid_and_respect_the_budget():
+    n_points, width, height = 500, 1000, 700
+    # 上限がなくても MIN_TILES 個程度には分割する
+    tiles = _plan_row_tiles(height, n_points, width, None, 1)
+    assert len(tiles) >= MIN_TILES
+    budget_mb = 64.0
+    for workers in (1, 4):
+        tiles = _plan_row_tiles(height, n_points, width, budget_mb, workers)
+        assert tiles[0][0] == 0 and tiles[-1][1] == height
+        assert all(a[1] == b[0] for a, b in zip(tiles, tiles[1:]))
+        # 同時に処理される workers 個のストリップの U テンソルが上限に収まる
+        rows = max(r1 - r0 for r0, r1 in tiles)
+        assert workers * rows * width * (n_points + 4) * 8 <= budget_mb * 1024 * 1024
@@ -0,0 +1,29 @@
+# tests/test_tps_fast.py
+
+import numpy as np
+import pytest
+from core import WarpMapBuilder, compute_tps_parameters
+from tps_fast import FastTPSEvaluator
+
+@pytest.mark.parametrize("tolerance", [0.1, 0.01])
+def test_fast_evaluator_within_tolerance(warp, max_deviation, tolerance):
+    fast = FastTPSEvaluator(warp.params_x, warp.params_y, warp.dest, warp.size, tolerance=tolerance)
+    approx = fast.evaluate_grid(np.arange(warp.size[0], dtype=np.float64), np.arange(warp.size[1], dtype=np.float64))
+    assert max_deviation(approx, warp.exact) <= tolerance
+
+def test_fast_evaluator_with_many_points(make_points, exact_map, max_deviation):
+    size = (320, 240)
+    dest, src = make_points(400, size=size, amplitude=3.0, seed=5)
+    params_x, params_y = compute_tps_parameters(dest, src, reg_lambda=1.0)
+    fast = FastTPSEvaluator(params_x, params_y, dest, size, tolerance=0.05)
+    # 遠方場の近似が使われる程度に木が深いことを確かめる
+    assert fast.levels >= 3
+    approx = fast.evaluate_grid(np.arange(size[0], dtype=np.float64), np.arange(size[1], dtype=np.float64))
+    assert max_deviation(approx, exact_map(params_x, params_y, dest, size)) <= 0.05
+
+def test_map_builder_fast_mode_close_to_exact(make_points, max_deviation):
+    dest, src = make_points(15, size=(320, 240), amplitude=10.0, seed=7)
+    exact = WarpMapBuilder(dest, src, (320, 240)).rows(0, 240)
+    approx = WarpMapBuilder(dest, src, (320, 240), eval_mode="fast", grid_tolerance=0.05).rows(0, 240)
+    # 変換元は変換先の 1.05 倍の大きさなので、アフィン変換を合成したマップでの誤差もほぼ同じ大きさになる
+    assert max_deviation(approx, exact) < 0.1
@@ -0,0 +1,41 @@
+# tests/test_tps_lattice.py
+
+import numpy as np
+import pytest
+from core import LATTICE_ERROR_SAFETY, TPSLattice, WarpMapBuilder, apply_tps_warp
+
+@pytest.mark.parametrize("tolerance", [0.1, 0.02])
+def test_lattice_within_tolerance(warp, max_deviation, tolerance):
+    lattice = TPSLattice(warp.params_x, warp.params_y, warp.dest, warp.size, step=32, tolerance=tolerance)
+    approx = lattice.interpolate(np.arange(warp.size[0]), np.arange(warp.size[1]))
+    assert max_deviation(approx, warp.exact) <= tolerance
+
+def test_lattice_is_exact_on_nodes(warp, max_deviation):
+    lattice = TPSLattice(warp.params_x, warp.params_y, warp.dest, warp.size, step=16)
+    nodes = np.arange(0, warp.size[0], 16), np.arange(0, warp.size[1], 16)
+    grid_x, grid_y = np.meshgrid(*nodes)
+    exact = apply_tps_warp(warp.params_x, warp.params_y, warp.dest, grid_x.astype(np.float64), grid_y.astype(np.float64))
+    assert max_deviation(lattice.interpolate(*nodes), exact) < 1e-9
+
+def test_interpolate_points_matches_grid(warp):
+    lattice = TPSLattice(warp.params_x, warp.params_y, warp.dest, warp.size, step=16)
+    xs, ys = np.array([0.0, 7.5, 100.25, 319.0]), np.array([3.0, 60.5, 239.0])
+    grid = lattice.interpolate(xs, ys)
+    grid_x, grid_y = np.meshgrid(xs, ys)
+    points = lattice.interpolate_points(grid_x.ravel(), grid_y.ravel())
+    np.testing.assert_allclose(points[0], grid[0].ravel(), rtol=0, atol=1e-9)
+    np.testing.assert_allclose(points[1], grid[1].ravel(), rtol=0, atol=1e-9)
+
+def test_error_estimate_bounds_true_error(warp, max_deviation):
+    lattice = TPSLattice(warp.params_x, warp.params_y, warp.dest, warp.size, step=32)
+    true_error = max_deviation(lattice.interpolate(np.arange(warp.size[0]), np.arange(warp.size[1])), warp.exact)
+    # 標本点上の最大値なので真の最大値は超えないが、安全係数の範囲には収まる
+    assert lattice.max_error <= true_error + 1e-12
+    assert true_error <= lattice.max_error * LATTICE_ERROR_SAFETY
+
+def test_map_builder_grid_mode_close_to_exact(make_points, max_deviation):
+    dest, src = make_points(15, size=(320, 240), amplitude=10.0, seed=7)
+    exact = WarpMapBuilder(dest, src, (320, 240)).rows(0, 240)
+    approx = WarpMapBuilder(dest, src, (320, 240), eval_mode="grid", grid_tolerance=0.05).rows(0, 240)
+    # 変換元は変換先の 1.05 倍の大きさなので、アフィン変換を合成したマップでの誤差もほぼ同じ大きさになる
+    assert max_deviation(approx, exact) < 0.1
@@ -0,0 +1,90 @@
+# tests/test_tps_solver.py
+
+import threading
+import numpy as np
+import pytest
+from tps_solver import TPSSolver, get_tps_solver
+
+def _assert_same_params(actual, expected, rtol=1e-8):
+    for a, e in zip(actual, expected):
+        np.testing.assert_allclose(a, e, rtol=rtol, atol=rtol * np.abs(e).max())
+
+def test_solve_matches_direct_system(points, direct_system):
+    dest, src = points
+    params_x, params_y = TPSSolver(dest, 1e-3).solve(src)
+    rhs = np.zeros((dest.shape[0] + 3, 2))
+    rhs[3:] = src
+    solution = np.linalg.solve(direct_system(dest, 1e-3), rhs)
+    # 直接解いた解は [a_0, a_x, a_y, w_1..w_N] の順
+    expected = np.vstack((solution[3:], solution[:3]))
+    _assert_same_params((params_x, params_y), (expected[:, 0], expected[:, 1]))
+
+@pytest.mark.parametrize("action", ["add", "remove", "move"])
+def test_incremental_update_matches_fresh_solver(points, action):
+    dest, src = points
+    solver = TPSSolver(dest, 1e-3)
+    if action == "add":
+        solver.add_point((123.0, 45.0), 4)
+        dest = np.insert(dest, 4, (123.0, 45.0), axis=0)
+        src = np.insert(src, 4, (130.0, 41.0), axis=0)
+    elif action == "remove":
+        solver.remove_point(5)
+        dest = np.delete(dest, 5, axis=0)
+        src = np.delete(src, 5, axis=0)
+    else:
+        solver.move_point(3, (200.0, 150.0))
+        dest = dest.copy()
+        dest[3] = (200.0, 150.0)
+    np.testing.assert_array_equal(solver.dest_points, dest)
+    _assert_same_params(solver.solve(src), TPSSolver(dest, 1e-3).solve(src))
+
+def test_many_updates_stay_accurate(make_points):
+    dest, src = make_points(20, seed=1)
+    rng = np.random.default_rng(2)
+    # 再分解の間隔より少ない回数の更新で、誤差が蓄積しないことを確かめる
+    solver = TPSSolver(dest, 1e-6, refactor_interval=1000)
+    for i in range(30):
+        index = int(rng.integers(dest.shape[0]))
+        point = rng.uniform(10.0, 290.0, 2)
+        dest = dest.copy()
+        dest[index] = point
+        solver.move_point(index, point)
+    _assert_same_params(solver.solve(src), TPSSolver(dest, 1e-6).solve(src), rtol=1e-7)
+
+def test_cached_solver_is_updated_incrementally(points):
+    dest, src = points
+    first = get_tps_solver(dest, 1e-3)
+    assert get_tps_solver(dest.copy(), 1e-3) is first
+    moved = dest.copy()
+    moved[2] += (3.0, -2.0)
+    updated = get_tps_solver(moved, 1e-3)
+    assert updated is not first and updated._updates == 1
+    # 元のソルバーは複製してから更新されるため変わらない
+    np.testing.assert_array_equal(first.dest_points, dest)
+    _assert_same_params(updated.solve(src), TPSSolver(moved, 1e-3).solve(src))
+
+def test_shared_solver_is_consistent_across_threads(points):
+    dest, src = points
+    moved = dest.copy()
+    moved[3] = (200.0, 150.0)
+    expected = [TPSSolver(dest, 1e-3).solve(src), TPSSolver(moved, 1e-3).solve(src)]
+    # 3 回の更新ごとに再分解させ、ほかのスレッドの解く処理と逐次更新・再分解を競合させる
+    solver = TPSSolver(dest, 1e-3, refactor_interval=3)
+    results, stop = [], threading.Event()
+
+    def solve_loop():
+        while not stop.is_set():
+            results.append(solver.solve(src))
+
+    threads = [threading.Thread(target=solve_loop) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for i in range(60):
+        solver.move_point(3, moved[3] if i % 2 == 0 else dest[3])
+    stop.set()
+    for thread in threads:
+        thread.join()
+    assert results
+    for params in results:
+        assert any(np.allclose(params[0], e[0], rtol=1e-6, atol=1e-9) and
+                   np.allclose(params[1], e[1], rtol=1e-6, atol=1e-9) for e in expected)
@@ -0,0 +1,35 @@
+# tests/test_transform_api.py
+
+import numpy as np
+import pytest
+from PyQt5.QtGui import QImage
+from common import numpy_to_qimage, qimage_to_numpy
+from core import perform_qimage_transformation, perform_transformation
+
+def _source_qimage() -> QImage:
+    rng = np.random.default_rng(10)
+    return numpy_to_qimage(rng.integers(0, 256, (150, 200, 3), dtype=np.uint8))
+
+def test_reg_lambda_and_adaptive_stay_positional(points):
+    dest, src = points
+    image = _source_qimage()
+    # 以前の版の呼び出し perform_transformation(d, s, img, size, reg_lambda, adaptive) がそのまま動く
+    positional = perform_transformation(dest, src, image, (160, 120), 10.0, True)
+    keyword = perform_transformation(dest, src, image, (160, 120), reg_lambda=10.0, adaptive=True)
+    np.testing.assert_array_equal(positional, keyword)
+    default = perform_transformation(dest, src, image, (160, 120))
+    assert not np.array_equal(positional, default)
+
+def test_progress_and_cancel_are_keyword_only(points):
+    dest, src = points
+    with pytest.raises(TypeError):
+        perform_transformation(dest, src, _source_qimage(), (160, 120), 1e-3, False, lambda *args: None)
+
+def test_qimage_result_matches_array_result(points):
+    dest, src = points
+    image = _source_qimage()
+    stages = []
+    qimage = perform_qimage_transformation(dest, src, image, (160, 120), 1e-3, False,
+                                           progress_callback=lambda stage, done, total: stages.append(stage))
+    np.testing.assert_array_equal(qimage_to_numpy(qimage), perform_transformation(dest, src, image, (160, 120)))
+    assert stages[0] == "prepare"
@@ -0,0 +1,58 @@
+# tests/test_warp_cache.py
+
+import os
+import numpy as np
+from core import perform_array_transformation
+from warp_cache import WarpMapCache, make_cache_key
+
+def _write(cache, key, height=10, width=20, value=1.0):
+    writer = cache.create(key, height, width)
+    writer.maps[:] = value
+    writer.commit()
+
+def test_cache_key_depends_on_points_and_options(points):
+    dest, src = points
+    key = make_cache_key(dest, src, (400, 300), (320, 420, 3), reg_lambda=1e-3)
+    assert make_cache_key(dest.copy(), src.copy(), (400, 300), (320, 420, 4), reg_lambda=1e-3) == key
+    moved = src.copy()
+    moved[0, 0] += 0.5
+    assert make_cache_key(dest, moved, (400, 300), (320, 420, 3), reg_lambda=1e-3) != key
+    assert make_cache_key(dest, src, (400, 300), (320, 420, 3), reg_lambda=1e-2) != key
+    assert make_cache_key(dest, src, (400, 301), (320, 420, 3), reg_lambda=1e-3) != key
+
+def test_committed_maps_are_loaded_back(tmp_path):
+    cache = WarpMapCache(str(tmp_path), 1)
+    writer = cache.create("a", 10, 20)
+    writer.maps[:] = np.arange(400, dtype=np.float32).reshape(10, 20, 2)
+    # commit するまではキャッシュに現れない
+    assert cache.load("a") is None
+    writer.commit()
+    np.testing.assert_array_equal(cache.load("a"), np.arange(400, dtype=np.float32).reshape(10, 20, 2))
+    writer = cache.create("b", 10, 20)
+    writer.discard()
+    assert cache.load("b") is None and os.listdir(str(tmp_path)) == ["a.npy"]
+
+def test_least_recently_used_maps_are_evicted(tmp_path):
+    # 1 つのマップは約 1.6KB なので、上限 4KB には 2 つまでしか残らない
+    cache = WarpMapCache(str(tmp_path), 4 / 1024)
+    _write(cache, "old")
+    _write(cache, "used")
+    os.utime(str(tmp_path / "old.npy"), (1, 1))
+    os.utime(str(tmp_path / "used.npy"), (2, 2))
+    assert cache.load("used") is not None  # 読み出しで最終使用時刻が更新される
+    _write(cache, "new")
+    assert sorted(os.listdir(str(tmp_path))) == ["new.npy", "used.npy"]
+
+def test_cached_warp_skips_solve_and_matches(tmp_path, monkeypatch, points):
+    monkeypatch.setenv("KARTENWARP_CONFIG_DIR", str(tmp_path))
+    dest, src = points
+    image = np.random.default_rng(0).integers(0, 256, (320, 420, 3), dtype=np.uint8)
+    expected = perform_array_transformation(dest, src, image, (400, 300))
+    for stages in ({"solve", "warp"}, {"warp"}):
+        seen = set()
+        result = perform_array_transformation(dest, src, image, (400, 300), use_map_cache=True,
+                                              progress_callback=lambda stage, done, total: seen.add(stage))
+        np.testing.assert_array_equal(result, expected)
+        # 2 回目はキャッシュ済みのマップで再サンプリングだけを行う
+        assert seen == stages
+    assert len(os.listdir(str(tmp_path / "warp_cache"))) == 1
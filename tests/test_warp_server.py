@@ -0,0 +1,99 @@
+# tests/test_warp_server.py
+
+import json
+import asyncio
+import threading
+import cv2
+import numpy as np
+from core import perform_array_transformation
+from warp_server import MemoryLRUCache, WarpServer
+
+async def _request(address, method, path, payload=None):
+    """
+    サーバーに 1 件のリクエストを送り、(ステータスコード, 応答の JSON のリスト) を返します。
+    """
+    reader, writer = await asyncio.open_connection(*address[:2])
+    body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+    response = await reader.read()
+    writer.close()
+    head, _sep, content = response.partition(b"\r\n\r\n")
+    status = int(head.split()[1])
+    if b"chunked" not in head:
+        return status, [json.loads(content)]
+    lines = []
+    while True:
+        size, _sep, content = content.partition(b"\r\n")
+        if int(size, 16) == 0:
+            return status, lines
+        lines.append(json.loads(content[:int(size, 16)]))
+        content = content[int(size, 16) + 2:]
+
+def _run(server, scenario):
+    async def main():
+        await server.start("127.0.0.1", 0)
+        try:
+            return await scenario(server.addresses[0])
+        finally:
+            await server.close()
+    return asyncio.run(main())
+
+def test_repeated_jobs_reuse_the_warm_caches(tmp_path, make_points, test_image):
+    dest, src = make_points(12, size=(200, 150), amplitude=6.0)
+    rgb = test_image(210, 160)
+    source = str(tmp_path / "real.png")
+    cv2.imwrite(source, cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR))
+    spec = {"game_points": dest.tolist(), "real_points": src.tolist(), "source": source, "output_size": [200, 150],
+            "settings": {"reg_lambda": 1e-3, "adaptive": False, "use_map_cache": False}}
+
+    async def scenario(address):
+        responses = []
+        for name in ("first.png", "second.png"):
+            responses.append(await _request(address, "POST", "/warp", dict(spec, output=str(tmp_path / name))))
+        responses.append(await _request(address, "GET", "/status"))
+        return responses
+
+    (status1, events1), (status2, events2), (_status, (stats,)) = _run(WarpServer(jobs=1, threads=1), scenario)
+    assert status1 == status2 == 200
+    assert [e["event"] for e in events1][:2] == ["queued", "started"]
+    done1, done2 = events1[-1], events2[-1]
+    assert done1["event"] == done2["event"] == "done"
+    assert done1["cached"] == {"source": False, "solver": False}
+    assert done2["cached"] == {"source": True, "solver": True}
+    assert stats["caches"]["solvers"] == {"items": 1, "bytes": 0, "hits": 1, "misses": 1}
+    expected = perform_array_transformation(dest, src, rgb, (200, 150), reg_lambda=1e-3, workers=1)
+    for name in ("first.png", "second.png"):
+        np.testing.assert_array_equal(cv2.cvtColor(cv2.imread(str(tmp_path / name)), cv2.COLOR_BGR2RGB), expected)
+
+def test_invalid_requests_are_rejected(tmp_path):
+    async def scenario(address):
+        return [await _request(address, "GET", "/unknown"),
+                await _request(address, "GET", "/warp"),
+                await _request(address, "POST", "/warp", {"source": "a.png"}),
+                await _request(address, "POST", "/warp", {"output": str(tmp_path / "a.png")})]
+
+    (s404, _b1), (s405, _b2), (s400, _b3), (status, events) = _run(WarpServer(jobs=1, threads=1), scenario)
+    assert (s404, s405, s400) == (404, 405, 400)
+    # 本文の検証はワーカーで行われるため、不足した項目は error イベントとして通知される
+    assert status == 200 and events[-1]["event"] == "error" and "game_points" in events[-1]["error"]
+
+def test_memory_cache_creates_once_and_evicts_least_recent():
+    cache = MemoryLRUCache(max_items=2)
+    calls = []
+    barrier = threading.Barrier(4)
+
+    def load():
+        barrier.wait()
+        cache.get_or_create("a", lambda: calls.append(1) or "A")
+
+    threads = [threading.Thread(target=load) for _i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert calls == [1]
+    cache.get_or_create("b", lambda: "B")
+    assert cache.get_or_create("a", lambda: "A2") == ("A", True)
+    cache.get_or_create("c", lambda: "C")
+    # 最後に使われた時刻が最も古い b が破棄される
+    assert cache.get_or_create("b", lambda: "B2") == ("B2", False)
@@ -0,0 +1,346 @@
+# utils/benchmark.py
+#
+# TPS 変換の主要な処理（compute_tps_parameters, apply_tps_warp, perform_transformation）を
+# 合成した対応点と画像で計測し、結果を JSON で書き出して基準値（ベースライン）と比較します。
+# ネットワークや GPU は使用しません。
+#
+# 例:
+#   python utils/benchmark.py --preset quick --save-baseline
+#   python utils/benchmark.py --preset quick --threshold 0.15
+import os
+import sys
+import gc
+import json
+import time
+import argparse
+import platform
+import threading
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, "src"))
+
+import numpy as np
+from PyQt5.QtGui import QImage
+from core import (compute_tps_parameters, apply_tps_warp, perform_transformation, load_transform_settings,
+                  estimate_precision_error, compile_warp, WARP_ENGINES, PRECISIONS)
+from common import qimage_array_view
+from tps_solver import clear_solver_cache
+
+PRESETS = {
+    "quick": {"points": [3, 50, 500], "sizes": [512, 1024]},
+    "standard": {"points": [3, 10, 100, 1000], "sizes": [512, 1024, 2048, 4096]},
+    "full": {"points": [3, 10, 100, 1000, 5000], "sizes": [512, 1024, 2048, 4096, 8192, 16384]},
+}
+STAGES = ("compute_tps_parameters", "apply_tps_warp", "perform_transformation", "apply_compiled_warp")
+DEFAULT_BASELINE = os.path.join(ROOT_DIR, "utils", "benchmark_baseline.json")
+RSS_SAMPLE_INTERVAL = 0.002
+
+def current_rss() -> int:
+    """
+    現在の RSS（バイト）を返します。/proc が使えない場合はプロセス開始以降の最大値を返します。
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+class RssSampler:
+    """
+    計測区間中の RSS の最大値を、バックグラウンドスレッドで定期的に読み取って求めます。
+    """
+    def __init__(self, interval: float = RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.start_rss = 0
+        self.peak_rss = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak_rss = max(self.peak_rss, current_rss())
+
+    def __enter__(self) -> "RssSampler":
+        self.start_rss = self.peak_rss = current_rss()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak_rss = max(self.peak_rss, current_rss())
+
+def measure(fn: Callable[[], Any], repeat: int, pixels: Optional[int] = None,
+            setup: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+    """
+    fn を repeat 回実行し、最短の実時間と CPU 時間、メモリの最大値、スループットを返します。
+    """
+    walls: List[float] = []
+    cpus: List[float] = []
+    peak_rss = peak_rss_delta = peak_traced = 0
+    for _i in range(repeat):
+        if setup is not None:
+            setup()
+        gc.collect()
+        tracemalloc.start()
+        with RssSampler() as sampler:
+            cpu_started = time.process_time()
+            started = time.perf_counter()
+            result = fn()
+            walls.append(time.perf_counter() - started)
+            cpus.append(time.process_time() - cpu_started)
+        peak_traced = max(peak_traced, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        del result
+        peak_rss = max(peak_rss, sampler.peak_rss)
+        peak_rss_delta = max(peak_rss_delta, sampler.peak_rss - sampler.start_rss)
+    best = min(walls)
+    metrics = {
+        "wall_s": best,
+        "wall_s_median": float(np.median(walls)),
+        "cpu_s": min(cpus),
+        "peak_rss_mb": peak_rss / 2 ** 20,
+        "peak_rss_delta_mb": peak_rss_delta / 2 ** 20,
+        "tracemalloc_peak_mb": peak_traced / 2 ** 20,
+        "repeat": repeat,
+    }
+    if pixels is not None:
+        metrics["mpx_per_s"] = pixels / 1e6 / best if best > 0 else None
+    return metrics
+
+def synthetic_points(n: int, size: int, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    正方形のキャンバス上に、アフィン変換と滑らかな歪みを加えた n 組の対応点を生成します。
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (変換先の対応点, 変換元の対応点)。いずれも形状 (n, 2)
+    """
+    rng = np.random.default_rng(seed + n)
+    margin = 0.05 * size
+    dest = rng.uniform(margin, size - margin, (n, 2))
+    angle = np.deg2rad(3.0)
+    rotation = 1.02 * np.array([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]])
+    src = dest @ rotation.T + np.array([0.01 * size, -0.02 * size])
+    src += 0.02 * size * np.sin(2 * np.pi * dest[:, ::-1] / size)
+    src += rng.normal(0.0, 0.5, src.shape)
+    return dest, src
+
+def synthetic_image(size: int) -> QImage:
+    """
+    グラデーションと市松模様からなる Format_RGB32 の画像を生成します。巨大な画像でも行単位で書き込みます。
+    """
+    qimage = QImage(size, size, QImage.Format_RGB32)
+    if qimage.isNull():
+        raise MemoryError(f"Failed to allocate a {size}x{size} image")
+    view = qimage_array_view(qimage, writable=True)
+    xs = np.arange(size, dtype=np.int64)
+    for r0 in range(0, size, 1024):
+        ys = np.arange(r0, min(size, r0 + 1024), dtype=np.int64)[:, None]
+        block = view[r0:r0 + ys.shape[0]]
+        block[:, :, 0] = xs * 255 // size
+        block[:, :, 1] = ys * 255 // size
+        block[:, :, 2] = ((xs // 32 + ys // 32) % 2) * 255
+        block[:, :, 3] = 255
+    return qimage
+
+def run_benchmarks(points: List[int], sizes: List[int], stages: List[str], repeat: int,
+                   settings: Dict[str, Any], max_exact_work: float, max_map_mb: float) -> List[Dict[str, Any]]:
+    """
+    点数と画像サイズの組み合わせごとに各処理を計測します。
+
+    compute_tps_parameters は点数だけで決まるため点数ごとに1回、ほかは組み合わせごとに計測します。
+    厳密評価の計算量（点数 × 画素数）が max_exact_work を超える場合や、apply_tps_warp の出力が
+    max_map_mb を超える場合は計測を省略し、理由を記録します。
+    float64 以外の精度では、apply_tps_warp の結果に float64 での評価との最大のずれ（max_error_px）を記録します。
+    apply_compiled_warp は compile_warp で作成済みの変換を 1 枚の元画像に適用する時間（2 枚目以降のレイヤーの
+    コスト）を計測し、作成にかかった時間を compile_s として記録します。
+    """
+    results: List[Dict[str, Any]] = []
+    # エンジンが異なる結果は別の項目としてベースラインと比較する
+    transform_stage = "perform_transformation"
+    if settings.get("engine", "tps") != "tps":
+        transform_stage += f"[{settings['engine']}]"
+    precision = settings.get("precision", "float64")
+    warp_stage = "apply_tps_warp" if precision == "float64" else f"apply_tps_warp[{precision}]"
+    if precision != "float64" and settings.get("engine", "tps") == "tps" and settings.get("eval_mode") == "exact":
+        transform_stage += f"[{precision}]"
+    compiled_stage = "apply_compiled_warp" + transform_stage[len("perform_transformation"):]
+
+    solver_options = {key: settings[key] for key in ("lowrank_threshold", "lowrank_landmarks") if key in settings}
+
+    def record(stage: str, n: int, size: Optional[int], metrics: Dict[str, Any]) -> None:
+        entry = {"id": f"{stage}/n={n}" + (f"/size={size}" if size is not None else ""),
+                 "stage": stage, "points": n, "size": size, **metrics}
+        results.append(entry)
+        print(_format_entry(entry), flush=True)
+
+    for n in points:
+        if "compute_tps_parameters" in stages:
+            dest, src = synthetic_points(n, max(sizes))
+            # 係数行列の分解がキャッシュされるため、毎回キャッシュを空にして初回の計算を計測する
+            record("compute_tps_parameters", n, None, measure(
+                lambda: compute_tps_parameters(dest, src, reg_lambda=settings["reg_lambda"], **solver_options),
+                repeat, setup=clear_solver_cache
+            ))
+    for size in sizes:
+        needs_source = "perform_transformation" in stages or "apply_compiled_warp" in stages
+        source = synthetic_image(size) if needs_source else None
+        pixels = size * size
+        for n in points:
+            dest, src = synthetic_points(n, size)
+            exact_too_large = n * pixels > max_exact_work
+            if "apply_tps_warp" in stages:
+                if exact_too_large or pixels * 16 / 2 ** 20 > max_map_mb:
+                    record(warp_stage, n, size, {"skipped": "exceeds --max-exact-work or --max-map-mb"})
+                else:
+                    params_x, params_y = compute_tps_parameters(dest, src, reg_lambda=settings["reg_lambda"], **solver_options)
+                    coords = np.arange(size, dtype=np.float64)
+                    # 格子は行・列のブロードキャストで表し、画像全体の座標配列を確保しない
+                    grid_x = np.broadcast_to(coords[None, :], (size, size))
+                    grid_y = np.broadcast_to(coords[:, None], (size, size))
+                    metrics = measure(
+                        lambda: apply_tps_warp(params_x, params_y, dest, grid_x, grid_y,
+                                               max_memory_mb=settings["max_memory_mb"], workers=settings["workers"],
+                                               precision=precision),
+                        repeat, pixels=pixels
+                    )
+                    if precision != "float64":
+                        metrics["max_error_px"] = estimate_precision_error(params_x, params_y, dest, (size, size),
+                                                                           precision)
+                    record(warp_stage, n, size, metrics)
+            if "perform_transformation" in stages:
+                if settings["engine"] == "tps" and settings["eval_mode"] == "exact" and exact_too_large:
+                    record(transform_stage, n, size, {"skipped": "exceeds --max-exact-work"})
+                else:
+                    record(transform_stage, n, size, measure(
+                        lambda: perform_transformation(dest.tolist(), src.tolist(), source, (size, size), **settings),
+                        repeat, pixels=pixels, setup=clear_solver_cache
+                    ))
+            if "apply_compiled_warp" in stages:
+                if settings["engine"] == "tps" and settings["eval_mode"] == "exact" and exact_too_large:
+                    record(compiled_stage, n, size, {"skipped": "exceeds --max-exact-work"})
+                else:
+                    started = time.perf_counter()
+                    compiled = compile_warp(dest.tolist(), src.tolist(), (size, size), (size, size), **settings)
+                    compile_s = time.perf_counter() - started
+                    metrics = measure(lambda: compiled.apply_qimage(source), repeat, pixels=pixels)
+                    metrics["compile_s"] = compile_s
+                    record(compiled_stage, n, size, metrics)
+                    del compiled
+        del source
+    return results
+
+def compare_with_baseline(results: List[Dict[str, Any]], baseline: Dict[str, Any], threshold: float,
+                          metric: str = "wall_s") -> List[Dict[str, Any]]:
+    """
+    ベースラインと同じ id の計測結果を比較し、metric が (1 + threshold) 倍を超えて悪化したものを返します。
+    """
+    previous = {entry["id"]: entry for entry in baseline.get("results", [])}
+    regressions = []
+    for entry in results:
+        old = previous.get(entry["id"])
+        if old is None or entry.get(metric) is None or old.get(metric) is None or old[metric] <= 0:
+            continue
+        ratio = entry[metric] / old[metric]
+        if ratio > 1.0 + threshold:
+            regressions.append({"id": entry["id"], "metric": metric, "baseline": old[metric],
+                                "current": entry[metric], "ratio": ratio})
+    return regressions
+
+def machine_info() -> Dict[str, Any]:
+    return {
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+    }
+
+def _format_entry(entry: Dict[str, Any]) -> str:
+    if "skipped" in entry:
+        return f"{entry['id']:<48} skipped ({entry['skipped']})"
+    throughput = f"{entry['mpx_per_s']:9.2f} MP/s" if entry.get("mpx_per_s") is not None else " " * 14
+    error = f"  max error {entry['max_error_px']:.4f} px" if "max_error_px" in entry else ""
+    return (f"{entry['id']:<48} {entry['wall_s']:9.4f}s  cpu {entry['cpu_s']:9.4f}s  {throughput}  "
+            f"rss +{entry['peak_rss_delta_mb']:8.1f} MB  traced {entry['tracemalloc_peak_mb']:8.1f} MB{error}")
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmark the KartenWarp TPS core")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="quick", help="Point counts and sizes to run")
+    parser.add_argument("--points", type=int, nargs="+", default=None, help="Override the point counts")
+    parser.add_argument("--sizes", type=int, nargs="+", default=None, help="Override the canvas sizes (square)")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES), help="Stages to measure")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement; the fastest is reported")
+    parser.add_argument("--workers", type=int, default=None, help="Threads (default: tps/workers setting)")
+    parser.add_argument("--eval-mode", choices=("exact", "grid", "fast"), default=None,
+                        help="TPS evaluation mode for perform_transformation (default: tps/eval_mode setting)")
+    parser.add_argument("--precision", choices=PRECISIONS, default=None,
+                        help="Kernel evaluation precision for the exact TPS path (default: tps/precision setting)")
+    parser.add_argument("--engine", choices=WARP_ENGINES, default="tps", help="Warp engine for perform_transformation")
+    parser.add_argument("--lowrank-threshold", type=int, default=None,
+                        help="Solve with the low-rank TPS above this point count; 0 always solves exactly "
+                             "(default: tps/lowrank_threshold setting)")
+    parser.add_argument("--max-exact-work", type=float, default=5e10,
+                        help="Skip exact evaluation when points x pixels exceeds this")
+    parser.add_argument("--max-map-mb", type=float, default=2048,
+                        help="Skip apply_tps_warp when its float64 maps exceed this size")
+    parser.add_argument("--output", "-o", default=None, help="Write the results JSON here")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Allowed slowdown relative to the baseline (0.2 = 20%%)")
+    return parser
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    ベンチマークを実行します。ベースラインに対して閾値を超える悪化があった場合は 1 を返します。
+    """
+    args = build_arg_parser().parse_args(argv)
+    preset = PRESETS[args.preset]
+    settings = load_transform_settings()
+    settings["use_map_cache"] = False
+    if args.workers is not None:
+        settings["workers"] = max(1, args.workers)
+    if args.eval_mode is not None:
+        settings["eval_mode"] = args.eval_mode
+    settings["engine"] = args.engine
+    if args.precision is not None:
+        settings["precision"] = args.precision
+    if args.lowrank_threshold is not None:
+        settings["lowrank_threshold"] = args.lowrank_threshold
+    results = run_benchmarks(args.points or preset["points"], args.sizes or preset["sizes"], args.stages,
+                             max(1, args.repeat), settings, args.max_exact_work, args.max_map_mb)
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": machine_info(),
+        "settings": {key: value for key, value in settings.items()},
+        "results": results,
+    }
+    exit_code = 0
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("machine") != report["machine"]:
+            print("Warning: the baseline was recorded on a different machine or environment")
+        regressions = compare_with_baseline(results, baseline, args.threshold)
+        report["comparison"] = {"baseline": args.baseline, "threshold": args.threshold, "regressions": regressions}
+        for regression in regressions:
+            print(f"REGRESSION {regression['id']}: {regression['baseline']:.4f}s -> "
+                  f"{regression['current']:.4f}s (x{regression['ratio']:.2f})")
+        print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%} against {args.baseline}")
+        exit_code = 1 if regressions else 0
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+    return exit_code
+
+if __name__ == "__main__":
+    sys.exit(main())